@@ -299,6 +299,7 @@ class AgentExecutor:
                         safe_print(f"\n{'='*80}")
                         safe_print(f"✅ Agent完成: {self.agent_name}")
                         safe_print(f"📊 状态: {tool_result.get('status', 'unknown')}")
+                        self._report_compressor_usage()
                         safe_print(f"{'='*80}\n")
                         
                         self.hierarchy_manager.pop_agent(self.agent_id, tool_result.get("output", ""))
@@ -335,6 +336,7 @@ class AgentExecutor:
         
         # 超过最大轮次
         safe_print(f"\n⚠️ 达到最大轮次限制: {self.max_turns}")
+        self._report_compressor_usage()
         timeout_result = {
             "status": "error",
             "output": "执行超过最大轮次限制",
@@ -443,16 +445,16 @@ class AgentExecutor:
             if not hasattr(self, 'action_compressor'):
                 self.action_compressor = ActionCompressor(self.llm_client)
             
-            # 使用新的压缩策略（传入 thinking 和 task_input）
-            compressed = self.action_compressor.compress_if_needed(
+            # 先拼接后台提前完成的总结，仍超限时同步压缩；接近上限时在后台提前总结
+            compressed = self.action_compressor.compress_with_background(
                 self.action_history,
                 self.llm_client.max_context_window,
                 thinking=self.latest_thinking,
                 task_input=getattr(self, 'current_task_input', '')
             )
             
-            # 如果发生了压缩，替换
-            if len(compressed) < len(self.action_history):
+            # 如果发生了压缩（返回了新列表），替换
+            if compressed is not self.action_history:
                 safe_print(f"✅ 历史动作已压缩: {len(self.action_history)}条 → {len(compressed)}条")
                 self.action_history = compressed
         
@@ -461,6 +463,14 @@ class AgentExecutor:
             import traceback
             traceback.print_exc()
     
+    def _report_compressor_usage(self):
+        """输出本次运行中历史压缩的模型消耗（未发生压缩时不输出）"""
+        compressor = getattr(self, 'action_compressor', None)
+        if compressor is None:
+            return
+        if compressor.usage["calls"] or compressor.usage["summary_cache_hits"]:
+            safe_print(compressor.usage_report())
+    
     def _recover_pending_tools(self, task_id: str):
         """恢复pending状态的工具调用"""
         for pending_tool in self.pending_tools[:]:  # 复制列表
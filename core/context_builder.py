@@ -8,6 +8,8 @@ from utils.windows_compat import safe_print
 from typing import Dict, List, Optional
 import json
 
+from utils.tool_result import render_tool_result
+
 
 class ContextBuilder:
     """构建XML结构化的Agent上下文（完整）"""
@@ -563,12 +565,8 @@ class ContextBuilder:
                 #action_xml += f"  <tool_use:{param_name}>{param_value_str}</tool_use:{param_name}>\n"
                 action_xml += f"  {param_name}:{param_value_str}\n"
             
-            # 添加结果（JSON格式）
-            try:
-                result_json = json.dumps(result, ensure_ascii=False, indent=2)
-                action_xml += f"  <result>\n{result_json}\n  </result>\n"
-            except:
-                action_xml += f"  <result>{str(result)}</result>\n"
+            # 添加结果（唯一的渲染步骤：输出原样保留，不再 JSON 转义）
+            action_xml += f"  <result>\n{render_tool_result(result)}\n  </result>\n"
             
             # action_xml += "</action>"
             actions_xml.append(action_xml)
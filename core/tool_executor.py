@@ -8,12 +8,13 @@ from utils.windows_compat import safe_print
 
 import requests
 import yaml
-import json
 import time
 import uuid
 from typing import Dict, Any
 from pathlib import Path
 
+from utils.tool_result import from_toolserver_data
+
 
 class ToolExecutor:
     """工具执行器 - 通过HTTP调用toolServer"""
@@ -256,20 +257,13 @@ class ToolExecutor:
             # 解析响应
             tool_server_response = response.json()
             
+            # 保持结构化：原始输出文本 + 元数据，只在 ContextBuilder 中渲染一次
+            output_data = tool_server_response.get("data") or {}
             if tool_server_response.get("success"):
-                output_data = tool_server_response.get("data", {})
-                return {
-                    "status": "success",
-                    "output": json.dumps(output_data, indent=2, ensure_ascii=False),
-                    "error_information": ""
-                }
+                return from_toolserver_data(output_data, status="success")
             else:
                 error_msg = tool_server_response.get("error", "工具服务器返回未知错误")
-                return {
-                    "status": "error",
-                    "output": "",
-                    "error_information": error_msg
-                }
+                return from_toolserver_data(output_data, status="error", error=error_msg)
         
         except Exception as e:
             return {
@@ -6,8 +6,14 @@ from utils.windows_compat import safe_print
 策略：总结历史XML + 保留最新action + 压缩最新action的大字段
 """
 
+import hashlib
 import json
-from typing import List, Dict
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+
+from services.output_reducers import reduce_output
 
 try:
     import tiktoken
@@ -19,6 +25,15 @@ except ImportError:
 class ActionCompressor:
     """历史动作压缩器"""
     
+    # 分段压缩时同时进行的压缩模型调用数（可通过 llm_config.yaml 的 compressor_concurrency 覆盖）
+    DEFAULT_CHUNK_CONCURRENCY = 4
+    # 分段结果合并后仍超长时的最大归并层数
+    MAX_REDUCE_DEPTH = 3
+    # 超过 (max_context_window - 20000) 的该比例时，提前在后台总结较早的历史
+    BACKGROUND_SOFT_RATIO = 0.7
+    # 历史总结缓存的最大条目数
+    SUMMARY_CACHE_SIZE = 32
+    
     def __init__(self, llm_client):
         """
         初始化
@@ -28,11 +43,41 @@ class ActionCompressor:
         """
         self.llm_client = llm_client
         
+        concurrency = getattr(llm_client, "compressor_concurrency", None)
+        if isinstance(concurrency, int) and concurrency > 0:
+            self.chunk_concurrency = concurrency
+        else:
+            self.chunk_concurrency = self.DEFAULT_CHUNK_CONCURRENCY
+        
         # 初始化tiktoken
         if HAS_TIKTOKEN:
             self.encoding = tiktoken.get_encoding("cl100k_base")
         else:
             self.encoding = None
+        
+        # 增量token统计：已计数的action（按顺序持有引用）及其token总数
+        self._counted_actions: List[Dict] = []
+        self._history_tokens = 0
+        # 每条action的token数：id(action) -> (action, token数)，不写入action记录本身
+        # （action 同时在 action_history 和 action_history_fact 中，会被持久化）
+        self._action_token_counts: Dict[int, tuple] = {}
+        # thinking / task_input 上一次的文本及token数
+        self._text_tokens: Dict[str, tuple] = {}
+        
+        # 正在进行或已完成、尚未拼接的后台总结
+        self._background: Optional[_BackgroundSummary] = None
+        
+        # 历史总结缓存：hash(历史前缀 + thinking + task_input) -> summary action
+        self._summary_cache: OrderedDict = OrderedDict()
+        # 压缩模型的调用统计（本次运行累计）
+        self._usage_lock = threading.Lock()
+        self.usage = {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "summary_cache_hits": 0,
+            "incremental_summaries": 0,
+        }
     
     def count_tokens(self, text: str) -> int:
         """统计token数"""
@@ -43,6 +88,56 @@ class ActionCompressor:
             other_chars = len(text) - chinese_chars
             return int(chinese_chars / 1.5 + other_chars / 4)
     
+    def action_tokens(self, action: Dict) -> int:
+        """单条action的token数，计算一次后缓存在压缩器内（按对象身份）"""
+        entry = self._action_token_counts.get(id(action))
+        if entry is not None and entry[0] is action:
+            return entry[1]
+        tokens = self.count_tokens(self._actions_to_xml([action]))
+        self._action_token_counts[id(action)] = (action, tokens)
+        return tokens
+    
+    def history_tokens(self, action_history: List[Dict]) -> int:
+        """
+        动作历史的token总数（增量维护）
+        
+        历史只追加时只统计新增的action；整体被替换（如压缩后）时用各action缓存的计数重建总数。
+        """
+        counted = self._counted_actions
+        n = len(counted)
+        is_append = (
+            n > 0
+            and len(action_history) >= n
+            and action_history[0] is counted[0]
+            and action_history[n - 1] is counted[-1]
+        )
+        if not is_append:
+            self._counted_actions = []
+            self._history_tokens = 0
+            n = 0
+            # 只保留仍在历史中的action的计数
+            current = {id(action) for action in action_history}
+            self._action_token_counts = {
+                key: entry for key, entry in self._action_token_counts.items() if key in current
+            }
+        
+        for action in action_history[n:]:
+            self._history_tokens += self.action_tokens(action)
+            self._counted_actions.append(action)
+        
+        return self._history_tokens
+    
+    def _text_tokens_cached(self, slot: str, text: str) -> int:
+        """thinking / task_input 的token数，文本未变化时复用上次结果"""
+        if not text:
+            return 0
+        previous = self._text_tokens.get(slot)
+        if previous is not None and previous[0] == text:
+            return previous[1]
+        tokens = self.count_tokens(text)
+        self._text_tokens[slot] = (text, tokens)
+        return tokens
+    
     def compress_if_needed(
         self,
         action_history: List[Dict],
@@ -73,16 +168,35 @@ class ActionCompressor:
         
         # 如果只有一条
         if len(action_history) == 1:
-            # 检查是否需要压缩字段
-            return [self._compress_action_fields(action_history[0], max_context_window // 2)]
+            hard_limit = max_context_window - 20000
+            other_tokens = (
+                self._text_tokens_cached("thinking", thinking)
+                + self._text_tokens_cached("task_input", task_input)
+            )
+            action_tokens = self.action_tokens(action_history[0])
+            # 整条action都不超过上限时，单个字段也不会超限
+            if action_tokens <= max_context_window // 2 and action_tokens + other_tokens <= hard_limit:
+                return action_history
+            # 压缩大字段：上限取窗口的一半与硬上限内剩余空间中的较小者
+            field_limit = max(1000, min(max_context_window // 2, hard_limit - other_tokens))
+            return [self._compress_action_fields(
+                action_history[0],
+                field_limit,
+                thinking=thinking,
+                task_input=task_input,
+                max_context_window=max_context_window
+            )]
         
         # 分离最新和历史
         recent_action = action_history[-1]
         historical_actions = action_history[:-1]
         
-        # 计算整体token数
-        total_text = self._actions_to_xml(action_history)
-        total_tokens = self.count_tokens(total_text+thinking+task_input)
+        # 计算整体token数（增量统计，只对新增的action调用tokenizer）
+        total_tokens = (
+            self.history_tokens(action_history)
+            + self._text_tokens_cached("thinking", thinking)
+            + self._text_tokens_cached("task_input", task_input)
+        )
         
         # 如果不超限，不压缩
         if total_tokens <= max_context_window - 20000:
@@ -94,8 +208,8 @@ class ActionCompressor:
         # 1. 历史 → 基于 thinking 和 task_input 智能总结为5k tokens
         # 2. 最新 → 压缩为max_window的50%
         
-        summary_action = self._summarize_historical_xml(
-            self._actions_to_xml(historical_actions),
+        summary_action = self._run_summary_plan(
+            self._plan_summary(historical_actions, thinking, task_input),
             target_tokens=5000,  # 历史总结固定5k tokens
             thinking=thinking,
             task_input=task_input,
@@ -113,13 +227,287 @@ class ActionCompressor:
         
         result = [summary_action, compressed_recent]
         
-        # 验证压缩效果
-        result_xml = self._actions_to_xml(result)
-        result_tokens = self.count_tokens(result_xml)
+        # 验证压缩效果（同时以压缩结果重置增量统计）
+        result_tokens = self.history_tokens(result)
         safe_print(f"✅ 压缩完成: {total_tokens} tokens → {result_tokens} tokens (压缩比: {result_tokens/total_tokens*100:.1f}%)")
         
         return result
     
+    def compress_with_background(
+        self,
+        action_history: List[Dict],
+        max_context_window: int,
+        thinking: str = "",
+        task_input: str = ""
+    ) -> List[Dict]:
+        """
+        每轮开始时调用的压缩入口（后台提前总结 + 同步兜底）
+        
+        1. 后台总结已完成且其覆盖的前缀未变化时，用总结替换该前缀
+        2. 仍超过硬上限时：有进行中的后台总结就等待它，否则同步压缩
+        3. 超过软阈值（BACKGROUND_SOFT_RATIO）时，在后台线程中总结除最新一条外的历史，下一轮再拼接
+        
+        Args:
+            action_history: 动作历史
+            max_context_window: 最大窗口大小
+            thinking: 当前的 thinking 内容
+            task_input: 任务需求描述
+            
+        Returns:
+            处理后的action_history（未变化时返回原列表）
+        """
+        if not action_history:
+            return action_history
+        
+        hard_limit = max_context_window - 20000
+        
+        history = self._splice_background(action_history, wait=False) or action_history
+        
+        if self._total_tokens(history, thinking, task_input) > hard_limit and self._background is not None:
+            # 已经在后台总结，等待结果比重新同步压缩更快
+            safe_print("⏳ 等待后台历史总结完成...")
+            history = self._splice_background(history, wait=True) or history
+        
+        if self._total_tokens(history, thinking, task_input) > hard_limit:
+            history = self.compress_if_needed(history, max_context_window, thinking, task_input)
+        
+        total_tokens = self._total_tokens(history, thinking, task_input)
+        if (
+            self._background is None
+            and len(history) > 2
+            and total_tokens > hard_limit * self.BACKGROUND_SOFT_RATIO
+        ):
+            self._start_background(history, max_context_window, thinking, task_input)
+        
+        return history
+    
+    def _total_tokens(self, action_history: List[Dict], thinking: str, task_input: str) -> int:
+        return (
+            self.history_tokens(action_history)
+            + self._text_tokens_cached("thinking", thinking)
+            + self._text_tokens_cached("task_input", task_input)
+        )
+    
+    def _start_background(
+        self,
+        action_history: List[Dict],
+        max_context_window: int,
+        thinking: str,
+        task_input: str
+    ):
+        """在后台线程中总结除最新一条外的历史"""
+        prefix = list(action_history[:-1])
+        job = _BackgroundSummary(prefix)
+        # 在主线程序列化，避免后台线程读取可能被修改的action
+        plan = self._plan_summary(prefix, thinking, task_input)
+        
+        def run():
+            try:
+                job.summary = self._run_summary_plan(
+                    plan,
+                    target_tokens=5000,
+                    thinking=thinking,
+                    task_input=task_input,
+                    max_context_window=max_context_window
+                )
+            except Exception as e:
+                safe_print(f"⚠️ 后台历史总结失败: {e}")
+            finally:
+                job.done.set()
+        
+        safe_print(f"🧵 后台开始总结较早的 {len(prefix)} 条历史动作")
+        self._background = job
+        threading.Thread(target=run, name="action-compressor-background", daemon=True).start()
+    
+    def _splice_background(self, action_history: List[Dict], wait: bool) -> Optional[List[Dict]]:
+        """
+        拼接后台总结结果
+        
+        Returns:
+            拼接后的新历史；没有可用结果时返回 None
+        """
+        job = self._background
+        if job is None:
+            return None
+        if wait:
+            job.done.wait()
+        elif not job.done.is_set():
+            return None
+        
+        self._background = None
+        
+        prefix = job.prefix
+        still_valid = (
+            len(action_history) >= len(prefix)
+            and all(a is b for a, b in zip(action_history, prefix))
+        )
+        summary = job.summary
+        if not still_valid or summary is None or summary.get("result", {}).get("_failed"):
+            return None
+        
+        spliced = [summary] + list(action_history[len(prefix):])
+        safe_print(f"✅ 已拼接后台历史总结: {len(action_history)}条 → {len(spliced)}条")
+        return spliced
+    
+    # ===== 历史总结（缓存 + 增量） =====
+    
+    def _plan_summary(self, actions: List[Dict], thinking: str, task_input: str) -> Dict:
+        """
+        准备一次历史总结：序列化历史并计算缓存键
+        若历史以上一次的总结开头，则只把其后的新增动作作为增量
+        """
+        full_xml = self._actions_to_xml(actions)
+        key_source = json.dumps([full_xml, thinking, task_input], ensure_ascii=False)
+        plan = {
+            "key": hashlib.sha256(key_source.encode('utf-8')).hexdigest(),
+            "full_xml": full_xml,
+            "previous_summary": None,
+            "delta_xml": None,
+        }
+        if len(actions) > 1 and actions[0].get("tool_name") == "_historical_summary":
+            plan["previous_summary"] = actions[0].get("result", {}).get("output", "")
+            plan["delta_xml"] = self._actions_to_xml(actions[1:])
+        return plan
+    
+    def _run_summary_plan(
+        self,
+        plan: Dict,
+        target_tokens: int,
+        thinking: str,
+        task_input: str,
+        max_context_window: int = None
+    ) -> Dict:
+        """执行历史总结：命中缓存直接返回；有上一次总结时只总结增量；否则完整总结"""
+        with self._usage_lock:
+            cached = self._summary_cache.get(plan["key"])
+            if cached is not None:
+                self._summary_cache.move_to_end(plan["key"])
+                self.usage["summary_cache_hits"] += 1
+        if cached is not None:
+            safe_print("   ♻️ 命中历史总结缓存，跳过压缩模型调用")
+            return self._copy_summary(cached)
+        
+        summary = None
+        if plan["previous_summary"] is not None:
+            summary = self._incremental_summarize(
+                plan["previous_summary"], plan["delta_xml"], target_tokens,
+                thinking, task_input, max_context_window
+            )
+        if summary is None:
+            summary = self._summarize_historical_xml(
+                plan["full_xml"],
+                target_tokens=target_tokens,
+                thinking=thinking,
+                task_input=task_input,
+                max_context_window=max_context_window
+            )
+        
+        if not summary.get("result", {}).get("_failed"):
+            with self._usage_lock:
+                self._summary_cache[plan["key"]] = self._copy_summary(summary)
+                while len(self._summary_cache) > self.SUMMARY_CACHE_SIZE:
+                    self._summary_cache.popitem(last=False)
+        return summary
+    
+    @staticmethod
+    def _copy_summary(summary: Dict) -> Dict:
+        copied = dict(summary)
+        if isinstance(copied.get("result"), dict):
+            copied["result"] = dict(copied["result"])
+        return copied
+    
+    def _incremental_summarize(
+        self,
+        previous_summary: str,
+        delta_xml: str,
+        target_tokens: int,
+        thinking: str,
+        task_input: str,
+        max_context_window: int = None
+    ) -> Optional[Dict]:
+        """
+        增量总结：已有总结 + 新增动作 → 新总结（只为增量付费）
+        
+        Returns:
+            summary action；增量放不进一次调用或调用失败时返回 None（由调用方完整总结）
+        """
+        context_info = self._build_context_info(thinking, task_input)
+        compressor_context_limit = max_context_window or self.llm_client.max_context_window
+        available_tokens = int(compressor_context_limit * 0.6) - self.count_tokens(context_info) - 2000
+        if self.count_tokens(previous_summary) + self.count_tokens(delta_xml) > available_tokens:
+            return None
+        
+        prompt = f"""你是智能历史信息压缩助手。下面是更早历史动作的已有总结，以及其后新增的历史动作。请基于任务需求和当前进度，把新增动作合并进总结，输出更新后的完整总结。
+
+{context_info}
+
+<已有总结>
+{previous_summary}
+</已有总结>
+
+<新增历史动作>
+{delta_xml}
+</新增历史动作>
+
+压缩要求：
+1. **目标长度**: 严格控制在 {target_tokens} tokens 以内
+2. **保持连续**: 已有总结中仍然有用的信息要保留，新增动作按时间顺序接在后面
+3. **优先保留**: 成功完成的关键步骤、生成的文件路径、对后续任务有参考价值的输出
+4. **可以丢弃**: 重复的尝试和错误信息、与当前任务目标无关的内容
+
+请直接输出更新后的总结（中文）："""
+        
+        try:
+            summary = self._compressor_chat(
+                prompt,
+                f"你是整体上下文构造专家。目标：将内容压缩到{target_tokens} tokens以内。"
+            )
+        except Exception as e:
+            safe_print(f"   ⚠️ 增量总结失败，改为完整总结: {e}")
+            return None
+        
+        with self._usage_lock:
+            self.usage["incremental_summaries"] += 1
+        safe_print("   ➕ 增量总结：已有总结 + 新增动作")
+        
+        return {
+            "tool_name": "_historical_summary",
+            "arguments": {},
+            "result": {
+                "status": "success",
+                "output": summary,
+                "_is_summary": True,
+                "_incremental": True
+            }
+        }
+    
+    # ===== 压缩模型调用统计 =====
+    
+    def _record_usage(self, prompt: str, response):
+        """累计压缩模型的token消耗（响应中没有usage时按本地分词估算）"""
+        usage = getattr(response, "usage", None)
+        if isinstance(usage, dict) and usage.get("prompt_tokens") is not None:
+            prompt_tokens = usage.get("prompt_tokens") or 0
+            completion_tokens = usage.get("completion_tokens") or 0
+        else:
+            prompt_tokens = self.count_tokens(prompt)
+            output = getattr(response, "output", "")
+            completion_tokens = self.count_tokens(output) if isinstance(output, str) else 0
+        with self._usage_lock:
+            self.usage["calls"] += 1
+            self.usage["prompt_tokens"] += prompt_tokens
+            self.usage["completion_tokens"] += completion_tokens
+    
+    def usage_report(self) -> str:
+        """本次运行的压缩模型消耗汇总"""
+        with self._usage_lock:
+            u = dict(self.usage)
+        return (
+            f"📊 压缩模型消耗: {u['calls']}次调用, "
+            f"输入 {u['prompt_tokens']} tokens, 输出 {u['completion_tokens']} tokens, "
+            f"增量总结 {u['incremental_summaries']}次, 缓存命中 {u['summary_cache_hits']}次"
+        )
+    
     def _actions_to_xml(self, actions: List[Dict]) -> str:
         """将actions转换为XML格式文本"""
         xml_parts = []
@@ -202,7 +590,7 @@ class ActionCompressor:
             return {
                 "tool_name": "_historical_summary",
                 "arguments": {},
-                "result": {"status": "success", "output": "[历史动作已省略]", "_is_summary": True}
+                "result": {"status": "success", "output": "[历史动作已省略]", "_is_summary": True, "_failed": True}
             }
     
     def _single_summarize(
@@ -256,10 +644,11 @@ class ActionCompressor:
             tool_list=[],
             tool_choice="auto"
         )
+        self._record_usage(prompt, response)
         
         summary = response.output if response.status == "success" else "[总结失败]"
         
-        return {
+        result = {
             "tool_name": "_historical_summary",
             "arguments": {},
             "result": {
@@ -268,6 +657,9 @@ class ActionCompressor:
                 "_is_summary": True
             }
         }
+        if response.status != "success":
+            result["result"]["_failed"] = True
+        return result
     
     def _chunked_summarize(
         self,
@@ -279,6 +671,7 @@ class ActionCompressor:
     ) -> Dict:
         """
         分段压缩（数据量过大时使用）
+        各段并发压缩（有界线程池），按原顺序合并；合并后仍超过目标长度时逐层归并
         
         Args:
             xml_text: 完整的XML文本
@@ -290,50 +683,23 @@ class ActionCompressor:
         Returns:
             压缩后的summary action
         """
-        from services.llm_client import ChatMessage
-        
         # 按action分割xml_text
         # 简单方法：按 </action> 分割
         action_blocks = xml_text.split('</action>')
         action_blocks = [block + '</action>' for block in action_blocks if block.strip()]
         
         # 将actions分组到chunks中
-        chunks = []
-        current_chunk = []
-        current_chunk_tokens = 0
-        
-        for action_block in action_blocks:
-            action_tokens = self.count_tokens(action_block)
-            
-            if current_chunk_tokens + action_tokens > chunk_size_tokens and current_chunk:
-                # 当前chunk已满，开始新chunk
-                chunks.append('\n\n'.join(current_chunk))
-                current_chunk = [action_block]
-                current_chunk_tokens = action_tokens
-            else:
-                current_chunk.append(action_block)
-                current_chunk_tokens += action_tokens
-        
-        # 添加最后一个chunk
-        if current_chunk:
-            chunks.append('\n\n'.join(current_chunk))
+        chunks = self._pack_blocks(action_blocks, chunk_size_tokens, '\n\n')
         
-        safe_print(f"      分成 {len(chunks)} 段进行压缩")
+        safe_print(f"      分成 {len(chunks)} 段进行压缩（并发 {min(self.chunk_concurrency, len(chunks))}）")
         
         # 构建上下文信息
-        context_info = ""
-        if task_input:
-            context_info += f"\n<任务需求>\n{task_input}\n</任务需求>\n"
-        if thinking:
-            context_info += f"\n<当前进度与计划>\n{thinking}\n</当前进度与计划>\n"
+        context_info = self._build_context_info(thinking, task_input)
         
         # 对每个chunk进行压缩
-        chunk_summaries = []
-        target_per_chunk = target_tokens // len(chunks)
+        target_per_chunk = max(1, target_tokens // len(chunks))
         
-        for i, chunk in enumerate(chunks):
-            safe_print(f"      压缩第 {i+1}/{len(chunks)} 段...")
-            
+        def summarize_chunk(i: int, chunk: str) -> str:
             prompt = f"""你是智能历史信息压缩助手。这是分段压缩任务的第 {i+1}/{len(chunks)} 段。
 
 {context_info}
@@ -357,29 +723,43 @@ class ActionCompressor:
 
 请直接输出本段的压缩总结（中文）："""
             
-            history = [ChatMessage(role="user", content=prompt)]
-            
             try:
-                response = self.llm_client.chat(
-                    history=history,
-                    model=self.llm_client.compressor_models[0],
-                    system_prompt=f"你是内容压缩专家。目标：将本段压缩到{target_per_chunk} tokens以内。",
-                    tool_list=[],
-                    tool_choice="auto"
+                summary = self._compressor_chat(
+                    prompt,
+                    f"你是内容压缩专家。目标：将本段压缩到{target_per_chunk} tokens以内。"
                 )
-                
-                if response.status == "success":
-                    chunk_summaries.append(f"[段{i+1}] {response.output}")
-                    safe_print(f"         ✅ 第{i+1}段压缩成功")
-                else:
-                    chunk_summaries.append(f"[段{i+1}] [压缩失败]")
-                    safe_print(f"         ⚠️ 第{i+1}段压缩失败: {response.output}")
+                safe_print(f"         ✅ 第{i+1}段压缩成功")
             except Exception as e:
-                chunk_summaries.append(f"[段{i+1}] [压缩异常]")
-                safe_print(f"         ❌ 第{i+1}段压缩异常: {e}")
+                summary = self._fallback_compress(chunk, target_per_chunk)
+                safe_print(f"         ⚠️ 第{i+1}段压缩失败，使用首尾保留: {e}")
+            return f"[段{i+1}] {summary}"
         
-        # 合并所有段的总结
-        final_summary = "\n\n".join(chunk_summaries)
+        chunk_summaries = self._map_chunks(chunks, summarize_chunk)
+        
+        def merge_summaries(text: str, target: int) -> str:
+            prompt = f"""你是智能历史信息压缩助手。以下是按时间顺序排列的多段历史动作总结，请合并为一份连贯的总结。
+
+{context_info}
+
+<分段总结>
+{text}
+</分段总结>
+
+合并要求：
+1. **目标长度**: 严格控制在 {target} tokens 以内
+2. 保持时间顺序，保留关键成果、文件路径和对后续任务有价值的信息
+3. 去除各段之间重复的内容
+
+请直接输出合并后的总结（中文）："""
+            return self._compressor_chat(
+                prompt,
+                f"你是整体上下文构造专家。目标：将内容压缩到{target} tokens以内。"
+            )
+        
+        # 合并所有段的总结（超出目标长度时逐层归并）
+        final_summary = self._reduce_summaries(
+            chunk_summaries, target_tokens, chunk_size_tokens, merge_summaries, "\n\n"
+        )
         
         safe_print(f"      ✅ 分段压缩完成，共{len(chunks)}段")
         
@@ -395,6 +775,122 @@ class ActionCompressor:
             }
         }
     
+    # ===== 分段压缩的公共步骤 =====
+    
+    def _build_context_info(self, thinking: str, task_input: str, field_context: str = "") -> str:
+        """构建压缩提示词中的任务/进度上下文"""
+        context_info = ""
+        if task_input:
+            context_info += f"\n<任务需求>\n{task_input}\n</任务需求>\n"
+        if thinking:
+            context_info += f"\n<当前进度与计划>\n{thinking}\n</当前进度与计划>\n"
+        if field_context:
+            context_info += f"\n<字段来源>\n这是最新动作中 {field_context} 的内容\n</字段来源>\n"
+        return context_info
+    
+    def _compressor_chat(self, prompt: str, system_prompt: str) -> str:
+        """调用压缩模型，失败时抛出异常"""
+        from services.llm_client import ChatMessage
+        
+        response = self.llm_client.chat(
+            history=[ChatMessage(role="user", content=prompt)],
+            model=self.llm_client.compressor_models[0],
+            system_prompt=system_prompt,
+            tool_list=[],
+            tool_choice="auto"
+        )
+        self._record_usage(prompt, response)
+        if response.status != "success":
+            raise Exception(response.output or response.error_information)
+        return response.output
+    
+    def _pack_blocks(self, blocks: List[str], limit_tokens: int, joiner: str) -> List[str]:
+        """按顺序把若干块打包成不超过 limit_tokens 的段（单块超限时独占一段）"""
+        chunks = []
+        current_chunk = []
+        current_chunk_tokens = 0
+        
+        for block in blocks:
+            block_tokens = self.count_tokens(block)
+            
+            if current_chunk_tokens + block_tokens > limit_tokens and current_chunk:
+                # 当前chunk已满，开始新chunk
+                chunks.append(joiner.join(current_chunk))
+                current_chunk = [block]
+                current_chunk_tokens = block_tokens
+            else:
+                current_chunk.append(block)
+                current_chunk_tokens += block_tokens
+        
+        # 添加最后一个chunk
+        if current_chunk:
+            chunks.append(joiner.join(current_chunk))
+        
+        return chunks
+    
+    def _map_chunks(self, chunks: List[str], compress_one) -> List[str]:
+        """并发压缩各段（最多 chunk_concurrency 个同时进行），按原顺序返回结果"""
+        workers = min(self.chunk_concurrency, len(chunks))
+        if workers <= 1:
+            return [compress_one(i, chunk) for i, chunk in enumerate(chunks)]
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(compress_one, range(len(chunks)), chunks))
+    
+    def _reduce_summaries(
+        self,
+        parts: List[str],
+        target_tokens: int,
+        chunk_size_tokens: int,
+        merge,
+        joiner: str,
+        depth: int = 0
+    ) -> str:
+        """
+        归并分段结果：合并后不超过 target_tokens 时直接拼接；
+        否则能放进一次调用就合并一次，放不下就先分组合并再递归
+        
+        Args:
+            parts: 按顺序排列的分段结果
+            target_tokens: 目标token数
+            chunk_size_tokens: 单次调用能容纳的最大token数
+            merge: merge(text, target) -> str，失败时抛出异常
+            joiner: 拼接分隔符
+            depth: 当前归并层数
+        """
+        combined = joiner.join(parts)
+        combined_tokens = self.count_tokens(combined)
+        if combined_tokens <= target_tokens:
+            return combined
+        
+        if depth >= self.MAX_REDUCE_DEPTH:
+            return self._fallback_compress(combined, target_tokens)
+        
+        safe_print(f"      🔁 合并结果仍有 {combined_tokens} tokens > {target_tokens}，进行第{depth+1}层归并")
+        
+        if combined_tokens <= chunk_size_tokens or len(parts) == 1:
+            try:
+                return merge(combined, target_tokens)
+            except Exception as e:
+                safe_print(f"         ⚠️ 归并失败，使用首尾保留: {e}")
+                return self._fallback_compress(combined, target_tokens)
+        
+        groups = self._pack_blocks(parts, chunk_size_tokens, joiner)
+        if len(groups) >= len(parts):
+            # 分组无法减少段数，直接截断
+            return self._fallback_compress(combined, target_tokens)
+        target_per_group = max(1, target_tokens // len(groups))
+        
+        def merge_group(i: int, group: str) -> str:
+            try:
+                return merge(group, target_per_group)
+            except Exception as e:
+                safe_print(f"         ⚠️ 第{i+1}组归并失败，使用首尾保留: {e}")
+                return self._fallback_compress(group, target_per_group)
+        
+        merged = self._map_chunks(groups, merge_group)
+        return self._reduce_summaries(merged, target_tokens, chunk_size_tokens, merge, joiner, depth + 1)
+    
     def _compress_action_fields(
         self, 
         action: Dict, 
@@ -417,6 +913,9 @@ class ActionCompressor:
             压缩后的action
         """
         compressed_action = action.copy()
+        # result 单独复制，避免修改原始轨迹中的记录
+        if isinstance(compressed_action.get("result"), dict):
+            compressed_action["result"] = dict(compressed_action["result"])
         
         # 压缩arguments中的大字段
         if "arguments" in compressed_action:
@@ -444,7 +943,17 @@ class ActionCompressor:
         # 压缩result.output
         if "result" in compressed_action and "output" in compressed_action["result"]:
             output = compressed_action["result"]["output"]
-            output_tokens = self.count_tokens(output)
+            original_tokens = output_tokens = self.count_tokens(output)
+            
+            if output_tokens > max_field_tokens:
+                # 先做确定性的结构化缩减，仍超长时才交给LLM
+                reduced = reduce_output(action.get("tool_name", ""), output)
+                if reduced is not output:
+                    output_tokens = self.count_tokens(reduced)
+                    safe_print(f"   🧹 结构化缩减result.output: {original_tokens} tokens → {output_tokens} tokens")
+                    compressed_action["result"]["output"] = output = reduced
+                    compressed_action["result"]["_reduced"] = True
+                    compressed_action["result"]["_original_tokens"] = original_tokens
             
             if output_tokens > max_field_tokens:
                 safe_print(f"   🤖 LLM压缩result.output: {output_tokens} tokens → {max_field_tokens} tokens")
@@ -463,7 +972,7 @@ class ActionCompressor:
                 )
                 compressed_action["result"]["output"] = compressed_output
                 compressed_action["result"]["_compressed"] = True
-                compressed_action["result"]["_original_tokens"] = output_tokens
+                compressed_action["result"]["_original_tokens"] = original_tokens
         
         return compressed_action
     
@@ -575,6 +1084,7 @@ class ActionCompressor:
                 tool_list=[],
                 tool_choice="auto"
             )
+            self._record_usage(prompt, response)
             
             compressed = response.output if response.status == "success" else text[:1000] + "\n[压缩失败，仅保留前1000字符]"
             
@@ -602,7 +1112,7 @@ class ActionCompressor:
         chunk_size_tokens: int
     ) -> str:
         """
-        分段压缩字段内容
+        分段压缩字段内容（各段并发压缩，按原顺序合并，超出目标长度时逐层归并）
         
         Args:
             text: 原始文本
@@ -618,8 +1128,6 @@ class ActionCompressor:
         Returns:
             压缩后的文本
         """
-        from services.llm_client import ChatMessage
-        
         # 按段落或固定字符数分割文本
         # 简单策略：按\n\n分割段落，如果段落太大则按字符数分割
         paragraphs = text.split('\n\n')
@@ -655,24 +1163,15 @@ class ActionCompressor:
         if current_chunk:
             chunks.append('\n\n'.join(current_chunk))
         
-        safe_print(f"         分成 {len(chunks)} 段进行字段压缩")
+        safe_print(f"         分成 {len(chunks)} 段进行字段压缩（并发 {min(self.chunk_concurrency, len(chunks))}）")
         
         # 构建上下文信息
-        context_info = ""
-        if task_input:
-            context_info += f"\n<任务需求>\n{task_input}\n</任务需求>\n"
-        if thinking:
-            context_info += f"\n<当前进度与计划>\n{thinking}\n</当前进度与计划>\n"
-        if field_context:
-            context_info += f"\n<字段来源>\n这是最新动作中 {field_context} 的内容\n</字段来源>\n"
+        context_info = self._build_context_info(thinking, task_input, field_context)
         
         # 压缩每个chunk
-        chunk_results = []
-        target_per_chunk = target_tokens // len(chunks)
+        target_per_chunk = max(1, target_tokens // len(chunks))
         
-        for i, chunk in enumerate(chunks):
-            safe_print(f"         压缩字段第 {i+1}/{len(chunks)} 段...")
-            
+        def compress_chunk(i: int, chunk: str) -> str:
             prompt = f"""你是智能内容压缩助手。这是分段压缩的第 {i+1}/{len(chunks)} 段{content_type}。
 
 {context_info}
@@ -689,29 +1188,43 @@ class ActionCompressor:
 
 请直接输出本段的压缩结果："""
             
-            history = [ChatMessage(role="user", content=prompt)]
-            
             try:
-                response = self.llm_client.chat(
-                    history=history,
-                    model=self.llm_client.compressor_models[0],
-                    system_prompt=f"压缩专家。目标：将本段压缩到{target_per_chunk} tokens。",
-                    tool_list=[],
-                    tool_choice="auto"
+                result = self._compressor_chat(
+                    prompt,
+                    f"压缩专家。目标：将本段压缩到{target_per_chunk} tokens。"
                 )
-                
-                if response.status == "success":
-                    chunk_results.append(response.output)
-                    safe_print(f"            ✅ 第{i+1}段压缩成功")
-                else:
-                    chunk_results.append(chunk[:500] + "\n[本段压缩失败]")
-                    safe_print(f"            ⚠️ 第{i+1}段压缩失败")
+                safe_print(f"            ✅ 第{i+1}段压缩成功")
+                return result
             except Exception as e:
-                chunk_results.append(chunk[:500] + "\n[本段压缩异常]")
-                safe_print(f"            ❌ 第{i+1}段压缩异常: {e}")
+                safe_print(f"            ⚠️ 第{i+1}段压缩失败，使用首尾保留: {e}")
+                return self._fallback_compress(chunk, target_per_chunk)
+        
+        chunk_results = self._map_chunks(chunks, compress_chunk)
+        
+        def merge_results(merged_text: str, target: int) -> str:
+            prompt = f"""你是智能内容压缩助手。以下是同一份{content_type}按顺序分段压缩后的结果，请合并为一份连贯的内容。
+
+{context_info}
+
+<分段压缩结果>
+{merged_text}
+</分段压缩结果>
+
+合并要求：
+1. **目标长度**: 严格控制在 {target} tokens 以内
+2. **智能筛选**: {focus}
+3. 保持原有顺序，去除重复内容
+
+请直接输出合并后的内容（不要额外说明）："""
+            return self._compressor_chat(
+                prompt,
+                f"你是智能内容压缩助手。目标：将{content_type}压缩到{target} tokens，同时保留核心信息。"
+            )
         
-        # 合并结果
-        final_result = '\n\n---\n\n'.join(chunk_results)
+        # 合并结果（超出目标长度时逐层归并）
+        final_result = self._reduce_summaries(
+            chunk_results, target_tokens, chunk_size_tokens, merge_results, '\n\n---\n\n'
+        )
         
         safe_print(f"         ✅ 字段分段压缩完成，共{len(chunks)}段")
         
@@ -723,6 +1236,8 @@ class ActionCompressor:
         """
         if self.encoding:
             tokens = self.encoding.encode(text)
+            if len(tokens) <= max_tokens:
+                return text
             head_count = int(max_tokens * 0.1)
             tail_count = int(max_tokens * 0.1)
             head_tokens = tokens[:head_count]
@@ -734,11 +1249,22 @@ class ActionCompressor:
         else:
             # 简单字符截取
             chars = int(max_tokens * 2)
+            if len(text) <= chars:
+                return text
             head = chars // 2
             tail = chars // 2
             return f"{text[:head]}\n\n[中间省略]\n\n{text[-tail:]}"
 
 
+class _BackgroundSummary:
+    """一次后台总结：覆盖的历史前缀（按引用）及结果"""
+    
+    def __init__(self, prefix: List[Dict]):
+        self.prefix = prefix
+        self.summary: Optional[Dict] = None
+        self.done = threading.Event()
+
+
 if __name__ == "__main__":
     safe_print("✅ ActionCompressor模块加载成功")
     safe_print("\n压缩策略：")
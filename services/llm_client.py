@@ -69,6 +69,7 @@ class SimpleLLMClient:
         self.temperature = self.config.get("temperature", 0)
         self.max_tokens = self.config.get("max_tokens", 0)
         self.max_context_window = self.config.get("max_context_window", 100000)  # 上下文窗口限制
+        self.compressor_concurrency = self.config.get("compressor_concurrency", 4)  # 分段压缩的并发调用数
         
         # 解析模型配置（支持两种格式）
         self.models = []  # 模型名称列表
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工具输出的结构化预压缩（确定性，不调用LLM）
+ActionCompressor 在调用压缩模型之前，先按工具类型无损或近无损地缩减大输出：
+- file_read: numbered 格式去掉行号补齐空格和空行（行号保留位置信息）；JSON 格式先转为 numbered 格式
+- grep: 按文件分组，去掉每行重复的路径前缀，合并相邻匹配上下文中重复的行
+- 代码执行/命令日志: 合并重复行、相似的进度行和相同的 Traceback
+- dir_list: 目录树过大时按深度折叠
+"""
+
+import json
+import re
+from typing import Callable, Dict, List
+
+
+# 工具名 -> 按顺序执行的 reducer 列表，每个 reducer 为 (text) -> text
+REDUCERS: Dict[str, List[Callable[[str], str]]] = {}
+
+# 目录树超过该行数时按深度折叠
+DIR_TREE_MAX_LINES = 200
+# 连续相似行达到该数量时折叠（保留首尾）
+SIMILAR_RUN_MIN = 5
+
+
+def register_reducer(*tool_names: str):
+    """注册 reducer（同一工具可注册多个，按注册顺序执行）"""
+    def decorator(fn: Callable[[str], str]) -> Callable[[str], str]:
+        for name in tool_names:
+            REDUCERS.setdefault(name, []).append(fn)
+        return fn
+    return decorator
+
+
+def reduce_output(tool_name: str, text: str) -> str:
+    """
+    对工具输出执行已注册的 reducer
+
+    Args:
+        tool_name: 工具名称
+        text: 原始输出
+
+    Returns:
+        缩减后的输出；没有 reducer、reducer 出错或没有变短时返回原文
+    """
+    if not isinstance(text, str) or not text:
+        return text
+    reduced = text
+    for reducer in REDUCERS.get(tool_name, []):
+        try:
+            reduced = reducer(reduced)
+        except Exception:
+            # reducer 只做优化，格式不符时保持原样
+            continue
+    return reduced if len(reduced) < len(text) else text
+
+
+# ===== file_read =====
+
+# FileReadTool numbered 格式的一行："{行号右对齐}\t{内容}"
+_NUMBERED_LINE = re.compile(r'^ *(\d+)\t(.*)$')
+
+
+def _numbered_lines(items: List[Dict]) -> str:
+    return "\n".join(f"{item['line']}\t{item['content']}" for item in items)
+
+
+def _is_line_objects(value) -> bool:
+    return (
+        isinstance(value, list)
+        and bool(value)
+        and all(isinstance(item, dict) and "line" in item and "content" in item for item in value)
+    )
+
+
+def _json_to_numbered(data) -> str:
+    """format=json 的输出转换为 numbered 格式（多文件时按 "==> 路径 <==" 分节，与 FileReadTool 一致）"""
+    if _is_line_objects(data):
+        return _numbered_lines(data)
+    if not isinstance(data, dict) or not isinstance(data.get("files"), dict):
+        raise ValueError("not a file_read JSON output")
+
+    header = f"[读取 {data.get('success_count', 0)}/{data.get('total_files', len(data['files']))} 个文件"
+    sections = ["；".join([header] + list(data.get("notes") or [])) + "]"]
+    for path, info in data["files"].items():
+        if info.get("status") != "success":
+            sections.append(f"==> {path} <== [error] {info.get('error', '')}")
+            continue
+        content = info.get("content", "")
+        section = f"==> {path} <== ({info.get('total_lines', '?')} lines)\n"
+        section += _numbered_lines(content) if _is_line_objects(content) else str(content)
+        if info.get("truncated"):
+            section += "\n" + info["truncated"]
+        sections.append(section)
+    return "\n\n".join(sections)
+
+
+@register_reducer("file_read")
+def reduce_file_read(text: str) -> str:
+    """
+    numbered 格式：去掉行号的补齐空格、行尾空白和空行（行号已标明位置，空行不丢信息）；
+    format=json 的输出先转换为 numbered 格式。分节标题、截断提示等其他行原样保留
+    """
+    if text.lstrip().startswith(("[{", "{", "[\n")):
+        try:
+            text = _json_to_numbered(json.loads(text))
+        except ValueError:
+            pass
+
+    lines = []
+    numbered = 0
+    for line in text.split("\n"):
+        match = _NUMBERED_LINE.match(line)
+        if not match:
+            lines.append(line)
+            continue
+        numbered += 1
+        content = match.group(2).rstrip()
+        if content:
+            lines.append(f"{match.group(1)}\t{content}")
+    if numbered == 0:
+        return text
+    return "\n".join(lines)
+
+
+# ===== grep =====
+
+_GREP_LINE = re.compile(r'^(?P<path>[^\n:]+?):(?P<num>\d+)(?P<sep>[:-]) ?(?P<text>.*)$')
+
+
+@register_reducer("grep")
+def reduce_grep(text: str) -> str:
+    """按文件分组匹配结果：路径只出现一次，上下文行用 "-" 标记；相邻匹配的上下文重叠时每行只保留一次"""
+    lines = text.split("\n")
+    grouped: List[str] = []
+    current_path = None
+    emitted: Dict[str, int] = {}    # 当前文件中已输出的行号 -> grouped 中的位置
+    converted = 0
+
+    for line in lines:
+        match = _GREP_LINE.match(line)
+        if not match:
+            current_path = None
+            grouped.append(line)
+            continue
+        converted += 1
+        if match["path"] != current_path:
+            current_path = match["path"]
+            emitted = {}
+            grouped.append(f"{current_path}:")
+        marker = ":" if match["sep"] == ":" else "-"
+        entry = f"  {match['num']}{marker} {match['text']}"
+        if match["num"] in emitted:
+            # 作为上下文出现过的行又是匹配行时，改为匹配标记
+            if marker == ":":
+                grouped[emitted[match["num"]]] = entry
+            continue
+        emitted[match["num"]] = len(grouped)
+        grouped.append(entry)
+
+    if converted == 0:
+        return text
+    return "\n".join(grouped)
+
+
+# ===== 代码执行 / 命令日志 =====
+
+_DIGITS = re.compile(r'\d+(\.\d+)?')
+
+
+def _collapse_repeated_lines(lines: List[str]) -> List[str]:
+    """完全相同的连续行合并为一行 + 次数；仅数字不同的连续行（进度条、训练日志）保留首尾"""
+    result: List[str] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+
+        # 完全相同
+        j = i + 1
+        while j < len(lines) and lines[j] == line:
+            j += 1
+        if j - i > 1:
+            result.append(f"{line}  [×{j - i}]")
+            i = j
+            continue
+
+        # 仅数字不同
+        pattern = _DIGITS.sub("#", line)
+        j = i + 1
+        while j < len(lines) and lines[j].strip() and _DIGITS.sub("#", lines[j]) == pattern:
+            j += 1
+        if line.strip() and pattern != line and j - i >= SIMILAR_RUN_MIN:
+            result.append(line)
+            result.append(lines[i + 1])
+            result.append(f"  [省略 {j - i - 3} 行相似输出]")
+            result.append(lines[j - 1])
+            i = j
+            continue
+
+        result.append(line)
+        i += 1
+    return result
+
+
+def _elide_repeated_tracebacks(lines: List[str]) -> List[str]:
+    """相同的 Traceback 只保留第一次出现"""
+    result: List[str] = []
+    seen = set()
+    i = 0
+    while i < len(lines):
+        if lines[i].startswith("Traceback (most recent call last):"):
+            # Traceback 块：缩进行一直到第一条非缩进行（异常信息）为止
+            j = i + 1
+            while j < len(lines) and (lines[j].startswith(" ") or not lines[j].strip()):
+                j += 1
+            end = min(j + 1, len(lines))
+            block = tuple(lines[i:end])
+            if block in seen:
+                result.append(f"[与前面相同的 Traceback（{len(block)} 行），已省略: {block[-1].strip()}]")
+            else:
+                seen.add(block)
+                result.extend(block)
+            i = end
+            continue
+        result.append(lines[i])
+        i += 1
+    return result
+
+
+@register_reducer("execute_code", "execute_command", "pip_install", "manage_code_process")
+def reduce_log(text: str) -> str:
+    """日志类输出：去掉行尾空白，合并重复行、相似进度行和重复的 Traceback"""
+    lines = [line.rstrip() for line in text.replace("\r\n", "\n").split("\n")]
+    # 进度条常用 \r 覆盖同一行，只保留最后的状态
+    lines = [line.rsplit("\r", 1)[-1] for line in lines]
+    lines = _elide_repeated_tracebacks(lines)
+    lines = _collapse_repeated_lines(lines)
+    return "\n".join(lines)
+
+
+# ===== dir_list =====
+
+_TREE_ENTRY = re.compile(r'^(?P<indent>(?:  )*)\[(?P<kind>dir|file)\] (?P<name>.*)$')
+
+
+@register_reducer("dir_list")
+def reduce_dir_tree(text: str) -> str:
+    """目录树超过 DIR_TREE_MAX_LINES 行时，只展开到能放下的最大深度，被折叠的目录标注文件/子目录数"""
+    lines = text.split("\n")
+    if len(lines) <= DIR_TREE_MAX_LINES:
+        return text
+
+    entries = []
+    for line in lines:
+        match = _TREE_ENTRY.match(line)
+        if not match:
+            return text
+        entries.append((len(match["indent"]) // 2, match["kind"], line))
+
+    max_depth = max(depth for depth, _, _ in entries)
+    keep_depth = max_depth
+    while keep_depth > 0 and sum(1 for depth, _, _ in entries if depth <= keep_depth) > DIR_TREE_MAX_LINES:
+        keep_depth -= 1
+    if keep_depth == max_depth:
+        return text
+
+    result = []
+    for index, (depth, kind, line) in enumerate(entries):
+        if depth > keep_depth:
+            continue
+        if kind == "dir" and depth == keep_depth:
+            # 统计该目录下被折叠的条目
+            files = dirs = 0
+            for sub_depth, sub_kind, _ in entries[index + 1:]:
+                if sub_depth <= depth:
+                    break
+                if sub_kind == "dir":
+                    dirs += 1
+                else:
+                    files += 1
+            if files or dirs:
+                line += f"  ({files} files, {dirs} dirs 已折叠)"
+        result.append(line)
+
+    result.append(f"[目录树共 {len(entries)} 项，仅展开到第 {keep_depth + 1} 层]")
+    return "\n".join(result)
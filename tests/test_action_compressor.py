@@ -136,6 +136,114 @@ def test_compress_if_needed_trigger_compression(compressor):
                 mock_sum.assert_called_once()
                 mock_fields.assert_called_once()
 
+@pytest.mark.unit
+def test_incremental_token_counting(compressor):
+    # Only newly appended actions should be run through the tokenizer
+    actions = [
+        {"tool_name": f"t{i}", "arguments": {}, "result": {"output": "x" * 50}}
+        for i in range(5)
+    ]
+
+    with patch.object(compressor, 'count_tokens', wraps=compressor.count_tokens) as counter:
+        compressor.compress_if_needed(actions, 100000, thinking="plan")
+        first_calls = counter.call_count
+
+        actions.append({"tool_name": "t5", "arguments": {}, "result": {"output": "y"}})
+        compressor.compress_if_needed(actions, 100000, thinking="plan")
+
+        assert first_calls == 6  # 5 actions + thinking
+        assert counter.call_count == first_calls + 1
+
+    expected = sum(
+        compressor.count_tokens(compressor._actions_to_xml([a])) for a in actions
+    )
+    assert compressor.history_tokens(actions) == expected
+    # Counts live in the compressor, never on the (persisted) action records
+    assert not any("_token_count" in a for a in actions)
+
+@pytest.mark.unit
+def test_background_compression_spliced_next_turn(compressor):
+    compressor.llm_client.chat.return_value = MockLLMResponse("background summary")
+    actions = [
+        {"tool_name": f"t{i}", "arguments": {}, "result": {"output": f"out {i}"}}
+        for i in range(4)
+    ]
+
+    with patch.object(compressor, 'count_tokens', return_value=1000):
+        # hard limit 5000, soft threshold 3500: 4000 tokens starts a background summary
+        result = compressor.compress_with_background(actions, 25000)
+        assert result is actions
+        compressor._background.done.wait(5)
+
+        actions.append({"tool_name": "t4", "arguments": {}, "result": {"output": "out 4"}})
+        result = compressor.compress_with_background(actions, 25000)
+
+    assert [a["tool_name"] for a in result] == ["_historical_summary", "t3", "t4"]
+    assert result[0]["result"]["output"] == "background summary"
+    assert compressor._background is None
+
+@pytest.mark.unit
+def test_single_oversized_action_compressed(compressor, mock_llm_client):
+    action = {
+        "tool_name": "web_search",
+        "arguments": {"query": "diffusion"},
+        "result": {"status": "success", "output": " ".join(f"word{i}" for i in range(30000))}
+    }
+
+    result = compressor.compress_with_background([action], 25000, thinking="plan", task_input="task")
+
+    assert len(result) == 1 and result[0]["result"]["_compressed"]
+    assert compressor._total_tokens(result, "plan", "task") <= 25000 - 20000
+    assert mock_llm_client.chat.called
+    assert "_compressed" not in action["result"]
+
+@pytest.mark.unit
+def test_background_summary_discarded_when_history_replaced(compressor):
+    compressor.llm_client.chat.return_value = MockLLMResponse("background summary")
+    actions = [
+        {"tool_name": f"t{i}", "arguments": {}, "result": {"output": f"out {i}"}}
+        for i in range(4)
+    ]
+
+    with patch.object(compressor, 'count_tokens', return_value=1000):
+        compressor.compress_with_background(actions, 25000)
+        compressor._background.done.wait(5)
+
+        replaced = [{"tool_name": "other", "arguments": {}, "result": {"output": "x"}}]
+        result = compressor.compress_with_background(replaced, 25000)
+
+    assert result is replaced
+
+@pytest.mark.unit
+def test_summary_cache_and_incremental_mode(compressor):
+    compressor.llm_client.chat.return_value = MockLLMResponse("summary v1")
+    history = [
+        {"tool_name": f"t{i}", "arguments": {}, "result": {"output": f"out {i}"}}
+        for i in range(3)
+    ]
+
+    # Same prefix + thinking + task input is only summarised once
+    first = compressor._run_summary_plan(compressor._plan_summary(history, "plan", "task"), 5000, "plan", "task")
+    second = compressor._run_summary_plan(compressor._plan_summary(history, "plan", "task"), 5000, "plan", "task")
+    assert first["result"]["output"] == second["result"]["output"] == "summary v1"
+    assert compressor.llm_client.chat.call_count == 1
+    assert compressor.usage["summary_cache_hits"] == 1
+
+    # A prefix that starts with a previous summary only sends the delta
+    compressor.llm_client.chat.return_value = MockLLMResponse("summary v2")
+    new_action = {"tool_name": "t3", "arguments": {}, "result": {"output": "out 3"}}
+    result = compressor._run_summary_plan(
+        compressor._plan_summary([first, new_action], "plan", "task"), 5000, "plan", "task"
+    )
+
+    prompt = compressor.llm_client.chat.call_args.kwargs["history"][0].content
+    assert result["result"]["output"] == "summary v2"
+    assert result["result"]["_incremental"] is True
+    assert "<已有总结>\nsummary v1" in prompt
+    assert "out 3" in prompt and "out 0" not in prompt
+    assert compressor.usage["incremental_summaries"] == 1
+    assert compressor.usage["calls"] == 2
+
 @pytest.mark.unit
 def test_fallback_compress(compressor):
     text = "A" * 100
@@ -209,6 +317,43 @@ def test_chunked_summarize_logic(compressor):
     assert len(call_args_list) > 1
     assert "chunk_summary" in result["result"]["output"]
 
+@pytest.mark.unit
+def test_chunked_summarize_parallel_order_and_fallback(compressor):
+    # Chunks are summarised concurrently but reassembled in order;
+    # a failing chunk falls back to head/tail truncation instead of a bare marker
+    action_xml = "".join([f"<action>content_{i}</action>\n" for i in range(6)])
+
+    def chat_side_effect(**kwargs):
+        prompt = kwargs["history"][0].content
+        if "content_3" in prompt:
+            return MockLLMResponse("boom", status="error")
+        index = next(i for i in range(6) if f"content_{i}<" in prompt)
+        return MockLLMResponse(f"summary_{index}")
+
+    compressor.llm_client.chat.side_effect = chat_side_effect
+    compressor.chunk_concurrency = 3
+
+    result = compressor._chunked_summarize(
+        action_xml, target_tokens=1000, thinking="", task_input="", chunk_size_tokens=5
+    )
+
+    output = result["result"]["output"]
+    positions = [output.index(f"summary_{i}") for i in (0, 1, 2, 4, 5)]
+    assert positions == sorted(positions)
+    assert "[段4]" in output and "content_3" in output
+
+@pytest.mark.unit
+def test_reduce_summaries_merges_when_over_target(compressor):
+    compressor.llm_client.chat.return_value = MockLLMResponse("merged")
+
+    result = compressor._reduce_summaries(
+        ["x" * 400, "y" * 400], target_tokens=50, chunk_size_tokens=10000,
+        merge=lambda text, target: compressor._compressor_chat(text, "sys"), joiner="\n\n"
+    )
+
+    assert result == "merged"
+    assert compressor.llm_client.chat.call_count == 1
+
 @pytest.mark.unit
 def test_compress_action_fields_logic(compressor):
     # Test detailed field compression logic without mocking the method itself
@@ -383,3 +528,21 @@ def test_compression_statistics_demo(compressor, mock_llm_client):
     # Basic assertions
     assert len(result) < len(actions)
     assert compressed_tokens < original_tokens
+
+@pytest.mark.unit
+def test_structural_reduction_skips_llm(compressor, mock_llm_client):
+    lines = [{"line": i, "content": f"value_{i} = {i}"} for i in range(1, 400)]
+    action = {
+        "tool_name": "file_read",
+        "arguments": {"path": "a.py"},
+        "result": {"status": "success", "output": json.dumps(lines, indent=2)}
+    }
+    limit = compressor.count_tokens(action["result"]["output"]) // 2
+
+    result = compressor._compress_action_fields(action, limit)
+
+    assert result["result"]["_reduced"]
+    assert "_compressed" not in result["result"]
+    assert result["result"]["output"].startswith("1\tvalue_1 = 1\n2\tvalue_2 = 2")
+    assert "_reduced" not in action["result"]
+    mock_llm_client.chat.assert_not_called()
@@ -0,0 +1,123 @@
+"""
+Tests for chunked audio transcription (tool_server_lite/tools/audio_segments.py).
+
+Run with: pytest tests/test_audio_segments.py -v
+"""
+
+import os
+import threading
+import wave
+
+import pytest
+
+from tool_server_lite.tools import audio_segments
+from tool_server_lite.tools.audio_segments import drop_overlap, plan_segments, stitch_transcript, transcribe_audio
+
+
+@pytest.mark.unit
+def test_plan_prefers_silence_and_overlaps_hard_cuts():
+    # Silence around 95s is inside the search window; none near the second boundary
+    plan = plan_segments(250, 100, overlap=2, silences=[(94, 96), (40, 41)], search=10)
+
+    assert plan == [(0.0, 95.0), (95.0, 195.0), (193.0, 250)]
+    assert plan_segments(80, 100) == [(0.0, 80)]
+
+
+@pytest.mark.unit
+def test_stitch_drops_overlapping_words():
+    segments = [
+        {"start": 0, "end": 600, "text": "and that is why the model converges quickly"},
+        {"start": 598, "end": 1200, "text": "converges quickly. Next we look at data"},
+        {"start": 1200, "end": 1500, "text": "数据集包含三部分"},
+    ]
+
+    assert stitch_transcript(segments) == (
+        "[00:00:00] and that is why the model converges quickly\n"
+        "[00:09:58] Next we look at data\n"
+        "[00:20:00] 数据集包含三部分"
+    )
+    assert drop_overlap("结果很好", "很好。下一步") == "下一步"
+    assert drop_overlap("one two", "two three") == "two three"
+
+
+@pytest.fixture
+def lecture(tmp_path, monkeypatch):
+    """22s WAV: tone with short gaps at ~9.5s and ~19.5s"""
+    np = pytest.importorskip("numpy")
+    rate = 8000
+    t = np.arange(int(22 * rate)) / rate
+    signal = (0.5 * np.sin(2 * np.pi * 440 * t) * 32767).astype("<i2")
+    for gap in (9.5, 19.5):
+        signal[int((gap - 0.3) * rate):int((gap + 0.3) * rate)] = 0
+    path = tmp_path / "lecture.wav"
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(signal.tobytes())
+
+    monkeypatch.setattr(audio_segments, "has_ffmpeg", lambda: False)
+    monkeypatch.setattr(audio_segments, "get_cache_root", lambda: tmp_path / "cache")
+    monkeypatch.setattr(audio_segments, "_cache_instance", None)
+    monkeypatch.setattr(audio_segments, "load_tool_config", lambda: {"audio": {
+        "segment_seconds": 10, "silence_search_seconds": 3, "single_max_mb": 0}})
+    return path
+
+
+@pytest.mark.unit
+def test_segments_transcribed_concurrently_and_cached(lecture):
+    calls = []
+    lock = threading.Lock()
+
+    def fake_transcribe(path, model):
+        with wave.open(path, "rb") as w:
+            seconds = w.getnframes() / w.getframerate()
+        with lock:
+            calls.append(seconds)
+        return f"{seconds:.1f} seconds of speech"
+
+    events = []
+    result = transcribe_audio(lecture, fake_transcribe, on_progress=events.append)
+
+    assert [(round(s["start"], 1), round(s["end"], 1)) for s in result["segments"]] == [
+        (0.0, 9.5), (9.5, 19.5), (19.5, 22.0)]
+    assert result["transcript"].splitlines()[1] == "[00:00:09] 10.0 seconds of speech"
+    assert sorted(e["index"] for e in events) == [0, 1, 2]
+    assert all(e["total"] == 3 and not e["cached"] for e in events)
+
+    again = transcribe_audio(lecture, lambda path, model: pytest.fail("not cached"))
+    assert again["cache_hit"] and again["transcript"] == result["transcript"]
+    assert len(calls) == 3
+
+
+@pytest.mark.unit
+def test_large_short_file_is_never_uploaded_whole(lecture, monkeypatch):
+    # 22s of 16 kB/s audio: over the whole-file limit but well under one segment's duration
+    limit = 100 * 1024
+    monkeypatch.setattr(audio_segments, "load_tool_config", lambda: {"audio": {
+        "segment_seconds": 600, "single_max_mb": limit / 1024 / 1024, "segment_max_mb": limit / 1024 / 1024}})
+    sizes = []
+
+    def fake_transcribe(path, model):
+        assert path != str(lecture)
+        sizes.append(os.path.getsize(path))
+        return "speech"
+
+    result = transcribe_audio(lecture, fake_transcribe)
+
+    assert len(result["segments"]) > 1 and result["segments"][-1]["end"] == pytest.approx(22.0)
+    assert all(size <= limit for size in sizes)
+
+    # With ffmpeg the single segment is transcoded instead of sending the original
+    cut = []
+    monkeypatch.setattr(audio_segments, "has_ffmpeg", lambda: True)
+    monkeypatch.setattr(audio_segments, "probe_duration", lambda path: 22.0)
+    monkeypatch.setattr(audio_segments, "detect_silences", lambda *args: [])
+    monkeypatch.setattr(audio_segments, "cut_segment",
+                        lambda path, start, end, out_dir, index: cut.append((start, end)) or path.with_suffix(".mp3"))
+    monkeypatch.setattr(audio_segments, "_cache_instance", None)
+    monkeypatch.setattr(audio_segments, "get_transcript_cache", lambda: None)
+
+    transcribe_audio(lecture, lambda path, model: path)
+
+    assert cut == [(0.0, 22.0)]
@@ -0,0 +1,151 @@
+"""
+Tests for the shared headless browser pool (tool_server_lite/tools/browser_pool.py) with a fake crawler:
+context / per-domain limits, page- and memory-based recycling, the page cache, and
+browser memory accounting restricted to the processes the pool launched.
+
+Run with: pytest tests/test_browser_pool.py -v
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+import pytest
+
+from tool_server_lite.tools import browser_pool
+from tool_server_lite.tools.browser_pool import BrowserPool
+
+
+class FakeCrawler:
+    instances = []
+
+    def __init__(self, config=None):
+        self.started = self.closed = False
+        self.active = 0
+        self.max_active = 0
+        self.per_domain = {}
+        self.max_per_domain = 0
+        self.urls = []
+        FakeCrawler.instances.append(self)
+
+    async def start(self):
+        self.started = True
+
+    async def close(self):
+        self.closed = True
+
+    async def arun(self, url, config=None):
+        domain = urlparse(url).netloc
+        self.urls.append(url)
+        self.active += 1
+        self.per_domain[domain] = self.per_domain.get(domain, 0) + 1
+        self.max_active = max(self.max_active, self.active)
+        self.max_per_domain = max(self.max_per_domain, self.per_domain[domain])
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        self.per_domain[domain] -= 1
+        return SimpleNamespace(markdown=SimpleNamespace(raw_markdown=f"# {url}"), success=True)
+
+
+@pytest.fixture(autouse=True)
+def fake_crawl4ai(monkeypatch):
+    FakeCrawler.instances = []
+    monkeypatch.setattr(browser_pool, "CRAWL4AI_AVAILABLE", True)
+    monkeypatch.setattr(browser_pool, "AsyncWebCrawler", FakeCrawler, raising=False)
+    monkeypatch.setattr(browser_pool, "BrowserConfig", lambda **kwargs: kwargs, raising=False)
+    monkeypatch.setattr(browser_pool, "CrawlerRunConfig", lambda **kwargs: kwargs, raising=False)
+    monkeypatch.setattr(browser_pool, "CacheMode", SimpleNamespace(BYPASS="bypass"), raising=False)
+
+
+def _crawl_all(pool, urls):
+    async def run():
+        return await asyncio.gather(*(pool.crawl_markdown(url) for url in urls))
+    return asyncio.run(run())
+
+
+@pytest.mark.unit
+def test_context_and_domain_limits():
+    pool = BrowserPool({"max_contexts": 3, "per_domain_limit": 1})
+    urls = [f"https://site{i % 3}.com/{i}" for i in range(9)]
+
+    results = _crawl_all(pool, urls)
+
+    crawler = FakeCrawler.instances[0]
+    assert results == [f"# {url}" for url in urls]
+    assert crawler.max_active <= 3 and crawler.max_per_domain == 1
+    assert pool.stats()["total_pages"] == 9 and pool.stats()["active"] == 0
+
+
+@pytest.mark.unit
+def test_recycles_after_page_count():
+    pool = BrowserPool({"recycle_after_pages": 2, "memory_limit_mb": None})
+
+    for i in range(5):
+        _crawl_all(pool, [f"https://example.com/{i}"])
+
+    assert pool.recycle_count == 2
+    assert [c.closed for c in FakeCrawler.instances] == [True, True, False]
+    assert [len(c.urls) for c in FakeCrawler.instances] == [2, 2, 1]
+
+
+@pytest.mark.unit
+def test_recycles_when_browser_memory_exceeds_limit(monkeypatch):
+    pool = BrowserPool({"memory_limit_mb": 100})
+    usage = iter([50, 500])
+    monkeypatch.setattr(pool, "_browser_memory_mb", lambda: next(usage))
+
+    for i in range(3):
+        _crawl_all(pool, [f"https://example.com/{i}"])
+
+    assert pool.recycle_count == 1 and len(FakeCrawler.instances) == 2
+
+
+@pytest.mark.unit
+def test_page_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(browser_pool, "get_cache_root", lambda: tmp_path)
+    pool = BrowserPool({"page_cache": True})
+
+    _crawl_all(pool, ["https://example.com/a"])
+    _crawl_all(pool, ["https://example.com/a"])
+    asyncio.run(pool.crawl_markdown("https://example.com/a", use_cache=False))
+
+    assert len(FakeCrawler.instances[0].urls) == 2
+    assert pool.stats()["page_cache"]["hits"] == 1
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="relies on Linux process names")
+def test_memory_counts_only_browser_processes(tmp_path, monkeypatch):
+    pytest.importorskip("psutil")
+    import psutil
+
+    sleep = "/bin/sleep" if os.path.exists("/bin/sleep") else "/usr/bin/sleep"
+    fake_chrome = tmp_path / "chrome-fake"
+    os.symlink(sleep, fake_chrome)
+    spawned = []
+
+    async def start(self):
+        # The browser and an unrelated job (e.g. execute_code) appear while the browser starts
+        spawned.append(subprocess.Popen([str(fake_chrome), "30"]))
+        spawned.append(subprocess.Popen([sleep, "30"]))
+
+    monkeypatch.setattr(FakeCrawler, "start", start)
+    unrelated = subprocess.Popen([sleep, "30"])
+    try:
+        pool = BrowserPool()
+        asyncio.run(pool.start())
+        unrelated_later = subprocess.Popen([str(fake_chrome), "30"])
+        spawned.append(unrelated_later)
+
+        expected = psutil.Process(spawned[0].pid).memory_info().rss / (1024 * 1024)
+        assert pool._browser_pids == {spawned[0].pid}
+        assert pool._browser_memory_mb() == pytest.approx(expected, rel=0.5)
+        asyncio.run(pool.close())
+        assert pool._browser_memory_mb() is None
+    finally:
+        for process in spawned + [unrelated]:
+            process.kill()
+            process.wait()
@@ -0,0 +1,137 @@
+"""
+Tests for the local document conversion backend with skip-if-unchanged builds (tool_server_lite/tools/convert_backends.py).
+
+Run with: pytest tests/test_convert_backends.py -v
+"""
+
+import sys
+
+import pytest
+
+from tool_server_lite.tools import convert_backends
+from tool_server_lite.tools.convert_tools import MarkdownToPdfTool, TexToPdfTool
+
+
+STUB_COMPILER = '''#!{python}
+import sys
+from pathlib import Path
+
+with open({calls!r}, "a") as f:
+    f.write(" ".join(sys.argv[1:]) + "\\n")
+
+args = sys.argv[1:]
+if "-o" in args:  # pandoc
+    Path(args[args.index("-o") + 1]).write_bytes(b"%PDF-md " + Path(args[0]).read_bytes())
+    sys.exit(0)
+
+outdir = Path(next(a for a in args if a.startswith("-outdir=")).split("=", 1)[1])
+main = Path(args[-1])
+stem = main.stem
+if "\\\\undefined" in main.read_text():
+    (outdir / (stem + ".log")).write_text("This is XeTeX\\n./main.tex:3: Undefined control sequence.\\nl.3 \\\\undefined\\n")
+    sys.exit(12)
+(outdir / (stem + ".aux")).write_text("\\\\relax\\n")
+body = b"".join(p.read_bytes() for p in sorted(Path(".").glob("*.tex")))
+(outdir / (stem + ".pdf")).write_bytes(b"%PDF-stub " + body)
+'''
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    calls = tmp_path / "calls.log"
+    stub = tmp_path / "stub_compiler"
+    stub.write_text(STUB_COMPILER.format(python=sys.executable, calls=str(calls)))
+    stub.chmod(0o755)
+    monkeypatch.setattr(convert_backends, "load_tool_config", lambda: {
+        "document_convert": {"backend": "local", "latexmk": str(stub), "pandoc": str(stub)}})
+    monkeypatch.setattr(convert_backends, "get_cache_root", lambda: tmp_path / "cache")
+
+    workspace = tmp_path / "ws"
+    paper = workspace / "paper"
+    paper.mkdir(parents=True)
+    (paper / "main.tex").write_text("\\documentclass{article}\n\\input{intro}\n", encoding="utf-8")
+    (paper / "intro.tex").write_text("Hello.\n", encoding="utf-8")
+    return workspace, calls
+
+
+def _compile(workspace, **params):
+    return TexToPdfTool().execute(str(workspace), dict({"project_dir": "paper", "main_file": "main.tex"}, **params))
+
+
+def _calls(calls):
+    return calls.read_text().splitlines() if calls.exists() else []
+
+
+@pytest.mark.unit
+def test_unchanged_sources_skip_compile(project):
+    workspace, calls = project
+
+    first = _compile(workspace)
+    second = _compile(workspace)
+
+    assert first["status"] == "success", first["error"]
+    assert first["compiled"] and first["backend"] == "local"
+    assert (workspace / "paper" / "main.pdf").read_bytes().startswith(b"%PDF-stub")
+    assert not second["compiled"] and "跳过编译" in second["output"]
+    assert len(_calls(calls)) == 1
+    assert "-xelatex" in _calls(calls)[0]
+
+
+@pytest.mark.unit
+def test_changed_file_recompiles_in_persistent_build_dir(project):
+    workspace, calls = project
+    _compile(workspace)
+    build_dirs = list((workspace.parent / "cache" / "convert").glob("*/build"))
+
+    (workspace / "paper" / "intro.tex").write_text("Hello again.\n", encoding="utf-8")
+    (workspace / "paper" / "main.aux").write_text("stray build output\n", encoding="utf-8")
+    result = _compile(workspace)
+
+    assert result["compiled"] and result["changed_files"] == ["intro.tex"]
+    assert b"Hello again." in (workspace / "paper" / "main.pdf").read_bytes()
+    assert list((workspace.parent / "cache" / "convert").glob("*/build")) == build_dirs
+    assert (build_dirs[0] / "main.aux").exists()
+    # Deleting the output forces a rebuild even though sources are unchanged
+    (workspace / "paper" / "main.pdf").unlink()
+    assert _compile(workspace)["compiled"]
+    assert len(_calls(calls)) == 3
+
+
+@pytest.mark.unit
+def test_compile_error_reports_log_and_markdown_skip(project):
+    workspace, calls = project
+    (workspace / "paper" / "main.tex").write_text("\\documentclass{article}\n\n\\undefined\n", encoding="utf-8")
+    (workspace / "notes.md").write_text("# Notes\n", encoding="utf-8")
+
+    failed = _compile(workspace)
+    md_first = MarkdownToPdfTool().execute(str(workspace), {"source_path": "notes.md"})
+    md_second = MarkdownToPdfTool().execute(str(workspace), {"source_path": "notes.md"})
+
+    assert failed["status"] == "error"
+    assert "./main.tex:3: Undefined control sequence." in failed["error"]
+    assert not (workspace / "paper" / "main.pdf").exists()
+    assert md_first["compiled"] and not md_second["compiled"]
+    assert (workspace / "notes.pdf").read_bytes() == b"%PDF-md # Notes\n"
+    assert "--pdf-engine=xelatex" in _calls(calls)[-1]
+
+
+@pytest.mark.unit
+def test_markdown_rebuilds_when_only_an_image_changes(project):
+    workspace, calls = project
+    (workspace / "figs").mkdir()
+    (workspace / "figs" / "plot.png").write_bytes(b"\x89PNG v1")
+    (workspace / "notes.md").write_text(
+        "# Notes\n\n![Plot](figs/plot.png \"caption\")\n<img src='logo.svg'>\n[web]: https://example.com\n",
+        encoding="utf-8")
+
+    first = MarkdownToPdfTool().execute(str(workspace), {"source_path": "notes.md"})
+    (workspace / "figs" / "plot.png").write_bytes(b"\x89PNG v2")
+    second = MarkdownToPdfTool().execute(str(workspace), {"source_path": "notes.md"})
+    (workspace / "logo.svg").write_text("<svg/>", encoding="utf-8")
+    third = MarkdownToPdfTool().execute(str(workspace), {"source_path": "notes.md"})
+    fourth = MarkdownToPdfTool().execute(str(workspace), {"source_path": "notes.md"})
+
+    assert first["compiled"] and sorted(first["changed_files"]) == ["figs/plot.png", "logo.svg", "notes.md"]
+    assert second["compiled"] and second["changed_files"] == ["figs/plot.png"]
+    assert third["compiled"] and third["changed_files"] == ["logo.svg"]
+    assert not fourth["compiled"] and len(_calls(calls)) == 3
@@ -0,0 +1,70 @@
+"""
+Tests for crawl_page batch mode (tool_server_lite/tools/web_tools.py) with a stubbed browser pool.
+
+Run with: pytest tests/test_crawl_page.py -v
+"""
+
+import asyncio
+
+import pytest
+
+from tool_server_lite.tools import web_tools
+from tool_server_lite.tools.web_tools import CrawlPageTool
+
+
+class FakePool:
+    def __init__(self):
+        self.calls = []
+
+    async def crawl_markdown(self, url, use_cache=None):
+        self.calls.append((url, use_cache))
+        if "broken" in url:
+            raise RuntimeError("navigation failed")
+        return f"# {url}\n![img](http://x/i.png)\nbody"
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    fake = FakePool()
+    monkeypatch.setattr(web_tools, "CRAWL4AI_AVAILABLE", True)
+    monkeypatch.setattr(web_tools, "get_browser_pool", lambda: fake)
+    return fake
+
+
+def _crawl(tmp_path, **params):
+    return asyncio.run(CrawlPageTool().execute_async(str(tmp_path), params))
+
+
+@pytest.mark.unit
+def test_single_element_list_uses_directory(pool, tmp_path):
+    (tmp_path / "temp" / "crawl").mkdir(parents=True)
+
+    result = _crawl(tmp_path, urls=["https://example.com/a"], save_path="temp/crawl")
+
+    assert result["status"] == "success", result["error"]
+    files = list((tmp_path / "temp" / "crawl").iterdir())
+    assert len(files) == 1 and files[0].name.startswith("example.com_a_")
+    assert files[0].read_text(encoding="utf-8") == "# https://example.com/a\n\nbody"
+
+
+@pytest.mark.unit
+def test_batch_writes_one_file_per_url_and_reports_failures(pool, tmp_path):
+    urls = ["https://example.com/a", "https://example.com/broken", "https://example.com/a",
+            "https://example.com/b"]
+
+    result = _crawl(tmp_path, url=urls, save_path="temp/pages.md", download_images=True, use_cache=False)
+
+    assert result["status"] == "success"
+    assert sorted(url for url, _ in pool.calls) == sorted(set(urls))
+    assert all(use_cache is False for _, use_cache in pool.calls)
+    saved = sorted(p.name for p in (tmp_path / "temp" / "pages").iterdir())
+    assert len(saved) == 2 and "![img]" in (tmp_path / "temp" / "pages" / saved[0]).read_text(encoding="utf-8")
+    assert "成功 2/3" in result["output"]
+    assert result["error"] == "https://example.com/broken: navigation failed"
+
+
+@pytest.mark.unit
+def test_batch_requires_save_directory(pool, tmp_path):
+    result = _crawl(tmp_path, urls=["https://example.com/a"])
+
+    assert result["status"] == "error" and "save_path" in result["error"] and pool.calls == []
@@ -0,0 +1,199 @@
+"""
+Tests for resumable / parallel downloads (tool_server_lite/tools/downloader.py).
+
+A local HTTP server with Range support stands in for the remote host.
+
+Run with: pytest tests/test_file_download.py -v
+"""
+
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tool_server_lite.tools import downloader
+from tool_server_lite.tools.downloader import DownloadError, Downloader, parse_checksum
+from tool_server_lite.tools.web_tools import FileDownloadTool
+
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)
+SMALL_CONFIG = {"min_parallel_size_mb": 1, "retries": 0, "timeout": 5}
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves PAYLOAD at any path, honouring Range/If-Range unless disabled"""
+
+    server_version = "TestServer"
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._respond(body=False)
+
+    def do_GET(self):
+        self._respond(body=True)
+
+    def _respond(self, body):
+        state = self.server.state
+        state["requests"].append({"method": self.command, "range": self.headers.get("Range")})
+        data = PAYLOAD
+        etag = state["etag"]
+
+        rng = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if rng and state["ranges"] and (if_range is None or if_range == etag):
+            start_s, end_s = rng.replace("bytes=", "").split("-")
+            start = int(start_s)
+            end = int(end_s) if end_s else len(data) - 1
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.end_headers()
+                return
+            chunk = data[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        else:
+            chunk = data
+            self.send_response(200)
+
+        self.send_header("Content-Length", str(len(chunk)))
+        self.send_header("ETag", etag)
+        if state["ranges"]:
+            self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        if body:
+            self.wfile.write(chunk)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    httpd.state = {"ranges": True, "etag": '"v1"', "requests": []}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _write_partial(dest, size, etag='"v1"', url=None):
+    """Simulate an interrupted single-stream download"""
+    dest.with_name(dest.name + ".part").write_bytes(PAYLOAD[:size])
+    meta = {"url": url, "total": len(PAYLOAD), "etag": etag, "last_modified": None,
+            "mode": "single", "segments": None}
+    dest.with_name(dest.name + ".part.json").write_text(json.dumps(meta))
+
+
+@pytest.mark.unit
+def test_parse_checksum():
+    digest = hashlib.sha256(b"x").hexdigest()
+    assert parse_checksum(f"SHA256:{digest.upper()}") == ("sha256", digest)
+    assert parse_checksum(hashlib.md5(b"x").hexdigest())[0] == "md5"
+    with pytest.raises(DownloadError):
+        parse_checksum("abc")
+
+
+@pytest.mark.unit
+def test_single_download_with_checksum(server, tmp_path):
+    _, base = server
+    dest = tmp_path / "data.bin"
+    checksum = "sha256:" + hashlib.sha256(PAYLOAD).hexdigest()
+
+    result = Downloader(f"{base}/data.bin", dest, connections=1, checksum=checksum,
+                        config=SMALL_CONFIG).run()
+
+    assert dest.read_bytes() == PAYLOAD
+    assert result["checksum"] == checksum
+    assert not result["parallel"]
+    assert not dest.with_name("data.bin.part").exists()
+    assert not dest.with_name("data.bin.part.json").exists()
+
+
+@pytest.mark.unit
+def test_parallel_download(server, tmp_path):
+    httpd, base = server
+    dest = tmp_path / "data.bin"
+
+    result = Downloader(f"{base}/data.bin", dest, connections=4, config=SMALL_CONFIG).run()
+
+    assert dest.read_bytes() == PAYLOAD
+    assert result["parallel"]
+    ranged = [r for r in httpd.state["requests"] if r["method"] == "GET" and r["range"]]
+    assert len(ranged) == 4
+
+
+@pytest.mark.unit
+def test_resume_from_part_file(server, tmp_path):
+    httpd, base = server
+    url = f"{base}/data.bin"
+    dest = tmp_path / "data.bin"
+    _write_partial(dest, 1000, url=url)
+
+    result = Downloader(url, dest, connections=1, config=SMALL_CONFIG).run()
+
+    assert dest.read_bytes() == PAYLOAD
+    assert result["resumed_bytes"] == 1000
+    gets = [r for r in httpd.state["requests"] if r["method"] == "GET"]
+    assert gets[-1]["range"] == "bytes=1000-"
+
+
+@pytest.mark.unit
+def test_changed_remote_restarts(server, tmp_path):
+    httpd, base = server
+    url = f"{base}/data.bin"
+    dest = tmp_path / "data.bin"
+    _write_partial(dest, 1000, etag='"old"', url=url)
+
+    result = Downloader(url, dest, connections=1, config=SMALL_CONFIG).run()
+
+    assert dest.read_bytes() == PAYLOAD
+    assert result["resumed_bytes"] == 0
+
+
+@pytest.mark.unit
+def test_server_without_ranges(server, tmp_path):
+    httpd, base = server
+    httpd.state["ranges"] = False
+    url = f"{base}/data.bin"
+    dest = tmp_path / "data.bin"
+    _write_partial(dest, 1000, url=url)
+
+    result = Downloader(url, dest, connections=4, config=SMALL_CONFIG).run()
+
+    assert dest.read_bytes() == PAYLOAD
+    assert not result["parallel"]
+
+
+@pytest.mark.unit
+def test_checksum_mismatch_removes_part(server, tmp_path):
+    _, base = server
+    dest = tmp_path / "data.bin"
+
+    with pytest.raises(DownloadError):
+        Downloader(f"{base}/data.bin", dest, connections=1, checksum="sha256:" + "0" * 64,
+                   config=SMALL_CONFIG).run()
+
+    assert not dest.exists()
+    assert not dest.with_name("data.bin.part").exists()
+
+
+@pytest.mark.unit
+def test_batch_download_tool(server, tmp_path, monkeypatch):
+    _, base = server
+    monkeypatch.setattr(downloader, "get_download_config", lambda: dict(SMALL_CONFIG))
+
+    result = FileDownloadTool().execute(str(tmp_path), {
+        "urls": [f"{base}/a/paper.pdf", f"{base}/b/paper.pdf", f"{base}/data.bin"],
+        "save_path": "upload/downloads",
+    })
+
+    assert result["status"] == "success", result["error"]
+    assert result["output"].count("[OK]") == 3
+    files = sorted(p.name for p in (tmp_path / "upload" / "downloads").iterdir())
+    assert len(files) == 3
+    assert "data.bin" in files and "paper.pdf" in files
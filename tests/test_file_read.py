@@ -0,0 +1,212 @@
+"""
+Tests for FileReadTool output formats and size caps (tool_server_lite/tools/file_tools.py).
+
+Run with: pytest tests/test_file_read.py -v
+"""
+
+import json
+
+import pytest
+
+from tool_server_lite.tools import file_tools, line_index
+from tool_server_lite.tools.file_tools import FileReadTool
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    (tmp_path / "big.txt").write_text("".join(f"row {i}\n" for i in range(1, 101)), encoding="utf-8")
+    (tmp_path / "small.txt").write_text("a\nb\n", encoding="utf-8")
+    return tmp_path
+
+
+def _read(workspace, **params):
+    return FileReadTool().execute(str(workspace), params)
+
+
+@pytest.mark.unit
+def test_numbered_is_default(workspace):
+    result = _read(workspace, path=["big.txt"], start_line=98)
+
+    assert result["status"] == "success"
+    assert result["output"] == " 98\trow 98\n 99\trow 99\n100\trow 100"
+
+
+@pytest.mark.unit
+def test_json_and_plain_formats(workspace):
+    as_json = _read(workspace, path=["small.txt"], format="json")
+    assert json.loads(as_json["output"]) == [{"line": 1, "content": "a"}, {"line": 2, "content": "b"}]
+
+    assert _read(workspace, path=["small.txt"], show_line_numbers=False)["output"] == "a\nb\n"
+    assert _read(workspace, path=["small.txt"], format="xml")["status"] == "error"
+
+
+@pytest.mark.unit
+def test_server_default_format(workspace, monkeypatch):
+    monkeypatch.setattr(file_tools, "load_tool_config", lambda: {"file_read": {"format": "json"}})
+
+    output = _read(workspace, path=["small.txt"])["output"]
+
+    assert json.loads(output)[0] == {"line": 1, "content": "a"}
+
+
+@pytest.mark.unit
+def test_byte_cap_truncates_with_continuation_hint(workspace):
+    output = _read(workspace, path=["big.txt"], max_bytes=100, end_line=50)["output"]
+    lines = output.splitlines()
+
+    shown = [line for line in lines if "\t" in line]
+    assert 0 < len(shown) < 50
+    next_line = len(shown) + 1
+    assert lines[-1].endswith(f"start_line={next_line}, end_line=50]")
+    assert "文件共 100 行" in lines[-1]
+
+
+@pytest.mark.unit
+def test_long_line_clipped(workspace, monkeypatch):
+    (workspace / "wide.txt").write_text("x" * 50 + "\n", encoding="utf-8")
+    monkeypatch.setattr(file_tools, "load_tool_config", lambda: {"file_read": {"max_line_chars": 10}})
+
+    output = _read(workspace, path=["wide.txt"])["output"]
+
+    assert output.startswith("1\txxxxxxxxxx …")
+    assert "40" in output
+
+
+@pytest.mark.unit
+def test_multiple_files_sections(workspace):
+    result = _read(workspace, path=["small.txt", "missing.txt", "big.txt"], end_line=1)
+
+    assert result["status"] == "success"
+    assert "==> small.txt <== (2 lines)\n1\ta" in result["output"]
+    assert "==> missing.txt <== [error] File not found: missing.txt" in result["output"]
+    assert "==> big.txt <== (100 lines)\n1\trow 1" in result["output"]
+
+
+@pytest.fixture
+def small_stride(monkeypatch, tmp_path):
+    """Tiny index blocks and a private cache dir so the sparse index is exercised on small files"""
+    monkeypatch.setattr(line_index, "INDEX_STRIDE", 64)
+    monkeypatch.setattr(line_index, "_index_store", line_index._IndexStore())
+    monkeypatch.setattr(file_tools, "load_tool_config", lambda: {"file_read": {"index_min_size_mb": 0}})
+    monkeypatch.setattr(file_tools, "get_cache_root", lambda: tmp_path / "cache")
+    return tmp_path / "cache" / "line_index"
+
+
+@pytest.mark.unit
+def test_ranged_read_uses_persisted_index(workspace, small_stride, monkeypatch):
+    assert _read(workspace, path=["big.txt"], start_line=57, end_line=58)["output"] == "57\trow 57\n58\trow 58"
+    assert len(list(small_stride.glob("*.json"))) == 1
+
+    # A fresh process reuses the persisted index instead of rescanning
+    monkeypatch.setattr(line_index, "_index_store", line_index._IndexStore())
+    monkeypatch.setattr(line_index.LineIndex, "build", classmethod(lambda cls, path: pytest.fail("rescanned")))
+    assert _read(workspace, path=["big.txt"], start_line=100)["output"] == "100\trow 100"
+
+
+@pytest.mark.unit
+def test_index_invalidated_when_file_changes(workspace, small_stride):
+    _read(workspace, path=["big.txt"], start_line=5, end_line=5)
+    with open(workspace / "big.txt", "a", encoding="utf-8") as f:
+        f.write("row 101\nrow 102")
+
+    result = _read(workspace, path=["big.txt"], start_line=101)
+
+    assert result["output"] == "101\trow 101\n102\trow 102"
+
+
+@pytest.mark.unit
+def test_crlf_and_unterminated_long_line(workspace, small_stride, monkeypatch):
+    (workspace / "crlf.txt").write_bytes(b"a\r\nb\r\n" + b"z" * 500)
+    monkeypatch.setattr(file_tools, "get_file_read_config",
+                        lambda: dict(file_tools.DEFAULT_FILE_READ_CONFIG, max_line_chars=10, index_min_size_mb=0))
+
+    assert _read(workspace, path=["crlf.txt"], end_line=2, format="plain")["output"] == "a\nb\n"
+    assert _read(workspace, path=["crlf.txt"], start_line=3)["output"] == "3\tzzzzzzzzzz …[该行过长，省略 490 字符]"
+
+
+@pytest.mark.unit
+def test_encoding_detection_fast_path(workspace, monkeypatch):
+    (workspace / "utf8.txt").write_text("中文内容\n" * 3000, encoding="utf-8")
+    (workspace / "gbk.txt").write_bytes("中文内容，编码检测\n".encode("gbk") * 200)
+    (workspace / "utf16.txt").write_text("第一行\n第二行\n", encoding="utf-16")
+
+    calls = []
+    real_detect = file_tools.chardet.detect
+    monkeypatch.setattr(file_tools.chardet, "detect", lambda data: calls.append(1) or real_detect(data))
+
+    assert file_tools.detect_encoding(workspace / "utf8.txt") == "utf-8"
+    assert not calls
+    assert _read(workspace, path=["gbk.txt"], end_line=1)["output"] == "1\t中文内容，编码检测"
+    # UTF-16 cannot be split on b"\n" and falls back to a whole-file read
+    reader = line_index.LineReader(workspace / "utf16.txt", "utf-16")
+    assert reader.total_lines == 2
+    assert list(reader.iter_lines(1)) == [("第二行\n", 0)]
+
+
+@pytest.mark.unit
+def test_utf8_bom_file_uses_line_index(workspace, small_stride, monkeypatch):
+    (workspace / "bom.txt").write_text("".join(f"行 {i}\n" for i in range(1, 51)), encoding="utf-8-sig")
+    monkeypatch.setattr(line_index.LineReader, "_read_all", lambda self: pytest.fail("read whole file"))
+
+    assert file_tools.detect_encoding(workspace / "bom.txt") == "utf-8-sig"
+    assert _read(workspace, path=["bom.txt"], end_line=2)["output"] == "1\t行 1\n2\t行 2"
+    assert _read(workspace, path=["bom.txt"], start_line=50)["output"] == "50\t行 50"
+
+
+@pytest.mark.unit
+def test_fair_shares():
+    shares = file_tools.fair_shares({"a": 10, "b": 500, "c": 1000}, 610)
+
+    assert shares == {"a": 10, "b": 300, "c": 300}
+    assert file_tools.fair_shares({"a": 5}, float("inf")) == {"a": 5}
+
+
+@pytest.mark.unit
+def test_multi_file_shared_budget_and_glob(workspace, monkeypatch):
+    src = workspace / "src" / "pkg"
+    src.mkdir(parents=True)
+    (src / "tiny.py").write_text("x = 1\n", encoding="utf-8")
+    (src / "huge.py").write_text("".join(f"value_{i} = {i}\n" for i in range(5000)), encoding="utf-8")
+    (src / "image.png").write_bytes(b"\x89PNG\x00\x00")
+    monkeypatch.setattr(file_tools, "get_file_read_config",
+                        lambda: dict(file_tools.DEFAULT_FILE_READ_CONFIG, total_max_bytes=2000))
+
+    result = _read(workspace, path=["src/**/*.py", "small.txt", "none/*.md"])
+    output = result["output"]
+
+    assert result["status"] == "success"
+    assert output.startswith("[读取 3/4 个文件；总输出预算按文件均分，1 个文件被截断]")
+    assert "==> src/pkg/tiny.py <== (1 lines)\n1\tx = 1" in output
+    assert "image.png" not in output
+    assert "No text files match pattern: none/*.md" in output
+    assert result["files"]["src/pkg/huge.py"]["truncated"]
+    assert result["files"]["src/pkg/huge.py"]["budget_limited"]
+    assert not result["files"]["small.txt"]["truncated"]
+    assert len(output.encode("utf-8")) < 2600
+
+
+@pytest.mark.unit
+def test_glob_skips_env_dirs_and_stops_at_max_files(workspace, monkeypatch):
+    for rel in ("code_env/lib/site.py", "node_modules/pkg/m.py", ".git/hooks/h.py", "venv/lib/v.py",
+                "src/a.py", "src/b.py", "src/sub/c.py", "src/sub/d.py", "top.py"):
+        (workspace / rel).parent.mkdir(parents=True, exist_ok=True)
+        (workspace / rel).write_text(f"# {rel}\n", encoding="utf-8")
+    (workspace / "venv" / "pyvenv.cfg").write_text("home = /usr/bin\n", encoding="utf-8")
+
+    everything = _read(workspace, path=["**/*.py"])
+    assert everything["status"] == "success", everything["error"]
+    assert list(everything["files"]) == ["top.py", "src/a.py", "src/b.py", "src/sub/c.py", "src/sub/d.py"]
+    # Named explicitly, a skipped directory is still readable
+    assert list(_read(workspace, path=["code_env/**/*.py"])["files"]) == ["code_env/lib/site.py"]
+
+    opened = []
+    real_is_binary = file_tools.is_binary_file
+    monkeypatch.setattr(file_tools, "is_binary_file", lambda path: opened.append(path) or real_is_binary(path))
+    monkeypatch.setattr(file_tools, "get_file_read_config",
+                        lambda: dict(file_tools.DEFAULT_FILE_READ_CONFIG, max_files=2))
+
+    result = _read(workspace, path=["src/**/*.py"])
+
+    assert list(result["files"]) == ["src/a.py", "src/b.py"]
+    assert "匹配文件过多，只读取了前 2 个文件" in result["output"]
+    assert len(opened) == 4    # two candidates during expansion, then one check per file read
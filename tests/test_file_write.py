@@ -0,0 +1,127 @@
+"""
+Tests for FileWriteTool edit operations (tool_server_lite/tools/file_edit.py).
+
+Run with: pytest tests/test_file_write.py -v
+"""
+
+import pytest
+
+from tool_server_lite.tools import file_edit
+from tool_server_lite.tools.file_tools import FileWriteTool
+
+
+SOURCE = "def a():\n    return 1\n\n\ndef b():\n    return 2\n\n\ndef c():\n    return 3\n"
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    # Tiny chunks so matches straddle chunk boundaries
+    monkeypatch.setattr(file_edit, "CHUNK_SIZE", 7)
+    (tmp_path / "m.py").write_text(SOURCE, encoding="utf-8")
+    return tmp_path
+
+
+def _write(workspace, **params):
+    return FileWriteTool().execute(str(workspace), dict(params, path="m.py"))
+
+
+def _text(workspace):
+    return (workspace / "m.py").read_text(encoding="utf-8")
+
+
+@pytest.mark.unit
+def test_replace_unique_string(workspace):
+    result = _write(workspace, mode="replace", old_string="def b():\n    return 2", new_string="def b():\n    return 20")
+
+    assert result["status"] == "success", result["error"]
+    assert "line 5" in result["output"]
+    assert _text(workspace) == SOURCE.replace("return 2\n", "return 20\n")
+    assert [p.name for p in workspace.iterdir()] == ["m.py"]
+
+
+@pytest.mark.unit
+def test_replace_rejects_missing_and_ambiguous(workspace):
+    missing = _write(workspace, mode="replace", old_string="return 4", new_string="x")
+    ambiguous = _write(workspace, mode="replace", old_string="    return", new_string="x")
+
+    assert missing["status"] == "error" and "未找到" in missing["error"]
+    assert ambiguous["status"] == "error" and "多次" in ambiguous["error"]
+    assert _text(workspace) == SOURCE
+
+
+@pytest.mark.unit
+def test_insert_after_and_before_anchor(workspace):
+    _write(workspace, mode="insert", anchor="def b():", content="    # b docs")
+    _write(workspace, mode="insert", anchor="def c():", position="before", content="@decorator\n")
+
+    assert "def b():\n    # b docs\n    return 2" in _text(workspace)
+    assert "\n@decorator\ndef c():" in _text(workspace)
+
+
+@pytest.mark.unit
+def test_apply_multi_hunk_patch_with_offset(workspace):
+    # Line numbers are deliberately stale; hunks are located by content
+    diff = (
+        "--- a/m.py\n+++ b/m.py\n"
+        "@@ -1,2 +1,2 @@\n def a():\n-    return 1\n+    return 10\n"
+        "@@ -20,3 +20,4 @@\n def c():\n-    return 3\n+    x = 3\n+    return x\n"
+    )
+
+    result = _write(workspace, mode="patch", content=diff)
+
+    assert result["status"] == "success", result["error"]
+    assert result["output"] == "Applied 2 hunk(s) to m.py (+3 -2 lines)"
+    assert _text(workspace) == SOURCE.replace("return 1", "return 10").replace(
+        "    return 3\n", "    x = 3\n    return x\n")
+
+
+@pytest.mark.unit
+def test_failed_patch_leaves_file_untouched(workspace):
+    diff = "@@ -1,1 +1,1 @@\n-def a():\n+def A():\n@@ -9,1 +9,1 @@\n-def zzz():\n+def c():\n"
+
+    result = _write(workspace, mode="patch", content=diff)
+
+    assert result["status"] == "error"
+    assert "第 2 个 hunk" in result["error"]
+    assert _text(workspace) == SOURCE
+    assert [p.name for p in workspace.iterdir()] == ["m.py"]
+
+
+@pytest.mark.unit
+def test_patch_lands_at_nearest_match_to_header_line(workspace):
+    (workspace / "m.py").write_text("a\nx\nb\nc\nx\nd\n", encoding="utf-8")
+
+    result = _write(workspace, mode="patch", content="@@ -5,1 +5,1 @@\n-x\n+Y\n")
+
+    assert result["status"] == "success", result["error"]
+    assert _text(workspace) == "a\nx\nb\nc\nY\nd\n"
+
+    # The first hunk's offset (+2) carries over: the second one targets line 7, not line 5
+    (workspace / "m.py").write_text("}\na\n}\nb\n}\nc\n}\n", encoding="utf-8")
+    diff = "@@ -2,1 +2,1 @@\n-b\n+B\n@@ -5,1 +5,1 @@\n-}\n+};\n"
+    result = _write(workspace, mode="patch", content=diff)
+
+    assert result["status"] == "success", result["error"]
+    assert _text(workspace) == "}\na\n}\nB\n}\nc\n};\n"
+
+
+@pytest.mark.unit
+def test_patch_rejects_ambiguous_location(workspace):
+    (workspace / "m.py").write_text("a\n}\nb\n}\nc\n", encoding="utf-8")
+
+    result = _write(workspace, mode="patch", content="@@ -3,1 +3,1 @@\n-}\n+};\n")
+
+    assert result["status"] == "error" and "位置不明确" in result["error"]
+    assert _text(workspace) == "a\n}\nb\n}\nc\n"
+
+
+@pytest.mark.unit
+def test_line_replace_streams_and_keeps_crlf(workspace):
+    (workspace / "m.py").write_bytes(b"one\r\ntwo\r\nthree\r\n")
+
+    result = _write(workspace, start_line=2, end_line=3, content="TWO")
+    replaced = _write(workspace, mode="replace", old_string="one\nTWO", new_string="1\n2")
+
+    assert result["output"] == "Replaced lines 2-3 in m.py"
+    assert replaced["status"] == "success", replaced["error"]
+    assert (workspace / "m.py").read_bytes() == b"1\r\n2\r\n"
@@ -0,0 +1,160 @@
+"""
+Tests for the tool server's shared LLM transport (tool_server_lite/llm_transport.py):
+token bucket pacing, retry / backoff and Retry-After handling, using a fake clock and a fake client.
+
+Run with: pytest tests/test_llm_transport.py -v
+"""
+
+import sys
+from email.utils import formatdate
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "tool_server_lite"))
+
+import llm_transport  # noqa: E402
+from llm_transport import LLMTransport, TokenBucket, is_retryable  # noqa: E402
+
+
+class FakeClock:
+    """Stands in for the time module: sleep() advances the clock instead of blocking."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 3))
+        self.now += seconds
+
+
+class APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class FakeClient:
+    """Fails with the queued errors, then succeeds."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, prompt):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return f"answer to {prompt}"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(llm_transport, "time", fake)
+    # Full jitter picks the upper bound so backoff delays are deterministic
+    monkeypatch.setattr(llm_transport.random, "uniform", lambda low, high: high)
+    return fake
+
+
+@pytest.mark.unit
+def test_token_bucket_paces_requests_and_honours_pause(clock):
+    bucket = TokenBucket(rate=0.5, capacity=2)
+
+    waits = [bucket.acquire() for _ in range(3)]
+    bucket.pause(10)
+    paused_wait = bucket.acquire()
+
+    assert waits == [0.0, 0.0, 2.0]
+    assert paused_wait == pytest.approx(10.0)
+    assert clock.now == pytest.approx(1012.0)
+
+
+@pytest.mark.unit
+def test_retries_with_exponential_backoff(clock):
+    transport = LLMTransport({"base_delay": 1.0, "max_delay": 3.0, "max_retries": 4})
+    client = FakeClient(APIError(503), APIError(500), APIError(502))
+
+    result = transport.call("m", client, "q")
+
+    assert result == "answer to q" and client.calls == 4
+    assert clock.sleeps == [1.0, 2.0, 3.0]    # 1, 2, 4 capped at max_delay
+    stats = transport.stats()["models"]["m"]
+    assert (stats["requests"], stats["successes"], stats["retries"], stats["failures"]) == (4, 1, 3, 0)
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.unit
+def test_non_retryable_and_exhausted_errors_raise(clock):
+    transport = LLMTransport({"max_retries": 2})
+
+    with pytest.raises(APIError):
+        transport.call("m", FakeClient(APIError(400)), "q")
+    assert clock.sleeps == []
+
+    client = FakeClient(*[APIError(429) for _ in range(5)])
+    with pytest.raises(APIError):
+        transport.call("m", client, "q")
+
+    stats = transport.stats()["models"]["m"]
+    assert client.calls == 3 and stats["failures"] == 2 and stats["rate_limited"] == 3
+
+
+@pytest.mark.unit
+def test_retry_after_header_variants(clock):
+    transport = LLMTransport({"max_delay": 60.0})
+    client = FakeClient(
+        APIError(429, {"retry-after": "7"}),
+        APIError(429, {"retry-after-ms": "1500"}),
+        # An absolute date: the first two retries have already moved the clock by 8.5s
+        APIError(503, {"retry-after": formatdate(clock.now + 30, usegmt=True)}),
+        APIError(429, {"retry-after": "600"}),
+    )
+
+    transport.call("m", client, "q")
+
+    assert clock.sleeps[:2] == [7.0, 1.5]
+    assert clock.sleeps[2] == pytest.approx(21.5, abs=1.0)
+    assert clock.sleeps[3] == 60.0    # capped at max_delay
+
+
+@pytest.mark.unit
+def test_retry_after_pauses_the_whole_model(clock):
+    transport = LLMTransport({"default_rpm": 600, "models": {"slow": {"rpm": 60}}})
+    transport.call("m", FakeClient(APIError(429, {"retry-after": "5"})), "q")
+    bucket = transport._limiter("m").bucket
+
+    assert bucket.blocked_until == pytest.approx(clock.now)
+    assert transport._limiter("slow").rpm == 60 and transport._limiter("m").rpm == 600
+
+
+@pytest.mark.unit
+def test_is_retryable_by_exception_name():
+    class RateLimitError(Exception):
+        pass
+
+    class AuthenticationError(Exception):
+        pass
+
+    assert is_retryable(RateLimitError()) and is_retryable(TimeoutError())
+    assert not is_retryable(AuthenticationError()) and not is_retryable(APIError(401))
+
+
+@pytest.mark.unit
+def test_config_comes_from_shared_tool_config(monkeypatch):
+    from tools import tool_config
+
+    monkeypatch.setattr(tool_config, "_TOOL_CONFIG_CACHE", {"llm_transport": {"max_retries": 9}})
+
+    config = llm_transport._load_transport_config()
+
+    assert config["max_retries"] == 9 and config["base_delay"] == 1.0
@@ -0,0 +1,124 @@
+"""
+Tests for deterministic tool-output reducers (services/output_reducers.py).
+
+Run with: pytest tests/test_output_reducers.py -v
+"""
+
+import pytest
+
+from services import output_reducers
+from services.output_reducers import reduce_output
+from tool_server_lite.tools import file_tools
+from tool_server_lite.tools.code_tools import GrepTool
+from tool_server_lite.tools.file_tools import DirListTool, FileReadTool
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    # Server defaults (numbered format, no tool_config.yaml overrides)
+    monkeypatch.setattr(file_tools, "load_tool_config", lambda: {})
+    body = ["import os", "", "", "def main():", "    x = 1   ", "", "    return x", ""] + [f"# {i}" for i in range(12)]
+    (tmp_path / "a.py").write_text("\n".join(body) + "\n", encoding="utf-8")
+    (tmp_path / "b.py").write_text("def foo():\n    return 1\n\n\ndef bar():\n    return foo()\n", encoding="utf-8")
+    return tmp_path
+
+
+def _run(tool, workspace, **params):
+    result = tool.execute(str(workspace), params)
+    assert result["status"] == "success", result["error"]
+    return result["output"]
+
+
+@pytest.mark.unit
+def test_file_read_numbered_output(workspace):
+    output = _run(FileReadTool(), workspace, path=["a.py"], end_line=12, max_bytes=80)
+
+    reduced = reduce_output("file_read", output)
+
+    assert output.startswith(" 1\timport os\n 2\t\n")
+    assert reduced.startswith("1\timport os\n4\tdef main():\n5\t    x = 1\n7\t    return x\n")
+    assert "\t\n" not in reduced and not any(line.endswith("\t") for line in reduced.splitlines())
+    assert reduced.splitlines()[-1] == output.splitlines()[-1]    # continuation hint kept
+    assert "start_line=" in reduced.splitlines()[-1]
+
+
+@pytest.mark.unit
+def test_file_read_json_matches_numbered(workspace):
+    for params in ({"path": ["a.py"]}, {"path": ["a.py", "b.py", "missing.py"]}):
+        numbered = _run(FileReadTool(), workspace, **params)
+        as_json = _run(FileReadTool(), workspace, format="json", **params)
+
+        assert reduce_output("file_read", as_json) == reduce_output("file_read", numbered)
+
+    reduced = reduce_output("file_read", numbered)
+    assert reduced.startswith("[读取 2/3 个文件]")
+    assert "==> b.py <== (6 lines)\n1\tdef foo():\n2\t    return 1\n5\tdef bar():" in reduced
+    assert "==> missing.py <== [error] File not found: missing.py" in reduced
+
+
+@pytest.mark.unit
+def test_grep_grouped_by_file(workspace):
+    output = _run(GrepTool(), workspace, pattern="return|def foo", file_pattern="b.py", context_lines=1)
+
+    reduced = reduce_output("grep", output)
+
+    assert output.count("b.py:2") == 2    # line 2 is both a match and context of line 1
+    assert reduced.count("b.py") == 1
+    assert reduced.split("\n\n")[0] == "\n".join([
+        "b.py:", "  1: def foo():", "  2:     return 1", "  3- ", "  5- def bar():", "  6:     return foo()"])
+    assert reduced.endswith("搜索完成: 在 1 个文件中找到 3 处匹配")
+
+
+@pytest.mark.unit
+def test_log_dedupes_lines_and_progress():
+    lines = ["start"] + ["warning: deprecated"] * 50 + [f"epoch {i} loss {i * 0.1:.2f}" for i in range(100)] + ["done"]
+
+    reduced = reduce_output("execute_code", "\n".join(lines))
+
+    assert "warning: deprecated  [×50]" in reduced
+    assert "epoch 0 loss 0.00" in reduced and "epoch 99 loss 9.90" in reduced
+    assert "省略 97 行相似输出" in reduced
+    assert len(reduced.splitlines()) < 10
+
+
+@pytest.mark.unit
+def test_log_elides_repeated_tracebacks():
+    tb = [
+        "Traceback (most recent call last):",
+        '  File "main.py", line 3, in <module>',
+        "    run()",
+        "ValueError: bad input",
+    ]
+    text = "\n".join(tb + ["retrying"] + tb + ["Exit code: 1"])
+
+    reduced = reduce_output("execute_command", text)
+
+    assert reduced.count("Traceback (most recent call last):") == 1
+    assert "已省略: ValueError: bad input" in reduced
+    assert reduced.endswith("Exit code: 1")
+
+
+@pytest.mark.unit
+def test_dir_tree_collapsed_by_depth(tmp_path):
+    for d in range(20):
+        for s in range(3):
+            sub = tmp_path / f"pkg{d:02d}" / f"sub{s}"
+            sub.mkdir(parents=True)
+            for i in range(5):
+                (sub / f"f{i}.py").write_text("")
+    output = _run(DirListTool(), tmp_path, recursive=True)
+
+    reduced = reduce_output("dir_list", output)
+
+    assert len(output.splitlines()) == 380
+    assert len(reduced.splitlines()) <= output_reducers.DIR_TREE_MAX_LINES + 1
+    assert "  [dir] sub0  (5 files, 0 dirs 已折叠)" in reduced
+    assert "f0.py" not in reduced
+
+
+@pytest.mark.unit
+def test_unknown_tool_and_malformed_input_unchanged():
+    assert reduce_output("web_search", "anything") == "anything"
+    assert reduce_output("file_read", "not json") == "not json"
+    small_tree = "[dir] a\n  [file] b"
+    assert reduce_output("dir_list", small_tree) == small_tree
@@ -0,0 +1,110 @@
+"""
+Tests for section-aware map-reduce paper analysis (tool_server_lite/tools/paper_chunks.py).
+
+Run with: pytest tests/test_paper_analyze.py -v
+"""
+
+import threading
+
+import pytest
+
+from tool_server_lite.tools import paper_chunks, paper_tools
+from tool_server_lite.tools.paper_chunks import NO_CONTENT, plan_chunks, split_sections
+from tool_server_lite.tools.paper_tools import PaperAnalyzeTool
+
+
+def _paper(body_lines=60):
+    filler = "\n".join(f"Sentence {i} about the topic with some words." for i in range(body_lines))
+    return (
+        "[提取了 0 张图片]\n\n"
+        "--- Page 1/3 ---\nA Study of Things\nAbstract\nWe study things.\n"
+        f"1 Introduction\n{filler}\n"
+        f"--- Page 2/3 ---\n2 Method\n{filler}\nThe learning rate is 0.01.\n"
+        f"2.1 Training Details\n{filler}\n"
+        f"--- Page 3/3 ---\n3 Results\n{filler}\nReferences\n[1] Someone. 2020.\n"
+    )
+
+
+class FakeLLMClient:
+    models = ["openai/fake-text"]
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def text_query(self, text, question, model=None):
+        with self.lock:
+            self.calls.append((text, question, model))
+        if question.startswith("上面是"):
+            return "merged: " + " | ".join(line for line in text.splitlines() if line.startswith("lr"))
+        if "learning rate" in text and "learning rate" in question:
+            return "lr = 0.01 (第 2 页)"
+        return NO_CONTENT + "。"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(paper_chunks, "load_tool_config", lambda: {
+        "paper_analyze": {"single_pass_tokens": 300, "chunk_tokens": 250}})
+    monkeypatch.setattr(paper_chunks, "get_cache_root", lambda: tmp_path / "cache")
+    monkeypatch.setattr(paper_chunks, "_cache_instance", None)
+    fake = FakeLLMClient()
+    monkeypatch.setattr(paper_tools, "get_llm_client", lambda: fake)
+    (tmp_path / "ws").mkdir()
+    (tmp_path / "ws" / "paper.md").write_text(_paper(), encoding="utf-8")
+    return tmp_path / "ws", fake
+
+
+@pytest.mark.unit
+def test_sections_follow_headings_and_page_markers():
+    sections = split_sections(_paper(body_lines=2))
+
+    assert [s["title"] for s in sections] == [
+        "", "Abstract", "1 Introduction", "2 Method", "2.1 Training Details", "3 Results", "References"]
+    method = sections[3]
+    assert (method["page_start"], method["page_end"]) == (2, 2)
+    assert method["text"].startswith("--- Page 2/3 ---\n2 Method")
+    assert "Sentence 1 about" not in sections[0]["text"]
+
+
+@pytest.mark.unit
+def test_chunks_respect_budget_and_split_oversized_sections():
+    chunks = plan_chunks(_paper(), chunk_tokens=250)
+
+    assert all(chunk["tokens"] <= 250 for chunk in chunks)
+    assert "".join(c["text"] for c in chunks).replace("\n", "") == _paper().replace("\n", "")
+    assert any("2 Method（续）" in c["label"] for c in chunks)
+    assert chunks[0]["label"].startswith("第 1 页")
+
+
+@pytest.mark.unit
+def test_map_reduce_fans_out_and_caches_per_question(client):
+    workspace, fake = client
+    question = "What learning rate is used?"
+
+    first = PaperAnalyzeTool().execute(str(workspace), {"paper_path": "paper.md", "question": question})
+    map_calls = [q for _, q, _ in fake.calls if q.startswith("这是一篇论文")]
+    fake.calls.clear()
+    again = PaperAnalyzeTool().execute(str(workspace), {"paper_path": "paper.md", "question": question + "  "})
+    other = PaperAnalyzeTool().execute(str(workspace), {"paper_path": "paper.md", "question": "Who are the authors?"})
+
+    assert first["status"] == "success", first["error"]
+    assert first["mode"] == "map_reduce" and first["chunks"] == len(map_calls) > 2
+    assert first["relevant_chunks"] == 1 and first["output"] == "lr = 0.01 (第 2 页)"
+    assert all(model == "openai/fake-text" for _, _, model in fake.calls)
+    assert again["output"] == first["output"] and again["llm_calls"] == 0
+    assert other["llm_calls"] == first["chunks"] and other["output"].startswith("论文中没有找到")
+
+
+@pytest.mark.unit
+def test_multiple_relevant_chunks_are_reduced(client, monkeypatch):
+    workspace, fake = client
+    monkeypatch.setattr(fake, "text_query", lambda text, question, model=None: (
+        fake.calls.append(question) or
+        ("merged answer" if question.startswith("上面是") else f"lr from {text.splitlines()[0][:12]}")))
+
+    result = PaperAnalyzeTool().execute(str(workspace), {"paper_path": "paper.md", "question": "lr?"})
+
+    reduce_calls = [q for q in fake.calls if q.startswith("上面是")]
+    assert result["output"] == "merged answer" and result["relevant_chunks"] == result["chunks"]
+    assert len(reduce_calls) >= 1 and result["llm_calls"] == result["chunks"] + len(reduce_calls)
@@ -0,0 +1,190 @@
+"""
+Tests for the cross-workspace paper store (tool_server_lite/tools/paper_store.py) and the
+file_download / arxiv_search / parse_document lookups that consult it.
+
+Run with: pytest tests/test_paper_store.py -v
+"""
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tool_server_lite.tools import paper_store
+from tool_server_lite.tools.arxiv_tools import ArxivSearchTool
+from tool_server_lite.tools.document_tools import ParseDocumentTool
+from tool_server_lite.tools.paper_store import PaperStore, identifiers_from_url, normalize_arxiv_id
+from tool_server_lite.tools.web_tools import FileDownloadTool
+
+
+PDF = b"%PDF-1.4\n" + os.urandom(20000) + b"\n%%EOF\n"
+
+
+class PdfHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(PDF)))
+        self.end_headers()
+        self.wfile.write(PDF)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PdfHandler)
+    httpd.requests = []
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    instance = PaperStore(tmp_path / "papers")
+    monkeypatch.setattr(paper_store, "_store_instance", instance)
+    return instance
+
+
+@pytest.mark.unit
+def test_identifier_normalization():
+    assert normalize_arxiv_id("arXiv:2401.01234V2") == "2401.01234v2"
+    assert normalize_arxiv_id("https://arxiv.org/pdf/hep-th/9901001v1.pdf") == "hep-th/9901001v1"
+    assert normalize_arxiv_id("transformers") is None
+    assert identifiers_from_url("http://ArXiv.org/abs/1706.03762#x") == {
+        "url": "https://arxiv.org/abs/1706.03762", "arxiv": "1706.03762"}
+    assert identifiers_from_url("https://doi.org/10.1145/ABC.123")["doi"] == "10.1145/abc.123"
+
+
+@pytest.mark.unit
+def test_second_workspace_download_links_from_store(server, store, tmp_path):
+    httpd, base = server
+    url = f"{base}/files/paper.pdf"
+    # arxiv_search registered this paper earlier; the download folds its metadata into the PDF entry
+    store.record_metadata({"arxiv": "2401.01234v1", "url": url}, {"title": "A Paper"}, bib="@article{a,\n}")
+    (tmp_path / "ws1").mkdir()
+    (tmp_path / "ws2").mkdir()
+
+    first = FileDownloadTool().execute(str(tmp_path / "ws1"), {"url": url, "save_path": "p.pdf"})
+    second = FileDownloadTool().execute(str(tmp_path / "ws2"), {"url": url, "save_path": "upload/p.pdf"})
+
+    assert first["status"] == "success" and second["status"] == "success", second["error"]
+    assert httpd.requests == ["/files/paper.pdf"]
+    assert "from shared paper store" in second["output"]
+    assert (tmp_path / "ws2" / "upload" / "p.pdf").read_bytes() == PDF
+    entry = store.lookup(arxiv_id="2401.01234")
+    assert entry["has_pdf"] and entry["metadata"]["title"] == "A Paper" and entry["bib"].startswith("@article")
+    assert store.stats()["entries"] == 1
+    # The workspace copy that was downloaded stays independent of the store
+    assert os.stat(tmp_path / "ws1" / "p.pdf").st_ino != os.stat(store.path(entry["id"], "paper.pdf")).st_ino
+
+
+@pytest.mark.unit
+def test_download_succeeds_when_store_write_fails(server, store, tmp_path, monkeypatch):
+    _, base = server
+    monkeypatch.setattr(store, "add_pdf", lambda *args: (_ for _ in ()).throw(OSError(28, "No space left")))
+
+    result = FileDownloadTool().execute(str(tmp_path), {"urls": [f"{base}/a.pdf"], "save_path": "dl"})
+
+    assert result["status"] == "success" and "[OK]" in result["output"], result["error"]
+    assert (tmp_path / "dl" / "a.pdf").read_bytes() == PDF
+
+
+@pytest.mark.unit
+def test_size_cap_evicts_least_recently_used(tmp_path):
+    store = PaperStore(tmp_path / "papers", max_bytes=50000)
+    pdfs = []
+    for i in range(3):
+        pdf = tmp_path / f"{i}.pdf"
+        pdf.write_bytes(b"%PDF-1.4\n" + bytes([i]) * 20000)
+        pdfs.append(pdf)
+
+    first = store.add_pdf(pdfs[0], {"doi": "10.1000/first"})
+    store.add_pdf(pdfs[1])
+    second = paper_store.file_sha256(pdfs[1])
+    store._atimes.update({first: 1, second: 2})
+    os.utime(store.path(second, "meta.json"), (2, 2))
+    assert store.lookup(doi="https://doi.org/10.1000/FIRST") is not None   # touching refreshes recency
+    store.add_pdf(pdfs[2])
+
+    assert store.stats()["evictions"] == 1
+    assert store.lookup(sha256=second) is None
+    assert store.lookup(doi="10.1000/first") is not None
+    # A fresh instance rebuilds the index and aliases from disk
+    assert PaperStore(tmp_path / "papers").lookup(doi="10.1000/first")["id"] == first
+
+
+@pytest.mark.unit
+def test_eviction_skipped_under_budget_and_uses_in_memory_recency(tmp_path, monkeypatch):
+    store = PaperStore(tmp_path / "papers", max_bytes=10 ** 9)
+    monkeypatch.setattr(store, "_atime", lambda entry_id: pytest.fail("sorted while under budget"))
+
+    for i in range(20):
+        store.record_metadata({"arxiv": f"2401.{i:05d}"}, {"title": f"Paper {i}"})
+
+    monkeypatch.undo()
+    ids = list(store._atimes)
+    # On-disk mtimes say the opposite; eviction follows the in-memory access times
+    for rank, entry_id in enumerate(ids):
+        os.utime(store.path(entry_id, "meta.json"), (rank, rank))
+        store._atimes[entry_id] = 100 - rank
+    store.max_bytes = store.stats()["bytes"]
+    store.record_metadata({"arxiv": "2401.99999"}, {"title": "Newest"})
+
+    assert store.stats()["evictions"] == 1 and store.lookup(arxiv_id=f"2401.{19:05d}") is None
+
+
+@pytest.mark.unit
+def test_incomplete_entries_removed_only_after_grace_period(tmp_path):
+    entries = tmp_path / "papers" / "entries"
+    fresh, stale = entries / "being-written", entries / "abandoned"
+    for path in (fresh, stale):
+        path.mkdir(parents=True)
+        (path / "paper.pdf").write_bytes(b"%PDF-1.4\n")
+    old = time.time() - paper_store.INCOMPLETE_GRACE_SECONDS - 60
+    os.utime(stale, (old, old))
+
+    assert PaperStore(tmp_path / "papers").stats()["entries"] == 0
+
+    assert fresh.exists() and not stale.exists()
+
+
+@pytest.mark.unit
+def test_parse_document_reuses_stored_text_and_images(store, tmp_path, monkeypatch):
+    pymupdf = pytest.importorskip("pymupdf")
+    pytest.importorskip("pdfplumber")
+    for name in ("ws1", "ws2"):
+        (tmp_path / name).mkdir()
+    doc = pymupdf.open()
+    doc.new_page().insert_text((72, 72), "Shared paper body")
+    doc.save(tmp_path / "ws1" / "paper.pdf")
+    (tmp_path / "ws2" / "copy.pdf").write_bytes((tmp_path / "ws1" / "paper.pdf").read_bytes())
+
+    first = ParseDocumentTool().execute(str(tmp_path / "ws1"), {"path": "paper.pdf", "save_path": "a/out.txt"})
+    monkeypatch.setattr(ParseDocumentTool, "_parse_pdf", lambda *args: pytest.fail("parsed again"))
+    second = ParseDocumentTool().execute(str(tmp_path / "ws2"), {"path": "copy.pdf", "save_path": "b/out.txt"})
+
+    assert first["status"] == "success" and second["status"] == "success", second["error"]
+    assert "Shared paper body" in (tmp_path / "ws2" / "b" / "out.txt").read_text(encoding="utf-8")
+    assert store.stats()["pdfs"] == 1
+
+
+@pytest.mark.unit
+def test_arxiv_id_query_served_from_store(store):
+    paper = {"title": "Stored Title", "authors": ["Ada Lovelace"], "published": "2024-01-02",
+             "updated": "2024-01-03", "arxiv_id": "2401.01234v1", "pdf_url": "http://arxiv.org/pdf/2401.01234v1",
+             "categories": ["cs.LG"], "abstract": "Cached abstract."}
+    store.record_metadata({"arxiv": paper["arxiv_id"], "url": paper["pdf_url"]}, paper)
+
+    result = ArxivSearchTool().execute("unused", {"query": "arXiv:2401.01234"})
+
+    if result["error"] == "arxiv not installed. Run: pip install arxiv":
+        pytest.skip("arxiv not installed")
+    assert result["status"] == "success", result["error"]
+    assert "## 1. Stored Title" in result["output"] and "**Authors**: Ada Lovelace" in result["output"]
+    assert "Local PDF" not in result["output"]
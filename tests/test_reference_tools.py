@@ -0,0 +1,135 @@
+"""
+Tests for the indexed BibTeX store behind the reference tools (tool_server_lite/tools/bib_store.py).
+
+Run with: pytest tests/test_reference_tools.py -v
+"""
+
+import pytest
+
+from tool_server_lite.tools import reference_tools
+from tool_server_lite.tools.bib_store import BibStore, parse_fields, scan_entries
+from tool_server_lite.tools.reference_tools import (
+    ReferenceAddTool, ReferenceDeleteTool, ReferenceListTool, ReferenceSearchTool
+)
+
+
+BIB = """% exported from Zotero
+@string{icml = "International Conference on Machine Learning"}
+
+@article{vaswani2017attention,
+  title={Attention Is All You Need},
+  author={Vaswani, Ashish and Shazeer, Noam},
+  journal={NeurIPS},
+  year={2017}
+}
+
+@inproceedings{he2016deep,
+  title = {Deep Residual Learning for {Image} Recognition},
+  author = "He, Kaiming and Zhang, {X}iangyu",
+  booktitle = icml # " 2016",
+  year = 2016,
+}
+
+@misc(sun2023blockchain,
+  title={区块链技术, 供应链网络与数据共享: {基于{演化}博弈}视角},
+  author={孙国强},
+  year={2023}
+)
+"""
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(reference_tools, "get_cache_root", lambda: tmp_path / "cache")
+    (tmp_path / "ws").mkdir()
+    (tmp_path / "ws" / "reference.bib").write_text(BIB, encoding="utf-8")
+    return tmp_path / "ws"
+
+
+@pytest.mark.unit
+def test_parser_handles_nested_braces_strings_and_parens():
+    raw = BIB.encode("utf-8")
+    entries = list(scan_entries(raw))
+
+    assert [(e["type"], e["key"]) for e in entries] == [
+        ("string", None), ("article", "vaswani2017attention"),
+        ("inproceedings", "he2016deep"), ("misc", "sun2023blockchain")]
+    he = parse_fields(raw[entries[2]["start"]:entries[2]["end"]].decode("utf-8"))
+    assert he["title"] == "Deep Residual Learning for {Image} Recognition"
+    assert he["author"] == "He, Kaiming and Zhang, {X}iangyu"
+    assert he["booktitle"] == "icml 2016" and he["year"] == "2016"
+    sun = raw[entries[3]["start"]:entries[3]["end"]].decode("utf-8")
+    assert sun.endswith("year={2023}\n)")
+    assert parse_fields(sun)["title"] == "区块链技术, 供应链网络与数据共享: {基于{演化}博弈}视角"
+
+
+@pytest.mark.unit
+def test_paren_entry_with_parentheses_in_fields(workspace):
+    bib = workspace / "reference.bib"
+    paren = ('@inproceedings(p2,\n  title = "Paren (in) title",\n  booktitle = {Proc. (ACL)},\n'
+             '  note = "unbalanced ) inside \\"quotes\\"",\n  year = 2020\n)\n')
+    bib.write_text(BIB + "\n" + paren + "\n@misc{after,\n  title={After}\n}\n", encoding="utf-8")
+
+    raw = bib.read_bytes()
+    p2 = [e for e in scan_entries(raw) if e["key"] == "p2"][0]
+    fields = parse_fields(raw[p2["start"]:p2["end"]].decode("utf-8"))
+    deleted = ReferenceDeleteTool().execute(str(workspace), {"keys": ["p2"]})
+
+    assert raw[p2["start"]:p2["end"]].decode("utf-8") == paren.rstrip("\n")
+    assert fields["title"] == "Paren (in) title" and fields["booktitle"] == "Proc. (ACL)"
+    assert fields["year"] == "2020"
+    assert deleted["status"] == "success", deleted["error"]
+    text = bib.read_text(encoding="utf-8")
+    assert "Paren" not in text and "booktitle = {Proc." not in text and "@misc{after" in text
+
+
+@pytest.mark.unit
+def test_add_replace_delete_update_index_incrementally(workspace, monkeypatch):
+    bib = workspace / "reference.bib"
+    ReferenceListTool().execute(str(workspace), {})  # builds the index
+
+    # After the first build, writes must not rescan the whole file
+    monkeypatch.setattr(BibStore, "_build_index", lambda self: pytest.fail("index rebuilt"))
+    added = ReferenceAddTool().execute(str(workspace), {"entries": [
+        "@article{new2024,\n  title={A {Nested {Deep}} Title},\n  author={Doe, J.},\n  year={2024}\n}",
+        "@article{vaswani2017attention,\n  title={Attention Is All You Need (v2)},\n  year={2017}\n}",
+    ]})
+    deleted = ReferenceDeleteTool().execute(str(workspace), {"keys": ["he2016deep", "missing"]})
+
+    assert added["output"] == "成功添加 1 条新参考文献\n覆盖了 1 条已存在的参考文献: vaswani2017attention"
+    assert "未找到: missing" in deleted["output"] and "剩余 3 条参考文献" in deleted["output"]
+    text = bib.read_text(encoding="utf-8")
+    assert "he2016deep" not in text and "@string{icml" in text
+    assert text.endswith("  year={2024}\n}\n")
+
+    store = reference_tools.open_bib_store(str(workspace), "reference.bib")
+    for entry in store.entries():
+        assert store.read(entry).startswith("@") and entry["key"] in store.read(entry)
+    # The persisted index matches a fresh parse of the rewritten file
+    monkeypatch.undo()
+    fresh = BibStore(bib)._build_index()
+    assert store.entries() == fresh
+    assert [e["title"] for e in fresh][:1] == ["Attention Is All You Need (v2)"]
+
+
+@pytest.mark.unit
+def test_paginated_list_and_search(workspace):
+    many = [f"@article{{paper{i:03d},\n  title={{Study number {i}}},\n  author={{Author {i} and Other}},\n"
+            f"  year={{{2000 + i % 20}}}\n}}" for i in range(45)]
+    ReferenceAddTool().execute(str(workspace), {"entries": many})
+
+    page = ReferenceListTool().execute(str(workspace), {"page": 2, "page_size": 20})
+    by_title = ReferenceSearchTool().execute(str(workspace), {"query": "attention is all you need"})
+    by_field = ReferenceSearchTool().execute(str(workspace), {"field": "year", "value": "2016"})
+    by_key = ReferenceSearchTool().execute(str(workspace), {"key": "sun2023blockchain", "raw": True})
+    by_booktitle = ReferenceSearchTool().execute(str(workspace), {"field": "booktitle", "value": "2016"})
+
+    lines = page["output"].splitlines()
+    assert lines[0] == "[共 48 条参考文献，第 2/3 页，每页 20 条]"
+    assert lines[2].startswith("21. paper017 — Author 17 et al. (2017) Study number 17")
+    assert len(lines) == 22
+    assert by_title["output"].splitlines()[1].startswith("vaswani2017attention — Vaswani, Ashish et al. (2017)")
+    assert {line.split(" — ")[0] for line in by_field["output"].splitlines()[1:]} == {
+        "he2016deep", "paper016", "paper036"}
+    assert "@misc(sun2023blockchain" in by_key["output"]
+    assert by_booktitle["output"].splitlines()[1].startswith("he2016deep")
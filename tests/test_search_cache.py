@@ -0,0 +1,148 @@
+"""
+Tests for the shared search result cache (tool_server_lite/tools/search_cache.py).
+
+Run with: pytest tests/test_search_cache.py -v
+"""
+
+import time
+
+import pytest
+
+from tool_server_lite.tools import arxiv_tools
+from tool_server_lite.tools import search_cache as search_cache_module
+from tool_server_lite.tools import web_tools
+from tool_server_lite.tools.disk_cache import DiskCache
+from tool_server_lite.tools.search_cache import make_search_key, normalize_query
+
+
+class StubWebSearchTool(web_tools.WebSearchTool):
+    """WebSearchTool with a local stub provider instead of DuckDuckGo"""
+
+    def __init__(self):
+        self.calls = []
+
+    def _search(self, query, max_results):
+        self.calls.append((query, max_results))
+        return [
+            {"title": f"Result {i} for {query}", "href": f"https://example.com/{i}", "body": "snippet"}
+            for i in range(max_results)
+        ]
+
+
+class StubArxivSearchTool(arxiv_tools.ArxivSearchTool):
+    """ArxivSearchTool that formats canned papers instead of calling the API"""
+
+    def __init__(self):
+        self.calls = []
+
+    def _search(self, query, max_results, sort_by_str, sort_order_str):
+        self.calls.append(query)
+        papers = [{"title": f"Paper for {query}", "authors": ["A. Author"], "published": "2024-01-01",
+                   "updated": "2024-01-01", "arxiv_id": "2401.00001v1", "pdf_url": "http://arxiv.org/pdf/x",
+                   "categories": ["cs.LG"], "abstract": "abstract"}]
+        return self._format(query, papers, sort_by_str, sort_order_str)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path / "search", ttl=60, max_entries=10)
+    monkeypatch.setattr(search_cache_module, "_cache_instance", cache)
+    monkeypatch.setattr(web_tools, "DDGS_AVAILABLE", True)
+    return cache
+
+
+@pytest.mark.unit
+def test_normalize_query():
+    assert normalize_query("  Transformer   Neural\tNetwork ") == "Transformer Neural Network"
+    assert normalize_query("  Transformer   Neural\tNetwork ", lowercase=True) == "transformer neural network"
+
+
+@pytest.mark.unit
+def test_search_key_is_normalised():
+    key1 = make_search_key("web_search", "Graph  Neural Networks", {"max_results": 5})
+    key2 = make_search_key("web_search", "graph neural networks ", {"max_results": 5})
+    key3 = make_search_key("web_search", "graph neural networks", {"max_results": 10})
+    key4 = make_search_key("arxiv_search", "graph neural networks", {"max_results": 5})
+    assert key1 == key2
+    assert key1 != key3
+    assert key1 != key4
+
+
+@pytest.mark.unit
+def test_boolean_operators_keep_case_for_arxiv_and_scholar():
+    for tool_name in ("arxiv_search", "google_scholar_search"):
+        assert make_search_key(tool_name, "A AND B", {}) != make_search_key(tool_name, "a and b", {})
+        assert make_search_key(tool_name, "A  AND B ", {}) == make_search_key(tool_name, "A AND B", {})
+
+
+@pytest.mark.unit
+def test_repeated_query_hits_cache(cache, tmp_path):
+    tool = StubWebSearchTool()
+
+    first = tool.execute(str(tmp_path), {"query": "LLM agents", "max_results": 3})
+    second = tool.execute(str(tmp_path), {"query": "llm  agents", "max_results": 3})
+
+    assert first["status"] == "success"
+    # The header is rendered with each caller's own query; the cached results are identical
+    assert first["output"].startswith("# Search Results: LLM agents\n")
+    assert second["output"].startswith("# Search Results: llm  agents\n")
+    assert second["output"].split("\n", 1)[1] == first["output"].split("\n", 1)[1]
+    assert len(tool.calls) == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+@pytest.mark.unit
+def test_cached_arxiv_result_shows_current_query(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(arxiv_tools, "ARXIV_AVAILABLE", True)
+    monkeypatch.setattr(arxiv_tools, "get_paper_store", lambda: None)
+    tool = StubArxivSearchTool()
+
+    first = tool.execute(str(tmp_path), {"query": "diffusion AND  models"})
+    second = tool.execute(str(tmp_path), {"query": "diffusion AND models"})
+    lowered = tool.execute(str(tmp_path), {"query": "diffusion and models"})
+
+    assert first["status"] == "success", first["error"]
+    assert tool.calls == ["diffusion AND  models", "diffusion and models"]
+    assert second["output"].startswith("# arXiv Search Results: diffusion AND models\n")
+    assert "## 1. Paper for diffusion AND  models" in second["output"]
+    assert lowered["output"].startswith("# arXiv Search Results: diffusion and models\n")
+
+
+@pytest.mark.unit
+def test_use_cache_false_refetches(cache, tmp_path):
+    tool = StubWebSearchTool()
+
+    tool.execute(str(tmp_path), {"query": "LLM agents", "max_results": 3})
+    tool.execute(str(tmp_path), {"query": "LLM agents", "max_results": 3, "use_cache": False})
+
+    assert len(tool.calls) == 2
+
+
+@pytest.mark.unit
+def test_ttl_expiry(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path, ttl=10)
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("k") is None
+
+
+@pytest.mark.unit
+def test_lru_eviction_and_persistence(tmp_path):
+    cache = DiskCache(tmp_path, ttl=None, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # a is now most recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    # A fresh instance over the same directory sees the persisted entries
+    reopened = DiskCache(tmp_path, ttl=None, max_entries=2)
+    assert reopened.get("a") == 1
+    assert reopened.get("c") == 3
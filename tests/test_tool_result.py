@@ -0,0 +1,80 @@
+"""
+Tests for the tool result envelope (utils/tool_result.py).
+
+Run with: pytest tests/test_tool_result.py -v
+"""
+
+import json
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from services.action_compressor import ActionCompressor
+from utils.tool_result import from_toolserver_data, render_tool_result, unwrap_legacy_result
+
+
+ROOT = Path(__file__).parent.parent
+
+
+def _recorded_tool_data():
+    """Raw toolServer results as produced by a short file_read / grep / execute_code session"""
+    source = (ROOT / "core" / "tool_executor.py").read_text(encoding="utf-8").splitlines()[:120]
+    file_read = json.dumps([{"line": i, "content": line} for i, line in enumerate(source, 1)],
+                           ensure_ascii=False, indent=2)
+    grep = "\n".join(f'core/agent_executor.py:{i}: self.action_history.append({{"tool_name": "x"}})'
+                     for i in range(1, 60))
+    log = "\n".join(f'epoch {i}: loss="{0.5 / i:.4f}" path="C:\\\\runs\\\\exp"' for i in range(1, 80))
+    return [
+        {"status": "success", "output": file_read, "error": ""},
+        {"status": "success", "output": grep, "error": ""},
+        {"status": "success", "output": log, "error": "", "exit_code": 0},
+    ]
+
+
+def _legacy(data):
+    """Result as stored by the old ToolExecutor: the whole tool dict json.dumps'ed into output"""
+    return {"status": "success", "output": json.dumps(data, indent=2, ensure_ascii=False),
+            "error_information": ""}
+
+
+@pytest.mark.unit
+def test_from_toolserver_data_keeps_raw_output_and_metadata():
+    result = from_toolserver_data({"status": "success", "output": 'say "hi"', "error": "", "exit_code": 0})
+
+    assert result == {"status": "success", "output": 'say "hi"', "error_information": "",
+                      "metadata": {"exit_code": 0}}
+    failed = from_toolserver_data({"status": "error", "output": "", "error": "boom"}, status="error", error="x")
+    assert failed["error_information"] == "x"
+
+
+@pytest.mark.unit
+def test_render_is_unescaped():
+    text = render_tool_result(from_toolserver_data({"status": "success", "output": 'a "b"\n\tc', "error": ""}))
+
+    assert text == 'status: success\noutput:\na "b"\n\tc'
+
+
+@pytest.mark.unit
+def test_legacy_results_render_like_envelopes():
+    for data in _recorded_tool_data():
+        legacy = _legacy(data)
+        legacy["_compressed"] = True
+        envelope = from_toolserver_data(data, status="success")
+        envelope["_compressed"] = True
+
+        assert unwrap_legacy_result(legacy) == envelope
+        assert render_tool_result(legacy) == render_tool_result(envelope)
+
+
+@pytest.mark.unit
+def test_rendered_trajectory_uses_fewer_tokens():
+    compressor = ActionCompressor(MagicMock())
+    before, after = [], []
+    for data in _recorded_tool_data():
+        # Old pipeline: ContextBuilder json.dumps'ed the already json.dumps'ed result
+        before.append(compressor.count_tokens(json.dumps(_legacy(data), ensure_ascii=False, indent=2)))
+        after.append(compressor.count_tokens(render_tool_result(from_toolserver_data(data, status="success"))))
+
+    assert all(0 < new < old for old, new in zip(before, after))
+    assert sum(after) < sum(before) * 0.8
@@ -0,0 +1,149 @@
+"""
+Tests for VisionTool image preprocessing and answer cache (tool_server_lite/tools/image_prep.py).
+
+Run with: pytest tests/test_vision_tool.py -v
+"""
+
+import io
+import random
+
+import pytest
+
+PIL = pytest.importorskip("PIL")
+from PIL import Image
+
+from tool_server_lite.tools import image_prep, vision_tools
+from tool_server_lite.tools.image_prep import prepare_image
+from tool_server_lite.tools.vision_tools import VisionTool, split_pack_answer
+
+
+class FakeLLMClient:
+    read_figure_models = ["openai/fake-vision"]
+
+    def __init__(self):
+        self.uploads = []
+        self.packs = []
+        self.pack_reply = None
+
+    def vision_query(self, image_path, question, model=None, image_bytes=None, mime_type=None):
+        self.uploads.append((model, len(image_bytes), mime_type))
+        return f"answer to {question}"
+
+    def vision_query_multi(self, images, prompt, model=None):
+        self.packs.append([label for label, _, _ in images])
+        if self.pack_reply is not None:
+            return self.pack_reply
+        return "\n".join(f"### 图片 {i}\npacked answer {i}" for i in range(1, len(images) + 1))
+
+
+def _noisy_png(path, size):
+    rng = random.Random(0)
+    img = Image.frombytes("RGB", size, bytes(rng.getrandbits(8) for _ in range(size[0] * size[1] * 3)))
+    img.save(path, format="PNG")
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_prep, "load_tool_config", lambda: {})
+    monkeypatch.setattr(image_prep, "get_cache_root", lambda: tmp_path / "cache")
+    monkeypatch.setattr(image_prep, "_cache_instance", None)
+    client = FakeLLMClient()
+    monkeypatch.setattr(vision_tools, "get_llm_client", lambda: client)
+    _noisy_png(tmp_path / "scan.png", (2400, 1200))
+    return tmp_path, client
+
+
+@pytest.mark.unit
+def test_large_image_downscaled_and_recompressed(workspace):
+    tmp_path, _ = workspace
+
+    image = prepare_image(tmp_path / "scan.png", max_edge=1000, fmt="jpeg", quality=80)
+
+    assert image["size"] == (1000, 500)
+    assert image["mime_type"] == "image/jpeg"
+    assert image["uploaded_bytes"] < image["original_bytes"] / 4
+    assert Image.open(io.BytesIO(image["data"])).size == (1000, 500)
+
+
+@pytest.mark.unit
+def test_small_image_uploaded_as_is(tmp_path):
+    Image.new("RGBA", (64, 32), (255, 0, 0, 128)).save(tmp_path / "icon.png")
+
+    image = prepare_image(tmp_path / "icon.png", max_edge=1568)
+
+    assert image["data"] == (tmp_path / "icon.png").read_bytes()
+    assert image["mime_type"] == "image/png"
+
+
+@pytest.mark.unit
+def test_repeat_question_served_from_cache(workspace):
+    tmp_path, client = workspace
+    params = {"image_path": "scan.png", "question": "What is shown?", "save_path": "out.txt"}
+
+    first = VisionTool().execute(str(tmp_path), params)
+    second = VisionTool().execute(str(tmp_path), params)
+    other = VisionTool().execute(str(tmp_path), dict(params, question="Any text?"))
+
+    assert first["status"] == "success", first["error"]
+    assert not first["cache_hit"] and 0 < first["uploaded_bytes"] < first["original_bytes"]
+    assert second["cache_hit"] and second["uploaded_bytes"] == 0
+    assert not other["cache_hit"]
+    assert len(client.uploads) == 2
+    assert (tmp_path / "out.txt").read_text(encoding="utf-8") == "answer to Any text?"
+    assert image_prep.vision_stats()["uploads"]["calls"] >= 2
+
+
+@pytest.fixture
+def figures(workspace):
+    tmp_path, client = workspace
+    (tmp_path / "figures").mkdir()
+    for i in range(3):
+        Image.new("RGB", (40, 30), (i * 80, 0, 0)).save(tmp_path / "figures" / f"fig{i}.png")
+    (tmp_path / "figures" / "notes.txt").write_text("not an image", encoding="utf-8")
+    return tmp_path, client
+
+
+@pytest.mark.unit
+def test_batch_glob_concurrent_report(figures):
+    tmp_path, client = figures
+
+    result = VisionTool().execute(str(tmp_path), {
+        "image_paths": ["figures/*.png", "missing.png"], "question": "Q", "save_path": "report.md"})
+    report = (tmp_path / "report.md").read_text(encoding="utf-8")
+
+    assert result["status"] == "success"
+    assert result["output"] == "结果保存在 report.md"
+    assert report.startswith("[分析 3/4 张图片；0 张命中缓存")
+    assert "==> figures/fig1.png <==\nanswer to Q" in report
+    assert "==> missing.png <== [error] 图片文件不存在" in report
+    assert set(result["images"]) == {"figures/fig0.png", "figures/fig1.png", "figures/fig2.png", "missing.png"}
+    assert len(client.uploads) == 3
+
+
+@pytest.mark.unit
+def test_batch_pack_mode_splits_answers(figures):
+    tmp_path, client = figures
+
+    result = VisionTool().execute(str(tmp_path), {"image_path": "figures", "question": "Q", "batch_mode": "pack"})
+
+    assert result["status"] == "success"
+    assert client.packs == [["图片 1:", "图片 2:", "图片 3:"]]
+    assert "==> figures/fig2.png <==\npacked answer 3" in result["output"]
+    assert not client.uploads
+
+    # Cached per image: a later single-image call hits the cache
+    single = VisionTool().execute(str(tmp_path), {"image_path": "figures/fig0.png", "question": "Q"})
+    assert single["cache_hit"] and single["output"] == "packed answer 1"
+
+
+@pytest.mark.unit
+def test_pack_falls_back_when_answer_cannot_be_split(figures):
+    tmp_path, client = figures
+    client.pack_reply = "All three figures show red rectangles."
+
+    result = VisionTool().execute(str(tmp_path), {"image_path": "figures/*.png", "batch_mode": "pack", "question": "Q"})
+
+    assert result["status"] == "success"
+    assert len(client.uploads) == 3
+    assert split_pack_answer("### 图片 1\na\n### 图片 2：\nb", 2) == ["a", "b"]
+    assert split_pack_answer("### 图片 2\nb", 2) is None
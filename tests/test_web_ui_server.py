@@ -0,0 +1,249 @@
+"""
+Tests for the web UI file endpoints (web_ui/server/server.py) through the Flask test client:
+directory listing (sort, pagination, ETag / 304, listing cache) and the streamed task ZIP download.
+
+Run with: pytest tests/test_web_ui_server.py -v
+"""
+
+import io
+import os
+import sys
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("flask_cors")
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "web_ui" / "server"))
+
+import server  # noqa: E402
+
+
+USERNAME = "alice"
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "WORKSPACE_ROOT", tmp_path)
+    monkeypatch.setattr(server, "file_list_cache", server.OrderedDict())
+    task = tmp_path / USERNAME / "task1"
+    (task / "src").mkdir(parents=True)
+    (task / "b.txt").write_bytes(b"x" * 300)
+    (task / "a.txt").write_bytes(b"x" * 10)
+    (task / "c.log").write_bytes(b"x" * 200)
+    (task / ".hidden").write_text("secret")
+    os.utime(task / "a.txt", (1000, 3000))
+    os.utime(task / "b.txt", (1000, 1000))
+    os.utime(task / "c.log", (1000, 2000))
+    return task
+
+
+@pytest.fixture
+def client(workspace):
+    server.app.config["TESTING"] = True
+    with server.app.test_client() as client:
+        with client.session_transaction() as sess:
+            sess["logged_in"] = True
+            sess["username"] = USERNAME
+        yield client
+
+
+def _list(client, query="", **headers):
+    return client.get(f"/api/files/list?path=task1{query}", headers=headers)
+
+
+def _names(response):
+    assert response.status_code == 200, response.get_json()
+    return [f["name"] for f in response.get_json()["files"]]
+
+
+@pytest.mark.unit
+def test_list_sorted_and_hidden_skipped(client):
+    assert _names(_list(client)) == ["a.txt", "b.txt", "c.log", "src"]
+    assert _names(_list(client, "&sort=size&order=desc")) == ["b.txt", "c.log", "a.txt", "src"]
+    assert _names(_list(client, "&sort=mtime")) == ["src", "b.txt", "c.log", "a.txt"]
+    assert _names(_list(client, "&sort=type")) == ["src", "a.txt", "b.txt", "c.log"]
+
+    entry = next(f for f in _list(client).get_json()["files"] if f["name"] == "b.txt")
+    assert entry["path"] == os.path.join("task1", "b.txt")
+    assert entry["type"] == "file" and entry["size"] == 300 and entry["mtime"] == 1000
+    assert _list(client, "&sort=color").status_code == 400
+    assert _list(client, "&order=up").status_code == 400
+
+
+@pytest.mark.unit
+def test_list_pagination(client):
+    first = _list(client, "&page_size=3").get_json()
+    second = _list(client, "&page=2&page_size=3").get_json()
+
+    assert [f["name"] for f in first["files"]] == ["a.txt", "b.txt", "c.log"]
+    assert [f["name"] for f in second["files"]] == ["src"]
+    assert first["total"] == second["total"] == 4
+    assert (second["page"], second["page_size"]) == (2, 3)
+    assert _names(_list(client, "&page=3&page_size=3")) == []
+    assert "page" not in _list(client).get_json()
+    assert _list(client, "&page=x").status_code == 400
+
+
+@pytest.mark.unit
+def test_list_not_modified_with_matching_etag(client, workspace):
+    first = _list(client)
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    again = _list(client, **{"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+    assert again.headers["ETag"] == etag
+
+    # ETag 随排序/分页参数变化
+    assert _list(client, "&sort=size", **{"If-None-Match": etag}).status_code == 200
+    # 目录内容变化后 ETag 失效
+    (workspace / "d.txt").write_text("new")
+    changed = _list(client, **{"If-None-Match": etag})
+    assert changed.status_code == 200 and "d.txt" in _names(changed)
+    assert changed.headers["ETag"] != etag
+
+
+@pytest.mark.unit
+def test_listing_cache_invalidated_by_directory_change_and_ttl(workspace, monkeypatch):
+    path = str(workspace)
+    listing = server.scan_directory(path)
+    assert server.scan_directory(path) is listing    # 目录未变化：命中缓存
+
+    # 新增/删除条目改变目录 mtime，立即重新扫描
+    (workspace / "a.txt").unlink()
+    rescanned = server.scan_directory(path)
+    assert rescanned is not listing
+    assert [e["name"] for e in rescanned["entries"]] == ["b.txt", "c.log", "src"]
+
+    # 仅文件内容变化不影响目录 mtime，TTL 过期后刷新
+    (workspace / "b.txt").write_bytes(b"x" * 5)
+    assert server.scan_directory(path) is rescanned
+    monkeypatch.setattr(server, "FILE_LIST_CACHE_TTL", 0)
+    refreshed = server.scan_directory(path)
+    assert next(e for e in refreshed["entries"] if e["name"] == "b.txt")["size"] == 5
+    assert refreshed["signature"] != rescanned["signature"]
+
+
+@pytest.mark.unit
+def test_listing_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "file_list_cache", server.OrderedDict())
+    monkeypatch.setattr(server, "FILE_LIST_CACHE_MAX", 2)
+    dirs = []
+    for name in ("one", "two", "three"):
+        (tmp_path / name).mkdir()
+        dirs.append(str(tmp_path / name))
+        server.scan_directory(dirs[-1])
+
+    assert list(server.file_list_cache) == dirs[1:]
+
+
+def _zip_entries(client, query=""):
+    response = client.get(f"/api/task/download?task_id=task1{query}")
+    assert response.status_code == 200, response.data[:200]
+    assert response.mimetype == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert archive.testzip() is None
+    return {info.filename: info for info in archive.infolist()}, archive
+
+
+@pytest.fixture
+def zip_task(workspace):
+    (workspace / "chat_history.json").write_text("[]")
+    (workspace / "figure.PNG").write_bytes(b"\x89PNG" + b"0" * 4000)
+    (workspace / "code_env" / "lib").mkdir(parents=True)
+    (workspace / "code_env" / "lib" / "site.py").write_text("x = 1")
+    (workspace / "myenv").mkdir()
+    (workspace / "myenv" / "pyvenv.cfg").write_text("home = /usr")
+    (workspace / "node_modules").mkdir()
+    (workspace / "node_modules" / "m.js").write_text("1")
+    (workspace / "__pycache__").mkdir()
+    (workspace / "__pycache__" / "a.cpython-311.pyc").write_bytes(b"\0")
+    (workspace / "old.pyc").write_bytes(b"\0")
+    return workspace
+
+
+@pytest.mark.unit
+def test_download_zip_contents(client, zip_task):
+    entries, archive = _zip_entries(client)
+
+    assert "chat_history.json" not in entries
+    assert "src/" in entries and entries["src/"].is_dir()    # 空目录保留为目录条目
+    assert {"a.txt", "b.txt", "c.log", ".hidden", "code_env/lib/site.py", "myenv/pyvenv.cfg",
+            "node_modules/m.js", "__pycache__/a.cpython-311.pyc", "old.pyc"} <= set(entries)
+    assert archive.read("b.txt") == b"x" * 300
+    assert entries["b.txt"].date_time == (1980, 1, 1, 0, 0, 0)    # 1980 年前的时间戳被截断而不是跳过文件
+    # 已压缩格式直接存储，其他文件 deflate
+    assert entries["figure.PNG"].compress_type == zipfile.ZIP_STORED
+    assert entries["b.txt"].compress_type == zipfile.ZIP_DEFLATED
+
+
+@pytest.mark.unit
+def test_download_zip_excludes(client, zip_task):
+    entries, _ = _zip_entries(client, "&exclude_env=true&exclude_cache=1")
+
+    assert not [name for name in entries if name.split("/")[0] in ("code_env", "myenv", "node_modules", "__pycache__")]
+    assert "old.pyc" not in entries
+    assert {"a.txt", "figure.PNG", "src/"} <= set(entries)
+
+    entries, _ = _zip_entries(client, "&exclude_cache=true")
+    assert "code_env/lib/site.py" in entries and "__pycache__/a.cpython-311.pyc" not in entries
+
+
+@pytest.mark.unit
+def test_zip_streamed_in_bounded_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "ZIP_CHUNK_SIZE", 64 * 1024)
+    task = tmp_path / "task"
+    task.mkdir()
+    payload = os.urandom(6 * 1024 * 1024)
+    (task / "data.bin").write_bytes(payload)
+    (task / "notes.txt").write_text("hello " * 1000)
+    out_path = tmp_path / "out.zip"
+
+    sizes = []
+    tracemalloc.start()
+    try:
+        with open(out_path, "wb") as out:
+            for chunk in server.iter_task_zip(task):
+                sizes.append(len(chunk))
+                out.write(chunk)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # 每次产出不超过一个读块（加少量头部），内存峰值与文件大小无关
+    assert len(sizes) > 90 and max(sizes) < 64 * 1024 + 4096
+    assert peak < 1024 * 1024
+    with zipfile.ZipFile(out_path) as archive:
+        assert archive.read("data.bin") == payload
+        assert archive.read("notes.txt") == b"hello " * 1000
+
+
+@pytest.mark.unit
+def test_zip_error_mid_stream_is_logged_and_aborts(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(server, "ZIP_CHUNK_SIZE", 1024)
+    task = tmp_path / "task"
+    task.mkdir()
+    (task / "data.bin").write_bytes(os.urandom(4096))
+
+    class FailingFile(io.BytesIO):
+        def read(self, size=-1):
+            if self.tell() >= 1024:
+                raise OSError("device went away")
+            return super().read(size)
+
+    monkeypatch.setattr(server, "open", lambda path, mode: FailingFile(Path(path).read_bytes()), raising=False)
+
+    received = b""
+    with pytest.raises(OSError, match="device went away"):
+        for chunk in server.iter_task_zip(task):
+            received += chunk
+
+    assert received    # 出错前已经发出了部分数据
+    assert "Task download error" in capsys.readouterr().out
+    # 中止而不是补上中央目录正常结束
+    with pytest.raises(zipfile.BadZipFile):
+        zipfile.ZipFile(io.BytesIO(received))
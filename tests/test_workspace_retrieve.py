@@ -0,0 +1,197 @@
+"""
+Tests for the workspace passage index (tool_server_lite/tools/workspace_index.py) and the
+workspace_retrieve tool built on it.
+
+Run with: pytest tests/test_workspace_retrieve.py -v
+"""
+
+import os
+import random
+import time
+
+import pytest
+
+from tool_server_lite.tools import workspace_index
+from tool_server_lite.tools.retrieve_tools import WorkspaceRetrieveTool
+from tool_server_lite.tools.workspace_index import (
+    EmbeddingBackend, get_workspace_index, register_embedding_backend, split_passages, tokenize)
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    config = {}
+    monkeypatch.setattr(workspace_index, "load_tool_config", lambda: {"workspace_retrieve": config})
+    monkeypatch.setattr(workspace_index, "get_cache_root", lambda: tmp_path / "cache")
+    monkeypatch.setattr(workspace_index, "_indexes", workspace_index.OrderedDict())
+    ws = tmp_path / "ws"
+    (ws / "notes").mkdir(parents=True)
+    (ws / "code_env").mkdir()
+    (ws / "notes" / "method.md").write_text(
+        "# Method\n\nWe train with AdamW.\nThe learning rate warmup lasts 500 steps.\n\n"
+        "# Data\n\nImages are resized to 224 pixels.\n", encoding="utf-8")
+    (ws / "intro.tex").write_text("\\section{Introduction}\n扩散模型在图像生成中表现出色。\n", encoding="utf-8")
+    (ws / "code_env" / "skip.md").write_text("learning rate warmup", encoding="utf-8")
+    return ws, config
+
+
+def _retrieve(ws, **params):
+    return WorkspaceRetrieveTool().execute(str(ws), params)
+
+
+@pytest.mark.unit
+def test_passages_carry_line_anchors():
+    text = "a\n\n" + "\n".join(f"line {i} " + "x" * 30 for i in range(10)) + "\n\nlast"
+    passages = split_passages(text, passage_chars=200, max_lines=4)
+
+    assert [(start, end) for start, end, _ in passages] == [(1, 5), (6, 9), (10, 12), (14, 14)]
+    assert passages[0][2].startswith("a\nline 0") and passages[-1][2] == "last"
+    assert tokenize("The Learning-Rate 扩散模型") == ["learning", "rate", "扩散", "散模", "模型"]
+
+
+@pytest.mark.unit
+def test_anchors_follow_newlines_only(workspace):
+    ws, config = workspace
+    config["passage_chars"] = 20
+    # Form feeds come from PDF-extracted text; the CRLF file must number lines the same way
+    (ws / "paper.txt").write_text("page one intro\fpage two alpha\n\nbeta gamma target word\n", encoding="utf-8")
+    (ws / "crlf.txt").write_bytes(b"first line\r\n\r\nsecond crlf target\r\n")
+
+    result = _retrieve(ws, query="target alpha", top_k=5)
+
+    hits = {(hit["path"], hit["start_line"], hit["end_line"]) for hit in result["hits"]}
+    assert {("paper.txt", 1, 1), ("paper.txt", 3, 3), ("crlf.txt", 3, 3)} <= hits
+    assert "[1] " in result["output"] and "beta gamma target word" in result["output"]
+    assert "page one intro\fpage two alpha" in result["output"]
+    assert "second crlf target" in result["output"] and "\r" not in result["output"]
+
+
+@pytest.mark.unit
+def test_retrieve_returns_ranked_passages_with_anchors(workspace):
+    ws, config = workspace
+    config["passage_chars"] = 120
+
+    result = _retrieve(ws, query="learning rate warmup", top_k=2)
+    chinese = _retrieve(ws, query="扩散模型")
+    scoped = _retrieve(ws, query="learning rate", path="*.tex")
+
+    assert result["status"] == "success", result["error"]
+    assert result["output"].startswith("[1] notes/method.md:1-4 (score")
+    assert "warmup lasts 500 steps" in result["output"]
+    assert all(hit["path"] != "code_env/skip.md" for hit in result["hits"])
+    assert result["index_changes"] == {"added": 2, "updated": 0, "removed": 0, "unchanged": 0}
+    assert chinese["hits"][0] == {"path": "intro.tex", "start_line": 1, "end_line": 2}
+    assert scoped["output"] == "没有找到相关内容"
+
+
+@pytest.mark.unit
+def test_incremental_update_only_reindexes_changed_files(workspace, monkeypatch):
+    ws, _ = workspace
+    _retrieve(ws, query="warmup")
+    os.utime(ws / "intro.tex", ns=(1, 1))    # mtime only: content hash is unchanged
+    (ws / "notes" / "method.md").write_text("Batch size is 256.\n", encoding="utf-8")
+    (ws / "new.txt").write_text("Extra note on warmup schedules.\n", encoding="utf-8")
+
+    retokenized = []
+    original = workspace_index.split_passages
+    monkeypatch.setattr(workspace_index, "split_passages",
+                        lambda text, *a: retokenized.append(text) or original(text, *a))
+    result = _retrieve(ws, query="warmup")
+    (ws / "new.txt").unlink()
+    removed = _retrieve(ws, query="warmup")
+
+    assert result["index_changes"] == {"added": 1, "updated": 1, "removed": 0, "unchanged": 1}
+    assert len(retokenized) == 2
+    assert [hit["path"] for hit in result["hits"]] == ["new.txt"]
+    assert removed["index_changes"]["removed"] == 1 and removed["hits"] == []
+
+
+@pytest.mark.unit
+def test_index_persists_and_compacts(workspace, monkeypatch):
+    ws, _ = workspace
+    for i in range(6):
+        (ws / f"doc{i}.md").write_text(f"topic{i} shared words\n", encoding="utf-8")
+    index = get_workspace_index(ws)
+    index.refresh()
+    for i in range(4):
+        (ws / f"doc{i}.md").unlink()
+    index.refresh()    # 4 of 8 passages dead -> compaction renumbers everything
+
+    monkeypatch.setattr(workspace_index, "_indexes", workspace_index.OrderedDict())
+    reloaded = get_workspace_index(ws)
+    assert reloaded is not index and not reloaded.stats()["arrays_loaded"]
+    assert reloaded.refresh()["unchanged"] == 4 and not reloaded.stats()["arrays_loaded"]
+    assert [hit["path"] for hit in reloaded.search("topic5 shared")][0] == "doc5.md"
+    assert len(reloaded.alive) == 4 and "topic0" not in reloaded.vocab
+    assert reloaded.search("adamw")[0]["path"] == "notes/method.md"
+
+
+@pytest.mark.unit
+def test_touch_after_restart_keeps_persisted_index(workspace, monkeypatch):
+    ws, _ = workspace
+    get_workspace_index(ws).refresh()
+    monkeypatch.setattr(workspace_index, "_indexes", workspace_index.OrderedDict())
+    os.utime(ws / "notes" / "method.md", ns=(1, 1))    # mtime only, content unchanged
+
+    assert get_workspace_index(ws).refresh()["unchanged"] == 2
+    monkeypatch.setattr(workspace_index, "_indexes", workspace_index.OrderedDict())
+    assert get_workspace_index(ws).search("warmup")[0]["path"] == "notes/method.md"
+
+
+class KeywordBackend(EmbeddingBackend):
+    """Deterministic 'embedding' that maps synonyms onto the same axis."""
+
+    name = "keyword"
+    AXES = [("optimizer", "adamw"), ("pixels", "resolution"), ("diffusion", "扩散")]
+
+    def __init__(self, **_):
+        pass
+
+    def embed(self, texts):
+        return [[1.0 + sum(word in text.lower() for word in axis) for axis in self.AXES] for text in texts]
+
+
+@pytest.mark.unit
+def test_embedding_backend_fuses_with_bm25(workspace):
+    ws, config = workspace
+    register_embedding_backend("keyword", KeywordBackend)
+    config["embedding"] = {"backend": "keyword"}
+
+    result = _retrieve(ws, query="which optimizer", top_k=1)
+
+    assert result["status"] == "success", result["error"]
+    assert result["hits"][0]["path"] == "notes/method.md"
+    assert get_workspace_index(ws).dim == 3
+
+
+@pytest.mark.slow
+def test_benchmark_thousand_documents(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace_index, "load_tool_config", lambda: {})
+    monkeypatch.setattr(workspace_index, "get_cache_root", lambda: tmp_path / "cache")
+    monkeypatch.setattr(workspace_index, "_indexes", workspace_index.OrderedDict())
+    rng = random.Random(0)
+    words = [f"w{i}" for i in range(5000)]
+    ws = tmp_path / "ws"
+    for d in range(10):
+        (ws / f"dir{d}").mkdir(parents=True)
+        for i in range(100):
+            paragraphs = ["\n".join(" ".join(rng.choices(words, k=12)) for _ in range(6)) for _ in range(8)]
+            (ws / f"dir{d}" / f"doc{i}.md").write_text("\n\n".join(paragraphs), encoding="utf-8")
+
+    start = time.perf_counter()
+    index = get_workspace_index(ws)
+    index.refresh()
+    build = time.perf_counter() - start
+    (ws / "dir0" / "doc0.md").write_text("needle haystack\n", encoding="utf-8")
+    start = time.perf_counter()
+    changes = index.refresh()
+    incremental = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(20):
+        hits = index.search("needle w1 w2 w3", top_k=5)
+    query = (time.perf_counter() - start) / 20
+
+    print(f"\n1000 docs / {index.live_count} passages / {len(index.terms)} terms: "
+          f"build {build:.2f}s, incremental {incremental * 1000:.0f}ms, query {query * 1000:.1f}ms")
+    assert changes == {"added": 0, "updated": 1, "removed": 0, "unchanged": 999}
+    assert hits[0]["path"] == "dir0/doc0.md"
+    assert incremental < build and query < 1.0
@@ -9,10 +9,11 @@ import os
 import yaml
 import base64
 from pathlib import Path
-from typing import Optional
-from litellm import completion
+from typing import List, Optional, Tuple
 import litellm
 
+from llm_transport import get_llm_transport
+
 # 尝试导入 transcribe，如果不支持则使用替代方案
 try:
     from litellm import transcribe
@@ -73,12 +74,17 @@ class LLMClientLite:
         # 配置LiteLLM
         litellm.set_verbose = False
         litellm.drop_params = True
+        
+        # 共享传输层：连接池、限速、重试
+        self.transport = get_llm_transport()
     
     def vision_query(
         self,
         image_path: str,
         question: str = "请描述这张图片的内容",
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        image_bytes: Optional[bytes] = None,
+        mime_type: Optional[str] = None
     ) -> str:
         """
         调用Vision模型分析图片
@@ -87,6 +93,8 @@ class LLMClientLite:
             image_path: 图片文件路径（绝对路径）
             question: 要问的问题
             model: 模型名称，默认使用配置中的第一个可用模型
+            image_bytes: 预处理后的图片数据（可选，不传时读取 image_path 原文件）
+            mime_type: image_bytes 的 MIME 类型
             
         Returns:
             LLM的响应文本
@@ -101,36 +109,69 @@ class LLMClientLite:
             raise FileNotFoundError(f"图片文件不存在: {image_path}")
         
         # 读取并编码图片
-        with open(img_path, "rb") as image_file:
-            image_data = base64.b64encode(image_file.read()).decode('utf-8')
+        if image_bytes is None:
+            with open(img_path, "rb") as image_file:
+                image_bytes = image_file.read()
+        image_data = base64.b64encode(image_bytes).decode('utf-8')
         
         # 判断图片格式
-        suffix = img_path.suffix.lower()
-        mime_type_map = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp'
-        }
-        mime_type = mime_type_map.get(suffix, 'image/jpeg')
+        if mime_type is None:
+            suffix = img_path.suffix.lower()
+            mime_type_map = {
+                '.jpg': 'image/jpeg',
+                '.jpeg': 'image/jpeg',
+                '.png': 'image/png',
+                '.gif': 'image/gif',
+                '.webp': 'image/webp'
+            }
+            mime_type = mime_type_map.get(suffix, 'image/jpeg')
         
         # 构建Vision消息
-        messages = [{
-            "role": "user",
-            "content": [
-                {
-                    "type": "text",
-                    "text": question
-                },
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:{mime_type};base64,{image_data}"
-                    }
+        content = [
+            {
+                "type": "text",
+                "text": question
+            },
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:{mime_type};base64,{image_data}"
                 }
-            ]
-        }]
+            }
+        ]
+        return self._vision_completion(content, model)
+    
+    def vision_query_multi(
+        self,
+        images: List[Tuple[str, bytes, str]],
+        prompt: str,
+        model: Optional[str] = None
+    ) -> str:
+        """
+        在一次请求中发送多张图片（模型需支持多图输入）
+        
+        Args:
+            images: [(标签, 图片数据, MIME 类型)]，每张图片前插入一行标签文本
+            prompt: 放在所有图片之前的提示
+            model: 模型名称，默认使用配置中的第一个可用模型
+            
+        Returns:
+            LLM的响应文本
+        """
+        content = [{"type": "text", "text": prompt}]
+        for label, data, mime_type in images:
+            content.append({"type": "text", "text": label})
+            content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+                }
+            })
+        return self._vision_completion(content, model)
+    
+    def _vision_completion(self, content: list, model: Optional[str] = None) -> str:
+        """发送一条多模态 user 消息并返回响应文本"""
+        messages = [{"role": "user", "content": content}]
         
         # 选择模型
         if model is None:
@@ -138,7 +179,7 @@ class LLMClientLite:
         
         # 调用LLM
         try:
-            response = completion(
+            response = self.transport.completion(
                 model=model,
                 messages=messages,
                 temperature=self.temperature,
@@ -196,7 +237,9 @@ class LLMClientLite:
                 
                 print(f"[INFO] 调用 OpenRouter 图片生成: {model}")
                 
-                response = client.chat.completions.create(
+                response = self.transport.call(
+                    model,
+                    client.chat.completions.create,
                     model=model,
                     messages=[{"role": "user", "content": prompt}],
                     extra_body={"modalities": ["image", "text"]}
@@ -228,7 +271,7 @@ class LLMClientLite:
                 
                 print(f"[INFO] 调用官方 API 图片生成: {model}")
                 
-                response = image_generation(model=model, prompt=prompt)
+                response = self.transport.call(model, image_generation, model=model, prompt=prompt)
                 
                 # 解析响应
                 if response.data and len(response.data) > 0:
@@ -253,7 +296,8 @@ class LLMClientLite:
         self,
         audio_path: str,
         question: str = "请描述这段音频的内容",
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        transcript: Optional[str] = None
     ) -> str:
         """
         调用Audio模型分析音频
@@ -262,6 +306,7 @@ class LLMClientLite:
             audio_path: 音频文件路径（绝对路径）
             question: 要问的问题
             model: 模型名称，默认使用配置中的第一个可用模型
+            transcript: 已有的转录文本（可选，传入时跳过转录步骤）
             
         Returns:
             LLM的响应文本（包含转录内容和分析结果）
@@ -274,6 +319,58 @@ class LLMClientLite:
         1. 使用 Whisper API 将音频转录为文本
         2. 根据问题分析转录内容并返回结果
         """
+        # 选择模型
+        if model is None:
+            model = self.models[0]
+        
+        # 步骤1: 转录音频为文本
+        if transcript is None:
+            transcript = self.transcribe(audio_path)
+        transcript_text = transcript
+        
+        try:
+            # 步骤2: 对转录内容进行分析
+            messages = [{
+                "role": "user",
+                "content": f"以下是音频转录内容：\n\n{transcript_text}\n\n请回答以下问题：{question}"
+            }]
+            
+            response = self.transport.completion(
+                model=model,
+                messages=messages,
+                temperature=self.temperature,
+                api_key=self.api_key,
+                api_base=self.base_url
+            )
+            
+            # 提取响应
+            if response.choices and len(response.choices) > 0:
+                analysis_result = response.choices[0].message.content
+                
+                # 返回包含转录和分析的完整结果
+                return f"【音频转录】\n{transcript_text}\n\n【分析结果】\n{analysis_result}"
+            else:
+                raise Exception("LLM响应格式异常：缺少choices字段")
+                
+        except Exception as e:
+            raise Exception(f"调用音频分析API失败: {str(e)}")
+    
+    def transcribe(self, audio_path: str, model: str = "whisper-1") -> str:
+        """
+        使用 Whisper API 将音频转录为文本
+        
+        Args:
+            audio_path: 音频文件路径（绝对路径）
+            model: 转录模型
+            
+        Returns:
+            转录文本
+            
+        Raises:
+            FileNotFoundError: 音频文件不存在
+            ValueError: 不支持的音频格式
+            Exception: API 调用失败
+        """
         # 检查音频文件
         audio_file = Path(audio_path)
         if not audio_file.exists():
@@ -294,20 +391,15 @@ class LLMClientLite:
         if suffix not in supported_formats:
             raise ValueError(f"不支持的音频格式: {suffix}。支持的格式: {', '.join(supported_formats.keys())}")
         
-        # 选择模型
-        if model is None:
-            model = self.models[0]
-        
         try:
-            # 步骤1: 转录音频为文本
             print(f"📝 正在转录音频: {audio_path}")
             
-            transcript_text = ""
-            
             if HAS_TRANSCRIBE:
                 # 使用 litellm 的 transcribe 功能
-                transcript = litellm.transcribe(
-                    model="whisper-1",
+                transcript = self.transport.call(
+                    model,
+                    litellm.transcribe,
+                    model=model,
                     file=str(audio_file),
                     api_key=self.api_key,
                     api_base=self.base_url
@@ -325,7 +417,7 @@ class LLMClientLite:
                 # 使用 OpenAI 直接调用
                 with open(audio_file, "rb") as f:
                     transcript = openai.Audio.transcribe(
-                        "whisper-1",
+                        model,
                         f,
                         api_key=self.api_key,
                         api_base=self.base_url if self.base_url else None
@@ -334,34 +426,12 @@ class LLMClientLite:
             
             else:
                 raise Exception("未安装必要的库（litellm 或 openai）")
-            
-            print(f"✅ 转录完成，文本长度: {len(transcript_text)} 字符")
-            
-            # 步骤2: 对转录内容进行分析
-            messages = [{
-                "role": "user",
-                "content": f"以下是音频转录内容：\n\n{transcript_text}\n\n请回答以下问题：{question}"
-            }]
-            
-            response = completion(
-                model=model,
-                messages=messages,
-                temperature=self.temperature,
-                api_key=self.api_key,
-                api_base=self.base_url
-            )
-            
-            # 提取响应
-            if response.choices and len(response.choices) > 0:
-                analysis_result = response.choices[0].message.content
-                
-                # 返回包含转录和分析的完整结果
-                return f"【音频转录】\n{transcript_text}\n\n【分析结果】\n{analysis_result}"
-            else:
-                raise Exception("LLM响应格式异常：缺少choices字段")
-                
+        
         except Exception as e:
-            raise Exception(f"调用音频分析API失败: {str(e)}")
+            raise Exception(f"调用音频转录API失败: {str(e)}")
+        
+        print(f"✅ 转录完成，文本长度: {len(transcript_text)} 字符")
+        return transcript_text
     
     def text_query(
         self,
@@ -395,7 +465,7 @@ class LLMClientLite:
         
         # 调用LLM
         try:
-            response = completion(
+            response = self.transport.completion(
                 model=model,
                 messages=messages,
                 temperature=self.temperature,
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工具服务器 LLM 调用的共享传输层
+- keep-alive 连接池（所有 litellm 调用共享同一个 httpx.Client）
+- 每个模型的令牌桶限速（RPM）和并发上限
+- 限流/服务端错误时带抖动的指数退避，优先遵守 Retry-After
+统计信息通过 GET /api/llm/stats 查看
+"""
+
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+# 默认配置（可在 tool_config.yaml 的 llm_transport 段覆盖）
+DEFAULT_TRANSPORT_CONFIG = {
+    "max_retries": 4,           # 可重试错误的最大重试次数
+    "base_delay": 1.0,          # 退避基础时间（秒）
+    "max_delay": 60.0,          # 单次退避上限（秒）
+    "timeout": 600,             # 单次请求超时（秒）
+    "pool_connections": 20,     # keep-alive 连接池大小
+    "default_rpm": None,        # 每个模型的默认每分钟请求数，None 表示不限速
+    "default_concurrency": 4,   # 每个模型的默认并发上限
+    "models": {},               # 按模型覆盖：{模型名: {rpm, concurrency}}
+}
+
+# 这些 HTTP 状态码视为暂时性错误，可以重试
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+
+
+def _load_transport_config() -> Dict[str, Any]:
+    # 延迟导入：tools 包的 __init__ 经 llm_client_lite 间接导入本模块
+    from tools.tool_config import load_tool_config
+    config = dict(DEFAULT_TRANSPORT_CONFIG)
+    config.update(load_tool_config().get("llm_transport") or {})
+    return config
+
+
+class TokenBucket:
+    """令牌桶：按 rate（个/秒）补充，最多积累 capacity 个"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float):
+        """收到 Retry-After 后暂停发放令牌"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def acquire(self) -> float:
+        """阻塞直到拿到一个令牌，返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class ModelLimiter:
+    """单个模型的限速器、并发上限和统计"""
+
+    def __init__(self, model: str, rpm: Optional[float], concurrency: int):
+        self.model = model
+        self.rpm = rpm
+        self.concurrency = max(1, int(concurrency))
+        self.bucket = TokenBucket(rpm / 60.0, max(1.0, rpm / 60.0)) if rpm else None
+        self.slots = threading.BoundedSemaphore(self.concurrency)
+
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.wait_seconds = 0.0
+
+    def record(self, **deltas):
+        with self._lock:
+            for name, value in deltas.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rpm": self.rpm,
+                "concurrency": self.concurrency,
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "successes": self.successes,
+                "failures": self.failures,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "wait_seconds": round(self.wait_seconds, 2),
+            }
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """从异常携带的响应头中读取 Retry-After（秒）"""
+    headers = None
+    response = getattr(error, "response", None)
+    if response is not None:
+        headers = getattr(response, "headers", None)
+    if not headers:
+        headers = getattr(error, "litellm_response_headers", None)
+    if not headers:
+        return None
+
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return float(value) / 1000.0
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        # HTTP 日期格式
+        try:
+            from email.utils import parsedate_to_datetime
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except Exception:
+            return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """限流、超时、连接错误和 5xx 可以重试；参数错误、鉴权错误等不重试"""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    name = type(error).__name__
+    return any(key in name for key in ("RateLimit", "Timeout", "Connection", "ServiceUnavailable", "InternalServer"))
+
+
+class LLMTransport:
+    """工具服务器所有 LLM 调用共享的传输层（线程安全）"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = dict(DEFAULT_TRANSPORT_CONFIG)
+        self.config.update(config or {})
+        self._limiters: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+        self._http_client = None
+
+    def _limiter(self, model: str) -> ModelLimiter:
+        with self._lock:
+            if model not in self._limiters:
+                overrides = (self.config.get("models") or {}).get(model) or {}
+                self._limiters[model] = ModelLimiter(
+                    model,
+                    rpm=overrides.get("rpm", self.config["default_rpm"]),
+                    concurrency=overrides.get("concurrency", self.config["default_concurrency"])
+                )
+            return self._limiters[model]
+
+    def install_http_pool(self):
+        """让 litellm 复用同一个 keep-alive 连接池（幂等，httpx 不可用时跳过）"""
+        if self._http_client is not None:
+            return
+        try:
+            import httpx
+            import litellm
+        except ImportError:
+            return
+        with self._lock:
+            if self._http_client is not None:
+                return
+            size = self.config["pool_connections"]
+            self._http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+                timeout=self.config["timeout"]
+            )
+            litellm.client_session = self._http_client
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.config["max_delay"])
+        delay = min(self.config["base_delay"] * (2 ** attempt), self.config["max_delay"])
+        # full jitter，避免多个线程同时重试
+        return random.uniform(0, delay)
+
+    def call(self, model: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        通过限速器调用 fn(*args, **kwargs)，可重试错误自动退避重试
+
+        Args:
+            model: 用于限速和统计的模型名
+            fn: 实际的调用函数（如 litellm.completion）
+
+        Returns:
+            fn 的返回值
+
+        Raises:
+            最后一次调用的异常（不可重试或重试次数用尽）
+        """
+        limiter = self._limiter(model)
+        max_retries = self.config["max_retries"]
+
+        for attempt in range(max_retries + 1):
+            if limiter.bucket is not None:
+                limiter.record(wait_seconds=limiter.bucket.acquire())
+
+            started = time.monotonic()
+            limiter.slots.acquire()
+            limiter.record(in_flight=1, requests=1, wait_seconds=time.monotonic() - started)
+            try:
+                result = fn(*args, **kwargs)
+                limiter.record(successes=1)
+                return result
+            except Exception as e:
+                status = _status_code(e)
+                if status == 429 or "RateLimit" in type(e).__name__:
+                    limiter.record(rate_limited=1)
+                if attempt >= max_retries or not is_retryable(e):
+                    limiter.record(failures=1)
+                    raise
+                delay = self._backoff(attempt, e)
+                if limiter.bucket is not None and _retry_after(e) is not None:
+                    # 同一模型的其他请求也一起等待
+                    limiter.bucket.pause(delay)
+                limiter.record(retries=1)
+                last_error = e
+            finally:
+                limiter.record(in_flight=-1)
+                limiter.slots.release()
+
+            print(f"[WARN] {model} 调用失败，{delay:.1f}s 后重试 ({attempt + 1}/{max_retries}): {last_error}")
+            time.sleep(delay)
+
+    def completion(self, model: str, **kwargs) -> Any:
+        """litellm.completion 的限速/重试包装"""
+        from litellm import completion
+        self.install_http_pool()
+        return self.call(model, completion, model=model, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {
+            "pool_connections": self.config["pool_connections"],
+            "http_pool_installed": self._http_client is not None,
+            "max_retries": self.config["max_retries"],
+            "models": {limiter.model: limiter.stats() for limiter in limiters},
+        }
+
+
+# 全局单例（延迟初始化）
+_transport_instance: Optional[LLMTransport] = None
+
+
+def get_llm_transport() -> LLMTransport:
+    """获取 LLM 传输层单例"""
+    global _transport_instance
+    if _transport_instance is None:
+        _transport_instance = LLMTransport(_load_transport_config())
+    return _transport_instance
@@ -58,13 +58,22 @@ from tools import (
     CodeProcessManagerTool,
     ReferenceListTool,
     ReferenceAddTool,
-    ReferenceDeleteTool
+    ReferenceDeleteTool,
+    ReferenceSearchTool,
+    WorkspaceRetrieveTool
 )
 from tools.human_tools import (
     get_hil_status, respond_hil_task, list_hil_tasks, get_hil_task_for_workspace,
     create_tool_confirmation, get_tool_confirmation_status, respond_tool_confirmation,
     get_tool_confirmation_for_workspace, list_tool_confirmations
 )
+from tools.browser_pool import get_browser_pool, shutdown_browser_pool
+from tools.search_cache import get_search_cache
+from tools.image_prep import vision_stats
+from tools.audio_segments import get_transcript_cache
+from tools.paper_store import get_paper_store
+from tools.paper_chunks import get_paper_analyze_cache
+from llm_transport import get_llm_transport
 
 app = FastAPI(
     title="Tool Server Lite",
@@ -102,9 +111,29 @@ TOOLS = {
     "reference_list": ReferenceListTool(),
     "reference_add": ReferenceAddTool(),
     "reference_delete": ReferenceDeleteTool(),
+    "reference_search": ReferenceSearchTool(),
+    "workspace_retrieve": WorkspaceRetrieveTool(),
 }
 
 
+# ===== 生命周期 =====
+@app.on_event("startup")
+async def startup_browser_pool():
+    """创建共享浏览器池（preload 为 true 时立即启动浏览器）"""
+    pool = get_browser_pool()
+    if pool.config.get("preload"):
+        try:
+            await pool.start()
+        except Exception as e:
+            print(f"[WARN] 浏览器池预启动失败: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_browser_pool_hook():
+    """关闭共享浏览器池"""
+    await shutdown_browser_pool()
+
+
 # ===== 请求模型 =====
 class ToolExecuteRequest(BaseModel):
     """工具执行请求"""
@@ -147,6 +176,59 @@ async def get_tools():
     }
 
 
+@app.get("/api/browser-pool/stats")
+async def get_browser_pool_stats():
+    """浏览器池状态"""
+    return {
+        "success": True,
+        "data": get_browser_pool().stats()
+    }
+
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """共享缓存命中统计"""
+    search_cache = get_search_cache()
+    transcript_cache = get_transcript_cache()
+    paper_store = get_paper_store()
+    paper_analyze_cache = get_paper_analyze_cache()
+    return {
+        "success": True,
+        "data": {
+            "search": search_cache.stats() if search_cache else None,
+            "vision": vision_stats(),
+            "transcripts": transcript_cache.stats() if transcript_cache else None,
+            "papers": paper_store.stats() if paper_store else None,
+            "paper_analyze": paper_analyze_cache.stats() if paper_analyze_cache else None
+        }
+    }
+
+
+@app.get("/api/papers/lookup")
+async def lookup_paper(arxiv_id: Optional[str] = None, doi: Optional[str] = None,
+                       url: Optional[str] = None, sha256: Optional[str] = None):
+    """按 arXiv ID / DOI / URL / 内容哈希查询共享论文库"""
+    paper_store = get_paper_store()
+    if paper_store is None:
+        raise HTTPException(status_code=404, detail="Paper store disabled")
+    entry = paper_store.lookup(arxiv_id=arxiv_id, doi=doi, url=url, sha256=sha256)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    return {
+        "success": True,
+        "data": entry
+    }
+
+
+@app.get("/api/llm/stats")
+async def get_llm_stats():
+    """LLM 调用传输层统计（各模型并发、限流、重试次数）"""
+    return {
+        "success": True,
+        "data": get_llm_transport().stats()
+    }
+
+
 @app.get("/api/task/{task_id}/status")
 async def get_task_status(task_id: str):
     """
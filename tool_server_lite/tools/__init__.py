@@ -45,9 +45,12 @@ from .code_tools import (
 from .reference_tools import (
     ReferenceListTool,
     ReferenceAddTool,
-    ReferenceDeleteTool
+    ReferenceDeleteTool,
+    ReferenceSearchTool
 )
 
+from .retrieve_tools import WorkspaceRetrieveTool
+
 __all__ = [
     "FileReadTool",
     "FileWriteTool",
@@ -77,5 +80,7 @@ __all__ = [
     "ReferenceListTool",
     "ReferenceAddTool",
     "ReferenceDeleteTool",
+    "ReferenceSearchTool",
+    "WorkspaceRetrieveTool",
 ]
 
@@ -5,9 +5,11 @@ arXiv 搜索工具
 """
 
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List
 import re
 from .file_tools import BaseTool, get_abs_path
+from .search_cache import cached_search
+from .paper_store import get_paper_store, normalize_arxiv_id
 
 # arXiv 导入
 try:
@@ -17,6 +19,36 @@ except ImportError:
     ARXIV_AVAILABLE = False
 
 
+def parse_id_query(query: str) -> List[str]:
+    """查询词只由 arXiv ID 组成时（逗号或空白分隔）返回规范化后的 ID 列表，否则返回空列表"""
+    parts = [p for p in re.split(r'[\s,;]+', query.strip()) if p]
+    ids = [normalize_arxiv_id(p[3:] if p.lower().startswith("id:") else p) for p in parts]
+    return ids if ids and all(ids) else []
+
+
+def make_bibtex(paper: Dict[str, Any]) -> str:
+    """按 arXiv 元数据生成 BibTeX 条目（键为 第一作者姓 + 年份 + 标题首词）"""
+    first_author = (paper["authors"] or ["anonymous"])[0]
+    surname = re.sub(r'[^a-z]', '', first_author.split()[-1].lower()) or "anonymous"
+    title_word = next((w for w in re.findall(r'[a-z]+', paper["title"].lower()) if len(w) > 3), "paper")
+    year = paper["published"][:4]
+    base_id = re.sub(r'v\d+$', '', paper["arxiv_id"])
+    fields = [
+        ("title", paper["title"]),
+        ("author", " and ".join(paper["authors"])),
+        ("journal", f"arXiv preprint arXiv:{base_id}"),
+        ("year", year),
+        ("eprint", base_id),
+        ("archivePrefix", "arXiv"),
+    ]
+    if paper.get("primary_category"):
+        fields.append(("primaryClass", paper["primary_category"]))
+    if paper.get("doi"):
+        fields.append(("doi", paper["doi"]))
+    body = ",\n".join(f"  {name}={{{value}}}" for name, value in fields)
+    return f"@article{{{surname}{year}{title_word},\n{body}\n}}"
+
+
 class ArxivSearchTool(BaseTool):
     """arXiv 搜索工具"""
     
@@ -35,6 +67,7 @@ class ArxivSearchTool(BaseTool):
                 - "descending": 降序
                 - "ascending": 升序
             save_path (str, optional): 保存结果的相对路径（.md文件）
+            use_cache (bool, optional): 是否使用搜索结果缓存，默认True
         """
         try:
             if not ARXIV_AVAILABLE:
@@ -49,6 +82,7 @@ class ArxivSearchTool(BaseTool):
             sort_by_str = parameters.get("sort_by", "relevance")
             sort_order_str = parameters.get("sort_order", "descending")
             save_path = parameters.get("save_path")
+            use_cache = parameters.get("use_cache", True)
             
             if not query:
                 return {
@@ -57,58 +91,22 @@ class ArxivSearchTool(BaseTool):
                     "error": "query is required"
                 }
             
-            # 转换排序参数
-            sort_by_map = {
-                "relevance": arxiv.SortCriterion.Relevance,
-                "lastUpdatedDate": arxiv.SortCriterion.LastUpdatedDate,
-                "submittedDate": arxiv.SortCriterion.SubmittedDate
-            }
-            sort_order_map = {
-                "descending": arxiv.SortOrder.Descending,
-                "ascending": arxiv.SortOrder.Ascending
-            }
-            
-            sort_by = sort_by_map.get(sort_by_str, arxiv.SortCriterion.Relevance)
-            sort_order = sort_order_map.get(sort_order_str, arxiv.SortOrder.Descending)
-            
-            # 搜索 arXiv
-            client = arxiv.Client()
-            search = arxiv.Search(
-                query=query,
-                max_results=max_results,
-                sort_by=sort_by,
-                sort_order=sort_order
-            )
-            
-            results = list(client.results(search))
-            
-            # 格式化为 Markdown
-            results_md = []
-            results_md.append(f"# arXiv Search Results: {query}\n")
-            results_md.append(f"**Total**: {len(results)} papers\n")
-            results_md.append(f"**Sort By**: {sort_by_str}\n")
-            results_md.append(f"**Sort Order**: {sort_order_str}\n")
-            
-            for i, paper in enumerate(results, 1):
-                results_md.append(f"\n---\n")
-                results_md.append(f"## {i}. {paper.title}\n")
-                results_md.append(f"**Authors**: {', '.join([author.name for author in paper.authors])}\n")
-                results_md.append(f"**Published**: {paper.published.strftime('%Y-%m-%d')}\n")
-                results_md.append(f"**Updated**: {paper.updated.strftime('%Y-%m-%d')}\n")
-                results_md.append(f"**arXiv ID**: {paper.entry_id.split('/')[-1]}\n")
-                results_md.append(f"**PDF URL**: {paper.pdf_url}\n")
-                
-                # 分类
-                if paper.categories:
-                    results_md.append(f"**Categories**: {', '.join(paper.categories)}\n")
-                
-                # 摘要
-                results_md.append(f"\n**Abstract**:\n")
-                # 清理摘要中的多余空白
-                abstract = re.sub(r'\s+', ' ', paper.summary).strip()
-                results_md.append(f"{abstract}\n")
-            
-            results_text = '\n'.join(results_md)
+            id_list = parse_id_query(query)
+            if id_list:
+                # 按 ID 查询：共享论文库中都有元数据时不调用 API
+                results_text = self._lookup_ids(query, id_list, use_cache)
+            else:
+                # 搜索 arXiv（优先使用缓存）
+                results_text = cached_search(
+                    "arxiv_search",
+                    query,
+                    {"max_results": max_results, "sort_by": sort_by_str, "sort_order": sort_order_str},
+                    lambda: self._search(query, max_results, sort_by_str, sort_order_str),
+                    use_cache=use_cache
+                )
+                # 缓存的结果可能来自空白不同的查询，标题按本次查询重新生成
+                results_text = self._with_query_header(results_text, query)
+            results_text = self._mark_stored_pdfs(results_text)
             
             # 保存到文件
             if save_path:
@@ -143,3 +141,132 @@ class ArxivSearchTool(BaseTool):
                 "error": str(e)
             }
 
+    def _search(self, query: str, max_results: int, sort_by_str: str, sort_order_str: str) -> str:
+        """调用 arXiv API 搜索，返回 Markdown 格式的结果"""
+        # 转换排序参数
+        sort_by_map = {
+            "relevance": arxiv.SortCriterion.Relevance,
+            "lastUpdatedDate": arxiv.SortCriterion.LastUpdatedDate,
+            "submittedDate": arxiv.SortCriterion.SubmittedDate
+        }
+        sort_order_map = {
+            "descending": arxiv.SortOrder.Descending,
+            "ascending": arxiv.SortOrder.Ascending
+        }
+
+        sort_by = sort_by_map.get(sort_by_str, arxiv.SortCriterion.Relevance)
+        sort_order = sort_order_map.get(sort_order_str, arxiv.SortOrder.Descending)
+
+        # 搜索 arXiv
+        client = arxiv.Client()
+        search = arxiv.Search(
+            query=query,
+            max_results=max_results,
+            sort_by=sort_by,
+            sort_order=sort_order
+        )
+
+        papers = self._record([self._to_dict(r) for r in client.results(search)])
+        return self._format(query, papers, sort_by_str, sort_order_str)
+
+    def _lookup_ids(self, query: str, id_list: List[str], use_cache: bool) -> str:
+        """按 arXiv ID 取论文：先查共享论文库，缺少的再用 id_list 调用 API"""
+        store = get_paper_store()
+        papers = {}
+        if store is not None and use_cache:
+            for arxiv_id in id_list:
+                entry = store.lookup(arxiv_id=arxiv_id)
+                if entry and entry["metadata"].get("title"):
+                    papers[arxiv_id] = entry["metadata"]
+        missing = [arxiv_id for arxiv_id in id_list if arxiv_id not in papers]
+        if missing:
+            if not ARXIV_AVAILABLE:
+                raise Exception("arxiv not installed. Run: pip install arxiv")
+            client = arxiv.Client()
+            fetched = self._record([self._to_dict(r) for r in client.results(arxiv.Search(id_list=missing))])
+            for paper in fetched:
+                base_id = re.sub(r'v\d+$', '', paper["arxiv_id"])
+                for arxiv_id in missing:
+                    if arxiv_id in (paper["arxiv_id"], base_id):
+                        papers[arxiv_id] = paper
+        return self._format(query, [papers[i] for i in id_list if i in papers], "id", "-")
+
+    @staticmethod
+    def _to_dict(paper) -> Dict[str, Any]:
+        return {
+            "title": paper.title,
+            "authors": [author.name for author in paper.authors],
+            "published": paper.published.strftime('%Y-%m-%d'),
+            "updated": paper.updated.strftime('%Y-%m-%d'),
+            "arxiv_id": paper.entry_id.split('/')[-1],
+            "pdf_url": paper.pdf_url,
+            "doi": paper.doi,
+            "primary_category": paper.primary_category,
+            "categories": list(paper.categories or []),
+            # 清理摘要中的多余空白
+            "abstract": re.sub(r'\s+', ' ', paper.summary).strip(),
+        }
+
+    @staticmethod
+    def _record(papers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """把检索到的论文元数据和 BibTeX 登记到共享论文库"""
+        store = get_paper_store()
+        if store is not None:
+            for paper in papers:
+                store.record_metadata(
+                    {"arxiv": paper["arxiv_id"], "doi": paper.get("doi"), "url": paper.get("pdf_url")},
+                    paper,
+                    bib=make_bibtex(paper)
+                )
+        return papers
+
+    @staticmethod
+    def _with_query_header(results_text: str, query: str) -> str:
+        """替换结果第一行的查询词"""
+        return re.sub(r'\A# arXiv Search Results: [^\n]*',
+                      lambda _: f"# arXiv Search Results: {query}", results_text, count=1)
+
+    @staticmethod
+    def _format(query: str, papers: List[Dict[str, Any]], sort_by_str: str, sort_order_str: str) -> str:
+        """格式化为 Markdown"""
+        results_md = []
+        results_md.append(f"# arXiv Search Results: {query}\n")
+        results_md.append(f"**Total**: {len(papers)} papers\n")
+        results_md.append(f"**Sort By**: {sort_by_str}\n")
+        results_md.append(f"**Sort Order**: {sort_order_str}\n")
+
+        for i, paper in enumerate(papers, 1):
+            results_md.append(f"\n---\n")
+            results_md.append(f"## {i}. {paper['title']}\n")
+            results_md.append(f"**Authors**: {', '.join(paper['authors'])}\n")
+            results_md.append(f"**Published**: {paper['published']}\n")
+            results_md.append(f"**Updated**: {paper['updated']}\n")
+            results_md.append(f"**arXiv ID**: {paper['arxiv_id']}\n")
+            results_md.append(f"**PDF URL**: {paper['pdf_url']}\n")
+
+            # 分类
+            if paper.get("categories"):
+                results_md.append(f"**Categories**: {', '.join(paper['categories'])}\n")
+
+            # 摘要
+            results_md.append(f"\n**Abstract**:\n")
+            results_md.append(f"{paper['abstract']}\n")
+
+        results_text = '\n'.join(results_md)
+        
+        return results_text
+
+    @staticmethod
+    def _mark_stored_pdfs(results_text: str) -> str:
+        """在共享论文库已有 PDF 的论文下加一行提示（搜索结果缓存之后再标注，保证是最新状态）"""
+        store = get_paper_store()
+        if store is None:
+            return results_text
+
+        def mark(match):
+            entry = store.lookup(arxiv_id=match.group(1))
+            if entry and entry["has_pdf"]:
+                return match.group(0) + "\n**Local PDF**: in shared paper store (file_download links it without downloading)\n"
+            return match.group(0)
+
+        return re.sub(r'\*\*arXiv ID\*\*: (\S+)\n', mark, results_text)
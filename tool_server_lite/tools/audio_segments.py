@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+长音频分段转录
+- 切分：优先在目标长度之前的静音处切开，找不到静音时按固定窗口切并保留少量重叠
+- 各段并发转录（线程数有上限），完成一段发出一次进度事件
+- 拼接：按段起始时间加时间戳，去掉重叠区域重复转录的词
+- 缓存：整段转录按音频内容哈希缓存，单段转录也缓存（中断后重试只补未完成的段）
+切分依赖 ffmpeg/ffprobe；没有 ffmpeg 时只能切分 WAV（标准库 wave）
+"""
+
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .disk_cache import DiskCache
+from .tool_config import load_tool_config, get_cache_root
+from .image_prep import file_sha256
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+# 默认配置（可在 tool_config.yaml 的 audio 段覆盖）
+DEFAULT_AUDIO_CONFIG = {
+    "transcribe_model": "whisper-1",
+    "segment_seconds": 600,         # 每段最长时长（秒）
+    "overlap_seconds": 2,           # 固定窗口切分时相邻段的重叠（秒）
+    "silence_search_seconds": 30,   # 在目标切点之前多长范围内寻找静音
+    "silence_db": -35,              # 静音阈值（dBFS）
+    "min_silence_seconds": 0.4,     # 最短静音时长
+    "max_workers": 4,               # 并发转录的段数
+    "single_max_mb": 24,            # 不超过该大小且不超过一段时长的文件整段上传
+    "segment_max_mb": 24,           # 切出的每段文件的大小上限（无 ffmpeg 时按帧复制 WAV，码率不变）
+    "cache_enabled": True,
+    "cache_ttl": 90 * 86400,
+    "cache_max_entries": 2000,
+}
+
+
+class AudioSplitError(Exception):
+    """音频无法切分（缺少 ffmpeg 且不是 WAV）"""
+
+
+def get_audio_config() -> Dict[str, Any]:
+    config = dict(DEFAULT_AUDIO_CONFIG)
+    config.update(load_tool_config().get("audio") or {})
+    return config
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+# ===== 切分计划 =====
+
+def plan_segments(
+    duration: float,
+    segment_seconds: float,
+    overlap: float = 0.0,
+    silences: Sequence[Tuple[float, float]] = (),
+    search: float = 30.0
+) -> List[Tuple[float, float]]:
+    """
+    计算分段 [(起始秒, 结束秒)]
+
+    每段不超过 segment_seconds：在 [目标切点 - search, 目标切点] 内有静音时切在最靠后的静音中点，
+    否则在目标切点硬切，下一段从 切点 - overlap 开始
+    """
+    overlap = min(max(overlap, 0.0), segment_seconds / 2)
+    midpoints = sorted((start + end) / 2 for start, end in silences)
+    segments = []
+    start = 0.0
+    while duration - start > segment_seconds:
+        target = start + segment_seconds
+        candidates = [m for m in midpoints if max(start, target - search) < m <= target]
+        if candidates:
+            segments.append((start, candidates[-1]))
+            start = candidates[-1]
+        else:
+            segments.append((start, target))
+            start = target - overlap
+    segments.append((start, duration))
+    return segments
+
+
+# ===== 拼接 =====
+
+_TOKEN = re.compile(r'[぀-ヿ㐀-鿿]|[^\W぀-ヿ㐀-鿿]+')
+
+
+def _norm_tokens(text: str) -> List[Tuple[str, int]]:
+    """[(规范化后的词, 该词在原文中的结束位置)]，中日文按字切分"""
+    return [(m.group(0).lower(), m.end()) for m in _TOKEN.finditer(text)]
+
+
+def drop_overlap(previous: str, current: str, max_tokens: int = 40) -> str:
+    """去掉 current 开头与 previous 结尾重复的部分（至少 2 个词才认为是重叠）"""
+    prev_tokens = [t for t, _ in _norm_tokens(previous)[-max_tokens:]]
+    cur_tokens = _norm_tokens(current)[:max_tokens]
+    for k in range(min(len(prev_tokens), len(cur_tokens)), 1, -1):
+        if prev_tokens[-k:] == [t for t, _ in cur_tokens[:k]]:
+            return current[cur_tokens[k - 1][1]:].lstrip(" \t,.，。、")
+    return current
+
+
+def stitch_transcript(segments: List[Dict[str, Any]]) -> str:
+    """
+    拼接各段转录
+
+    Args:
+        segments: [{"start", "end", "text"}]，按时间排序
+
+    Returns:
+        每段一行 "[hh:mm:ss] 文本"
+    """
+    lines = []
+    previous = None
+    for segment in segments:
+        text = (segment["text"] or "").strip()
+        if previous is not None and segment["start"] < previous["end"]:
+            text = drop_overlap(previous["text"] or "", text)
+        lines.append(f"[{format_timestamp(segment['start'])}] {text}")
+        previous = segment
+    return "\n".join(lines)
+
+
+# ===== 音频后端 =====
+
+def has_ffmpeg() -> bool:
+    return bool(shutil.which("ffmpeg") and shutil.which("ffprobe"))
+
+
+def probe_duration(path: Path) -> float:
+    if has_ffmpeg():
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+            capture_output=True, text=True, check=True
+        )
+        return float(result.stdout.strip())
+    if path.suffix.lower() == ".wav":
+        with wave.open(str(path), 'rb') as w:
+            return w.getnframes() / w.getframerate()
+    raise AudioSplitError("切分非 WAV 音频需要安装 ffmpeg")
+
+
+_SILENCE_START = re.compile(r'silence_start:\s*(-?[\d.]+)')
+_SILENCE_END = re.compile(r'silence_end:\s*([\d.]+)')
+
+
+def detect_silences(path: Path, silence_db: float, min_silence: float) -> List[Tuple[float, float]]:
+    """返回静音区间 [(起始秒, 结束秒)]；无法检测时返回空列表（退化为固定窗口）"""
+    if has_ffmpeg():
+        result = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-nostats", "-i", str(path),
+             "-af", f"silencedetect=noise={silence_db}dB:d={min_silence}", "-f", "null", "-"],
+            capture_output=True, text=True
+        )
+        starts = [float(v) for v in _SILENCE_START.findall(result.stderr)]
+        ends = [float(v) for v in _SILENCE_END.findall(result.stderr)]
+        return list(zip(starts, ends))
+    if path.suffix.lower() == ".wav" and HAS_NUMPY:
+        return _wav_silences(path, silence_db, min_silence)
+    return []
+
+
+def _wav_silences(path: Path, silence_db: float, min_silence: float) -> List[Tuple[float, float]]:
+    """按 50ms 帧计算 RMS，连续低于阈值且不短于 min_silence 的区间视为静音（仅 16 位 PCM）"""
+    with wave.open(str(path), 'rb') as w:
+        if w.getsampwidth() != 2:
+            return []
+        rate, channels = w.getframerate(), w.getnchannels()
+        samples = np.frombuffer(w.readframes(w.getnframes()), dtype='<i2')
+    frame = max(1, rate // 20)
+    mono = samples.reshape(-1, channels).mean(axis=1) / 32768.0
+    count = len(mono) // frame
+    if count == 0:
+        return []
+    rms = np.sqrt(np.mean(mono[:count * frame].reshape(count, frame) ** 2, axis=1))
+    quiet = 20 * np.log10(np.maximum(rms, 1e-10)) < silence_db
+
+    silences = []
+    run_start = None
+    for i, is_quiet in enumerate(list(quiet) + [False]):
+        if is_quiet and run_start is None:
+            run_start = i
+        elif not is_quiet and run_start is not None:
+            start, end = run_start * frame / rate, i * frame / rate
+            if end - start >= min_silence:
+                silences.append((start, end))
+            run_start = None
+    return silences
+
+
+def cut_segment(path: Path, start: float, end: float, out_dir: Path, index: int) -> Path:
+    """导出 [start, end) 区间：ffmpeg 转为 16kHz 单声道 mp3，否则按帧复制 WAV"""
+    if has_ffmpeg():
+        out = out_dir / f"segment_{index:04d}.mp3"
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", str(path),
+             "-ac", "1", "-ar", "16000", "-b:a", "64k", str(out)],
+            check=True
+        )
+        return out
+    if path.suffix.lower() != ".wav":
+        raise AudioSplitError("切分非 WAV 音频需要安装 ffmpeg")
+    out = out_dir / f"segment_{index:04d}.wav"
+    with wave.open(str(path), 'rb') as src, wave.open(str(out), 'wb') as dst:
+        rate = src.getframerate()
+        dst.setparams(src.getparams())
+        src.setpos(int(start * rate))
+        dst.writeframes(src.readframes(int((end - start) * rate)))
+    return out
+
+
+# ===== 缓存 =====
+
+_cache_instance: Optional[DiskCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_transcript_cache() -> Optional[DiskCache]:
+    """获取转录缓存单例，配置中关闭时返回 None"""
+    global _cache_instance
+    config = get_audio_config()
+    if not config["cache_enabled"]:
+        return None
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = DiskCache(
+                get_cache_root() / "transcripts",
+                ttl=config["cache_ttl"],
+                max_entries=config["cache_max_entries"]
+            )
+    return _cache_instance
+
+
+# ===== 流水线 =====
+
+def transcribe_audio(
+    path: Path,
+    transcribe: Callable[[str, str], str],
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    分段并发转录音频
+
+    Args:
+        path: 音频文件
+        transcribe: 转录函数 (音频路径, 模型) -> 文本
+        on_progress: 每完成一段调用一次，参数为
+            {"type": "segment", "index", "total", "start", "end", "cached", "text"}
+        use_cache: 是否读取缓存
+
+    Returns:
+        {"transcript": 带时间戳的全文, "segments": [{"start", "end", "text"}], "cache_hit": bool}
+    """
+    path = Path(path)
+    config = get_audio_config()
+    model = config["transcribe_model"]
+    cache = get_transcript_cache()
+    audio_hash = file_sha256(path)
+    params = {k: config[k] for k in ("segment_seconds", "overlap_seconds", "silence_search_seconds",
+                                     "silence_db", "min_silence_seconds", "single_max_mb", "segment_max_mb")}
+    key = DiskCache.make_key("transcript", audio_hash, model, params)
+
+    if cache is not None and use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return {**cached, "cache_hit": True}
+
+    small = path.stat().st_size <= config["single_max_mb"] * 1024 * 1024
+    try:
+        duration = probe_duration(path)
+    except AudioSplitError:
+        if not small:
+            raise
+        duration = None
+
+    if duration is None or (small and duration <= config["segment_seconds"]):
+        # 短音频（或无法切分的小文件）整段上传
+        plan = [(0.0, duration or 0.0)]
+    else:
+        segment_seconds = config["segment_seconds"]
+        if not has_ffmpeg() and duration > 0:
+            # 按帧复制的 WAV 段与原文件码率相同，大文件即使时长很短也要按大小切分（留 5% 给文件头）
+            bytes_per_second = path.stat().st_size / duration
+            segment_seconds = min(segment_seconds,
+                                  max(1.0, 0.95 * config["segment_max_mb"] * 1024 * 1024 / bytes_per_second))
+        silences = detect_silences(path, config["silence_db"], config["min_silence_seconds"])
+        plan = plan_segments(duration, segment_seconds, config["overlap_seconds"],
+                             silences, config["silence_search_seconds"])
+
+    segments = [{"start": start, "end": end, "text": None} for start, end in plan]
+    progress_lock = threading.Lock()
+
+    def report(index: int, cached: bool):
+        if on_progress is None:
+            return
+        segment = segments[index]
+        with progress_lock:
+            on_progress({"type": "segment", "index": index, "total": len(segments), "start": segment["start"],
+                         "end": segment["end"], "cached": cached, "text": segment["text"]})
+
+    with tempfile.TemporaryDirectory(prefix="audio_segments_") as tmp:
+        def run(index: int):
+            segment = segments[index]
+            segment_key = DiskCache.make_key("transcript_segment", audio_hash, model,
+                                             round(segment["start"], 3), round(segment["end"], 3))
+            if cache is not None and use_cache:
+                text = cache.get(segment_key)
+                if text is not None:
+                    segment["text"] = text
+                    report(index, True)
+                    return
+            # 只有小文件直接上传原文件；超过大小上限的单段也要经 ffmpeg 转码
+            source = path if small and len(segments) == 1 else cut_segment(
+                path, segment["start"], segment["end"], Path(tmp), index)
+            segment["text"] = transcribe(str(source), model)
+            if cache is not None:
+                cache.set(segment_key, segment["text"])
+            report(index, False)
+
+        with ThreadPoolExecutor(max_workers=max(1, int(config["max_workers"]))) as pool:
+            for future in as_completed([pool.submit(run, i) for i in range(len(segments))]):
+                future.result()
+
+    result = {"transcript": stitch_transcript(segments) if len(segments) > 1 else segments[0]["text"],
+              "segments": segments}
+    if cache is not None:
+        cache.set(key, result)
+    return {**result, "cache_hit": False}
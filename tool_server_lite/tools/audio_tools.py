@@ -4,9 +4,11 @@
 Audio分析工具 - 音频内容分析
 """
 
+import json
 from pathlib import Path
 from typing import Dict, Any
 
+from .audio_segments import AudioSplitError, format_timestamp, transcribe_audio
 from .file_tools import BaseTool, get_abs_path
 
 # 导入llm_client_lite
@@ -30,11 +32,16 @@ class AudioTool(BaseTool):
             audio_path (str): 音频文件相对路径（相对于任务目录）
             question (str, optional): 要问的问题，默认"请描述这段音频的内容"
             model (str, optional): 模型名称，默认使用配置中的模型
+            use_cache (bool, optional): 是否使用转录缓存，默认 True
+        
+        长音频按静音/固定窗口切分后并发转录，每完成一段向
+        temp/audio_progress/<文件名>.jsonl 追加一条进度事件
         
         Returns:
             status: "success" 或 "error"
             output: 分析结果文本
             error: 错误信息（如有）
+            segments / cache_hit / progress_file: 转录段数、是否命中转录缓存、进度事件文件
         """
         try:
             # 获取参数
@@ -56,16 +63,48 @@ class AudioTool(BaseTool):
             llm_client = get_llm_client()
             
             try:
+                if not abs_audio_path.exists():
+                    raise FileNotFoundError(audio_path)
+                
+                progress_rel = f"temp/audio_progress/{abs_audio_path.stem}.jsonl"
+                progress_path = get_abs_path(task_id, progress_rel)
+                progress_path.parent.mkdir(parents=True, exist_ok=True)
+                progress_path.write_text("", encoding='utf-8')
+                
+                def on_progress(event: Dict[str, Any]):
+                    span = f"{format_timestamp(event['start'])}-{format_timestamp(event['end'])}"
+                    print(f"[audio] {abs_audio_path.name} 段 {event['index'] + 1}/{event['total']} 完成 ({span}"
+                          f"{', 缓存' if event['cached'] else ''})")
+                    with open(progress_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(event, ensure_ascii=False) + "\n")
+                
+                transcription = transcribe_audio(
+                    abs_audio_path,
+                    lambda path, transcribe_model: llm_client.transcribe(path, model=transcribe_model),
+                    on_progress=on_progress,
+                    use_cache=parameters.get("use_cache", True)
+                )
                 result = llm_client.audio_query(
                     audio_path=str(abs_audio_path),
                     question=question,
-                    model=model
+                    model=model,
+                    transcript=transcription["transcript"]
                 )
                 
                 return {
                     "status": "success",
                     "output": result,
-                    "error": ""
+                    "error": "",
+                    "segments": len(transcription["segments"]),
+                    "cache_hit": transcription["cache_hit"],
+                    "progress_file": progress_rel
+                }
+                
+            except AudioSplitError as e:
+                return {
+                    "status": "error",
+                    "output": "",
+                    "error": f"音频过大且无法切分: {str(e)}"
                 }
                 
             except NotImplementedError as e:
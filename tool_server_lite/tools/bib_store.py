@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BibTeX 存储 - reference_* 工具的底层
+- 按括号配对流式解析（mmap），正确处理嵌套花括号、@string/@comment 和 ( ) 定界的条目
+- 旁路索引：引用键 → 字节偏移，以及 title/author/year，按 (size, mtime) 失效
+- 增量更新：新增条目直接追加到文件末尾；覆盖/删除只在一次流式复制中改动相关区间，
+  索引中其后条目的偏移整体平移，不重新解析整个文件
+"""
+
+import difflib
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# 不是参考文献条目的特殊块
+NON_ENTRY_TYPES = ("comment", "string", "preamble")
+# 索引中保存的字段
+INDEXED_FIELDS = ("title", "author", "year")
+
+_HEAD = re.compile(rb'@[ \t]*([A-Za-z]+)\s*([{(])')
+_KEY = re.compile(rb'\s*([^,\s{}()"]+)\s*,')
+_BRACKETS = re.compile(rb'[{}()"\\]')
+_FIELD_NAME = re.compile(r'\s*,?\s*([A-Za-z][\w\-:.+]*)\s*=\s*')
+
+
+def _match_close(buf, start: int, close: bytes) -> Optional[int]:
+    """
+    从 start 开始找与条目定界符配对的结束位置（跳过 \\{ \\} 等转义）
+
+    ( ) 定界的条目：花括号外的 "..." 字符串中的括号不计，其余 ( ) 按嵌套配对
+    """
+    depth = 0
+    parens = 0
+    in_quote = False
+    escaped_until = -1
+    for match in _BRACKETS.finditer(buf, start):
+        pos = match.start()
+        if pos <= escaped_until:
+            continue
+        ch = match.group(0)
+        if ch == b'\\':
+            escaped_until = pos + 1
+        elif ch == b'{':
+            depth += 1
+        elif ch == b'}':
+            if depth == 0:
+                return pos if close == b'}' else None
+            depth -= 1
+        elif close != b')' or depth > 0:
+            continue
+        elif ch == b'"':
+            in_quote = not in_quote
+        elif in_quote:
+            continue
+        elif ch == b'(':
+            parens += 1
+        elif parens:
+            parens -= 1
+        else:
+            return pos
+    return None
+
+
+def scan_entries(buf) -> Iterator[Dict[str, Any]]:
+    """
+    扫描 bib 内容（bytes 或 mmap），逐条产出条目
+
+    Yields:
+        {"type": 小写类型, "key": 引用键（特殊块为 None）, "start": 字节偏移, "end": 结束偏移（不含）}
+    """
+    pos = 0
+    while True:
+        at = buf.find(b'@', pos)
+        if at == -1:
+            return
+        head = _HEAD.match(buf, at)
+        if not head:
+            pos = at + 1
+            continue
+        entry_type = head.group(1).decode('ascii').lower()
+        close = b'}' if head.group(2) == b'{' else b')'
+        end = _match_close(buf, head.end(), close)
+        if end is None:
+            # 括号不配对：跳过这个 @，继续找下一条
+            pos = head.end()
+            continue
+        key = None
+        if entry_type not in NON_ENTRY_TYPES:
+            key_match = _KEY.match(buf, head.end())
+            if key_match and key_match.end() <= end:
+                key = key_match.group(1).decode('utf-8', errors='replace')
+        yield {"type": entry_type, "key": key, "start": at, "end": end + 1}
+        pos = end + 1
+
+
+def _read_value(text: str, pos: int) -> Tuple[str, int]:
+    """读取一个字段值（{...}、"..."、裸词，支持 # 连接），返回 (去掉外层定界符的值, 结束位置)"""
+    parts = []
+    while pos < len(text):
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos >= len(text):
+            break
+        ch = text[pos]
+        if ch in '{"':
+            depth = 0
+            i = pos
+            while i < len(text):
+                c = text[i]
+                if c == '\\':
+                    i += 2
+                    continue
+                if c == '{':
+                    depth += 1
+                elif c == '}':
+                    depth -= 1
+                    if ch == '{' and depth == 0:
+                        break
+                elif c == '"' and ch == '"' and i > pos and depth == 0:
+                    break
+                i += 1
+            parts.append(text[pos + 1:i])
+            pos = i + 1
+        else:
+            match = re.match(r'[^,#}\s]+', text[pos:])
+            parts.append(match.group(0) if match else "")
+            pos += len(parts[-1]) or 1
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos < len(text) and text[pos] == '#':
+            pos += 1
+            continue
+        break
+    return "".join(parts), pos
+
+
+def parse_fields(entry_text: str) -> Dict[str, str]:
+    """解析单个条目的字段 {小写字段名: 值}"""
+    head = re.match(r'\s*@\s*\w+\s*[{(]\s*[^,\s{}()"]+\s*', entry_text)
+    if not head:
+        return {}
+    fields = {}
+    pos = head.end()
+    body_end = len(entry_text.rstrip()) - 1  # 结束定界符
+    while pos < body_end:
+        match = _FIELD_NAME.match(entry_text, pos)
+        if not match:
+            break
+        value, pos = _read_value(entry_text[:body_end], match.end())
+        fields[match.group(1).lower()] = " ".join(value.split())
+    return fields
+
+
+def normalize_text(text: str) -> str:
+    """用于模糊匹配：去掉 LaTeX 命令和花括号，统一大小写与空白"""
+    text = re.sub(r'\\[A-Za-z]+\s*|\\.|[{}$~]', ' ', text or "")
+    return " ".join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+
+
+class _PathLocks:
+    def __init__(self):
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def get(self, path: Path) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(str(path.resolve()), threading.Lock())
+
+
+_path_locks = _PathLocks()
+
+
+class BibStore:
+    """带旁路索引的 bib 文件"""
+
+    def __init__(self, path: Path, index_dir: Optional[Path] = None):
+        """
+        Args:
+            path: bib 文件路径
+            index_dir: 索引目录（None 时只在内存中构建）
+        """
+        self.path = Path(path)
+        self.index_path = None
+        if index_dir is not None:
+            digest = hashlib.sha1(str(self.path.resolve()).encode('utf-8')).hexdigest()
+            self.index_path = Path(index_dir) / f"{digest}.json"
+        self.lock = _path_locks.get(self.path)
+        self._entries: Optional[List[Dict[str, Any]]] = None
+
+    # ===== 索引 =====
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """索引中的条目（按文件顺序）：{key, type, start, end, title, author, year}"""
+        if self._entries is None:
+            self._entries = self._load_index()
+            if self._entries is None:
+                self._entries = self._build_index()
+                self._save_index()
+        return self._entries
+
+    def _stat(self) -> Tuple[int, int]:
+        try:
+            stat = self.path.stat()
+            return stat.st_size, stat.st_mtime_ns
+        except FileNotFoundError:
+            return 0, 0
+
+    def _load_index(self) -> Optional[List[Dict[str, Any]]]:
+        if self.index_path is None:
+            return None
+        try:
+            data = json.loads(self.index_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        if [data.get("size"), data.get("mtime_ns")] != list(self._stat()):
+            return None
+        return data.get("entries")
+
+    def _save_index(self):
+        if self.index_path is None:
+            return
+        size, mtime_ns = self._stat()
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.index_path.with_suffix(f".tmp{threading.get_ident()}")
+            tmp.write_text(json.dumps({"size": size, "mtime_ns": mtime_ns, "entries": self._entries},
+                                      ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp, self.index_path)
+        except OSError:
+            pass
+
+    def _build_index(self) -> List[Dict[str, Any]]:
+        if self._stat()[0] == 0:
+            return []
+        entries = []
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for entry in scan_entries(mm):
+                if entry["key"] is None:
+                    continue
+                entries.append(self._describe(entry, mm[entry["start"]:entry["end"]]))
+        return entries
+
+    @staticmethod
+    def _describe(entry: Dict[str, Any], raw: bytes) -> Dict[str, Any]:
+        fields = parse_fields(raw.decode('utf-8', errors='replace'))
+        return {**entry, **{name: fields.get(name, "") for name in INDEXED_FIELDS}}
+
+    # ===== 读取 =====
+
+    def read(self, entry: Dict[str, Any]) -> str:
+        """按偏移读取条目原文"""
+        with open(self.path, 'rb') as f:
+            f.seek(entry["start"])
+            return f.read(entry["end"] - entry["start"]).decode('utf-8', errors='replace')
+
+    def find(self, key: str) -> List[Dict[str, Any]]:
+        return [entry for entry in self.entries() if entry["key"] == key]
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        key: Optional[str] = None,
+        field: Optional[str] = None,
+        value: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        检索条目
+
+        Args:
+            query: 模糊匹配标题（相似度 + 词覆盖率，按得分排序）
+            key: 引用键（完全匹配优先，其次为包含）
+            field / value: 字段包含 value（title/author/year 走索引，其他字段读取原文）
+            limit: 最多返回条数
+
+        Returns:
+            索引条目列表，模糊匹配时附带 score
+        """
+        results = self.entries()
+        if key:
+            needle = key.lower()
+            exact = [e for e in results if e["key"].lower() == needle]
+            results = exact or [e for e in results if needle in e["key"].lower()]
+        if field and value:
+            field = field.lower()
+            needle = normalize_text(value)
+            if field in INDEXED_FIELDS or field in ("key", "type"):
+                results = [e for e in results if needle in normalize_text(e.get(field, ""))]
+            else:
+                results = [e for e in results
+                           if needle in normalize_text(parse_fields(self.read(e)).get(field, ""))]
+        if query:
+            target = normalize_text(query)
+            words = set(target.split())
+            scored = []
+            for entry in results:
+                title = normalize_text(entry["title"])
+                ratio = difflib.SequenceMatcher(None, target, title).ratio()
+                coverage = len(words & set(title.split())) / len(words) if words else 0
+                score = max(ratio, coverage)
+                if score >= 0.5:
+                    scored.append({**entry, "score": round(score, 3)})
+            results = sorted(scored, key=lambda e: -e["score"])
+        return results[:limit]
+
+    # ===== 写入 =====
+
+    def add(self, texts: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        添加条目，引用键已存在时覆盖（一个字符串中可以包含多条）
+
+        Returns:
+            (新增的键, 覆盖的键)
+        """
+        incoming: Dict[str, str] = {}
+        for text in texts:
+            raw = text.strip().encode('utf-8')
+            for entry in scan_entries(raw):
+                if entry["key"]:
+                    incoming[entry["key"]] = raw[entry["start"]:entry["end"]].decode('utf-8')
+
+        existing = {}
+        for entry in self.entries():
+            existing.setdefault(entry["key"], []).append(entry)
+        added = [key for key in incoming if key not in existing]
+        replaced = [key for key in incoming if key in existing]
+
+        edits = []
+        for key in replaced:
+            first, *duplicates = existing[key]
+            edits.append((first["start"], first["end"], incoming[key].encode('utf-8'), key))
+            edits.extend((dup["start"], self._span_end(dup["end"]), b"", None) for dup in duplicates)
+        if edits:
+            self._splice(edits)
+        if added:
+            self._append([incoming[key] for key in added])
+        return added, replaced
+
+    def delete(self, keys: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        删除条目（同一个键出现多次时全部删除）
+
+        Returns:
+            (删除的键, 未找到的键)
+        """
+        wanted = set(keys)
+        targets = [entry for entry in self.entries() if entry["key"] in wanted]
+        deleted = list(dict.fromkeys(entry["key"] for entry in targets))
+        not_found = [key for key in keys if key not in deleted]
+        if targets:
+            self._splice([(entry["start"], self._span_end(entry["end"]), b"", None) for entry in targets])
+        return deleted, not_found
+
+    def _span_end(self, end: int) -> int:
+        """删除条目时一并删除其后的空白，避免空行堆积"""
+        with open(self.path, 'rb') as f:
+            f.seek(end)
+            tail = f.read(256)
+        return end + len(tail) - len(tail.lstrip(b" \t\r\n"))
+
+    def _append(self, texts: List[str]):
+        size = self._stat()[0]
+        prefix = b""
+        if size:
+            with open(self.path, 'rb') as f:
+                f.seek(max(0, size - 2))
+                last = f.read()
+            prefix = b"" if last.endswith(b"\n\n") else b"\n" if last.endswith(b"\n") else b"\n\n"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        offset = size + len(prefix)
+        chunks = [prefix]
+        entries = self.entries()
+        for i, text in enumerate(texts):
+            raw = text.encode('utf-8')
+            entry = next(scan_entries(raw))
+            entries.append(self._describe(
+                {**entry, "start": offset, "end": offset + len(raw)}, raw))
+            sep = b"\n\n" if i < len(texts) - 1 else b"\n"
+            chunks.append(raw + sep)
+            offset += len(raw) + len(sep)
+        with open(self.path, 'ab') as f:
+            f.write(b"".join(chunks))
+        self._save_index()
+
+    def _splice(self, edits: List[Tuple[int, int, bytes, Optional[str]]]):
+        """
+        一次流式复制应用多处区间替换，并平移索引偏移
+
+        Args:
+            edits: [(起始, 结束, 新内容, 新内容对应的键或 None)]，区间互不重叠
+        """
+        edits = sorted(edits)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{self.path.name}.", suffix=".tmp", dir=self.path.parent)
+        try:
+            with open(self.path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+                pos = 0
+                for start, end, data, _ in edits:
+                    remaining = start - pos
+                    while remaining > 0:
+                        chunk = src.read(min(1 << 20, remaining))
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        remaining -= len(chunk)
+                    dst.write(data)
+                    src.seek(end)
+                    pos = end
+                shutil.copyfileobj(src, dst, 1 << 20)
+            shutil.copymode(self.path, tmp_name)
+            os.replace(tmp_name, self.path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+
+        def shift(offset: int) -> int:
+            return offset + sum(len(data) - (end - start) for start, end, data, _ in edits if end <= offset)
+
+        by_start = {start: (end, data, key) for start, end, data, key in edits}
+        updated = []
+        for entry in self.entries():
+            edit = by_start.get(entry["start"])
+            if edit is None:
+                updated.append({**entry, "start": shift(entry["start"]), "end": shift(entry["end"])})
+            elif edit[2] is not None:
+                start = shift(entry["start"])
+                raw = edit[1]
+                updated.append(self._describe(
+                    {"type": next(scan_entries(raw))["type"], "key": edit[2],
+                     "start": start, "end": start + len(raw)}, raw))
+        self._entries = updated
+        self._save_index()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+浏览器池 - 服务器生命周期内复用同一个无头浏览器
+由 server.py 的 startup/shutdown 钩子管理，CrawlPageTool 和 GoogleScholarSearchTool 共享
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from .disk_cache import DiskCache
+from .tool_config import load_tool_config, get_cache_root
+
+# Crawl4AI 导入
+try:
+    from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+    CRAWL4AI_AVAILABLE = True
+except ImportError:
+    CRAWL4AI_AVAILABLE = False
+
+
+# 默认配置（可在 tool_config.yaml 的 browser_pool 段覆盖）
+DEFAULT_POOL_CONFIG = {
+    "max_contexts": 4,             # 同时打开的页面/上下文数
+    "per_domain_limit": 2,         # 单个域名的并发数
+    "recycle_after_pages": 100,    # 爬取多少页面后重启浏览器
+    "memory_limit_mb": 2048,       # 浏览器进程树内存超过该值后重启
+    "preload": False,              # 服务器启动时立即启动浏览器
+    "page_cache": False,           # 是否启用磁盘页面缓存（默认关闭）
+    "page_cache_ttl": 3600,        # 页面缓存有效期（秒）
+    "page_cache_max_entries": 2000,
+}
+
+# 浏览器启动时新出现的子进程中，按进程名识别属于浏览器的进程（playwright 驱动为 node）
+BROWSER_PROCESS_MARKERS = ("chrom", "headless_shell", "node", "playwright", "firefox", "webkit")
+
+
+def extract_markdown(result) -> Optional[str]:
+    """从 crawl4ai 的结果中提取 markdown 文本"""
+    markdown_attr = getattr(result, "markdown", None)
+    if markdown_attr is None:
+        return None
+    return getattr(markdown_attr, "raw_markdown", None) or str(markdown_attr)
+
+
+class BrowserPool:
+    """无头浏览器池：限制上下文总数和单域名并发，按页数/内存回收浏览器"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = dict(DEFAULT_POOL_CONFIG)
+        self.config.update(config or {})
+
+        self._crawler = None
+        self._context_slots = asyncio.Semaphore(self.config["max_contexts"])
+        self._domain_slots: Dict[str, asyncio.Semaphore] = {}
+        # 浏览器启动/回收时持有，保证重启时没有正在进行的爬取
+        self._lifecycle_lock = asyncio.Lock()
+        self._active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        self.pages_since_start = 0
+        self.total_pages = 0
+        self.recycle_count = 0
+        self.started_at: Optional[float] = None
+        # 本池启动的浏览器进程树的根进程（playwright 驱动 / Chromium）
+        self._browser_pids = set()
+
+        self.page_cache = None
+        if self.config["page_cache"]:
+            self.page_cache = self._create_page_cache()
+
+    def _create_page_cache(self) -> DiskCache:
+        return DiskCache(
+            get_cache_root() / "pages",
+            ttl=self.config["page_cache_ttl"],
+            max_entries=self.config["page_cache_max_entries"]
+        )
+
+    async def start(self):
+        """启动浏览器（幂等）"""
+        async with self._lifecycle_lock:
+            await self._start_locked()
+
+    async def close(self):
+        """关闭浏览器，等待进行中的爬取结束"""
+        async with self._lifecycle_lock:
+            await self._idle.wait()
+            await self._close_locked()
+
+    async def _start_locked(self):
+        if self._crawler is not None:
+            return
+        if not CRAWL4AI_AVAILABLE:
+            raise Exception("crawl4ai not installed. Run: pip install crawl4ai")
+
+        browser_conf = BrowserConfig(headless=True, verbose=False)
+        crawler = AsyncWebCrawler(config=browser_conf)
+        before = self._child_pids()
+        await crawler.start()
+        self._browser_pids = self._browser_roots(self._child_pids() - before)
+        self._crawler = crawler
+        self.pages_since_start = 0
+        self.started_at = time.time()
+
+    async def _close_locked(self):
+        if self._crawler is None:
+            return
+        crawler = self._crawler
+        self._crawler = None
+        self._browser_pids = set()
+        try:
+            await crawler.close()
+        except Exception as e:
+            print(f"[WARN] 关闭浏览器失败: {e}")
+
+    async def _acquire_crawler(self):
+        """获取浏览器引用；如果需要回收，先等待进行中的爬取结束再重启"""
+        async with self._lifecycle_lock:
+            if self._crawler is not None and self._needs_recycle():
+                await self._idle.wait()
+                await self._close_locked()
+                self.recycle_count += 1
+            await self._start_locked()
+
+            self._active += 1
+            self._idle.clear()
+            return self._crawler
+
+    def _release_crawler(self):
+        self._active -= 1
+        if self._active == 0:
+            self._idle.set()
+
+    def _needs_recycle(self) -> bool:
+        if self.pages_since_start >= self.config["recycle_after_pages"]:
+            return True
+        limit_mb = self.config.get("memory_limit_mb")
+        if limit_mb:
+            rss_mb = self._browser_memory_mb()
+            if rss_mb is not None and rss_mb > limit_mb:
+                return True
+        return False
+
+    @staticmethod
+    def _child_pids() -> set:
+        """当前进程的直接子进程"""
+        try:
+            import psutil
+            return {child.pid for child in psutil.Process(os.getpid()).children()}
+        except Exception:
+            return set()
+
+    @staticmethod
+    def _browser_roots(pids: set) -> set:
+        """从启动期间新出现的子进程中挑出浏览器进程（排除同时启动的 execute_code、ffmpeg 等）"""
+        try:
+            import psutil
+        except ImportError:
+            return set()
+        roots = set()
+        for pid in pids:
+            try:
+                name = psutil.Process(pid).name().lower()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            if any(marker in name for marker in BROWSER_PROCESS_MARKERS):
+                roots.add(pid)
+        return roots
+
+    def _browser_memory_mb(self) -> Optional[float]:
+        """统计本池启动的浏览器进程树（驱动 + Chromium 及其渲染进程）的常驻内存"""
+        if not self._browser_pids:
+            return None
+        try:
+            import psutil
+        except ImportError:
+            return None
+        total = 0
+        for pid in self._browser_pids:
+            try:
+                root = psutil.Process(pid)
+                processes = [root] + root.children(recursive=True)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            for process in processes:
+                try:
+                    total += process.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+        return total / (1024 * 1024)
+
+    def _domain_semaphore(self, url: str) -> asyncio.Semaphore:
+        domain = urlparse(url).netloc.lower()
+        if domain not in self._domain_slots:
+            self._domain_slots[domain] = asyncio.Semaphore(self.config["per_domain_limit"])
+        return self._domain_slots[domain]
+
+    async def crawl_markdown(self, url: str, use_cache: Optional[bool] = None) -> Optional[str]:
+        """
+        爬取页面并返回 markdown
+
+        Args:
+            url: 页面URL
+            use_cache: 是否使用磁盘页面缓存，None 时跟随服务器配置
+
+        Returns:
+            markdown 文本，爬取结果中没有 markdown 时返回 None
+        """
+        if use_cache is None:
+            use_cache = self.page_cache is not None
+        cache = None
+        if use_cache:
+            if self.page_cache is None:
+                self.page_cache = self._create_page_cache()
+            cache = self.page_cache
+
+        if cache is not None:
+            cached = cache.get(url)
+            if cached is not None:
+                return cached
+
+        async with self._domain_semaphore(url):
+            async with self._context_slots:
+                crawler = await self._acquire_crawler()
+                try:
+                    run_conf = CrawlerRunConfig(cache_mode=CacheMode.BYPASS)
+                    result = await crawler.arun(url, config=run_conf)
+                finally:
+                    self.pages_since_start += 1
+                    self.total_pages += 1
+                    self._release_crawler()
+
+        markdown_text = extract_markdown(result)
+        if markdown_text is None:
+            return None
+
+        if cache is not None and getattr(result, "success", True):
+            cache.set(url, markdown_text)
+
+        return markdown_text
+
+    def stats(self) -> Dict[str, Any]:
+        """池状态（供 /api/browser-pool/stats 使用）"""
+        return {
+            "running": self._crawler is not None,
+            "active": self._active,
+            "max_contexts": self.config["max_contexts"],
+            "per_domain_limit": self.config["per_domain_limit"],
+            "pages_since_start": self.pages_since_start,
+            "total_pages": self.total_pages,
+            "recycle_count": self.recycle_count,
+            "uptime": round(time.time() - self.started_at, 1) if self.started_at and self._crawler else 0,
+            "page_cache": self.page_cache.stats() if self.page_cache else None,
+        }
+
+
+# 全局单例（延迟初始化）
+_pool_instance: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """获取浏览器池单例"""
+    global _pool_instance
+    if _pool_instance is None:
+        _pool_instance = BrowserPool(load_tool_config().get("browser_pool"))
+    return _pool_instance
+
+
+async def shutdown_browser_pool():
+    """关闭浏览器池（服务器 shutdown 时调用）"""
+    global _pool_instance
+    if _pool_instance is not None:
+        await _pool_instance.close()
+        _pool_instance = None
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档转换后端
+- local: 本机 latexmk / pandoc；每个项目有持久的构建目录（cache_dir/convert/<任务键>/build），
+  aux/bbl 等中间文件跨次编译复用，latexmk 只重跑需要的步骤
+- remote: document_convert_api.yaml 中的远程 Pandoc API
+两种后端都会记录上次编译时的源文件哈希，源文件和输出都未变化时直接跳过编译
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import requests
+import yaml
+
+from .disk_cache import DiskCache
+from .tool_config import load_tool_config, get_cache_root
+
+
+# 默认配置（可在 tool_config.yaml 的 document_convert 段覆盖）
+DEFAULT_CONVERT_CONFIG = {
+    "backend": "auto",          # auto: 本机有 latexmk/pandoc 时用本地，否则远程 API
+    "latexmk": "latexmk",       # 本地命令（可写绝对路径）
+    "pandoc": "pandoc",
+    "timeout": 300,             # 单次编译/请求超时（秒）
+}
+
+BACKENDS = ("auto", "local", "remote")
+
+ENGINE_FLAGS = {"pdflatex": "-pdf", "xelatex": "-xelatex", "lualatex": "-lualatex"}
+
+# LaTeX 中间文件：不参与源文件哈希，也不上传
+BUILD_ARTIFACT_SUFFIXES = (
+    ".aux", ".log", ".out", ".toc", ".lof", ".lot", ".bbl", ".blg", ".bcf", ".run.xml",
+    ".fls", ".fdb_latexmk", ".synctex.gz", ".xdv", ".nav", ".snm", ".idx", ".ilg", ".ind",
+)
+
+
+class ConvertError(Exception):
+    """转换失败（消息中附编译日志摘要）"""
+
+
+def get_convert_config() -> Dict[str, Any]:
+    config = dict(DEFAULT_CONVERT_CONFIG)
+    config.update(load_tool_config().get("document_convert") or {})
+    return config
+
+
+def load_convert_api_config() -> str:
+    """读取文档转换 API 配置"""
+    try:
+        # 查找配置文件
+        config_path = Path(__file__).parent.parent.parent / "config" / "run_env_config" / "document_convert_api.yaml"
+
+        if not config_path.exists():
+            return "如果有的话:8000/"  # 默认地址
+
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+            api_server = config.get("api_server", "http://192.168.31.4:8000/")
+
+            # 确保以 / 结尾
+            if not api_server.endswith('/'):
+                api_server += '/'
+
+            return api_server
+    except Exception:
+        return "http://192.168.31.4:8000/"
+
+
+def is_build_artifact(path: Path) -> bool:
+    return path.name.endswith(BUILD_ARTIFACT_SUFFIXES)
+
+
+def hash_tree(root: Path, exclude: Iterable[Path] = ()) -> Dict[str, str]:
+    """项目内各源文件的 sha256 {相对路径: 哈希}（跳过中间文件和 exclude）"""
+    excluded = {Path(p).resolve() for p in exclude}
+    hashes = {}
+    for path in sorted(root.rglob('*')):
+        if not path.is_file() or is_build_artifact(path) or path.resolve() in excluded:
+            continue
+        rel = path.relative_to(root)
+        if any(part.startswith('.') for part in rel.parts):
+            continue
+        hashes[rel.as_posix()] = hashlib.sha256(path.read_bytes()).hexdigest()
+    return hashes
+
+
+# Markdown 中引用的本地文件：图片 ![](path)、<img src>、引用式链接定义、YAML 头中的 bibliography/csl 等
+_MD_ASSET_PATTERNS = [
+    re.compile(r'!\[[^\]]*\]\(\s*<?([^)\s>]+)'),
+    re.compile(r'<img\b[^>]*?\bsrc\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE),
+    re.compile(r'^\s{0,3}\[[^\]]+\]:\s*<?([^\s>]+)', re.MULTILINE),
+    re.compile(r'^(?:bibliography|csl|reference-doc|include-in-header):\s*["\']?([^"\'\n]+?)["\']?\s*$',
+               re.MULTILINE),
+]
+
+
+def hash_markdown(source: Path) -> Dict[str, str]:
+    """Markdown 源文件及其引用的本地文件的 sha256 {相对源文件目录的路径: 哈希}（引用的文件不存在时哈希为空）"""
+    data = source.read_bytes()
+    hashes = {source.name: hashlib.sha256(data).hexdigest()}
+    text = data.decode('utf-8', errors='replace')
+    for pattern in _MD_ASSET_PATTERNS:
+        for ref in pattern.findall(text):
+            ref = ref.split('#', 1)[0].split('?', 1)[0]
+            if not ref or re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*:', ref):
+                continue    # URL、data: 等
+            path = (source.parent / ref).resolve()
+            rel = Path(os.path.relpath(path, source.parent)).as_posix()
+            if rel in hashes:
+                continue
+            hashes[rel] = hashlib.sha256(path.read_bytes()).hexdigest() if path.is_file() else ""
+    return hashes
+
+
+class BuildJob:
+    """一次转换任务（源 + 参数 + 输出）的持久状态：构建目录和上次编译的源文件哈希"""
+
+    def __init__(self, kind: str, source: Path, options: Dict[str, Any], output: Path):
+        key = DiskCache.make_key(kind, str(Path(source).resolve()), options, str(Path(output).resolve()))
+        self.dir = get_cache_root() / "convert" / key[:32]
+        self.build_dir = self.dir / "build"
+        self.build_dir.mkdir(parents=True, exist_ok=True)
+        self.state_path = self.dir / "state.json"
+        self.output = Path(output)
+        self.options = options
+        try:
+            self.state = json.loads(self.state_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self.state = {}
+
+    def changed_files(self, files: Dict[str, str]) -> list:
+        previous = self.state.get("files") or {}
+        return sorted(set(previous) ^ set(files) | {p for p in files if previous.get(p) not in (None, files[p])})
+
+    def up_to_date(self, files: Dict[str, str]) -> bool:
+        """源文件与上次成功编译时相同，且输出文件未被改动"""
+        if self.state.get("files") != files or self.state.get("options") != self.options:
+            return False
+        try:
+            stat = self.output.stat()
+        except OSError:
+            return False
+        return self.state.get("output") == [stat.st_size, stat.st_mtime_ns]
+
+    def save(self, files: Dict[str, str]):
+        stat = self.output.stat()
+        self.state = {"files": files, "options": self.options, "output": [stat.st_size, stat.st_mtime_ns]}
+        self.state_path.write_text(json.dumps(self.state), encoding='utf-8')
+
+
+def _run(cmd: list, cwd: Path, timeout: float) -> subprocess.CompletedProcess:
+    try:
+        return subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, errors='replace', timeout=timeout)
+    except FileNotFoundError:
+        raise ConvertError(f"找不到命令: {cmd[0]}")
+    except subprocess.TimeoutExpired:
+        raise ConvertError(f"{Path(cmd[0]).name} 超时（{timeout}s）")
+
+
+def summarize_latex_log(log_text: str, max_lines: int = 20) -> str:
+    """提取 LaTeX 日志中的错误行（'! ...' 与 'file:line: ...'）及其后一行上下文"""
+    lines = log_text.splitlines()
+    picked = []
+    for i, line in enumerate(lines):
+        if line.startswith("!") or ":" in line and line.split(":", 2)[1].isdigit():
+            picked.extend(lines[i:i + 2])
+        if len(picked) >= max_lines:
+            break
+    return "\n".join(picked[:max_lines] or lines[-max_lines:])
+
+
+class LocalBackend:
+    """本机 latexmk / pandoc"""
+
+    name = "local"
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+
+    def tex_to_pdf(self, project_dir: Path, main_file: str, engine: str, output: Path) -> Dict[str, Any]:
+        if engine not in ENGINE_FLAGS:
+            raise ConvertError(f"不支持的引擎: {engine}，可选 {', '.join(ENGINE_FLAGS)}")
+        job = BuildJob("tex", project_dir, {"main_file": main_file, "engine": engine}, output)
+        files = hash_tree(project_dir, exclude=[output])
+        if job.up_to_date(files):
+            return {"compiled": False, "changed_files": []}
+        changed = job.changed_files(files)
+
+        result = _run(
+            [self.config["latexmk"], ENGINE_FLAGS[engine], "-interaction=nonstopmode", "-halt-on-error",
+             "-file-line-error", f"-outdir={job.build_dir}", main_file],
+            cwd=project_dir, timeout=self.config["timeout"]
+        )
+        pdf = job.build_dir / f"{Path(main_file).stem}.pdf"
+        if result.returncode != 0 or not pdf.exists():
+            log_path = job.build_dir / f"{Path(main_file).stem}.log"
+            log_text = log_path.read_text(encoding='utf-8', errors='replace') if log_path.exists() else ""
+            raise ConvertError(f"LaTeX 编译失败:\n{summarize_latex_log(log_text or result.stdout + result.stderr)}")
+
+        shutil.copyfile(pdf, output)
+        job.save(files)
+        return {"compiled": True, "changed_files": changed}
+
+    def convert_markdown(self, source: Path, output: Path, engine: Optional[str] = None) -> Dict[str, Any]:
+        job = BuildJob("md", source, {"engine": engine, "format": output.suffix}, output)
+        files = hash_markdown(source)
+        if job.up_to_date(files):
+            return {"compiled": False, "changed_files": []}
+        changed = job.changed_files(files)
+
+        target = job.build_dir / f"{source.stem}{output.suffix}"
+        cmd = [self.config["pandoc"], source.name, "-o", str(target)]
+        if engine:
+            cmd.append(f"--pdf-engine={engine}")
+        # 在源文件目录运行，相对路径的图片才能找到
+        result = _run(cmd, cwd=source.parent, timeout=self.config["timeout"])
+        if result.returncode != 0 or not target.exists():
+            raise ConvertError(f"pandoc 转换失败:\n{(result.stderr or result.stdout)[-2000:]}")
+
+        shutil.copyfile(target, output)
+        job.save(files)
+        return {"compiled": True, "changed_files": changed}
+
+
+class RemoteBackend:
+    """远程 Pandoc API（document_convert_api.yaml）"""
+
+    name = "remote"
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.api_server = load_convert_api_config()
+
+    def _post(self, endpoint: str, files: dict, params: Optional[dict], output: Path):
+        try:
+            response = requests.post(f"{self.api_server}{endpoint}", files=files, params=params,
+                                     timeout=self.config["timeout"])
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise ConvertError(f"API 调用失败: {str(e)}")
+        with open(output, 'wb') as f:
+            f.write(response.content)
+
+    def tex_to_pdf(self, project_dir: Path, main_file: str, engine: str, output: Path) -> Dict[str, Any]:
+        job = BuildJob("tex-remote", project_dir, {"main_file": main_file, "engine": engine}, output)
+        files = hash_tree(project_dir, exclude=[output])
+        if job.up_to_date(files):
+            return {"compiled": False, "changed_files": []}
+        changed = job.changed_files(files)
+
+        # 打包项目为 ZIP（只含源文件，不含中间文件和上次的输出）
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for rel in files:
+                zipf.write(project_dir / rel, rel)
+        buffer.seek(0)
+
+        self._post("convert/tex-zip-to-pdf",
+                   {'file': (f"{project_dir.name}.zip", buffer, 'application/zip')},
+                   {'main_file': main_file, 'engine': engine}, output)
+        job.save(files)
+        return {"compiled": True, "changed_files": changed}
+
+    def convert_markdown(self, source: Path, output: Path, engine: Optional[str] = None) -> Dict[str, Any]:
+        job = BuildJob("md-remote", source, {"engine": engine, "format": output.suffix}, output)
+        files = hash_markdown(source)
+        if job.up_to_date(files):
+            return {"compiled": False, "changed_files": []}
+        changed = job.changed_files(files)
+
+        endpoint = "convert/md-to-pdf" if output.suffix == ".pdf" else "convert/md-to-doc"
+        with open(source, 'rb') as f:
+            self._post(endpoint, {'file': (source.name, f, 'text/markdown')},
+                       {'engine': engine} if engine else None, output)
+        job.save(files)
+        return {"compiled": True, "changed_files": changed}
+
+
+def get_convert_backend(kind: str, name: Optional[str] = None):
+    """
+    选择转换后端
+
+    Args:
+        kind: "tex" 或 "md"（auto 时分别检查 latexmk / pandoc 是否可用）
+        name: auto / local / remote，默认取配置
+    """
+    config = get_convert_config()
+    name = name or config["backend"]
+    if name not in BACKENDS:
+        raise ConvertError(f"无效的转换后端: {name}，可选 {', '.join(BACKENDS)}")
+    if name == "auto":
+        command = config["latexmk"] if kind == "tex" else config["pandoc"]
+        name = "local" if shutil.which(command) else "remote"
+    return LocalBackend(config) if name == "local" else RemoteBackend(config)
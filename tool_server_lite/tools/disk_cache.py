@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+磁盘缓存 - 供各工具共享的 TTL + LRU 缓存
+每个条目是一个 JSON 文件，跨 workspace 共享，服务器重启后仍然有效
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class DiskCache:
+    """基于文件的 TTL + LRU 缓存（线程安全）"""
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        ttl: Optional[float] = 86400,
+        max_entries: int = 1000,
+        max_bytes: Optional[int] = None
+    ):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            ttl: 条目有效期（秒），None 表示永不过期
+            max_entries: 最大条目数，超出后按 LRU 淘汰
+            max_bytes: 最大总字节数（可选），超出后按 LRU 淘汰
+        """
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        # 文件名 -> 字节数，按最近访问顺序排列（最旧的在最前）
+        self._index: Optional[OrderedDict] = None
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """将任意可 JSON 序列化的参数组合成稳定的缓存键"""
+        raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中或已过期时返回 None"""
+        with self._lock:
+            self._load_index()
+            name = self._file_name(key)
+            path = self.cache_dir / name
+
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self._forget(name)
+                self.misses += 1
+                return None
+
+            if self.ttl is not None and time.time() - entry.get("created", 0) > self.ttl:
+                self._remove(name)
+                self.misses += 1
+                return None
+
+            # 刷新 LRU 顺序（mtime 同时作为重启后的访问时间）
+            if name in self._index:
+                self._index.move_to_end(name)
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+
+            self.hits += 1
+            return entry.get("value")
+
+    def set(self, key: str, value: Any):
+        """写入缓存（原子替换），并按需淘汰旧条目"""
+        data = json.dumps(
+            {"created": time.time(), "value": value},
+            ensure_ascii=False
+        ).encode('utf-8')
+
+        with self._lock:
+            self._load_index()
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            name = self._file_name(key)
+            path = self.cache_dir / name
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+            self._forget(name)
+            self._index[name] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def delete(self, key: str):
+        """删除条目"""
+        with self._lock:
+            self._load_index()
+            self._remove(self._file_name(key))
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._load_index()
+            for name in list(self._index.keys()):
+                self._remove(name)
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        with self._lock:
+            self._load_index()
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0
+            }
+
+    # ===== 内部方法（调用方需持有锁） =====
+
+    def _file_name(self, key: str) -> str:
+        # 键可能是任意字符串，统一哈希成安全的文件名
+        if len(key) == 64 and all(c in "0123456789abcdef" for c in key):
+            return f"{key}.json"
+        return f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+    def _load_index(self):
+        """首次使用时扫描目录，按 mtime 重建 LRU 顺序"""
+        if self._index is not None:
+            return
+
+        entries = []
+        if self.cache_dir.exists():
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, entry.name, st.st_size))
+
+        entries.sort()
+        self._index = OrderedDict((name, size) for _, name, size in entries)
+        self._total_bytes = sum(size for _, _, size in entries)
+
+    def _forget(self, name: str):
+        size = self._index.pop(name, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _remove(self, name: str):
+        self._forget(name)
+        try:
+            (self.cache_dir / name).unlink()
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._index and (
+            len(self._index) > self.max_entries
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._index))
+            self._remove(oldest)
+            self.evictions += 1
@@ -4,9 +4,11 @@
 文档处理工具
 """
 
+import re
 from pathlib import Path
 from typing import Dict, Any, List
 from .file_tools import BaseTool, get_abs_path
+from .paper_store import IMAGES_DIR, IMAGES_TOKEN, file_sha256, get_paper_store
 
 
 class ParseDocumentTool(BaseTool):
@@ -21,10 +23,12 @@ class ParseDocumentTool(BaseTool):
             save_path (str, optional): 保存解析结果的相对路径
                                       图片会自动保存到 {save_path}_images/ 目录
                                       (仅对PDF有效，Word文档只提取文字和表格)
+            use_cache (bool, optional): 是否复用共享论文库中同一PDF的解析结果，默认True
         """
         try:
             path = parameters.get("path")
             save_path = parameters.get("save_path")
+            use_cache = parameters.get("use_cache", True)
             
             abs_path = get_abs_path(task_id, path)
             
@@ -51,7 +55,7 @@ class ParseDocumentTool(BaseTool):
             suffix = abs_path.suffix.lower()
             
             if suffix == '.pdf':
-                content = self._parse_pdf(abs_path, task_id, extract_images, images_dir)
+                content = self._parse_pdf_cached(abs_path, task_id, extract_images, images_dir, use_cache)
             elif suffix in ['.docx', '.doc']:
                 content = self._parse_word(abs_path, task_id, extract_images, images_dir)
             elif suffix in ['.txt', '.md']:
@@ -87,6 +91,31 @@ class ParseDocumentTool(BaseTool):
                 "error": str(e)
             }
     
+    def _parse_pdf_cached(self, pdf_path: Path, task_id: str, extract_images: bool, images_dir: str,
+                          use_cache: bool) -> str:
+        """同一PDF（按内容哈希）在共享论文库中已有解析结果时直接复用，图片链接到 images_dir"""
+        store = get_paper_store()
+        if store is None:
+            return self._parse_pdf(pdf_path, task_id, extract_images, images_dir)
+
+        sha = file_sha256(pdf_path)
+        entry = store.lookup(sha256=sha) if use_cache else None
+        text = store.read_parsed(entry["id"]) if entry and entry["has_parsed"] else None
+        if text is not None:
+            abs_images_dir = get_abs_path(task_id, images_dir)
+            for name in entry.get("images", []):
+                store.materialize(entry["id"], f"{IMAGES_DIR}/{name}", abs_images_dir / name)
+            return text.replace(IMAGES_TOKEN, images_dir)
+
+        content = self._parse_pdf(pdf_path, task_id, extract_images, images_dir)
+        # 解析结果入库：文本中的图片目录换成占位符，图片一并保存
+        abs_images_dir = get_abs_path(task_id, images_dir)
+        names = re.findall(r'\[Image \d+\]: ' + re.escape(images_dir) + r'/(\S+)\n', content)
+        images = [abs_images_dir / name for name in dict.fromkeys(names) if (abs_images_dir / name).is_file()]
+        entry_id = store.add_pdf(pdf_path, sha256=sha)
+        store.put_parsed(entry_id, content.replace(f"{images_dir}/", f"{IMAGES_TOKEN}/"), images)
+        return content
+
     def _parse_pdf(self, pdf_path: Path, task_id: str, extract_images: bool, images_dir: str) -> str:
         """解析PDF文件 - 使用 pdfplumber（质量更高）"""
         try:
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+断点续传下载器 - FileDownloadTool 使用
+先写入 <目标>.part，进度保存在 <目标>.part.json，完成并校验后再原子替换为目标文件
+服务器支持 Range 时可续传，文件较大时按字节区间多连接并行下载
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from .tool_config import load_tool_config
+
+
+# 默认配置（可在 tool_config.yaml 的 file_download 段覆盖）
+DEFAULT_DOWNLOAD_CONFIG = {
+    "connections": 4,                 # 并行下载的最大连接数
+    "min_parallel_size_mb": 8,        # 小于该大小的文件不分段
+    "timeout": 60,                    # 单次请求超时（秒）
+    "retries": 3,                     # 连接中断后的续传重试次数
+    "min_chunk_size": 64 * 1024,      # 自适应块大小下限
+    "max_chunk_size": 4 * 1024 * 1024,  # 自适应块大小上限
+}
+
+# 校验和长度 -> 算法（未写明算法时按长度推断）
+_HEX_LENGTH_ALGOS = {32: "md5", 40: "sha1", 64: "sha256", 128: "sha512"}
+
+
+class DownloadError(Exception):
+    """下载失败（校验失败、服务器错误等）"""
+
+
+class _RangeNotSupported(Exception):
+    """服务器对 Range 请求返回了完整内容"""
+
+
+# 可通过续传恢复的网络错误
+_RETRYABLE_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    ProtocolError,
+    ReadTimeoutError,
+)
+
+
+def get_download_config() -> Dict[str, Any]:
+    config = dict(DEFAULT_DOWNLOAD_CONFIG)
+    config.update(load_tool_config().get("file_download") or {})
+    return config
+
+
+def parse_checksum(checksum: str) -> Tuple[str, str]:
+    """
+    解析校验和，支持 "sha256:abcd..." 或直接给出十六进制串（按长度推断算法）
+
+    Returns:
+        (算法名, 小写十六进制摘要)
+    """
+    checksum = checksum.strip()
+    if ":" in checksum:
+        algo, digest = checksum.split(":", 1)
+        algo = algo.strip().lower().replace("-", "")
+    else:
+        digest = checksum
+        algo = _HEX_LENGTH_ALGOS.get(len(digest))
+        if algo is None:
+            raise DownloadError(f"Cannot infer checksum algorithm from: {checksum}")
+    if algo not in hashlib.algorithms_available:
+        raise DownloadError(f"Unsupported checksum algorithm: {algo}")
+    return algo, digest.strip().lower()
+
+
+def file_digest(path: Path, algo: str) -> str:
+    h = hashlib.new(algo)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class _ChunkSizer:
+    """根据每次读取耗时调整块大小：读得快就加倍，读得慢就减半"""
+
+    def __init__(self, min_size: int, max_size: int):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.size = min_size
+
+    def update(self, nbytes: int, elapsed: float):
+        if nbytes >= self.size and elapsed < 0.1:
+            self.size = min(self.size * 2, self.max_size)
+        elif elapsed > 1.0:
+            self.size = max(self.size // 2, self.min_size)
+
+
+class Downloader:
+    """单个文件的下载任务"""
+
+    def __init__(
+        self,
+        url: str,
+        dest: Path,
+        connections: Optional[int] = None,
+        checksum: Optional[str] = None,
+        config: Optional[Dict[str, Any]] = None
+    ):
+        self.url = url
+        self.dest = Path(dest)
+        self.part_path = self.dest.with_name(self.dest.name + ".part")
+        self.meta_path = self.dest.with_name(self.dest.name + ".part.json")
+
+        self.config = dict(DEFAULT_DOWNLOAD_CONFIG)
+        self.config.update(config or {})
+        self.connections = max(1, int(connections or self.config["connections"]))
+        self.checksum = parse_checksum(checksum) if checksum else None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self.connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # 续传偏移按原始字节计算，必须禁止内容压缩
+        self.session.headers["Accept-Encoding"] = "identity"
+
+        self._meta: Dict[str, Any] = {}
+        self._meta_lock = threading.Lock()
+        self._last_meta_save = 0.0
+
+    # ===== 入口 =====
+
+    def run(self) -> Dict[str, Any]:
+        """
+        执行下载
+
+        Returns:
+            {"path", "size", "resumed_bytes", "parallel", "checksum"}
+        """
+        self.dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            info = self._probe()
+            self._load_meta(info)
+            resumed_bytes = self._downloaded_bytes()
+
+            parallel = (
+                self.connections > 1
+                and info["accept_ranges"]
+                and info["total"] is not None
+                and info["total"] >= self.config["min_parallel_size_mb"] * 1024 * 1024
+                and self._meta.get("mode") in (None, "parallel")
+            )
+            if parallel:
+                try:
+                    self._download_parallel(info)
+                except _RangeNotSupported:
+                    # HEAD 声称支持 Range，但 GET 不支持：退回单连接从头下载
+                    self._reset(info)
+                    resumed_bytes = 0
+                    parallel = False
+            if not parallel:
+                if self._meta.get("mode") == "parallel":
+                    # 上次是分段下载（文件已预分配），无法按文件大小续传
+                    self._reset(info)
+                    resumed_bytes = 0
+                self._download_single(info)
+
+            size = self.part_path.stat().st_size
+            total = self._meta.get("total")
+            if total is not None and size != total:
+                raise DownloadError(f"Size mismatch: expected {total} bytes, got {size}")
+
+            verified = None
+            if self.checksum:
+                algo, expected = self.checksum
+                actual = file_digest(self.part_path, algo)
+                if actual != expected:
+                    self._discard()
+                    raise DownloadError(f"Checksum mismatch ({algo}): expected {expected}, got {actual}")
+                verified = f"{algo}:{actual}"
+
+            os.replace(self.part_path, self.dest)
+            self._remove_meta()
+            return {
+                "path": self.dest,
+                "size": size,
+                "resumed_bytes": resumed_bytes,
+                "parallel": parallel,
+                "checksum": verified,
+            }
+        finally:
+            self.session.close()
+
+    # ===== 探测与进度文件 =====
+
+    def _probe(self) -> Dict[str, Any]:
+        """HEAD 请求获取大小、Range 支持和校验标识（失败时返回未知）"""
+        info = {"total": None, "accept_ranges": False, "etag": None, "last_modified": None}
+        try:
+            resp = self.session.head(self.url, allow_redirects=True, timeout=self.config["timeout"])
+        except requests.RequestException:
+            return info
+        if resp.status_code >= 400:
+            return info
+        length = resp.headers.get("Content-Length")
+        if length and length.isdigit():
+            info["total"] = int(length)
+        info["accept_ranges"] = resp.headers.get("Accept-Ranges", "").lower() == "bytes"
+        info["etag"] = resp.headers.get("ETag")
+        info["last_modified"] = resp.headers.get("Last-Modified")
+        return info
+
+    def _validator(self) -> Optional[str]:
+        """If-Range 使用的校验标识（弱 ETag 不能用于 If-Range）"""
+        etag = self._meta.get("etag")
+        if etag and not etag.startswith("W/"):
+            return etag
+        return self._meta.get("last_modified")
+
+    def _load_meta(self, info: Dict[str, Any]):
+        """读取上次的进度；远端文件已变化或进度文件损坏时从头开始"""
+        meta = None
+        if self.part_path.exists() and self.meta_path.exists():
+            try:
+                with open(self.meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = None
+
+        if meta and self._meta_matches(meta, info):
+            self._meta = meta
+        else:
+            self._reset(info)
+
+    def _meta_matches(self, meta: Dict[str, Any], info: Dict[str, Any]) -> bool:
+        if meta.get("url") != self.url:
+            return False
+        if info["total"] is not None and meta.get("total") not in (None, info["total"]):
+            return False
+        for field in ("etag", "last_modified"):
+            if info[field] and meta.get(field) and info[field] != meta[field]:
+                return False
+        # 没有任何校验标识时无法确认远端未变化，不续传
+        return bool(meta.get("etag") or meta.get("last_modified"))
+
+    def _reset(self, info: Dict[str, Any]):
+        self._discard()
+        self._meta = {
+            "url": self.url,
+            "total": info["total"],
+            "etag": info["etag"],
+            "last_modified": info["last_modified"],
+            "mode": None,
+            "segments": None,
+        }
+
+    def _save_meta(self, force: bool = False):
+        """原子写入进度文件（非强制时最多每秒写一次）"""
+        with self._meta_lock:
+            now = time.time()
+            if not force and now - self._last_meta_save < 1.0:
+                return
+            self._last_meta_save = now
+            tmp_path = self.meta_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._meta, f)
+            os.replace(tmp_path, self.meta_path)
+
+    def _downloaded_bytes(self) -> int:
+        if self._meta.get("mode") == "parallel" and self._meta.get("segments"):
+            return sum(seg[2] for seg in self._meta["segments"])
+        if self.part_path.exists():
+            return self.part_path.stat().st_size
+        return 0
+
+    def _remove_meta(self):
+        for path in (self.meta_path, self.meta_path.with_suffix(".tmp")):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def _discard(self):
+        try:
+            self.part_path.unlink()
+        except OSError:
+            pass
+        self._remove_meta()
+
+    # ===== 单连接下载 =====
+
+    def _download_single(self, info: Dict[str, Any]):
+        self._meta["mode"] = "single"
+        self._meta["segments"] = None
+        attempts = self.config["retries"] + 1
+
+        for attempt in range(attempts):
+            offset = self.part_path.stat().st_size if self.part_path.exists() else 0
+            total = self._meta.get("total")
+            if total is not None and offset == total:
+                return
+
+            headers = {}
+            validator = self._validator()
+            if offset > 0 and validator:
+                headers["Range"] = f"bytes={offset}-"
+                headers["If-Range"] = validator
+            elif offset > 0:
+                offset = 0
+
+            try:
+                with self.session.get(self.url, headers=headers, stream=True,
+                                      timeout=self.config["timeout"]) as resp:
+                    if resp.status_code == 416:
+                        # 已经下载完整，或本地文件比远端还大
+                        if total is not None and offset == total:
+                            return
+                        self._reset(info)
+                        continue
+                    resp.raise_for_status()
+
+                    if resp.status_code == 206:
+                        mode = 'ab'
+                    else:
+                        # 200：服务器忽略了 Range 或远端已变化，从头写
+                        mode = 'wb'
+                        offset = 0
+                        self._update_validators(resp)
+
+                    self._save_meta(force=True)
+                    with open(self.part_path, mode) as f:
+                        self._copy_stream(resp, f)
+
+                total = self._meta.get("total")
+                if total is None or self.part_path.stat().st_size >= total:
+                    return
+                # 连接提前关闭：继续续传
+            except _RETRYABLE_ERRORS as e:
+                if attempt == attempts - 1:
+                    raise DownloadError(f"Download interrupted after {attempts} attempts: {e}")
+                time.sleep(min(2 ** attempt, 10))
+        raise DownloadError(f"Download incomplete after {attempts} attempts")
+
+    def _update_validators(self, resp: requests.Response):
+        """完整响应时用 GET 的响应头更新进度文件"""
+        length = resp.headers.get("Content-Length")
+        if length and length.isdigit():
+            self._meta["total"] = int(length)
+        self._meta["etag"] = resp.headers.get("ETag") or self._meta.get("etag")
+        self._meta["last_modified"] = resp.headers.get("Last-Modified") or self._meta.get("last_modified")
+
+    def _copy_stream(self, resp: requests.Response, f, on_progress=None):
+        sizer = _ChunkSizer(self.config["min_chunk_size"], self.config["max_chunk_size"])
+        while True:
+            started = time.monotonic()
+            chunk = resp.raw.read(sizer.size, decode_content=True)
+            if not chunk:
+                break
+            f.write(chunk)
+            sizer.update(len(chunk), time.monotonic() - started)
+            if on_progress:
+                # 先落盘再记录进度，保证进度文件不会超前于实际数据
+                f.flush()
+                on_progress(len(chunk))
+
+    # ===== 多连接并行下载 =====
+
+    def _download_parallel(self, info: Dict[str, Any]):
+        total = info["total"]
+        if self._meta.get("mode") != "parallel" or not self._meta.get("segments"):
+            self._meta["mode"] = "parallel"
+            self._meta["segments"] = self._plan_segments(total)
+            with open(self.part_path, 'wb') as f:
+                f.truncate(total)
+        self._save_meta(force=True)
+
+        segments: List[List[int]] = self._meta["segments"]
+        pending = [i for i, seg in enumerate(segments) if seg[2] < seg[1] - seg[0] + 1]
+
+        with ThreadPoolExecutor(max_workers=self.connections) as pool:
+            futures = [pool.submit(self._fetch_segment, i) for i in pending]
+            errors = []
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append(e)
+
+        self._save_meta(force=True)
+        for e in errors:
+            if isinstance(e, _RangeNotSupported):
+                raise e
+        if errors:
+            raise DownloadError(f"Download interrupted: {errors[0]}")
+
+    def _plan_segments(self, total: int) -> List[List[int]]:
+        """按连接数切分字节区间：[起始, 结束(含), 已下载字节]"""
+        size = -(-total // self.connections)
+        return [
+            [start, min(start + size, total) - 1, 0]
+            for start in range(0, total, size)
+        ]
+
+    def _fetch_segment(self, index: int):
+        segment = self._meta["segments"][index]
+        attempts = self.config["retries"] + 1
+
+        def on_progress(nbytes: int):
+            segment[2] += nbytes
+            self._save_meta()
+
+        for attempt in range(attempts):
+            start = segment[0] + segment[2]
+            if start > segment[1]:
+                return
+            headers = {"Range": f"bytes={start}-{segment[1]}"}
+            validator = self._validator()
+            if validator:
+                headers["If-Range"] = validator
+
+            try:
+                with self.session.get(self.url, headers=headers, stream=True,
+                                      timeout=self.config["timeout"]) as resp:
+                    resp.raise_for_status()
+                    if resp.status_code != 206:
+                        raise _RangeNotSupported(f"Server returned {resp.status_code} for range request")
+                    with open(self.part_path, 'r+b') as f:
+                        f.seek(start)
+                        self._copy_stream(resp, f, on_progress)
+                if segment[0] + segment[2] > segment[1]:
+                    return
+            except _RETRYABLE_ERRORS as e:
+                if attempt == attempts - 1:
+                    raise DownloadError(f"Segment {index} failed after {attempts} attempts: {e}")
+                time.sleep(min(2 ** attempt, 10))
+        if segment[0] + segment[2] <= segment[1]:
+            raise DownloadError(f"Segment {index} incomplete")
+
+
+def download_file(
+    url: str,
+    dest: Path,
+    connections: Optional[int] = None,
+    checksum: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    下载文件到 dest（支持断点续传、并行分段和校验）
+
+    Args:
+        url: 文件URL
+        dest: 目标绝对路径
+        connections: 并行连接数，None 时使用配置（服务器不支持 Range 或文件较小时自动退回单连接）
+        checksum: 可选校验和，如 "sha256:..." 或直接给出十六进制摘要
+
+    Returns:
+        {"path", "size", "resumed_bytes", "parallel", "checksum"}
+    """
+    return Downloader(url, dest, connections, checksum, get_download_config()).run()
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式文件编辑 - FileWriteTool 的增量编辑操作
+所有操作都是边读边写到同目录的临时文件，完成后 os.replace 原子替换；
+大文件不会被整体读入内存，失败时原文件保持不变。
+- replace_lines: 替换指定行范围
+- replace_unique: 替换唯一出现的字符串
+- insert_at_anchor: 在唯一锚点所在行之前/之后插入
+- apply_patch: 应用多 hunk 的 unified diff
+"""
+
+import os
+import re
+import shutil
+import tempfile
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+# 流式读取的块大小（字符）
+CHUNK_SIZE = 1 << 20
+
+
+class EditError(Exception):
+    """编辑无法应用（原文件未被修改）"""
+
+
+@contextmanager
+def _rewrite(path: Path, encoding: str = 'utf-8'):
+    """打开 (源文件, 临时文件)，正常退出时用临时文件替换源文件，异常时丢弃临时文件"""
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with open(path, 'r', encoding=encoding, newline='') as src, \
+                os.fdopen(fd, 'w', encoding=encoding, newline='') as dst:
+            yield src, dst
+        shutil.copymode(path, tmp_name)
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+def _copy_chars(src, dst, count: int):
+    """从 src 复制 count 个字符到 dst"""
+    while count > 0:
+        chunk = src.read(min(CHUNK_SIZE, count))
+        if not chunk:
+            break
+        dst.write(chunk)
+        count -= len(chunk)
+
+
+def _skip_chars(src, count: int):
+    """跳过 src 中的 count 个字符"""
+    while count > 0:
+        chunk = src.read(min(CHUNK_SIZE, count))
+        if not chunk:
+            break
+        count -= len(chunk)
+
+
+def _detect_newline(path: Path, encoding: str = 'utf-8') -> str:
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        first = f.readline()
+    return "\r\n" if first.endswith("\r\n") else "\n"
+
+
+def find_occurrences(path: Path, needle: str, limit: int = 2, encoding: str = 'utf-8') -> List[int]:
+    """
+    流式查找 needle 的出现位置（字符偏移），找到 limit 个后停止
+
+    相邻块之间保留 len(needle)-1 个字符的重叠，跨块的匹配也能找到且不会重复计数
+    """
+    positions = []
+    keep = len(needle) - 1
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        carry = ""
+        base = 0  # carry[0] 在文件中的偏移
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            buf = carry + chunk
+            i = buf.find(needle)
+            while i != -1:
+                positions.append(base + i)
+                if len(positions) >= limit:
+                    return positions
+                i = buf.find(needle, i + 1)
+            carry = buf[-keep:] if keep else ""
+            base += len(buf) - len(carry)
+    return positions
+
+
+def _line_bounds(path: Path, pos: int, encoding: str = 'utf-8') -> Tuple[int, int, int, bool]:
+    """返回偏移 pos 所在行的 (行首偏移, 下一行行首偏移, 行号, 该行是否以换行符结尾)"""
+    offset = 0
+    line_no = 0
+    line = ""
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        for line_no, line in enumerate(f, start=1):
+            if offset + len(line) > pos:
+                break
+            offset += len(line)
+        else:
+            offset -= len(line)
+    return offset, offset + len(line), line_no, line.endswith("\n")
+
+
+def _find_unique(path: Path, needle: str, what: str) -> Tuple[int, str]:
+    """
+    定位唯一出现的 needle；CRLF 文件中自动把 needle 的 \\n 转为 \\r\\n
+
+    Returns:
+        (字符偏移, 实际匹配的文本)
+    """
+    if not needle:
+        raise EditError(f"{what} 不能为空")
+    candidates = [needle]
+    if "\n" in needle and "\r\n" not in needle and _detect_newline(path) == "\r\n":
+        candidates.append(needle.replace("\n", "\r\n"))
+
+    for candidate in candidates:
+        positions = find_occurrences(path, candidate)
+        if len(positions) == 1:
+            return positions[0], candidate
+        if len(positions) > 1:
+            raise EditError(f"{what} 在文件中出现了多次，请加入更多上下文使其唯一")
+    raise EditError(f"{what} 在文件中未找到（需要与文件内容完全一致，包括缩进和空白）")
+
+
+def replace_lines(path: Path, start_line: int, end_line: int, content: str) -> int:
+    """
+    用 content 替换第 start_line 到 end_line 行（含），返回被替换的行数
+    """
+    if start_line < 1 or end_line < start_line:
+        raise EditError(f"无效的行范围: {start_line}-{end_line}")
+    newline = _detect_newline(path)
+    replaced = 0
+    with _rewrite(path) as (src, dst):
+        for line_no, line in enumerate(src, start=1):
+            if line_no < start_line or line_no > end_line:
+                dst.write(line)
+                continue
+            if line_no == start_line:
+                dst.write(content + newline)
+            replaced += 1
+        if replaced == 0:
+            raise EditError(f"起始行 {start_line} 超出文件行数")
+    return replaced
+
+
+def replace_unique(path: Path, old: str, new: str) -> int:
+    """
+    把唯一出现的 old 替换为 new，返回匹配所在行号
+    """
+    pos, matched = _find_unique(path, old, "old_string")
+    if matched is not old:
+        new = new.replace("\r\n", "\n").replace("\n", "\r\n")
+    line_no = _line_bounds(path, pos)[2]
+    with _rewrite(path) as (src, dst):
+        _copy_chars(src, dst, pos)
+        _skip_chars(src, len(matched))
+        dst.write(new)
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    return line_no
+
+
+def insert_at_anchor(path: Path, anchor: str, content: str, position: str = "after") -> int:
+    """
+    在唯一锚点所在行之后（position='after'）或之前（'before'）插入 content，返回插入位置的行号
+    """
+    if position not in ("after", "before"):
+        raise EditError(f"无效的 position: {position}，应为 'after' 或 'before'")
+    pos, matched = _find_unique(path, anchor, "anchor")
+    # 锚点跨多行时，after 以锚点最后一个字符所在的行为准
+    anchor_pos = pos if position == "before" else pos + len(matched) - 1
+    line_start, next_line, line_no, has_newline = _line_bounds(path, anchor_pos)
+    newline = _detect_newline(path)
+
+    text = content.replace("\r\n", "\n").replace("\n", newline)
+    if not text.endswith(newline):
+        text += newline
+    if position == "after" and not has_newline:
+        # 锚点在最后一行且没有换行符
+        text = newline + text
+    insert_at = line_start if position == "before" else next_line
+
+    with _rewrite(path) as (src, dst):
+        _copy_chars(src, dst, insert_at)
+        dst.write(text)
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    return line_no + 1 if position == "after" else line_no
+
+
+_HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+def parse_unified_diff(diff: str) -> List[Dict]:
+    """
+    解析 unified diff 为 hunk 列表
+
+    Returns:
+        [{"old_start": int, "old": [旧行（含上下文）], "new": [新行（含上下文）], "added": int, "removed": int}]
+    """
+    lines = diff.replace("\r\n", "\n").split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+
+    hunks = []
+    current = None
+    for raw in lines:
+        match = _HUNK_HEADER.match(raw)
+        if match:
+            current = {"old_start": int(match.group(1)), "old": [], "new": [], "added": 0, "removed": 0}
+            hunks.append(current)
+            continue
+        if current is None or raw.startswith("\\"):
+            # 文件头（---/+++/diff）和 "\ No newline at end of file"
+            continue
+        # 空行视为空的上下文行（很多 diff 会去掉上下文行前的空格）
+        tag, text = (raw[:1], raw[1:]) if raw else (" ", "")
+        if tag == " ":
+            current["old"].append(text)
+            current["new"].append(text)
+        elif tag == "-":
+            current["old"].append(text)
+            current["removed"] += 1
+        elif tag == "+":
+            current["new"].append(text)
+            current["added"] += 1
+        else:
+            raise EditError(f"无法解析的 diff 行: {raw[:80]}")
+
+    if not hunks:
+        raise EditError("patch 中没有找到 hunk（需要 unified diff 格式，以 '@@ -a,b +c,d @@' 开头）")
+    return hunks
+
+
+def _find_hunk_matches(path: Path, hunks: List[Dict]) -> Tuple[List[List[int]], int]:
+    """
+    逐行扫描文件，记录每个 hunk 的旧行（上下文 + 删除行）在文件中所有匹配的起始行（从0开始）
+
+    Returns:
+        (每个 hunk 的匹配起始行列表, 文件总行数)
+    """
+    matches: List[List[int]] = [[] for _ in hunks]
+    longest = max((len(h["old"]) for h in hunks), default=0)
+    window: deque = deque(maxlen=max(longest, 1))
+    line_no = 0
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for line in f:
+            window.append(line.rstrip("\r\n"))
+            line_no += 1
+            for hunk, found in zip(hunks, matches):
+                old = hunk["old"]
+                if not old or len(old) > len(window):
+                    continue
+                start = len(window) - len(old)
+                if window[start] == old[0] and all(window[start + k] == text for k, text in enumerate(old)):
+                    found.append(line_no - len(old))
+    return matches, line_no
+
+
+def apply_patch(path: Path, diff: str) -> Dict[str, int]:
+    """
+    流式应用 unified diff
+
+    和 patch/git apply 一样按 hunk 头的行号（加上前面 hunk 累计的偏移）定位：
+    第一遍扫描记录每个 hunk 旧内容的所有匹配位置，取离预期行最近的一处，
+    前后距离相同的两处匹配视为位置不明确并拒绝；第二遍按确定的位置边读边写。
+    内存占用与文件大小无关（只保存匹配位置）
+
+    Returns:
+        {"hunks": 应用的 hunk 数, "added": 新增行数, "removed": 删除行数}
+    """
+    hunks = parse_unified_diff(diff)
+    newline = _detect_newline(path)
+    matches, total_lines = _find_hunk_matches(path, hunks)
+
+    positions = []
+    offset = 0
+    line_no = 0  # 前一个 hunk 结束后的行（从0开始），后面的 hunk 不能与之重叠
+    for index, (hunk, found) in enumerate(zip(hunks, matches)):
+        old = hunk["old"]
+        if not old:
+            # 纯新增：插入到原文件第 old_start 行之后
+            position = min(max(hunk["old_start"] + offset, line_no), total_lines)
+        else:
+            expected = max(hunk["old_start"] - 1, 0) + offset
+            candidates = [p for p in found if p >= line_no]
+            if not candidates:
+                raise EditError(
+                    f"第 {index + 1} 个 hunk 无法匹配：第 {line_no + 1} 行之后找不到它的上下文/删除行 "
+                    f"(首行 {old[0][:80]!r})"
+                )
+            position = min(candidates, key=lambda p: abs(p - expected))
+            if expected * 2 - position in candidates and position != expected:
+                raise EditError(
+                    f"第 {index + 1} 个 hunk 位置不明确：第 {min(position, expected * 2 - position) + 1} 行和"
+                    f"第 {max(position, expected * 2 - position) + 1} 行与预期的第 {expected + 1} 行距离相同，"
+                    f"请补充更多上下文 (首行 {old[0][:80]!r})"
+                )
+            offset = position - max(hunk["old_start"] - 1, 0)
+        positions.append(position)
+        line_no = position + len(old)
+
+    with _rewrite(path) as (src, dst):
+        line_no = 0
+        for hunk, position in zip(hunks, positions):
+            while line_no < position:
+                line = src.readline()
+                if not line:
+                    break
+                dst.write(line)
+                line_no += 1
+            for _ in hunk["old"]:
+                src.readline()
+                line_no += 1
+            dst.write("".join(text + newline for text in hunk["new"]))
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+    return {
+        "hunks": len(hunks),
+        "added": sum(h["added"] for h in hunks),
+        "removed": sum(h["removed"] for h in hunks),
+    }
@@ -4,11 +4,19 @@
 文件操作工具
 """
 
-from pathlib import Path
-from typing import Dict, Any, Optional
+from pathlib import Path, PurePosixPath
+from typing import Dict, Any, Iterator, Optional
+import codecs
+import os
+import re
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 import chardet
 
+from .file_edit import EditError, apply_patch, insert_at_anchor, replace_lines, replace_unique
+from .line_index import LineReader
+from .tool_config import load_tool_config, get_cache_root
+
 
 class BaseTool:
     """工具基类"""
@@ -35,11 +43,151 @@ def get_abs_path(task_id: str, relative_path: str) -> Path:
     return workspace / rel_path
 
 
+# file_read 默认配置（可在 tool_config.yaml 的 file_read 段覆盖）
+DEFAULT_FILE_READ_CONFIG = {
+    "format": "numbered",      # numbered: "  12\t内容"；json: 旧版逐行 JSON；plain: 纯文本
+    "max_bytes": 200_000,      # 单个文件返回内容的字节上限
+    "max_tokens": 50_000,      # 单个文件返回内容的估算 token 上限
+    "max_line_chars": 4000,    # 单行字符上限（压缩后的 JS/CSV 等超长行会被截断）
+                               # 以上三个上限设为 0 或 null 表示不限制
+    "index_min_size_mb": 8,    # 不小于该大小的文件，行索引持久化到缓存目录
+    # 多文件模式
+    "total_max_bytes": 400_000,   # 一次调用所有文件的总字节预算（0 不限制）
+    "total_max_tokens": 100_000,  # 一次调用所有文件的总估算 token 预算（0 不限制）
+    "max_files": 50,              # glob 展开后最多读取的文件数
+    "read_workers": 8,            # 并行读取线程数
+}
+
+FILE_READ_FORMATS = ("numbered", "json", "plain")
+
+
+def get_file_read_config() -> Dict[str, Any]:
+    """读取 file_read 配置（tool_config.yaml 覆盖默认值）"""
+    config = dict(DEFAULT_FILE_READ_CONFIG)
+    config.update(load_tool_config().get("file_read") or {})
+    return config
+
+
+def is_glob_pattern(path: str) -> bool:
+    return any(ch in str(path) for ch in "*?[")
+
+
+# glob 通配展开和 workspace 检索索引都不进入的目录（另外跳过隐藏目录和虚拟环境）
+SKIP_DIRS = {"code_env", "__pycache__", "node_modules"}
+
+
+def _glob_regex(pattern: str) -> "re.Pattern":
+    """把 glob 模式（支持 **）转换为匹配 '/' 分隔相对路径的正则"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:[^/]*/)*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end]
+            out.append("[" + ("^" + body[1:] if body.startswith("!") else body).replace("\\", "\\\\") + "]")
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(out))
+
+
+def iter_glob(workspace: Path, pattern: str) -> Iterator[Path]:
+    """
+    按 glob 模式遍历 workspace 中的文件（按路径排序，边遍历边产出）
+
+    从模式中不含通配符的前缀目录开始 os.walk，通配部分不进入 SKIP_DIRS、隐藏目录和虚拟环境，
+    也不匹配隐藏文件；没有 ** 时只遍历到模式的深度
+    """
+    parts = PurePosixPath(pattern).parts
+    fixed = 0
+    while fixed < len(parts) and not is_glob_pattern(parts[fixed]):
+        fixed += 1
+    base = Path(workspace).joinpath(*parts[:fixed])
+    rest = parts[fixed:]
+    if not rest:
+        if base.is_file():
+            yield base
+        return
+    regex = _glob_regex("/".join(rest))
+    max_depth = None if any("**" in part for part in rest) else len(rest) - 1
+
+    for root, dirs, files in os.walk(base):
+        rel_root = Path(root).relative_to(base).as_posix()
+        depth = 0 if rel_root == "." else rel_root.count("/") + 1
+        if max_depth is not None and depth >= max_depth:
+            dirs[:] = []
+        else:
+            dirs[:] = sorted(
+                d for d in dirs
+                if not d.startswith('.') and d not in SKIP_DIRS and not os.path.exists(os.path.join(root, d, 'pyvenv.cfg'))
+            )
+        for name in sorted(files):
+            if name.startswith('.'):
+                continue
+            rel = name if rel_root == "." else f"{rel_root}/{name}"
+            if regex.fullmatch(rel):
+                yield Path(root) / name
+
+
+def fair_shares(demands: Dict[str, int], budget: float) -> Dict[str, float]:
+    """
+    按 max-min 公平原则分配预算：需求小于平均份额的全额满足，剩余预算在其他项之间均分
+
+    Args:
+        demands: {键: 需求量}
+        budget: 总预算（inf 表示不限制）
+
+    Returns:
+        {键: 分到的额度}
+    """
+    shares = {}
+    remaining = dict(demands)
+    left = budget
+    while remaining:
+        share = left / len(remaining)
+        satisfied = {key: demand for key, demand in remaining.items() if demand <= share}
+        if not satisfied:
+            shares.update({key: int(share) for key in remaining})
+            break
+        for key, demand in satisfied.items():
+            shares[key] = demand
+            left -= demand
+            del remaining[key]
+    return shares
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：ASCII 约 4 字符/token，其他字符（中文等）约 1 字符/token"""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
 def detect_encoding(file_path: Path) -> str:
-    """检测文件编码"""
+    """检测文件编码（样本能按 UTF-8 解码时直接返回，否则交给 chardet）"""
     try:
         with open(file_path, 'rb') as f:
             raw_data = f.read(10240)
+        if raw_data.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        try:
+            # 增量解码：样本末尾被截断的多字节字符不算错误
+            codecs.getincrementaldecoder('utf-8')().decode(raw_data, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
         result = chardet.detect(raw_data)
         encoding = result.get('encoding', 'utf-8')
         return encoding or 'utf-8'
@@ -98,7 +246,13 @@ class FileReadTool(BaseTool):
             start_line (int, optional): 起始行号（从1开始）
             end_line (int, optional): 结束行号
             encoding (str, optional): 文件编码
-            show_line_numbers (bool, optional): 是否显示行号，默认 True
+            show_line_numbers (bool, optional): 是否显示行号，默认 True（False 等同 format='plain'）
+            format (str, optional): 输出格式 numbered / json / plain，默认取 tool_config.yaml 的 file_read.format
+            max_bytes (int, optional): 单个文件返回内容的字节上限，0 表示不限制
+            max_tokens (int, optional): 单个文件返回内容的估算 token 上限，0 表示不限制
+        
+        多文件模式下 path 支持 glob（如 'src/**/*.py'），文件并行读取，
+        总输出受 total_max_bytes / total_max_tokens 限制并在文件间公平分配
         """
         try:
             # 兼容 path 和 file_path 两种参数名
@@ -122,13 +276,21 @@ class FileReadTool(BaseTool):
                     "error": f"Invalid path type: {type(path).__name__}, expected list"
                 }
             
-            # 根据列表长度决定使用哪种模式
-            if len(path) == 1:
+            options = self._resolve_options(parameters)
+            if options["format"] not in FILE_READ_FORMATS:
+                return {
+                    "status": "error",
+                    "output": "",
+                    "error": f"Invalid format: {options['format']}, expected one of {', '.join(FILE_READ_FORMATS)}"
+                }
+            
+            # 根据列表长度决定使用哪种模式（glob 可能匹配多个文件，按多文件处理）
+            if len(path) == 1 and not is_glob_pattern(path[0]):
                 # 单文件模式
-                return self._read_single_file(task_id, path[0], parameters)
+                return self._read_single_file(task_id, path[0], parameters, options)
             else:
                 # 多文件模式
-                return self._read_multiple_files(task_id, path, parameters)
+                return self._read_multiple_files(task_id, path, parameters, options)
             
         except Exception as e:
             return {
@@ -137,13 +299,115 @@ class FileReadTool(BaseTool):
                 "error": str(e)
             }
     
-    def _read_single_file(self, task_id: str, path: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
-        """读取单个文件"""
+    def _resolve_options(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """合并调用参数和服务器默认配置"""
+        config = get_file_read_config()
+        fmt = parameters.get("format") or config["format"]
+        if parameters.get("show_line_numbers", True) is False:
+            fmt = "plain"
+        options = {"format": fmt}
+        for key in ("max_bytes", "max_tokens", "max_line_chars", "total_max_bytes", "total_max_tokens"):
+            # 0 或 null 表示不限制
+            value = parameters[key] if parameters.get(key) is not None else config[key]
+            options[key] = int(value) if value else float("inf")
+        return options
+    
+    def _open(self, abs_path: Path, encoding: Optional[str]) -> LineReader:
+        """打开按行读取器（自动检测编码）；大文件的行索引持久化到缓存目录"""
+        if not encoding:
+            encoding = detect_encoding(abs_path)
+        min_size = get_file_read_config()["index_min_size_mb"] * 1024 * 1024
+        index_dir = get_cache_root() / "line_index" if abs_path.stat().st_size >= min_size else None
+        return LineReader(abs_path, encoding, index_dir=index_dir)
+    
+    def _render(self, reader: LineReader, parameters: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        按行范围和大小上限格式化内容（只读取需要的行，达到上限后立即停止）
+        
+        Returns:
+            {"content": 格式化后的内容（json 格式时为行对象列表）, "first": 首行号,
+             "last": 实际返回的末行号, "requested_last": 请求的末行号, "truncated": 是否因上限截断}
+        """
+        total_lines = reader.total_lines
         start_line = parameters.get("start_line")
         end_line = parameters.get("end_line")
-        encoding = parameters.get("encoding")
-        show_line_numbers = parameters.get("show_line_numbers", True)
+        start_idx = max((start_line - 1) if start_line else 0, 0)
+        end_idx = min(end_line if end_line else total_lines, total_lines)
+        
+        fmt = options["format"]
+        max_line_chars = options["max_line_chars"]
+        # 超长行最多解码 4 字节/字符，剩余部分不读入内存
+        max_line_bytes = None if max_line_chars == float("inf") else int(max_line_chars) * 4
+        width = len(str(max(end_idx, 1)))
+        
+        rendered = []
+        used_bytes = 0
+        used_tokens = 0
+        last = start_idx
+        truncated = False
+        lines = reader.iter_lines(start_idx, max_line_bytes)
+        try:
+            for i, (line, skipped) in zip(range(start_idx, end_idx), lines):
+                text = line.rstrip('\n\r')
+                if len(text) > max_line_chars or skipped:
+                    omitted = len(text) - int(max_line_chars) + skipped
+                    text = text[:int(max_line_chars)] + f" …[该行过长，省略 {omitted} 字符]"
+                
+                if fmt == "numbered":
+                    piece = f"{i + 1:>{width}}\t{text}"
+                elif fmt == "json":
+                    piece = {"line": i + 1, "content": text}
+                else:
+                    piece = line if len(line) <= max_line_chars + 1 and not skipped else text + "\n"
+                
+                size_text = piece if isinstance(piece, str) else text
+                piece_bytes = len(size_text.encode('utf-8')) + 1
+                piece_tokens = estimate_tokens(size_text) + 1
+                if rendered and (used_bytes + piece_bytes > options["max_bytes"]
+                                 or used_tokens + piece_tokens > options["max_tokens"]):
+                    truncated = True
+                    break
+                rendered.append(piece)
+                used_bytes += piece_bytes
+                used_tokens += piece_tokens
+                last = i + 1
+        finally:
+            lines.close()
         
+        if fmt == "numbered":
+            content = "\n".join(rendered)
+        elif fmt == "json":
+            content = rendered
+        else:
+            content = "".join(rendered)
+        
+        return {
+            "content": content,
+            "first": start_idx + 1,
+            "last": last,
+            "requested_last": end_idx,
+            "truncated": truncated,
+            "total_lines": total_lines,
+            "used_bytes": used_bytes,
+            "used_tokens": used_tokens,
+        }
+    
+    def _continuation_hint(self, path: str, view: Dict[str, Any], total_lines: int) -> str:
+        """截断提示：告诉模型从哪一行继续读"""
+        next_call = f"path=['{path}'], start_line={view['last'] + 1}"
+        if view["requested_last"] < total_lines:
+            next_call += f", end_line={view['requested_last']}"
+        return (
+            f"[输出已截断：显示第 {view['first']}-{view['last']} 行（文件共 {total_lines} 行）。"
+            f"继续读取请使用 {next_call}]"
+        )
+    
+    def _read_single_file(self, task_id: str, path: str, parameters: Dict[str, Any],
+                          options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """读取单个文件"""
+        import json
+        
+        options = options or self._resolve_options(parameters)
         abs_path = get_abs_path(task_id, path)
         
         # 检查文件是否存在
@@ -162,38 +426,17 @@ class FileReadTool(BaseTool):
                 "error": f"Cannot read binary file: {path}. Use other tools to analyze the file."
             }
         
-        # 自动检测编码
-        if not encoding:
-            encoding = detect_encoding(abs_path)
-        
-        # 读取文件
-        try:
-            with open(abs_path, 'r', encoding=encoding) as f:
-                lines = f.readlines()
-        except UnicodeDecodeError:
-            # 如果指定编码失败，尝试 utf-8
-            with open(abs_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-        
-        # 处理行范围
-        start_idx = (start_line - 1) if start_line else 0
-        end_idx = end_line if end_line else len(lines)
-        selected_lines = lines[start_idx:end_idx]
+        view = self._render(self._open(abs_path, parameters.get("encoding")), parameters, options)
         
         # 格式化输出
-        if show_line_numbers:
-            # 带行号格式
-            import json
-            output_lines = []
-            for i, line in enumerate(selected_lines, start=start_idx + 1):
-                output_lines.append({
-                    "line": i,
-                    "content": line.rstrip('\n\r')
-                })
-            content = json.dumps(output_lines, ensure_ascii=False, indent=2)
+        if options["format"] == "json":
+            content = json.dumps(view["content"], ensure_ascii=False, indent=2)
         else:
-            # 纯文本格式
-            content = ''.join(selected_lines)
+            content = view["content"]
+        
+        if view["truncated"]:
+            separator = "" if options["format"] == "plain" and content.endswith("\n") else "\n"
+            content += separator + self._continuation_hint(path, view, view["total_lines"])
         
         return {
             "status": "success",
@@ -201,114 +444,186 @@ class FileReadTool(BaseTool):
             "error": ""
         }
     
-    def _read_multiple_files(self, task_id: str, paths: list, parameters: Dict[str, Any]) -> Dict[str, Any]:
-        """读取多个文件"""
+    def _expand_paths(self, task_id: str, patterns: list, max_files: int):
+        """
+        展开 glob 并去重（保持顺序），收集到 max_files 个文件后停止遍历
+        
+        Returns:
+            (文件路径列表, {无匹配的模式: 错误信息}, 是否还有未读取的匹配文件)
+        """
+        workspace = Path(task_id)
+        paths = {}
+        errors = {}
+        more = False
+        for pattern in patterns:
+            if not is_glob_pattern(pattern):
+                paths.setdefault(pattern, None)
+                continue
+            rel_pattern = get_abs_path(task_id, pattern).relative_to(workspace).as_posix()
+            matched = False
+            for match in iter_glob(workspace, rel_pattern):
+                if len(paths) >= max_files:
+                    more = True
+                    break
+                # 二进制检查要打开文件，只对需要的候选做
+                if not is_binary_file(match):
+                    matched = True
+                    paths.setdefault(match.relative_to(workspace).as_posix(), None)
+            if not matched and not more:
+                errors[pattern] = f"No text files match pattern: {pattern}"
+        
+        paths = list(paths)
+        more = more or len(paths) > max_files
+        return paths[:max_files], errors, more
+    
+    def _read_multiple_files(self, task_id: str, paths: list, parameters: Dict[str, Any],
+                             options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """读取多个文件（并行读取，总输出按公平份额分配预算）"""
         import json
         
-        start_line = parameters.get("start_line")
-        end_line = parameters.get("end_line")
-        encoding = parameters.get("encoding")
-        show_line_numbers = parameters.get("show_line_numbers", True)
+        options = options or self._resolve_options(parameters)
+        config = get_file_read_config()
+        paths, pattern_errors, more = self._expand_paths(task_id, paths, int(config["max_files"]))
         
-        results = {}
-        errors = []
-        success_count = 0
+        def load(path: str) -> Dict[str, Any]:
+            abs_path = get_abs_path(task_id, path)
+            # 检查文件是否存在
+            if not abs_path.exists():
+                return {"status": "error", "error": f"File not found: {path}"}
+            # 检查是否为二进制文件
+            if is_binary_file(abs_path):
+                return {"status": "error", "error": f"Cannot read binary file: {path}"}
+            reader = self._open(abs_path, parameters.get("encoding"))
+            return {"status": "success", "reader": reader, "view": self._render(reader, parameters, options)}
         
-        for path in paths:
+        def safe_load(path: str) -> Dict[str, Any]:
             try:
-                abs_path = get_abs_path(task_id, path)
-                
-                # 检查文件是否存在
-                if not abs_path.exists():
-                    errors.append(f"File not found: {path}")
-                    results[path] = {
-                        "status": "error",
-                        "error": f"File not found: {path}"
-                    }
-                    continue
-                
-                # 检查是否为二进制文件
-                if is_binary_file(abs_path):
-                    errors.append(f"Cannot read binary file: {path}")
-                    results[path] = {
-                        "status": "error",
-                        "error": f"Binary file, use other tools"
-                    }
-                    continue
-                
-                # 自动检测编码
-                file_encoding = encoding or detect_encoding(abs_path)
-                
-                # 读取文件
-                try:
-                    with open(abs_path, 'r', encoding=file_encoding) as f:
-                        lines = f.readlines()
-                except UnicodeDecodeError:
-                    with open(abs_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        lines = f.readlines()
-                
-                # 处理行范围
-                start_idx = (start_line - 1) if start_line else 0
-                end_idx = end_line if end_line else len(lines)
-                selected_lines = lines[start_idx:end_idx]
-                
-                # 格式化内容
-                if show_line_numbers:
-                    output_lines = []
-                    for i, line in enumerate(selected_lines, start=start_idx + 1):
-                        output_lines.append({
-                            "line": i,
-                            "content": line.rstrip('\n\r')
-                        })
-                    content = output_lines  # 保持为列表，稍后统一序列化
-                else:
-                    content = ''.join(selected_lines)
-                
-                results[path] = {
-                    "status": "success",
-                    "content": content,
-                    "total_lines": len(lines)
-                }
-                success_count += 1
-                
+                return load(path)
             except Exception as e:
-                errors.append(f"{path}: {str(e)}")
-                results[path] = {
-                    "status": "error",
-                    "error": str(e)
-                }
+                return {"status": "error", "error": f"{path}: {str(e)}"}
         
-        # 构建输出
-        output_data = {
-            "total_files": len(paths),
-            "success_count": success_count,
-            "error_count": len(errors),
-            "files": results
-        }
+        # 第一轮：并行读取，每个文件只受单文件上限约束，得到各自的需求量
+        workers = max(1, min(int(config["read_workers"]), len(paths) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            loaded = dict(zip(paths, pool.map(safe_load, paths)))
+        
+        # 第二轮：超出公平份额的文件按分到的预算重新渲染
+        ok = [path for path in paths if loaded[path]["status"] == "success"]
+        byte_caps = fair_shares({p: loaded[p]["view"]["used_bytes"] for p in ok}, options["total_max_bytes"])
+        token_caps = fair_shares({p: loaded[p]["view"]["used_tokens"] for p in ok}, options["total_max_tokens"])
+        over_budget = [
+            p for p in ok
+            if byte_caps[p] < loaded[p]["view"]["used_bytes"] or token_caps[p] < loaded[p]["view"]["used_tokens"]
+        ]
+        
+        def shrink(path: str) -> Dict[str, Any]:
+            capped = dict(options, max_bytes=byte_caps[path], max_tokens=token_caps[path])
+            return self._render(loaded[path]["reader"], parameters, capped)
+        
+        if over_budget:
+            with ThreadPoolExecutor(max_workers=min(workers, len(over_budget))) as pool:
+                for path, view in zip(over_budget, pool.map(shrink, over_budget)):
+                    loaded[path]["view"] = view
+        
+        results = {}
+        errors = []
+        files_meta = {}
+        for pattern, error in pattern_errors.items():
+            errors.append(error)
+            results[pattern] = {"status": "error", "error": error}
+        for path in paths:
+            item = loaded[path]
+            if item["status"] != "success":
+                errors.append(item["error"])
+                results[path] = {"status": "error", "error": item["error"]}
+                continue
+            view = item["view"]
+            results[path] = {
+                "status": "success",
+                "content": view["content"],
+                "total_lines": view["total_lines"]
+            }
+            if view["truncated"]:
+                results[path]["truncated"] = self._continuation_hint(path, view, view["total_lines"])
+            files_meta[path] = {
+                "lines": f"{view['first']}-{view['last']}",
+                "total_lines": view["total_lines"],
+                "truncated": view["truncated"],
+                "budget_limited": path in over_budget,
+            }
+        
+        success_count = len(files_meta)
+        listed = list(pattern_errors) + paths
+        notes = []
+        if over_budget:
+            notes.append(f"总输出预算按文件均分，{len(over_budget)} 个文件被截断")
+        if more:
+            notes.append(f"匹配文件过多，只读取了前 {config['max_files']} 个文件")
         
-        if errors:
-            output_data["errors"] = errors
+        # 构建输出
+        if options["format"] == "json":
+            output_data = {
+                "total_files": len(listed),
+                "success_count": success_count,
+                "error_count": len(errors),
+                "files": results
+            }
+            if errors:
+                output_data["errors"] = errors
+            if notes:
+                output_data["notes"] = notes
+            output = json.dumps(output_data, ensure_ascii=False, indent=2)
+        else:
+            output = self._format_sections(listed, results, success_count, notes)
         
         return {
             "status": "success" if success_count > 0 else "error",
-            "output": json.dumps(output_data, ensure_ascii=False, indent=2),
-            "error": "\n".join(errors) if errors else ""
+            "output": output,
+            "error": "\n".join(errors) if errors else "",
+            "files": files_meta
         }
+    
+    def _format_sections(self, paths: list, results: Dict[str, Any], success_count: int,
+                         notes: Optional[list] = None) -> str:
+        """多文件的紧凑文本输出：每个文件一节"""
+        header = f"[读取 {success_count}/{len(paths)} 个文件"
+        sections = ["；".join([header] + (notes or [])) + "]"]
+        for path in paths:
+            info = results[path]
+            if info["status"] != "success":
+                sections.append(f"==> {path} <== [error] {info['error']}")
+                continue
+            section = f"==> {path} <== ({info['total_lines']} lines)\n{info['content']}".rstrip("\n")
+            if info.get("truncated"):
+                section += "\n" + info["truncated"]
+            sections.append(section)
+        return "\n\n".join(sections)
 
 
 class FileWriteTool(BaseTool):
     """文件写入工具"""
     
+    EDIT_MODES = ("replace", "insert", "patch")
+    
     def execute(self, task_id: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """
         写入文件
         
         Parameters:
             path (str): 相对路径
-            content (str): 文件内容
-            mode (str, optional): 写入模式 'write'(覆盖) 或 'append'(追加)，默认 'write'
-            start_line (int, optional): replace模式 - 起始行号
-            end_line (int, optional): replace模式 - 结束行号
+            content (str): 文件内容（insert 模式为插入的内容，patch 模式为 unified diff）
+            mode (str, optional): 写入模式，默认 'write'
+                - 'write' 覆盖 / 'append' 追加
+                - 'replace': 把唯一出现的 old_string 替换为 new_string
+                - 'insert': 在唯一锚点 anchor 所在行之后（position='before' 时为之前）插入 content
+                - 'patch': 应用 content 中的 unified diff（可包含多个 hunk）
+            start_line (int, optional): 行替换 - 起始行号
+            end_line (int, optional): 行替换 - 结束行号
+            old_string / new_string (str, optional): replace 模式参数
+            anchor (str, optional): insert 模式的锚点文本
+            position (str, optional): insert 模式插入位置 'after'（默认）或 'before'
+        
+        编辑操作（行替换、replace、insert、patch）都是流式写入临时文件后原子替换，不会把大文件整体读入内存
         """
         try:
             path = parameters.get("path")
@@ -327,36 +642,31 @@ class FileWriteTool(BaseTool):
             
             abs_path = get_abs_path(task_id, path)
             
-            # 确保父目录存在
-            abs_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Replace line 模式
-            if start_line is not None:
-                if not abs_path.exists():
+            # 编辑已有文件
+            if start_line is not None or mode in self.EDIT_MODES:
+                if not abs_path.is_file():
                     return {
                         "status": "error",
                         "output": "",
-                        "error": f"File not found for line replacement: {path}"
+                        "error": f"File not found for editing: {path}"
+                    }
+                try:
+                    msg = self._edit(abs_path, path, mode, parameters)
+                except EditError as e:
+                    return {
+                        "status": "error",
+                        "output": "",
+                        "error": f"{e}（文件未修改）"
                     }
-                
-                with open(abs_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                
-                start_idx = start_line - 1
-                end_idx = end_line if end_line else start_line
-                
-                # 替换指定行
-                new_lines = lines[:start_idx] + [content + '\n'] + lines[end_idx:]
-                
-                with open(abs_path, 'w', encoding='utf-8') as f:
-                    f.writelines(new_lines)
-                
                 return {
                     "status": "success",
-                    "output": f"Replaced lines {start_line}-{end_idx} in {path}",
+                    "output": msg,
                     "error": ""
                 }
             
+            # 确保父目录存在
+            abs_path.parent.mkdir(parents=True, exist_ok=True)
+            
             # 普通写入模式
             if mode == "append":
                 with open(abs_path, 'a', encoding='utf-8') as f:
@@ -379,6 +689,32 @@ class FileWriteTool(BaseTool):
                 "output": "",
                 "error": str(e)
             }
+    
+    def _edit(self, abs_path: Path, path: str, mode: str, parameters: Dict[str, Any]) -> str:
+        """执行增量编辑，返回结果描述；无法应用时抛出 EditError"""
+        content = parameters.get("content", "")
+        
+        # Replace line 模式
+        if parameters.get("start_line") is not None:
+            start_line = int(parameters["start_line"])
+            end_line = int(parameters.get("end_line") or start_line)
+            replaced = replace_lines(abs_path, start_line, end_line, content)
+            return f"Replaced lines {start_line}-{start_line + replaced - 1} in {path}"
+        
+        if mode == "replace":
+            if "old_string" not in parameters or "new_string" not in parameters:
+                raise EditError("replace 模式需要 old_string 和 new_string 参数")
+            line_no = replace_unique(abs_path, parameters["old_string"], parameters["new_string"])
+            return f"Replaced 1 occurrence at line {line_no} in {path}"
+        
+        if mode == "insert":
+            position = parameters.get("position", "after")
+            line_no = insert_at_anchor(abs_path, parameters.get("anchor", ""), content, position)
+            inserted = content.count("\n") + (0 if content.endswith("\n") else 1)
+            return f"Inserted {inserted} line(s) at line {line_no} in {path}"
+        
+        stats = apply_patch(abs_path, content)
+        return f"Applied {stats['hunks']} hunk(s) to {path} (+{stats['added']} -{stats['removed']} lines)"
 
 
 class DirListTool(BaseTool):
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vision 调用前的图片预处理与结果缓存
+- 长边超过 max_edge 时等比缩小，再按目标质量重新编码为 JPEG/WebP（只在确实变小时采用）
+- 回答缓存：键为 (图片内容哈希, 问题, 模型, 预处理参数)，TTL + LRU
+Pillow 不可用时原样上传
+"""
+
+import hashlib
+import io
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .disk_cache import DiskCache
+from .tool_config import load_tool_config, get_cache_root
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+
+# 默认配置（可在 tool_config.yaml 的 vision 段覆盖）
+DEFAULT_VISION_CONFIG = {
+    "max_edge": 1568,           # 长边上限（像素），0 表示不缩放
+    "format": "jpeg",           # 重新编码格式：jpeg / webp
+    "quality": 85,              # 重新编码质量
+    "cache_enabled": True,
+    "cache_ttl": 30 * 86400,    # 回答缓存有效期（秒）
+    "cache_max_entries": 2000,
+    "batch_mode": "concurrent",  # 批量分析：concurrent 逐张并发请求 / pack 多张图片合并为一次请求
+    "max_workers": 4,           # 批量分析的并发请求数
+    "pack_size": 4,             # pack 模式下每次请求的图片数
+    "max_images": 50,           # 一次调用最多分析的图片数
+}
+
+BATCH_MODES = ("concurrent", "pack")
+
+MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp'
+}
+
+
+def get_vision_config() -> Dict[str, Any]:
+    config = dict(DEFAULT_VISION_CONFIG)
+    config.update(load_tool_config().get("vision") or {})
+    return config
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def prepare_image(path: Path, max_edge: int, fmt: str = "jpeg", quality: int = 85) -> Dict[str, Any]:
+    """
+    读取并预处理图片
+
+    Args:
+        path: 图片路径
+        max_edge: 长边上限（像素），0 表示不缩放
+        fmt: 重新编码格式 jpeg / webp
+        quality: 编码质量
+
+    Returns:
+        {"data": 上传的字节, "mime_type", "original_bytes", "uploaded_bytes",
+         "original_size": (宽, 高) 或 None, "size": (宽, 高) 或 None}
+    """
+    path = Path(path)
+    original = path.read_bytes()
+    result = {
+        "data": original,
+        "mime_type": MIME_TYPES.get(path.suffix.lower(), 'image/jpeg'),
+        "original_bytes": len(original),
+        "uploaded_bytes": len(original),
+        "original_size": None,
+        "size": None,
+    }
+    if not HAS_PIL:
+        return result
+
+    try:
+        with Image.open(io.BytesIO(original)) as img:
+            img.seek(0)  # 动图只取第一帧
+            result["original_size"] = result["size"] = img.size
+            scale = max_edge / max(img.size) if max_edge else 1.0
+            if scale >= 1.0 and len(original) <= 512 * 1024:
+                # 尺寸和体积都不大，直接上传原图，避免无谓的有损压缩
+                return result
+
+            frame = img.convert("RGBA") if img.mode in ("P", "LA", "PA") else img.copy()
+            if scale < 1.0:
+                new_size = (max(1, round(img.size[0] * scale)), max(1, round(img.size[1] * scale)))
+                frame = frame.resize(new_size, Image.LANCZOS)
+
+            fmt = fmt.lower()
+            if fmt == "jpeg" and frame.mode != "RGB":
+                # JPEG 不支持透明通道：铺白底
+                background = Image.new("RGB", frame.size, (255, 255, 255))
+                rgba = frame.convert("RGBA")
+                background.paste(rgba, mask=rgba.split()[-1])
+                frame = background
+
+            buffer = io.BytesIO()
+            frame.save(buffer, format=fmt.upper(), quality=quality)
+            encoded = buffer.getvalue()
+    except Exception:
+        # 无法解析的图片交给模型端处理
+        return result
+
+    if scale < 1.0 or len(encoded) < len(original):
+        result.update({
+            "data": encoded,
+            "mime_type": f"image/{fmt}",
+            "uploaded_bytes": len(encoded),
+            "size": frame.size,
+        })
+    return result
+
+
+# ===== 回答缓存 =====
+
+_cache_instance: Optional[DiskCache] = None
+_upload_stats = {"calls": 0, "original_bytes": 0, "uploaded_bytes": 0}
+_stats_lock = threading.Lock()
+
+
+def get_vision_cache() -> Optional[DiskCache]:
+    """获取 Vision 回答缓存单例，配置中关闭时返回 None"""
+    global _cache_instance
+    config = get_vision_config()
+    if not config["cache_enabled"]:
+        return None
+    if _cache_instance is None:
+        _cache_instance = DiskCache(
+            get_cache_root() / "vision",
+            ttl=config["cache_ttl"],
+            max_entries=config["cache_max_entries"]
+        )
+    return _cache_instance
+
+
+def make_vision_key(image_hash: str, question: str, model: str, prep: Dict[str, Any]) -> str:
+    return DiskCache.make_key("vision", image_hash, question.strip(), model, prep)
+
+
+def record_upload(original_bytes: int, uploaded_bytes: int):
+    with _stats_lock:
+        _upload_stats["calls"] += 1
+        _upload_stats["original_bytes"] += original_bytes
+        _upload_stats["uploaded_bytes"] += uploaded_bytes
+
+
+def vision_stats() -> Optional[Dict[str, Any]]:
+    """缓存命中与上传字节统计（GET /api/cache/stats）"""
+    cache = get_vision_cache()
+    with _stats_lock:
+        uploads = dict(_upload_stats)
+    return {**(cache.stats() if cache else {}), "uploads": uploads}
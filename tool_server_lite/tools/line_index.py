@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大文件按行随机读取
+- mmap 读取，只解码请求的行，不把整个文件读进内存
+- 稀疏行索引：每 INDEX_STRIDE 字节记录一次此前的换行符数量，定位某一行只需扫描一个区块
+- 索引按 (size, mtime) 失效，可持久化到磁盘，重复读取同一个大文件时无需再次扫描
+"""
+
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+
+# 索引粒度（字节）
+INDEX_STRIDE = 1 << 20
+# 进程内缓存的索引数量
+MEMORY_INDEX_ENTRIES = 64
+
+
+def _is_utf8_sig(encoding: str) -> bool:
+    try:
+        return codecs.lookup(encoding).name == "utf-8-sig"
+    except LookupError:
+        return False
+
+
+def is_ascii_compatible(encoding: str) -> bool:
+    """编码是否与 ASCII 兼容（换行符为单字节 0x0A），只有这类编码可以按字节切分行"""
+    if _is_utf8_sig(encoding):
+        # utf-8-sig 只在开头多一个 BOM，正文与 utf-8 相同
+        encoding = "utf-8"
+    try:
+        return "\n".encode(encoding) == b"\n" and "a".encode(encoding) == b"a"
+    except (LookupError, UnicodeError):
+        return False
+
+
+class LineIndex:
+    """文件的稀疏换行符索引"""
+
+    def __init__(self, size: int, mtime_ns: int, newlines: List[int], total_lines: int):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        # newlines[k] = 偏移 k * INDEX_STRIDE 之前的换行符数量
+        self.newlines = newlines
+        self.total_lines = total_lines
+
+    @classmethod
+    def build(cls, path: Path) -> "LineIndex":
+        """扫描文件构建索引（按区块 bytes.count，C 速度）"""
+        stat = path.stat()
+        newlines = []
+        count = 0
+        last = b""
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(INDEX_STRIDE)
+                if not chunk:
+                    break
+                newlines.append(count)
+                count += chunk.count(b"\n")
+                last = chunk[-1:]
+        total = count + (1 if last and last != b"\n" else 0)
+        return cls(stat.st_size, stat.st_mtime_ns, newlines, total)
+
+    def matches(self, path: Path) -> bool:
+        stat = path.stat()
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+    def to_dict(self) -> dict:
+        return {"size": self.size, "mtime_ns": self.mtime_ns, "stride": INDEX_STRIDE,
+                "newlines": self.newlines, "total_lines": self.total_lines}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> Optional["LineIndex"]:
+        if data.get("stride") != INDEX_STRIDE:
+            return None
+        return cls(data["size"], data["mtime_ns"], data["newlines"], data["total_lines"])
+
+    def line_offset(self, mm, line_idx: int) -> int:
+        """第 line_idx 行（从0开始）的起始字节偏移；超出文件时返回文件大小"""
+        if line_idx <= 0:
+            return 0
+        if line_idx >= self.total_lines:
+            return self.size
+
+        # 第 line_idx 行从第 line_idx 个换行符之后开始：找到之前换行符数量 < line_idx 的最后一个区块
+        lo, hi = 0, len(self.newlines) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.newlines[mid] < line_idx:
+                lo = mid
+            else:
+                hi = mid - 1
+
+        offset = lo * INDEX_STRIDE
+        for _ in range(line_idx - self.newlines[lo]):
+            offset = mm.find(b"\n", offset) + 1
+        return offset
+
+
+class _IndexStore:
+    """索引缓存：进程内 LRU + 可选的磁盘持久化（线程安全）"""
+
+    def __init__(self):
+        self._memory: "OrderedDict[str, LineIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: Path, index_dir: Optional[Path] = None) -> LineIndex:
+        key = hashlib.sha1(str(path.resolve()).encode('utf-8')).hexdigest()
+        with self._lock:
+            index = self._memory.get(key)
+            if index is not None:
+                self._memory.move_to_end(key)
+        if index is not None and index.matches(path):
+            return index
+
+        index = self._load(index_dir, key, path) if index_dir else None
+        if index is None:
+            index = LineIndex.build(path)
+            if index_dir:
+                self._save(index_dir, key, index)
+
+        with self._lock:
+            self._memory[key] = index
+            self._memory.move_to_end(key)
+            while len(self._memory) > MEMORY_INDEX_ENTRIES:
+                self._memory.popitem(last=False)
+        return index
+
+    def _load(self, index_dir: Path, key: str, path: Path) -> Optional[LineIndex]:
+        try:
+            with open(index_dir / f"{key}.json", 'r', encoding='utf-8') as f:
+                index = LineIndex.from_dict(json.load(f))
+            if index is not None and index.matches(path):
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def _save(self, index_dir: Path, key: str, index: LineIndex):
+        try:
+            index_dir.mkdir(parents=True, exist_ok=True)
+            tmp = index_dir / f"{key}.json.tmp{threading.get_ident()}"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(index.to_dict(), f)
+            os.replace(tmp, index_dir / f"{key}.json")
+        except OSError:
+            pass
+
+
+_index_store = _IndexStore()
+
+
+class LineReader:
+    """按行范围读取文本文件"""
+
+    def __init__(self, path: Path, encoding: str, index_dir: Optional[Path] = None):
+        """
+        Args:
+            path: 文件路径
+            encoding: 文件编码
+            index_dir: 索引持久化目录（None 时只缓存在内存中）
+        """
+        self.path = Path(path)
+        self.encoding = encoding
+        self._lines: Optional[List[str]] = None
+        self._index: Optional[LineIndex] = None
+        # 文本起始偏移（跳过 UTF-8 BOM）
+        self._start = 0
+
+        if _is_utf8_sig(encoding):
+            # 按 utf-8 逐行解码，BOM 只出现在偏移 0 处
+            self.encoding = "utf-8"
+            with open(self.path, 'rb') as f:
+                if f.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8:
+                    self._start = len(codecs.BOM_UTF8)
+
+        if self.path.stat().st_size == 0:
+            self._lines = []
+        elif is_ascii_compatible(encoding):
+            self._index = _index_store.get(self.path, index_dir)
+        else:
+            # UTF-16 等编码无法按字节切分行，退回整体读取
+            self._lines = self._read_all()
+
+    def _read_all(self) -> List[str]:
+        try:
+            with open(self.path, 'r', encoding=self.encoding) as f:
+                return f.readlines()
+        except UnicodeDecodeError:
+            with open(self.path, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.readlines()
+
+    @property
+    def total_lines(self) -> int:
+        return len(self._lines) if self._lines is not None else self._index.total_lines
+
+    def _decode(self, data: bytes) -> str:
+        try:
+            return data.decode(self.encoding)
+        except UnicodeDecodeError:
+            return data.decode('utf-8', errors='ignore')
+
+    def iter_lines(self, start_idx: int = 0, max_line_bytes: Optional[int] = None) -> Iterator[Tuple[str, int]]:
+        """
+        从第 start_idx 行（从0开始）开始逐行读取
+
+        Args:
+            start_idx: 起始行
+            max_line_bytes: 单行最多解码的字节数（None 不限制），避免超长单行被整体读入
+
+        Yields:
+            (行文本（换行符统一为 \\n）, 因 max_line_bytes 未读取的字节数)
+        """
+        if self._lines is not None:
+            for line in self._lines[start_idx:]:
+                yield line, 0
+            return
+
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            offset = max(self._index.line_offset(mm, start_idx), self._start)
+            while offset < size:
+                end = mm.find(b"\n", offset)
+                end = size if end == -1 else end + 1
+                # 不含换行符的行长度
+                length = end - offset
+                if mm[end - 1:end] == b"\n":
+                    length -= 2 if mm[end - 2:end] == b"\r\n" else 1
+                skipped = 0
+                if max_line_bytes is not None and length > max_line_bytes:
+                    skipped = length - max_line_bytes
+                    # 截断处可能落在多字节字符中间，忽略不完整的尾部
+                    text = codecs.decode(mm[offset:offset + max_line_bytes], self.encoding, 'ignore')
+                else:
+                    raw = mm[offset:end]
+                    if raw.endswith(b"\r\n"):
+                        raw = raw[:-2] + b"\n"
+                    text = self._decode(raw)
+                yield text, skipped
+                offset = end
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+长论文的分块 map-reduce 分析 - PaperAnalyzeTool 使用
+- 分块：按章节标题和 parse_document 的页标记切分，章节尽量不跨块，超长章节按段落再切
+- map：各块并发提问（线程数有上限），与问题无关的块回答“无相关内容”后被丢弃
+- reduce：按论文顺序合并各块回答；合并输入过长时分组逐层合并
+- 缓存：各块回答按 (论文文本哈希, 块序号与哈希, 问题, 模型) 缓存，最终回答按 (论文文本哈希, 问题, 模型) 缓存
+论文不超过 single_pass_tokens 时整篇一次提问
+"""
+
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .disk_cache import DiskCache
+from .file_tools import estimate_tokens
+from .tool_config import load_tool_config, get_cache_root
+
+
+# 默认配置（可在 tool_config.yaml 的 paper_analyze 段覆盖）
+DEFAULT_PAPER_ANALYZE_CONFIG = {
+    "single_pass_tokens": 16000,    # 不超过该长度的论文整篇一次提问
+    "chunk_tokens": 8000,           # 每块的目标上限（估算 token）
+    "max_workers": 4,               # 并发提问的块数
+    "cache_enabled": True,
+    "cache_ttl": 30 * 86400,
+    "cache_max_entries": 5000,
+}
+
+NO_CONTENT = "无相关内容"
+
+MAP_PROMPT = (
+    "这是一篇论文的第 {index}/{total} 部分（{label}）。只根据这部分内容回答下面的问题，"
+    "给出相关的事实、数据和结论，并注明页码；如果这部分与问题无关，只回复“" + NO_CONTENT + "”。\n\n"
+    "问题：{question}"
+)
+
+REDUCE_PROMPT = (
+    "上面是分别阅读同一篇论文各部分后对同一问题的回答（按论文顺序排列）。"
+    "请把它们合并成一个完整、连贯、不重复的最终回答，保留具体的数据和页码，不要提及“各部分”。\n\n"
+    "问题：{question}"
+)
+
+_PAGE_MARKER = re.compile(r'^--- Page (\d+)/\d+ ---$')
+_HEADING_PATTERNS = [
+    re.compile(r'^#{1,6}\s+\S'),                                                   # Markdown 标题
+    re.compile(r'^(?:\d{1,2}(?:\.\d{1,2}){0,3})\.?\s+[A-Z一-鿿][^.。:：]{0,80}$'),  # 1 Introduction / 2.1 方法
+    re.compile(r'^(?:[IVX]{1,5}|[A-H])\.\s+[A-Z][^.]{0,80}$'),                     # II. RELATED WORK / A. Setup
+    re.compile(r'^(?:第[一二三四五六七八九十\d]+[章节]|[一二三四五六七八九十]+、)\s*\S{1,40}$'),
+    re.compile(r'^(?:Abstract|Introduction|Related Work|Background|Methods?|Methodology|Experiments?|'
+               r'Results|Discussion|Conclusions?|References|Bibliography|Appendix|Acknowledge?ments?|'
+               r'摘\s*要|引\s*言|结\s*论|参考文献|致\s*谢|附\s*录)\b.{0,40}$', re.IGNORECASE),
+]
+
+
+def get_paper_analyze_config() -> Dict[str, Any]:
+    config = dict(DEFAULT_PAPER_ANALYZE_CONFIG)
+    config.update(load_tool_config().get("paper_analyze") or {})
+    return config
+
+
+def is_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > 100:
+        return False
+    return any(pattern.match(line) for pattern in _HEADING_PATTERNS)
+
+
+# ===== 分块 =====
+
+def split_sections(text: str) -> List[Dict[str, Any]]:
+    """
+    按章节标题切分论文文本（页标记行保留在正文中，只用于记录页码）
+
+    Returns:
+        [{"title", "page_start", "page_end", "text"}]；第一个标题之前的内容标题为空
+    """
+    sections = []
+    page = None
+    current = {"title": "", "page_start": None, "page_end": None, "lines": []}
+
+    for line in text.splitlines():
+        marker = _PAGE_MARKER.match(line.strip())
+        if marker:
+            page = int(marker.group(1))
+        elif is_heading(line):
+            # 当前章节已有正文（不只是页标记）时，标题开始新章节
+            if any(l.strip() and not _PAGE_MARKER.match(l.strip()) for l in current["lines"]):
+                # 紧挨在标题前的页标记（和空行）归入新章节
+                carried = []
+                while current["lines"] and (not current["lines"][-1].strip()
+                                            or _PAGE_MARKER.match(current["lines"][-1].strip())):
+                    carried.insert(0, current["lines"].pop())
+                sections.append(current)
+                first_marker = next((_PAGE_MARKER.match(l.strip()) for l in carried if l.strip()), None)
+                current = {"title": "", "page_start": int(first_marker.group(1)) if first_marker else None,
+                           "page_end": page, "lines": carried}
+            if not current["title"]:
+                current["title"] = line.strip().lstrip('#').strip()
+        if current["page_start"] is None:
+            current["page_start"] = page
+        current["page_end"] = page
+        current["lines"].append(line)
+    sections.append(current)
+
+    return [{"title": s["title"], "page_start": s["page_start"], "page_end": s["page_end"],
+             "text": "\n".join(s["lines"])} for s in sections if "".join(s["lines"]).strip()]
+
+
+def _split_oversized(text: str, limit: int) -> List[str]:
+    """按段落（其次按行、最后按字符）把超长文本切成不超过 limit 的片段"""
+    pieces = [text]
+    for separator in ("\n\n", "\n"):
+        next_pieces = []
+        for piece in pieces:
+            if estimate_tokens(piece) <= limit:
+                next_pieces.append(piece)
+                continue
+            buffer = ""
+            for part in piece.split(separator):
+                candidate = buffer + separator + part if buffer else part
+                if buffer and estimate_tokens(candidate) > limit:
+                    next_pieces.append(buffer)
+                    buffer = part
+                else:
+                    buffer = candidate
+            if buffer:
+                next_pieces.append(buffer)
+        pieces = next_pieces
+
+    result = []
+    for piece in pieces:
+        # 单行仍超长（如没有换行的抽取结果）时按字符硬切
+        while estimate_tokens(piece) > limit:
+            cut = max(1, len(piece) * limit // estimate_tokens(piece))
+            result.append(piece[:cut])
+            piece = piece[cut:]
+        result.append(piece)
+    return result
+
+
+def _label(parts: List[Dict[str, Any]]) -> str:
+    pages = [p for part in parts for p in (part["page_start"], part["page_end"]) if p is not None]
+    titles = [part["title"] for part in parts if part["title"]]
+    label = []
+    if pages:
+        label.append(f"第 {min(pages)} 页" if min(pages) == max(pages) else f"第 {min(pages)}-{max(pages)} 页")
+    if titles:
+        label.append(titles[0] if len(titles) == 1 else f"{titles[0]} … {titles[-1]}")
+    return "，".join(label) or "正文"
+
+
+def plan_chunks(text: str, chunk_tokens: int) -> List[Dict[str, Any]]:
+    """
+    把论文切成不超过 chunk_tokens 的块：整章节装箱，超长章节单独切分
+
+    Returns:
+        [{"index", "label", "text", "tokens"}]
+    """
+    parts = []
+    for section in split_sections(text):
+        if estimate_tokens(section["text"]) <= chunk_tokens:
+            parts.append(section)
+            continue
+        for i, piece in enumerate(_split_oversized(section["text"], chunk_tokens)):
+            title = section["title"] if i == 0 else (f"{section['title']}（续）" if section["title"] else "")
+            parts.append(dict(section, title=title, text=piece))
+
+    chunks, group, size = [], [], 0
+    for part in parts:
+        tokens = estimate_tokens(part["text"])
+        if group and size + tokens > chunk_tokens:
+            chunks.append(group)
+            group, size = [], 0
+        group.append(part)
+        size += tokens
+    if group:
+        chunks.append(group)
+
+    return [{"index": i, "label": _label(group), "text": "\n".join(part["text"] for part in group),
+             "tokens": sum(estimate_tokens(part["text"]) for part in group)}
+            for i, group in enumerate(chunks)]
+
+
+# ===== 缓存 =====
+
+_cache_instance: Optional[DiskCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_paper_analyze_cache() -> Optional[DiskCache]:
+    """获取论文分析缓存单例，配置中关闭时返回 None"""
+    global _cache_instance
+    config = get_paper_analyze_config()
+    if not config["cache_enabled"]:
+        return None
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = DiskCache(
+                get_cache_root() / "paper_analyze",
+                ttl=config["cache_ttl"],
+                max_entries=config["cache_max_entries"]
+            )
+    return _cache_instance
+
+
+def normalize_question(question: str) -> str:
+    return re.sub(r'\s+', ' ', question or '').strip()
+
+
+# ===== 流水线 =====
+
+def analyze_paper(
+    text: str,
+    question: str,
+    ask: Callable[[str, str], str],
+    model: str,
+    use_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    对论文全文提问（长论文走 map-reduce）
+
+    Args:
+        text: 论文全文（parse_document 的输出）
+        question: 问题
+        ask: 提问函数 (内容, 问题) -> 回答
+        model: 模型名（只用于缓存键）
+        use_cache: 是否读取缓存（结果仍会写入）
+
+    Returns:
+        {"answer", "mode": "single" / "map_reduce", "chunks": 块数, "relevant_chunks", "cache_hits", "llm_calls"}
+    """
+    config = get_paper_analyze_config()
+    cache = get_paper_analyze_cache()
+    question = normalize_question(question)
+    paper_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    stats = {"cache_hits": 0, "llm_calls": 0}
+    stats_lock = threading.Lock()
+
+    def cached_ask(key: str, content: str, prompt: str) -> str:
+        if cache is not None and use_cache:
+            cached = cache.get(key)
+            if cached is not None:
+                with stats_lock:
+                    stats["cache_hits"] += 1
+                return cached
+        answer = ask(content, prompt)
+        with stats_lock:
+            stats["llm_calls"] += 1
+        if cache is not None and answer:
+            cache.set(key, answer)
+        return answer
+
+    chunk_tokens = max(500, int(config["chunk_tokens"]))
+    final_key = DiskCache.make_key("paper_answer", paper_hash, question, model,
+                                   config["single_pass_tokens"], chunk_tokens)
+
+    if estimate_tokens(text) <= config["single_pass_tokens"]:
+        answer = cached_ask(final_key, text, question)
+        return {"answer": answer, "mode": "single", "chunks": 1, "relevant_chunks": 1, **stats}
+
+    if cache is not None and use_cache:
+        cached = cache.get(final_key)
+        if cached is not None:
+            return {**cached, "cache_hits": 1, "llm_calls": 0}
+
+    # map：各块并发提问
+    chunks = plan_chunks(text, chunk_tokens)
+
+    def run(chunk: Dict[str, Any]) -> str:
+        chunk_hash = hashlib.sha256(chunk["text"].encode('utf-8')).hexdigest()
+        key = DiskCache.make_key("paper_chunk", paper_hash, chunk["index"], chunk_hash, question, model)
+        prompt = MAP_PROMPT.format(index=chunk["index"] + 1, total=len(chunks), label=chunk["label"],
+                                   question=question)
+        return cached_ask(key, chunk["text"], prompt)
+
+    with ThreadPoolExecutor(max_workers=max(1, int(config["max_workers"]))) as pool:
+        answers = list(pool.map(run, chunks))
+
+    relevant = [(chunk, answer.strip()) for chunk, answer in zip(chunks, answers) if is_relevant(answer)]
+
+    if not relevant:
+        answer = f"论文中没有找到与问题相关的内容：{question}"
+    elif len(relevant) == 1:
+        # 只有一块相关时直接使用该块的回答
+        answer = relevant[0][1]
+    else:
+        # reduce：输入过长时分组逐层合并
+        partials = [f"### 第 {chunk['index'] + 1} 部分（{chunk['label']}）\n{answer}" for chunk, answer in relevant]
+        level = 0
+        while True:
+            groups = _group_by_tokens(partials, chunk_tokens)
+
+            def reduce_group(group: List[str]) -> str:
+                content = "\n\n".join(group)
+                key = DiskCache.make_key("paper_reduce", paper_hash, question, model, level, content)
+                return cached_ask(key, content, REDUCE_PROMPT.format(question=question))
+
+            with ThreadPoolExecutor(max_workers=max(1, int(config["max_workers"]))) as pool:
+                reduced = list(pool.map(reduce_group, groups))
+            if len(reduced) == 1:
+                answer = reduced[0]
+                break
+            partials = [f"### 合并回答 {i + 1}\n{text.strip()}" for i, text in enumerate(reduced)]
+            level += 1
+
+    result = {"answer": answer, "mode": "map_reduce", "chunks": len(chunks), "relevant_chunks": len(relevant)}
+    if cache is not None:
+        cache.set(final_key, result)
+    return {**result, **stats}
+
+
+def is_relevant(answer: Optional[str]) -> bool:
+    """map 回答不是“无相关内容”（允许带引号、句号等）"""
+    text = (answer or "").strip().strip('“”"\'。.！! ')
+    return bool(text) and text != NO_CONTENT
+
+
+def _group_by_tokens(partials: List[str], limit: int) -> List[List[str]]:
+    """按顺序把回答分组，每组不超过 limit；每组至少两条，保证逐层收敛"""
+    groups, group, size = [], [], 0
+    for partial in partials:
+        tokens = estimate_tokens(partial)
+        if len(group) >= 2 and size + tokens > limit:
+            groups.append(group)
+            group, size = [], 0
+        group.append(partial)
+        size += tokens
+    if len(group) == 1 and groups:
+        groups[-1].append(group[0])
+    else:
+        groups.append(group)
+    return groups
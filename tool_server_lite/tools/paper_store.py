@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨 workspace 共享的论文库 - file_download / arxiv_search / parse_document 共用
+- 每篇论文一个条目目录：PDF、解析文本、提取的图片、BibTeX 与元数据
+- 有 PDF 的条目以 PDF 内容的 sha256 为 ID，另按 arXiv ID、DOI、下载 URL 建立别名
+- 放入 workspace 时优先 reflink，其次硬链接，都不支持时才复制；库内文件只读，避免被原地改写
+- 总大小超过 max_size_mb 时按最近访问时间淘汰
+"""
+
+import errno
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import unquote, urlparse
+
+from .tool_config import load_tool_config, get_cache_root
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+
+# 默认配置（可在 tool_config.yaml 的 paper_store 段覆盖）
+DEFAULT_PAPER_STORE_CONFIG = {
+    "enabled": True,
+    "max_size_mb": 5120,        # 论文库总大小上限，超出后按最近访问时间淘汰
+    "link": "auto",             # auto: reflink > 硬链接 > 复制；copy: 总是复制
+}
+
+PDF_NAME = "paper.pdf"
+PARSED_NAME = "parsed.txt"
+BIB_NAME = "reference.bib"
+META_NAME = "meta.json"
+IMAGES_DIR = "images"
+
+# 解析文本中图片目录的占位符（放入 workspace 时替换为实际目录）
+IMAGES_TOKEN = "{{images_dir}}"
+
+ID_KINDS = ("arxiv", "doi", "url")
+
+# 没有 meta.json 的条目目录超过该时长（秒）才视为写入中断的残缺条目（可能有其他进程正在写入）
+INCOMPLETE_GRACE_SECONDS = 3600
+
+# Linux FICLONE ioctl（btrfs / xfs 等支持写时复制的文件系统）
+_FICLONE = 0x40049409
+
+_ARXIV_ID_RE = re.compile(
+    r'(?:arxiv:)?((?:\d{4}\.\d{4,5})|(?:[a-z][a-z.-]*(?:\.[A-Z]{2})?/\d{7}))(v\d+)?', re.IGNORECASE)
+_DOI_RE = re.compile(r'(10\.\d{4,9}/\S+)')
+
+
+def get_paper_store_config() -> Dict[str, Any]:
+    config = dict(DEFAULT_PAPER_STORE_CONFIG)
+    config.update(load_tool_config().get("paper_store") or {})
+    return config
+
+
+# ===== 标识符规范化 =====
+
+def normalize_arxiv_id(value: Optional[str]) -> Optional[str]:
+    """'arXiv:2401.01234v2'、'https://arxiv.org/abs/2401.01234' 等 -> '2401.01234v2'（保留版本号）"""
+    if not value:
+        return None
+    text = str(value).strip()
+    if "arxiv.org" in text.lower():
+        path = urlparse(text).path
+        match = re.match(r'/(?:abs|pdf|html)/(.+?)(?:\.pdf)?/?$', path)
+        text = match.group(1) if match else ""
+    match = _ARXIV_ID_RE.fullmatch(text)
+    if not match:
+        return None
+    return match.group(1) + (match.group(2) or "").lower()
+
+
+def normalize_doi(value: Optional[str]) -> Optional[str]:
+    """'https://doi.org/10.1000/XYZ'、'doi:10.1000/xyz' -> '10.1000/xyz'"""
+    if not value:
+        return None
+    match = _DOI_RE.search(unquote(str(value).strip()))
+    return match.group(1).rstrip('.').lower() if match else None
+
+
+def normalize_url(value: Optional[str]) -> Optional[str]:
+    """去掉片段、统一协议和主机名大小写"""
+    if not value:
+        return None
+    parsed = urlparse(str(value).strip())
+    if not parsed.netloc:
+        return None
+    return parsed._replace(scheme="https" if parsed.scheme in ("http", "https") else parsed.scheme,
+                           netloc=parsed.netloc.lower(), fragment="").geturl()
+
+
+def identifiers_from_url(url: str) -> Dict[str, str]:
+    """从下载 URL 推断标识符（arxiv.org 链接给出 arXiv ID，doi.org 链接给出 DOI）"""
+    ids = {"url": normalize_url(url)}
+    host = urlparse(str(url)).netloc.lower()
+    if host.endswith("arxiv.org"):
+        ids["arxiv"] = normalize_arxiv_id(url)
+    elif host.endswith("doi.org"):
+        ids["doi"] = normalize_doi(url)
+    return {kind: value for kind, value in ids.items() if value}
+
+
+def _alias_keys(kind: str, value: str) -> List[str]:
+    """别名键；带版本号的 arXiv ID 同时登记为不带版本的 ID（指向最近一次加入的版本）"""
+    keys = [f"{kind}:{value}"]
+    if kind == "arxiv":
+        base = re.sub(r'v\d+$', '', value)
+        if base != value:
+            keys.append(f"arxiv:{base}")
+    return keys
+
+
+def _lookup_key(kind: str, value: Optional[str]) -> Optional[str]:
+    normalizer = {"arxiv": normalize_arxiv_id, "doi": normalize_doi, "url": normalize_url}[kind]
+    value = normalizer(value)
+    return f"{kind}:{value}" if value else None
+
+
+# ===== 链接 =====
+
+def link_file(src: Path, dest: Path, allow_hardlink: bool = True) -> str:
+    """
+    把 src 放到 dest（原子替换）：reflink > 硬链接 > 复制
+
+    Returns:
+        实际使用的方式 "reflink" / "hardlink" / "copy"
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    method = None
+    try:
+        if HAS_FCNTL:
+            try:
+                with open(src, 'rb') as fsrc, open(tmp, 'wb') as fdst:
+                    fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                method = "reflink"
+            except OSError:
+                tmp.unlink(missing_ok=True)
+        if method is None and allow_hardlink:
+            try:
+                os.link(src, tmp)
+                method = "hardlink"
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES):
+                    raise
+        if method is None:
+            shutil.copyfile(src, tmp)
+            method = "copy"
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return method
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_pdf(path: Path) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(5) == b"%PDF-"
+    except OSError:
+        return False
+
+
+# ===== 论文库 =====
+
+class PaperStore:
+    """内容寻址的论文库（线程安全）"""
+
+    def __init__(self, root: Path, max_bytes: Optional[int] = None, allow_hardlink: bool = True):
+        """
+        Args:
+            root: 库目录（条目在 root/entries/<ID>/）
+            max_bytes: 总大小上限，None 表示不限
+            allow_hardlink: 是否允许用硬链接放入 workspace
+        """
+        self.root = Path(root)
+        self.entries_dir = self.root / "entries"
+        self.max_bytes = max_bytes
+        self.allow_hardlink = allow_hardlink
+
+        self._lock = threading.RLock()
+        self._metas: Optional[Dict[str, Dict[str, Any]]] = None   # 条目 ID -> meta
+        self._aliases: Dict[str, str] = {}                         # "arxiv:..." 等 -> 条目 ID
+        self._sizes: Dict[str, int] = {}
+        self._atimes: Dict[str, float] = {}                        # 条目 ID -> 最近访问时间
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.links: Dict[str, int] = {"reflink": 0, "hardlink": 0, "copy": 0}
+
+    # ----- 查询 -----
+
+    def lookup(
+        self,
+        arxiv_id: Optional[str] = None,
+        doi: Optional[str] = None,
+        url: Optional[str] = None,
+        sha256: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        按 sha256 / arXiv ID / DOI / URL 查找条目（依次尝试，命中任一即返回）
+
+        Returns:
+            meta 的副本，附 "dir"（条目目录）与 "has_pdf" / "has_parsed"；未命中返回 None
+        """
+        with self._lock:
+            self._load()
+            entry_id = None
+            if sha256 and sha256.lower() in self._metas:
+                entry_id = sha256.lower()
+            for kind, value in (("arxiv", arxiv_id), ("doi", doi), ("url", url)):
+                key = _lookup_key(kind, value) if entry_id is None else None
+                if key and key in self._aliases:
+                    entry_id = self._aliases[key]
+            if entry_id is None or not self._valid(entry_id):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touch(entry_id)
+            return self._describe(entry_id)
+
+    def path(self, entry_id: str, name: str) -> Path:
+        return self.entries_dir / entry_id / name
+
+    def materialize(self, entry_id: str, name: str, dest: Path) -> str:
+        """把条目中的文件放入 workspace，返回使用的方式（reflink / hardlink / copy）"""
+        method = link_file(self.path(entry_id, name), dest, allow_hardlink=self.allow_hardlink)
+        with self._lock:
+            self.links[method] += 1
+        return method
+
+    # ----- 写入 -----
+
+    def add_pdf(self, src: Path, ids: Optional[Dict[str, Any]] = None, sha256: Optional[str] = None) -> str:
+        """
+        把 PDF 加入库（已有相同内容时只补登别名），返回条目 ID（内容 sha256）
+
+        入库时不使用硬链接，workspace 中的原文件保持独立
+        """
+        src = Path(src)
+        sha = sha256 or file_sha256(src)
+        with self._lock:
+            self._load()
+            if sha not in self._metas:
+                entry_dir = self.entries_dir / sha
+                entry_dir.mkdir(parents=True, exist_ok=True)
+                link_file(src, entry_dir / PDF_NAME, allow_hardlink=False)
+                _make_readonly(entry_dir / PDF_NAME)
+                self._metas[sha] = {"id": sha, "sha256": sha, "ids": {}, "metadata": {}, "created": time.time()}
+            self._absorb_metadata_entries(sha, ids or {})
+            self._register(sha, ids or {})
+            self._save_meta(sha)
+            self._evict(keep=sha)
+        return sha
+
+    def record_metadata(self, ids: Dict[str, Any], metadata: Dict[str, Any], bib: Optional[str] = None) -> str:
+        """
+        登记论文元数据（如 arxiv_search 的结果）；已有条目时合并，否则建立只含元数据的条目
+
+        Returns:
+            条目 ID
+        """
+        with self._lock:
+            self._load()
+            entry_id = next((self._aliases[key] for kind in ID_KINDS
+                             for key in [_lookup_key(kind, ids.get(kind))] if key in self._aliases), None)
+            if entry_id is None:
+                primary = next(_lookup_key(kind, ids.get(kind)) for kind in ID_KINDS if _lookup_key(kind, ids.get(kind)))
+                entry_id = "meta-" + hashlib.sha256(primary.encode('utf-8')).hexdigest()[:40]
+                (self.entries_dir / entry_id).mkdir(parents=True, exist_ok=True)
+                self._metas[entry_id] = {"id": entry_id, "sha256": None, "ids": {}, "metadata": {},
+                                         "created": time.time()}
+            meta = self._metas[entry_id]
+            meta["metadata"].update({k: v for k, v in metadata.items() if v not in (None, "", [])})
+            if bib:
+                _write_text(self.path(entry_id, BIB_NAME), bib)
+            self._register(entry_id, ids)
+            self._save_meta(entry_id)
+            self._evict(keep=entry_id)
+        return entry_id
+
+    def put_parsed(self, entry_id: str, text: str, images: Iterable[Path] = ()) -> None:
+        """保存解析文本（图片目录写成 IMAGES_TOKEN）和提取出的图片"""
+        with self._lock:
+            self._load()
+            if entry_id not in self._metas:
+                return
+            entry_dir = self.entries_dir / entry_id
+            image_names = []
+            for image in images:
+                link_file(image, entry_dir / IMAGES_DIR / image.name, allow_hardlink=False)
+                _make_readonly(entry_dir / IMAGES_DIR / image.name)
+                image_names.append(image.name)
+            _write_text(entry_dir / PARSED_NAME, text)
+            self._metas[entry_id]["images"] = image_names
+            self._save_meta(entry_id)
+            self._evict(keep=entry_id)
+
+    def read_parsed(self, entry_id: str) -> Optional[str]:
+        try:
+            return self.path(entry_id, PARSED_NAME).read_text(encoding='utf-8')
+        except OSError:
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._load()
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._metas),
+                "pdfs": sum(1 for meta in self._metas.values() if meta.get("sha256")),
+                "bytes": sum(self._sizes.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "links": dict(self.links)
+            }
+
+    # ===== 内部方法（调用方需持有锁） =====
+
+    def _load(self):
+        """首次使用时扫描各条目的 meta.json，重建别名表和大小统计"""
+        if self._metas is not None:
+            return
+        self._metas = {}
+        if self.entries_dir.exists():
+            now = time.time()
+            with os.scandir(self.entries_dir) as it:
+                for entry in it:
+                    meta_path = Path(entry.path) / META_NAME
+                    try:
+                        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+                        atime = meta_path.stat().st_mtime
+                    except (OSError, ValueError):
+                        try:
+                            stale = now - entry.stat().st_mtime > INCOMPLETE_GRACE_SECONDS
+                        except OSError:
+                            stale = False
+                        if stale:
+                            shutil.rmtree(entry.path, ignore_errors=True)   # 写入中断留下的残缺条目
+                        continue
+                    self._metas[entry.name] = meta
+                    self._sizes[entry.name] = _dir_size(Path(entry.path))
+                    self._atimes[entry.name] = atime
+        # 按访问时间从旧到新登记，同一别名以最近的条目为准
+        for entry_id in sorted(self._metas, key=self._atime):
+            for kind, values in self._metas[entry_id].get("ids", {}).items():
+                for value in values:
+                    for key in _alias_keys(kind, value):
+                        self._aliases[key] = entry_id
+
+    def _register(self, entry_id: str, ids: Dict[str, Any]):
+        meta_ids = self._metas[entry_id].setdefault("ids", {})
+        for kind in ID_KINDS:
+            key = _lookup_key(kind, ids.get(kind))
+            if not key:
+                continue
+            value = key.split(":", 1)[1]
+            if value not in meta_ids.setdefault(kind, []):
+                meta_ids[kind].append(value)
+            for alias in _alias_keys(kind, value):
+                self._aliases[alias] = entry_id
+
+    def _absorb_metadata_entries(self, sha: str, ids: Dict[str, Any]):
+        """PDF 入库时，把别名相同的纯元数据条目（arxiv_search 登记的）并入该条目"""
+        meta = self._metas[sha]
+        for kind in ID_KINDS:
+            key = _lookup_key(kind, ids.get(kind))
+            other = self._aliases.get(key) if key else None
+            if not other or other == sha or not other.startswith("meta-") or other not in self._metas:
+                continue
+            merged = self._remove(other, keep_files=True)
+            meta["metadata"] = dict(merged.get("metadata") or {}, **meta["metadata"])
+            bib = self.path(other, BIB_NAME)
+            if bib.exists() and not self.path(sha, BIB_NAME).exists():
+                os.replace(bib, self.path(sha, BIB_NAME))
+            shutil.rmtree(self.entries_dir / other, ignore_errors=True)
+            for merged_kind, values in (merged.get("ids") or {}).items():
+                for value in values:
+                    self._register(sha, {merged_kind: value})
+
+    def _valid(self, entry_id: str) -> bool:
+        """PDF 条目的文件必须仍在（被外部删除时丢弃整个条目）"""
+        meta = self._metas.get(entry_id)
+        if meta is None:
+            return False
+        if meta.get("sha256") and not self.path(entry_id, PDF_NAME).exists():
+            self._remove(entry_id)
+            return False
+        return True
+
+    def _describe(self, entry_id: str) -> Dict[str, Any]:
+        meta = json.loads(json.dumps(self._metas[entry_id]))
+        entry_dir = self.entries_dir / entry_id
+        meta["dir"] = str(entry_dir)
+        meta["has_pdf"] = bool(meta.get("sha256"))
+        meta["has_parsed"] = (entry_dir / PARSED_NAME).exists()
+        bib = entry_dir / BIB_NAME
+        meta["bib"] = bib.read_text(encoding='utf-8') if bib.exists() else None
+        return meta
+
+    def _save_meta(self, entry_id: str):
+        entry_dir = self.entries_dir / entry_id
+        _write_text(entry_dir / META_NAME, json.dumps(self._metas[entry_id], ensure_ascii=False))
+        self._sizes[entry_id] = _dir_size(entry_dir)
+        self._atimes[entry_id] = time.time()
+
+    def _atime(self, entry_id: str) -> float:
+        return self._atimes.get(entry_id, 0.0)
+
+    def _touch(self, entry_id: str):
+        # 访问时间保存在内存中；同时更新 meta.json 的 mtime，供下次启动时恢复
+        self._atimes[entry_id] = time.time()
+        try:
+            os.utime(self.entries_dir / entry_id / META_NAME, None)
+        except OSError:
+            pass
+
+    def _remove(self, entry_id: str, keep_files: bool = False):
+        meta = self._metas.pop(entry_id, None)
+        self._sizes.pop(entry_id, None)
+        self._atimes.pop(entry_id, None)
+        if not keep_files:
+            shutil.rmtree(self.entries_dir / entry_id, ignore_errors=True)
+        for key in [k for k, v in self._aliases.items() if v == entry_id]:
+            del self._aliases[key]
+        return meta
+
+    def _evict(self, keep: Optional[str] = None):
+        if self.max_bytes is None:
+            return
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+        for entry_id in sorted(self._metas, key=self._atime):
+            if total <= self.max_bytes:
+                break
+            if entry_id == keep:
+                continue
+            total -= self._sizes.get(entry_id, 0)
+            self._remove(entry_id)
+            self.evictions += 1
+
+
+def _write_text(path: Path, text: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(text, encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def _make_readonly(path: Path):
+    try:
+        os.chmod(path, 0o444)
+    except OSError:
+        pass
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for sub in path.rglob('*'):
+        try:
+            if sub.is_file():
+                total += sub.stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+_store_instance: Optional[PaperStore] = None
+_store_lock = threading.Lock()
+
+
+def get_paper_store() -> Optional[PaperStore]:
+    """获取论文库单例，配置中关闭时返回 None"""
+    global _store_instance
+    config = get_paper_store_config()
+    if not config["enabled"]:
+        return None
+    with _store_lock:
+        if _store_instance is None:
+            max_size_mb = config["max_size_mb"]
+            _store_instance = PaperStore(
+                get_cache_root() / "papers",
+                max_bytes=int(max_size_mb * 1024 * 1024) if max_size_mb else None,
+                allow_hardlink=config["link"] != "copy"
+            )
+    return _store_instance
@@ -3,12 +3,22 @@
 """
 Paper分析工具 - 论文内容分析
 舍弃了，标准化为 agent 即可
+长论文按章节分块，各块并发提问后合并回答（见 paper_chunks.py）
 """
 
-from pathlib import Path
 from typing import Dict, Any
 
 from .file_tools import BaseTool, get_abs_path
+from .paper_chunks import analyze_paper
+
+# 导入llm_client_lite
+import sys
+import os
+# 添加父目录到路径
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+from llm_client_lite import get_llm_client
 
 
 class PaperAnalyzeTool(BaseTool):
@@ -22,17 +32,22 @@ class PaperAnalyzeTool(BaseTool):
             paper_path (str): 论文文件相对路径（相对于任务目录）
             question (str, optional): 要问的问题，默认"请总结这篇论文的主要内容"
             parse_save_path (str, optional): 解析结果保存路径，可选
+            use_cache (bool, optional): 是否复用同一论文、同一问题的分块回答缓存，默认True
         
         Returns:
             status: "success" 或 "error"
             output: 分析结果文本
             error: 错误信息（如有）
+            mode: "single"（整篇一次提问）或 "map_reduce"
+            chunks / relevant_chunks: 分块数 / 与问题相关的块数
+            cache_hits / llm_calls: 缓存命中次数 / 实际的 LLM 调用次数
         """
         try:
             # 获取参数
             paper_path = parameters.get("paper_path")
             question = parameters.get("question", "请总结这篇论文的主要内容")
             parse_save_path = parameters.get("parse_save_path")
+            use_cache = parameters.get("use_cache", True)
             
             if not paper_path:
                 return {
@@ -71,72 +86,39 @@ class PaperAnalyzeTool(BaseTool):
                     "error": f"文档解析失败: {parse_result.get('error', '未知错误')}"
                 }
             
-            # 步骤2: 读取解析结果
+            # 步骤2: 取得解析文本（保存了解析结果时直接读文件，不经 FileReadTool 包装）
             if parse_save_path:
-                # 如果保存了解析结果，读取保存的文件
-                read_path = parse_save_path
+                paper_content = get_abs_path(task_id, parse_save_path).read_text(encoding='utf-8')
             else:
-                # 否则读取返回的内容
                 paper_content = parse_result.get("output", "")
-                if not paper_content:
-                    return {
-                        "status": "error",
-                        "output": "",
-                        "error": "文档解析结果为空"
-                    }
-                
-                # 临时处理：如果输出是"结果保存在 xxx"，则需要读取该文件
-                if "结果保存在" in paper_content:
-                    # 提取文件路径
-                    import re
-                    match = re.search(r'结果保存在\s+(\S+)', paper_content)
-                    if match:
-                        read_path = match.group(1)
-                    else:
-                        read_path = paper_path.replace(".pdf", ".txt")
-                else:
-                    # 直接返回内容
-                    read_path = None
-                    paper_content = paper_content
-            
-            # 步骤3: 如果有文件路径，读取文件
-            if read_path:
-                from .file_tools import FileReadTool
-                read_tool = FileReadTool()
-                read_result = read_tool.execute(task_id, {"path": read_path})
-                
-                if read_result["status"] != "success":
-                    return {
-                        "status": "error",
-                        "output": "",
-                        "error": f"读取解析结果失败: {read_result.get('error', '未知错误')}"
-                    }
-                
-                paper_content = read_result.get("output", "")
-            
-            # 步骤4: 使用 LLM 分析内容
-            import sys
-            import os
-            parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            if parent_dir not in sys.path:
-                sys.path.insert(0, parent_dir)
-            
-            from llm_client_lite import get_llm_client
+            if not paper_content.strip():
+                return {
+                    "status": "error",
+                    "output": "",
+                    "error": "文档解析结果为空"
+                }
             
+            # 步骤3: 使用 LLM 分析内容（长论文分块 map-reduce）
             try:
-                # 获取 LLM 客户端
                 llm_client = get_llm_client()
-                
-                # 调用文本分析
-                analysis_result = llm_client.text_query(
-                    text=paper_content,
-                    question=question
+                model = llm_client.models[0]
+                result = analyze_paper(
+                    paper_content,
+                    question,
+                    lambda text, prompt: llm_client.text_query(text=text, question=prompt, model=model),
+                    model=model,
+                    use_cache=use_cache
                 )
                 
                 return {
                     "status": "success",
-                    "output": analysis_result,
-                    "error": ""
+                    "output": result["answer"],
+                    "error": "",
+                    "mode": result["mode"],
+                    "chunks": result["chunks"],
+                    "relevant_chunks": result["relevant_chunks"],
+                    "cache_hits": result["cache_hits"],
+                    "llm_calls": result["llm_calls"]
                 }
                     
             except Exception as e:
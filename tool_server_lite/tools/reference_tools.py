@@ -2,54 +2,156 @@
 # -*- coding: utf-8 -*-
 """
 参考文献管理工具 - 用于管理 reference.bib 文件
+底层为 bib_store.BibStore：按括号配对解析，旁路索引按偏移读取，增量写入
 """
 
-import re
-from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any
+from .bib_store import BibStore
 from .file_tools import BaseTool, get_abs_path
+from .tool_config import get_cache_root
+
+
+def open_bib_store(task_id: str, bib_path: str) -> BibStore:
+    """打开 bib 文件（索引保存在 cache_dir/bib_index）"""
+    return BibStore(get_abs_path(task_id, bib_path), index_dir=get_cache_root() / "bib_index")
+
+
+def format_reference(entry: Dict[str, Any]) -> str:
+    """单行摘要：key — 第一作者 et al. (年份) 标题"""
+    authors = [a.strip() for a in entry.get("author", "").split(" and ") if a.strip()]
+    author = authors[0] + (" et al." if len(authors) > 1 else "") if authors else "?"
+    year = entry.get("year") or "n.d."
+    return f"{entry['key']} — {author} ({year}) {entry.get('title') or '(无标题)'}"
 
 
 class ReferenceListTool(BaseTool):
-    """列出所有参考文献（直接显示原文）"""
+    """分页列出参考文献"""
     
     def execute(self, task_id: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """
-        列出 reference.bib 中的所有参考文献（原文）
+        分页列出 reference.bib 中的参考文献
         
         Parameters:
             bib_path (str, optional): bib文件相对路径，默认 "reference.bib"
+            page (int, optional): 页码（从1开始），默认 1
+            page_size (int, optional): 每页条数，默认 20
+            raw (bool, optional): 是否返回 bib 原文，默认 False（每条一行摘要）
         
         Returns:
             status: "success" 或 "error"
-            output: 文件原文内容
+            output: 当前页的参考文献
             error: 错误信息（如有）
         """
         try:
             bib_path = parameters.get("bib_path", "reference.bib")
-            abs_bib_path = get_abs_path(task_id, bib_path)
+            page = max(1, int(parameters.get("page", 1)))
+            page_size = max(1, int(parameters.get("page_size", 20)))
+            raw = parameters.get("raw", False)
             
-            if not abs_bib_path.exists():
+            store = open_bib_store(task_id, bib_path)
+            if not store.path.exists():
                 return {
                     "status": "error",
                     "output": "",
                     "error": f"文件不存在: {bib_path}"
                 }
             
-            # 直接读取并返回文件内容
-            with open(abs_bib_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            with store.lock:
+                entries = store.entries()
+                total = len(entries)
+                pages = max(1, -(-total // page_size))
+                current = entries[(page - 1) * page_size:page * page_size]
+                
+                if not entries:
+                    return {
+                        "status": "success",
+                        "output": "(文件为空)",
+                        "error": ""
+                    }
+                
+                if raw:
+                    body = "\n\n".join(store.read(entry) for entry in current)
+                else:
+                    first = (page - 1) * page_size
+                    body = "\n".join(f"{first + i}. {format_reference(entry)}"
+                                     for i, entry in enumerate(current, start=1))
+            
+            header = f"[共 {total} 条参考文献，第 {page}/{pages} 页，每页 {page_size} 条]"
+            if page < pages:
+                header += f"\n[下一页: page={page + 1}]"
+            return {
+                "status": "success",
+                "output": f"{header}\n{body}" if current else f"{header}\n(本页没有条目)",
+                "error": "",
+                "total": total,
+                "pages": pages
+            }
+            
+        except Exception as e:
+            return {
+                "status": "error",
+                "output": "",
+                "error": f"读取失败: {str(e)}"
+            }
+
+
+class ReferenceSearchTool(BaseTool):
+    """检索参考文献（引用键 / 字段 / 模糊标题）"""
+    
+    def execute(self, task_id: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        在 reference.bib 中检索参考文献
+        
+        Parameters:
+            query (str, optional): 标题关键词，模糊匹配并按相似度排序
+            key (str, optional): 引用键（完全匹配优先，其次为包含）
+            field (str, optional): 字段名，如 author / year / journal
+            value (str, optional): field 字段应包含的内容
+            limit (int, optional): 最多返回条数，默认 10
+            raw (bool, optional): 是否返回 bib 原文，默认 False
+            bib_path (str, optional): bib文件相对路径，默认 "reference.bib"
+        
+        Returns:
+            status: "success" 或 "error"
+            output: 匹配的参考文献
+            error: 错误信息（如有）
+        """
+        try:
+            bib_path = parameters.get("bib_path", "reference.bib")
+            query = parameters.get("query")
+            key = parameters.get("key")
+            field = parameters.get("field")
+            value = parameters.get("value")
+            
+            if not (query or key or (field and value)):
+                return {
+                    "status": "error",
+                    "output": "",
+                    "error": "至少需要 query、key 或 field+value 之一"
+                }
             
-            if not content.strip():
+            store = open_bib_store(task_id, bib_path)
+            if not store.path.exists():
                 return {
-                    "status": "success",
-                    "output": "(文件为空)",
-                    "error": ""
+                    "status": "error",
+                    "output": "",
+                    "error": f"文件不存在: {bib_path}"
                 }
             
+            with store.lock:
+                matches = store.search(query=query, key=key, field=field, value=value,
+                                       limit=int(parameters.get("limit", 10)))
+                if parameters.get("raw", False):
+                    body = "\n\n".join(store.read(entry) for entry in matches)
+                else:
+                    body = "\n".join(
+                        format_reference(entry) + (f"  [相似度 {entry['score']}]" if "score" in entry else "")
+                        for entry in matches
+                    )
+            
             return {
                 "status": "success",
-                "output": content,
+                "output": f"[找到 {len(matches)} 条]\n{body}" if matches else "没有匹配的参考文献",
                 "error": ""
             }
             
@@ -57,7 +159,7 @@ class ReferenceListTool(BaseTool):
             return {
                 "status": "error",
                 "output": "",
-                "error": f"读取失败: {str(e)}"
+                "error": f"检索失败: {str(e)}"
             }
 
 
@@ -91,66 +193,16 @@ class ReferenceAddTool(BaseTool):
             if not isinstance(entries, list):
                 entries = [entries]
             
-            abs_bib_path = get_abs_path(task_id, bib_path)
-            
-            # 如果文件不存在，创建它
-            if not abs_bib_path.exists():
-                abs_bib_path.parent.mkdir(parents=True, exist_ok=True)
-                existing_content = ""
-            else:
-                # 读取现有内容
-                with open(abs_bib_path, 'r', encoding='utf-8') as f:
-                    existing_content = f.read()
-            
-            # 解析现有条目
-            existing_entries = self._parse_bib_entries(existing_content)
-            existing_dict = {entry["key"]: entry["content"] for entry in existing_entries}
-            
-            # 处理新条目
-            added_count = 0
-            replaced_count = 0
-            replaced_keys = []
-            
-            for entry in entries:
-                entry = entry.strip()
-                if not entry:
-                    continue
-                
-                # 提取key
-                key = self._extract_key_from_entry(entry)
-                if not key:
-                    continue
-                
-                # 检查是否是覆盖操作
-                if key in existing_dict:
-                    replaced_count += 1
-                    replaced_keys.append(key)
-                else:
-                    added_count += 1
-                
-                # 更新或添加
-                existing_dict[key] = entry
-            
-            # 重新组装文件内容
-            new_content_parts = []
-            for key in existing_dict:
-                entry = existing_dict[key]
-                new_content_parts.append(entry)
-            
-            new_content = '\n\n'.join(new_content_parts)
-            if new_content and not new_content.endswith('\n'):
-                new_content += '\n'
-            
-            # 写入文件
-            with open(abs_bib_path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
+            store = open_bib_store(task_id, bib_path)
+            with store.lock:
+                added_keys, replaced_keys = store.add(entries)
             
             # 生成结果信息
             result_parts = []
-            if added_count > 0:
-                result_parts.append(f"成功添加 {added_count} 条新参考文献")
-            if replaced_count > 0:
-                result_parts.append(f"覆盖了 {replaced_count} 条已存在的参考文献: {', '.join(replaced_keys)}")
+            if added_keys:
+                result_parts.append(f"成功添加 {len(added_keys)} 条新参考文献")
+            if replaced_keys:
+                result_parts.append(f"覆盖了 {len(replaced_keys)} 条已存在的参考文献: {', '.join(replaced_keys)}")
             
             if not result_parts:
                 result_parts.append("没有有效的文献被添加")
@@ -167,41 +219,6 @@ class ReferenceAddTool(BaseTool):
                 "output": "",
                 "error": f"添加失败: {str(e)}"
             }
-    
-    def _parse_bib_entries(self, content: str) -> List[Dict[str, str]]:
-        """解析bib文件内容，提取所有条目（改进版，支持多种格式）"""
-        if not content.strip():
-            return []
-        
-        entries = []
-        # 改进的正则表达式：
-        # 1. 匹配 @type{key, 后面的任意内容
-        # 2. 使用括号计数来找到匹配的右括号
-        # 3. 支持多行和单行格式
-        pattern = r'@(\w+)\s*\{\s*([^,\s]+)\s*,([^}]*)\}'
-        
-        matches = re.finditer(pattern, content, re.DOTALL)
-        
-        for match in matches:
-            entry_type = match.group(1)
-            entry_key = match.group(2).strip()
-            entry_content = match.group(0)
-            
-            entries.append({
-                "type": entry_type,
-                "key": entry_key,
-                "content": entry_content
-            })
-        
-        return entries
-    
-    def _extract_key_from_entry(self, entry: str) -> str:
-        """从单个bib条目中提取引用键（改进版，更健壮）"""
-        # 匹配 @type{key, 的模式，key不包含逗号和空格
-        match = re.search(r'@\w+\s*\{\s*([^,\s]+)\s*,', entry)
-        if match:
-            return match.group(1).strip()
-        return ""
 
 
 class ReferenceDeleteTool(BaseTool):
@@ -235,37 +252,17 @@ class ReferenceDeleteTool(BaseTool):
             if isinstance(keys, str):
                 keys = [keys]
             
-            abs_bib_path = get_abs_path(task_id, bib_path)
-            
-            if not abs_bib_path.exists():
+            store = open_bib_store(task_id, bib_path)
+            if not store.path.exists():
                 return {
                     "status": "error",
                     "output": "",
                     "error": f"文件不存在: {bib_path}"
                 }
             
-            # 读取文件
-            with open(abs_bib_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 解析所有条目
-            entries = self._parse_bib_entries(content)
-            
-            # 过滤掉要删除的条目
-            deleted_keys = []
-            not_found_keys = []
-            remaining_entries = []
-            
-            for entry in entries:
-                if entry["key"] in keys:
-                    deleted_keys.append(entry["key"])
-                else:
-                    remaining_entries.append(entry["content"])
-            
-            # 检查哪些key没找到
-            for key in keys:
-                if key not in deleted_keys:
-                    not_found_keys.append(key)
+            with store.lock:
+                deleted_keys, not_found_keys = store.delete(keys)
+                remaining = len(store.entries())
             
             if not deleted_keys:
                 return {
@@ -274,19 +271,11 @@ class ReferenceDeleteTool(BaseTool):
                     "error": f"未找到要删除的文献: {', '.join(keys)}"
                 }
             
-            # 重新写入文件
-            new_content = '\n\n'.join(remaining_entries)
-            if new_content and not new_content.endswith('\n'):
-                new_content += '\n'
-            
-            with open(abs_bib_path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            
             # 生成结果信息
             result_parts = [f"成功删除 {len(deleted_keys)} 条参考文献: {', '.join(deleted_keys)}"]
             if not_found_keys:
                 result_parts.append(f"未找到: {', '.join(not_found_keys)}")
-            result_parts.append(f"剩余 {len(remaining_entries)} 条参考文献")
+            result_parts.append(f"剩余 {remaining} 条参考文献")
             
             return {
                 "status": "success",
@@ -300,31 +289,6 @@ class ReferenceDeleteTool(BaseTool):
                 "output": "",
                 "error": f"删除失败: {str(e)}"
             }
-    
-    def _parse_bib_entries(self, content: str) -> List[Dict[str, str]]:
-        """解析bib文件内容，提取所有条目（改进版，支持多种格式）"""
-        if not content.strip():
-            return []
-        
-        entries = []
-        # 改进的正则表达式：支持多行和单行格式
-        # 匹配 @type{key, 后面的任意内容直到 }
-        pattern = r'@(\w+)\s*\{\s*([^,\s]+)\s*,([^}]*)\}'
-        
-        matches = re.finditer(pattern, content, re.DOTALL)
-        
-        for match in matches:
-            entry_type = match.group(1)
-            entry_key = match.group(2).strip()
-            entry_content = match.group(0)
-            
-            entries.append({
-                "type": entry_type,
-                "key": entry_key,
-                "content": entry_content
-            })
-        
-        return entries
 
 
 if __name__ == "__main__":
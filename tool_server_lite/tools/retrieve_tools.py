@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+workspace 检索工具 - 在 workspace 的文本文件中按相关度检索段落，代替整文件读取
+底层为 workspace_index.WorkspaceIndex：BM25 倒排索引（可选嵌入后端），按文件增量更新
+"""
+
+from pathlib import Path
+from typing import Dict, Any
+from .file_tools import BaseTool
+from .workspace_index import get_workspace_index, read_passage
+
+
+class WorkspaceRetrieveTool(BaseTool):
+    """检索 workspace 文档段落"""
+
+    def execute(self, task_id: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        在 workspace 的文本文件（md/txt/tex/bib/py 等）中检索与 query 最相关的段落
+
+        Parameters:
+            query (str): 检索内容（关键词或自然语言问题）
+            top_k (int, optional): 返回段落数，默认 5
+            path (str, optional): 只在该目录或 glob 匹配的文件中检索，如 "upload" 或 "*.tex"
+            max_chars (int, optional): 每个段落最多返回的字符数，默认 1500
+
+        Returns:
+            status: "success" 或 "error"
+            output: 段落列表，每条带 文件:起始行-结束行
+            error: 错误信息（如有）
+        """
+        try:
+            query = (parameters.get("query") or "").strip()
+            if not query:
+                return {
+                    "status": "error",
+                    "output": "",
+                    "error": "query 不能为空"
+                }
+            top_k = max(1, int(parameters.get("top_k", 5)))
+            max_chars = int(parameters.get("max_chars", 1500))
+
+            workspace = Path(task_id)
+            index = get_workspace_index(workspace)
+            changes = index.refresh()
+            hits = index.search(query, top_k=top_k, path_pattern=parameters.get("path"))
+
+            blocks = []
+            for rank, hit in enumerate(hits, 1):
+                try:
+                    text = read_passage(workspace, hit, max_chars)
+                except OSError:
+                    continue
+                blocks.append(f"[{rank}] {hit['path']}:{hit['start_line']}-{hit['end_line']} "
+                              f"(score {hit['score']})\n{text}")
+
+            return {
+                "status": "success",
+                "output": "\n\n".join(blocks) if blocks else "没有找到相关内容",
+                "error": "",
+                "hits": [{k: hit[k] for k in ("path", "start_line", "end_line")} for hit in hits],
+                "index_changes": changes
+            }
+
+        except Exception as e:
+            return {
+                "status": "error",
+                "output": "",
+                "error": f"检索失败: {str(e)}"
+            }
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+搜索结果缓存 - web_search / arxiv_search / google_scholar_search 共享
+键为规范化后的 (工具名, 查询词, 参数)，跨 workspace 和子智能体复用
+"""
+
+import re
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .disk_cache import DiskCache
+from .tool_config import load_tool_config, get_cache_root
+
+
+# 默认配置（可在 tool_config.yaml 的 search_cache 段覆盖）
+DEFAULT_SEARCH_CACHE_CONFIG = {
+    "enabled": True,
+    "ttl": 6 * 3600,        # 搜索结果有效期（秒）
+    "max_entries": 5000,
+}
+
+
+# 查询词不区分大小写的工具；arXiv / 谷歌学术的 AND / OR / ANDNOT 等运算符区分大小写，不能转小写
+CASE_INSENSITIVE_TOOLS = {"web_search"}
+
+
+def normalize_query(query: str, lowercase: bool = False) -> str:
+    """规范化查询词：去首尾空白、合并连续空白，lowercase 为 True 时转小写"""
+    normalized = re.sub(r'\s+', ' ', str(query or '')).strip()
+    return normalized.lower() if lowercase else normalized
+
+
+def make_search_key(tool_name: str, query: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """生成缓存键，忽略值为 None 的参数"""
+    clean_params = {k: v for k, v in (params or {}).items() if v is not None}
+    query = normalize_query(query, lowercase=tool_name in CASE_INSENSITIVE_TOOLS)
+    return DiskCache.make_key(tool_name, query, clean_params)
+
+
+_cache_instance: Optional[DiskCache] = None
+
+
+def get_search_cache() -> Optional[DiskCache]:
+    """获取搜索缓存单例，配置中关闭时返回 None"""
+    global _cache_instance
+    config = dict(DEFAULT_SEARCH_CACHE_CONFIG)
+    config.update(load_tool_config().get("search_cache") or {})
+    if not config["enabled"]:
+        return None
+    if _cache_instance is None:
+        _cache_instance = DiskCache(
+            get_cache_root() / "search",
+            ttl=config["ttl"],
+            max_entries=config["max_entries"]
+        )
+    return _cache_instance
+
+
+def cached_search(
+    tool_name: str,
+    query: str,
+    params: Dict[str, Any],
+    fetch: Callable[[], Any],
+    use_cache: bool = True
+) -> Any:
+    """
+    带缓存的搜索调用
+
+    Args:
+        tool_name: 工具名称
+        query: 查询词
+        params: 影响结果的其他参数
+        fetch: 未命中时调用的搜索函数
+        use_cache: False 时跳过读取缓存（结果仍会写入）
+
+    Returns:
+        fetch 的返回值（或缓存值）；空结果不会写入缓存
+    """
+    cache = get_search_cache()
+    if cache is None:
+        return fetch()
+
+    key = make_search_key(tool_name, query, params)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    result = fetch()
+    if result:
+        cache.set(key, result)
+    return result
+
+
+async def cached_search_async(
+    tool_name: str,
+    query: str,
+    params: Dict[str, Any],
+    fetch: Callable[[], Awaitable[Any]],
+    use_cache: bool = True
+) -> Any:
+    """cached_search 的异步版本（fetch 为协程函数）"""
+    cache = get_search_cache()
+    if cache is None:
+        return await fetch()
+
+    key = make_search_key(tool_name, query, params)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    result = await fetch()
+    if result:
+        cache.set(key, result)
+    return result
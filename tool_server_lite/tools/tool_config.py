@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工具配置与共享缓存目录
+读取 config/run_env_config/tool_config.yaml，供各工具模块共用
+"""
+
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+
+_TOOL_CONFIG_CACHE: Optional[Dict[str, Any]] = None
+
+
+def load_tool_config() -> Dict[str, Any]:
+    """
+    读取 config/run_env_config/tool_config.yaml（进程内缓存）
+
+    Returns:
+        配置字典，文件不存在或解析失败时返回空字典
+    """
+    global _TOOL_CONFIG_CACHE
+    if _TOOL_CONFIG_CACHE is None:
+        try:
+            import yaml
+            config_path = Path(__file__).parent.parent.parent / "config" / "run_env_config" / "tool_config.yaml"
+            with open(config_path, 'r', encoding='utf-8') as f:
+                _TOOL_CONFIG_CACHE = yaml.safe_load(f) or {}
+        except Exception:
+            _TOOL_CONFIG_CACHE = {}
+    return _TOOL_CONFIG_CACHE
+
+
+def get_cache_root() -> Path:
+    """跨 workspace 共享的缓存根目录（可在 tool_config.yaml 的 cache_dir 中覆盖）"""
+    cache_dir = load_tool_config().get("cache_dir")
+    if cache_dir:
+        return Path(cache_dir).expanduser()
+    return Path.home() / "mla_v3" / "cache"
@@ -4,10 +4,16 @@
 Vision分析工具 - 图片内容分析
 """
 
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
-from .file_tools import BaseTool, get_abs_path
+from .file_tools import BaseTool, get_abs_path, is_glob_pattern
+from .image_prep import (
+    BATCH_MODES, MIME_TYPES, file_sha256, get_vision_cache, get_vision_config, make_vision_key,
+    prepare_image, record_upload
+)
 
 # 导入llm_client_lite
 import sys
@@ -19,6 +25,24 @@ if parent_dir not in sys.path:
 from llm_client_lite import get_llm_client
 
 
+# 合并请求时要求模型按图片分段作答
+PACK_PROMPT = (
+    "下面依次给出 {count} 张图片（图片 1 到图片 {count}），每张图片前有一行编号。"
+    "请对每张图片分别回答同一个问题，按顺序输出，每张图片的回答以单独一行 `### 图片 k` 开头。\n\n"
+    "问题：{question}"
+)
+_PACK_HEADER = re.compile(r'^[ \t]*#{1,6}[ \t]*图片[ \t]*(\d+)[ \t]*[:：]?[ \t]*$', re.MULTILINE)
+
+
+def split_pack_answer(text: str, count: int) -> Optional[List[str]]:
+    """按 '### 图片 k' 标题拆分合并请求的回答；标题缺失或乱序时返回 None"""
+    matches = list(_PACK_HEADER.finditer(text or ""))
+    if [int(m.group(1)) for m in matches] != list(range(1, count + 1)):
+        return None
+    ends = [m.start() for m in matches[1:]] + [len(text)]
+    return [text[m.end():end].strip() for m, end in zip(matches, ends)]
+
+
 class VisionTool(BaseTool):
     """图片Vision分析工具 - 调用LLM分析图片内容"""
     
@@ -27,19 +51,25 @@ class VisionTool(BaseTool):
         执行Vision分析
         
         Parameters:
-            image_path (str): 图片文件相对路径（相对于任务目录）
+            image_path (str): 图片文件相对路径（相对于任务目录）；glob（如 "figures/*.png"）或目录时批量分析
+            image_paths (list, optional): 多个图片路径（可含 glob），批量分析
             question (str, optional): 要问的问题，默认"请描述这张图片的内容"
             model (str, optional): 模型名称，默认使用配置中的模型
             save_path (str, optional): 保存分析结果的相对路径
+            max_edge (int, optional): 上传前缩放的长边上限（像素），0 表示上传原图
+            use_cache (bool, optional): 是否使用回答缓存，默认 True
+            batch_mode (str, optional): 批量模式 concurrent（逐张并发请求）/ pack（多张图片合并为一次请求）
         
         Returns:
             status: "success" 或 "error"
             output: 分析结果文本或保存位置信息
             error: 错误信息（如有）
+            uploaded_bytes / original_bytes / cache_hit: 本次上传字节数、原图字节数、是否命中缓存
+            images: 批量模式下逐张图片的状态 {路径: {status, cache_hit, uploaded_bytes, error}}
         """
         try:
             # 获取参数
-            image_path = parameters.get("image_path")
+            image_path = parameters.get("image_paths") or parameters.get("image_path")
             question = parameters.get("question", "请描述这张图片的内容")
             model = parameters.get("model")
             save_path = parameters.get("save_path")
@@ -51,33 +81,28 @@ class VisionTool(BaseTool):
                     "error": "缺少必需参数: image_path"
                 }
             
-            # 转换为绝对路径
-            abs_image_path = get_abs_path(task_id, image_path)
-            
             # 调用LLM客户端
             llm_client = get_llm_client()
             
+            if isinstance(image_path, list) or is_glob_pattern(image_path) \
+                    or get_abs_path(task_id, image_path).is_dir():
+                return self._execute_batch(task_id, llm_client, image_path, parameters)
+            
+            # 转换为绝对路径
+            abs_image_path = get_abs_path(task_id, image_path)
+            
             try:
-                result = llm_client.vision_query(
-                    image_path=str(abs_image_path),
-                    question=question,
-                    model=model
+                result, upload = self._query(
+                    llm_client, abs_image_path, question, model,
+                    max_edge=parameters.get("max_edge"),
+                    use_cache=parameters.get("use_cache", True)
                 )
                 
-                # 保存分析结果
-                if save_path:
-                    abs_save_path = get_abs_path(task_id, save_path)
-                    abs_save_path.parent.mkdir(parents=True, exist_ok=True)
-                    with open(abs_save_path, 'w', encoding='utf-8') as f:
-                        f.write(result)
-                    output = f"结果保存在 {save_path}"
-                else:
-                    output = result
-                
                 return {
                     "status": "success",
-                    "output": output,
-                    "error": ""
+                    "output": self._save(task_id, save_path, result),
+                    "error": "",
+                    **upload
                 }
                 
             except FileNotFoundError as e:
@@ -99,6 +124,236 @@ class VisionTool(BaseTool):
                 "output": "",
                 "error": f"执行失败: {str(e)}"
             }
+    
+    def _save(self, task_id: str, save_path: Optional[str], text: str) -> str:
+        """保存分析结果，返回工具输出"""
+        if not save_path:
+            return text
+        abs_save_path = get_abs_path(task_id, save_path)
+        abs_save_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(abs_save_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return f"结果保存在 {save_path}"
+    
+    # ===== 单张图片 =====
+    
+    def _query(self, llm_client, abs_image_path: Path, question: str, model: Optional[str],
+               max_edge: Optional[int] = None, use_cache: bool = True):
+        """
+        预处理图片并查询（先查回答缓存）
+        
+        Returns:
+            (回答文本, {"uploaded_bytes", "original_bytes", "cache_hit"})
+        """
+        plan = self._plan(llm_client, abs_image_path, question, model, max_edge, use_cache)
+        return self._answer(llm_client, plan, question)
+    
+    def _plan(self, llm_client, abs_image_path: Path, question: str, model: Optional[str],
+              max_edge: Optional[int], use_cache: bool) -> Dict[str, Any]:
+        """确定模型和预处理参数并查缓存"""
+        if not abs_image_path.exists():
+            raise FileNotFoundError(str(abs_image_path))
+        
+        config = get_vision_config()
+        prep = {
+            "max_edge": config["max_edge"] if max_edge is None else int(max_edge),
+            "format": config["format"],
+            "quality": config["quality"],
+        }
+        model = model or llm_client.read_figure_models[0]
+        
+        cache = get_vision_cache()
+        key = make_vision_key(file_sha256(abs_image_path), question, model, prep)
+        cached = cache.get(key) if cache is not None and use_cache else None
+        return {"path": abs_image_path, "model": model, "prep": prep, "cache": cache, "key": key, "cached": cached}
+    
+    def _answer(self, llm_client, plan: Dict[str, Any], question: str):
+        if plan["cached"] is not None:
+            return plan["cached"], {"uploaded_bytes": 0, "original_bytes": plan["path"].stat().st_size, "cache_hit": True}
+        
+        image = self._prepare(plan)
+        result = llm_client.vision_query(
+            image_path=str(plan["path"]),
+            question=question,
+            model=plan["model"],
+            image_bytes=image["data"],
+            mime_type=image["mime_type"]
+        )
+        return result, self._store(plan, image, result)
+    
+    def _prepare(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        prep = plan["prep"]
+        return prepare_image(plan["path"], prep["max_edge"], prep["format"], prep["quality"])
+    
+    def _store(self, plan: Dict[str, Any], image: Dict[str, Any], result: str) -> Dict[str, Any]:
+        """记录上传量并写入缓存"""
+        record_upload(image["original_bytes"], image["uploaded_bytes"])
+        print(f"[vision] {plan['path'].name}: {image['original_bytes']} → {image['uploaded_bytes']} bytes"
+              f" ({image['original_size']} → {image['size']})")
+        
+        if plan["cache"] is not None and result:
+            plan["cache"].set(plan["key"], result)
+        return {
+            "uploaded_bytes": image["uploaded_bytes"],
+            "original_bytes": image["original_bytes"],
+            "cache_hit": False
+        }
+    
+    # ===== 批量 =====
+    
+    def _expand_images(self, task_id: str, patterns: list, max_images: int):
+        """
+        展开 glob / 目录并去重（保持顺序），超过 max_images 的部分丢弃
+        
+        Returns:
+            (图片路径列表, {无匹配的模式: 错误信息}, 被丢弃的图片数)
+        """
+        workspace = Path(task_id)
+        paths = []
+        errors = {}
+        for pattern in patterns:
+            abs_path = get_abs_path(task_id, pattern)
+            if is_glob_pattern(pattern):
+                candidates = workspace.glob(str(abs_path.relative_to(workspace)))
+            elif abs_path.is_dir():
+                candidates = abs_path.iterdir()
+            else:
+                paths.append(pattern)
+                continue
+            matches = sorted(
+                str(match.relative_to(workspace)) for match in candidates
+                if match.is_file() and match.suffix.lower() in MIME_TYPES
+            )
+            if matches:
+                paths.extend(matches)
+            else:
+                errors[pattern] = f"No images match: {pattern}"
+        
+        paths = list(dict.fromkeys(paths))
+        dropped = max(0, len(paths) - max_images)
+        return paths[:max_images], errors, dropped
+    
+    def _execute_batch(self, task_id: str, llm_client, image_path, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """批量分析多张图片，返回逐张图片的报告"""
+        config = get_vision_config()
+        question = parameters.get("question", "请描述这张图片的内容")
+        mode = parameters.get("batch_mode") or config["batch_mode"]
+        if mode not in BATCH_MODES:
+            return {
+                "status": "error",
+                "output": "",
+                "error": f"无效的 batch_mode: {mode}，应为 {' / '.join(BATCH_MODES)}"
+            }
+        
+        patterns = image_path if isinstance(image_path, list) else [image_path]
+        paths, pattern_errors, dropped = self._expand_images(task_id, patterns, int(config["max_images"]))
+        
+        def analyze(path: str, plan: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+            try:
+                if plan is None:
+                    plan = self._plan(llm_client, get_abs_path(task_id, path), question, parameters.get("model"),
+                                      parameters.get("max_edge"), parameters.get("use_cache", True))
+                answer, upload = self._answer(llm_client, plan, question)
+                return {"status": "success", "answer": answer, **upload}
+            except FileNotFoundError:
+                return {"status": "error", "error": f"图片文件不存在: {path}"}
+            except Exception as e:
+                return {"status": "error", "error": f"Vision分析失败: {str(e)}"}
+        
+        workers = max(1, int(config["max_workers"]))
+        entries: Dict[str, Dict[str, Any]] = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            if mode == "concurrent":
+                entries.update(zip(paths, pool.map(analyze, paths)))
+            else:
+                pending = []
+                for path in paths:
+                    try:
+                        plan = self._plan(llm_client, get_abs_path(task_id, path), question, parameters.get("model"),
+                                          parameters.get("max_edge"), parameters.get("use_cache", True))
+                    except Exception:
+                        entries[path] = analyze(path)
+                        continue
+                    if plan["cached"] is not None:
+                        entries[path] = analyze(path, plan)
+                    else:
+                        pending.append((path, plan))
+                
+                size = max(1, int(config["pack_size"]))
+                groups = [pending[i:i + size] for i in range(0, len(pending), size)]
+                
+                def run_group(group):
+                    answers = self._ask_pack(llm_client, group, question) if len(group) > 1 else None
+                    if answers is None:
+                        # 单张、模型不支持多图或回答无法拆分时逐张请求
+                        return {path: analyze(path, plan) for path, plan in group}
+                    return {
+                        path: {"status": "success", "answer": answer, **self._store(plan, image, answer)}
+                        for (path, plan), (image, answer) in zip(group, answers)
+                    }
+                
+                for result in pool.map(run_group, groups):
+                    entries.update(result)
+        
+        for pattern, error in pattern_errors.items():
+            entries[pattern] = {"status": "error", "error": error}
+        
+        success_count = sum(1 for entry in entries.values() if entry["status"] == "success")
+        hits = sum(1 for entry in entries.values() if entry.get("cache_hit"))
+        uploaded = sum(entry.get("uploaded_bytes", 0) for entry in entries.values())
+        original = sum(entry.get("original_bytes", 0) for entry in entries.values())
+        
+        notes = [f"{hits} 张命中缓存", f"上传 {uploaded / 1024:.0f}KB（原图 {original / 1024:.0f}KB）"]
+        if dropped:
+            notes.append(f"超过 {config['max_images']} 张，另有 {dropped} 张未分析")
+        report = self._format_report(paths + list(pattern_errors), entries, success_count, notes)
+        
+        return {
+            "status": "success" if success_count else "error",
+            "output": self._save(task_id, parameters.get("save_path"), report) if success_count else "",
+            "error": "" if success_count else report,
+            "uploaded_bytes": uploaded,
+            "original_bytes": original,
+            "images": {
+                path: {key: value for key, value in entry.items() if key != "answer"}
+                for path, entry in entries.items()
+            }
+        }
+    
+    def _ask_pack(self, llm_client, group: list, question: str) -> Optional[List]:
+        """
+        把一组图片合并为一次请求
+        
+        Returns:
+            [(预处理结果, 回答)]；请求失败或回答无法按图片拆分时返回 None
+        """
+        try:
+            images = [self._prepare(plan) for _, plan in group]
+            response = llm_client.vision_query_multi(
+                [(f"图片 {i}:", image["data"], image["mime_type"]) for i, image in enumerate(images, start=1)],
+                PACK_PROMPT.format(count=len(images), question=question),
+                model=group[0][1]["model"]
+            )
+        except Exception as e:
+            print(f"[vision] 合并请求失败，改为逐张请求: {e}")
+            return None
+        answers = split_pack_answer(response, len(images))
+        if answers is None:
+            print("[vision] 合并请求的回答无法按图片拆分，改为逐张请求")
+            return None
+        return list(zip(images, answers))
+    
+    def _format_report(self, paths: list, entries: Dict[str, Dict[str, Any]], success_count: int, notes: list) -> str:
+        """逐张图片的报告：头部摘要 + 每张图片一节"""
+        header = f"[分析 {success_count}/{len(paths)} 张图片；{'；'.join(notes)}]"
+        sections = [header]
+        for path in paths:
+            entry = entries[path]
+            if entry["status"] == "success":
+                sections.append(f"==> {path} <==\n{entry['answer']}")
+            else:
+                sections.append(f"==> {path} <== [error] {entry['error']}")
+        return "\n\n".join(sections)
 
 
 class CreateImageTool(BaseTool):
@@ -5,19 +5,17 @@
 """
 
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List
 import asyncio
+import hashlib
 import re
-import requests
-from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlparse, unquote
 from .file_tools import BaseTool, get_abs_path
-
-# Crawl4AI 导入
-try:
-    from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
-    CRAWL4AI_AVAILABLE = True
-except ImportError:
-    CRAWL4AI_AVAILABLE = False
+from .downloader import download_file, file_digest, parse_checksum
+from .paper_store import PDF_NAME, get_paper_store, identifiers_from_url, is_pdf
+from .browser_pool import CRAWL4AI_AVAILABLE, get_browser_pool
+from .search_cache import cached_search, cached_search_async
 
 # DuckDuckGo 导入
 try:
@@ -36,12 +34,16 @@ class CrawlPageTool(BaseTool):
     
     async def execute_async(self, task_id: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """
-        爬取网页内容
+        爬取网页内容（支持单个或多个URL）
         
         Parameters:
-            url (str): 网页URL
-            save_path (str, optional): 保存结果的相对路径（.md文件）
+            url (str or list): 网页URL，传列表时并发批量爬取
+            urls (list, optional): 同 url 的列表形式（批量模式）
+            save_path (str, optional): 保存结果的相对路径（.md文件）；
+                                      批量模式下为保存目录（必需），每个URL写入确定性的文件名
             download_images (bool, optional): 是否下载图片，默认False
+            use_cache (bool, optional): 是否使用磁盘页面缓存，默认跟随服务器配置
+            max_concurrency (int, optional): 批量模式的最大并发数，默认4
         """
         try:
             if not CRAWL4AI_AVAILABLE:
@@ -51,9 +53,10 @@ class CrawlPageTool(BaseTool):
                     "error": "crawl4ai not installed. Run: pip install crawl4ai"
                 }
             
-            url = parameters.get("url")
+            url = parameters.get("url") or parameters.get("urls")
             save_path = parameters.get("save_path")
             download_images = parameters.get("download_images", False)
+            use_cache = parameters.get("use_cache")
             
             if not url:
                 return {
@@ -62,8 +65,12 @@ class CrawlPageTool(BaseTool):
                     "error": "url is required"
                 }
             
+            # 批量模式（单元素列表同样按目录保存，与 save_path 的含义一致）
+            if isinstance(url, list):
+                return await self._crawl_batch(task_id, url, parameters)
+            
             # 爬取页面
-            markdown_text = await self._crawl_page(url)
+            markdown_text = await self._crawl_page(url, use_cache)
             
             # 处理图片
             if not download_images:
@@ -95,20 +102,82 @@ class CrawlPageTool(BaseTool):
                 "error": str(e)
             }
     
-    async def _crawl_page(self, url: str) -> str:
-        """使用 crawl4ai 爬取页面"""
-        browser_conf = BrowserConfig(headless=True, verbose=False)
-        run_conf = CrawlerRunConfig(cache_mode=CacheMode.BYPASS)
+    async def _crawl_page(self, url: str, use_cache: bool = None) -> str:
+        """使用共享浏览器池爬取页面"""
+        markdown_text = await get_browser_pool().crawl_markdown(url, use_cache=use_cache)
+        if markdown_text is None:
+            raise Exception("Unable to extract markdown from crawl result")
+        return markdown_text
+    
+    async def _crawl_batch(self, task_id: str, urls: List[str], parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """并发爬取多个URL，每个结果写入 save_path 目录下的独立文件，返回紧凑索引"""
+        save_dir = parameters.get("save_path")
+        download_images = parameters.get("download_images", False)
+        use_cache = parameters.get("use_cache")
+        max_concurrency = max(1, int(parameters.get("max_concurrency", 4)))
         
-        async with AsyncWebCrawler(config=browser_conf) as crawler:
-            result = await crawler.arun(url, config=run_conf)
-            
-            markdown_attr = getattr(result, "markdown", None)
-            if markdown_attr is None:
-                raise Exception("Unable to extract markdown from crawl result")
-            
-            markdown_text = getattr(markdown_attr, "raw_markdown", None) or str(markdown_attr)
-            return markdown_text
+        if not save_dir:
+            return {
+                "status": "error",
+                "output": "",
+                "error": "save_path (directory) is required when url is a list"
+            }
+        
+        # 兼容传入 xxx.md：使用去掉后缀的路径作为目录
+        save_dir_obj = Path(save_dir)
+        if save_dir_obj.suffix:
+            save_dir_obj = save_dir_obj.parent / save_dir_obj.stem
+        abs_save_dir = get_abs_path(task_id, str(save_dir_obj))
+        abs_save_dir.mkdir(parents=True, exist_ok=True)
+        
+        # 去重但保持顺序
+        unique_urls = list(dict.fromkeys(u for u in urls if u))
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def crawl_one(page_url: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    markdown_text = await self._crawl_page(page_url, use_cache)
+                    if not download_images:
+                        markdown_text = re.sub(r"!\[[^\]]*\]\([^\)]+\)", "", markdown_text)
+                    
+                    filename = self._batch_filename(page_url)
+                    with open(abs_save_dir / filename, 'w', encoding='utf-8') as f:
+                        f.write(markdown_text)
+                    
+                    return {
+                        "url": page_url,
+                        "status": "success",
+                        "path": str(save_dir_obj / filename),
+                        "chars": len(markdown_text)
+                    }
+                except Exception as e:
+                    return {"url": page_url, "status": "error", "error": str(e)}
+        
+        results = await asyncio.gather(*(crawl_one(u) for u in unique_urls))
+        
+        succeeded = [r for r in results if r["status"] == "success"]
+        failed = [r for r in results if r["status"] != "success"]
+        
+        lines = [f"批量爬取完成: 成功 {len(succeeded)}/{len(results)}，结果保存在 {save_dir_obj}/"]
+        for r in succeeded:
+            lines.append(f"[OK] {r['url']} -> {r['path']} ({r['chars']} chars)")
+        for r in failed:
+            lines.append(f"[FAIL] {r['url']}: {r['error']}")
+        
+        return {
+            "status": "success" if succeeded else "error",
+            "output": "\n".join(lines),
+            "error": "\n".join(f"{r['url']}: {r['error']}" for r in failed)
+        }
+    
+    @staticmethod
+    def _batch_filename(url: str) -> str:
+        """根据URL生成确定性的文件名：可读前缀 + URL哈希"""
+        readable = re.sub(r'^https?://', '', url)
+        readable = re.sub(r'[^\w.-]+', '_', readable).strip('_')[:60]
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]
+        return f"{readable}_{digest}.md"
 
 
 class GoogleScholarSearchTool(BaseTool):
@@ -124,6 +193,7 @@ class GoogleScholarSearchTool(BaseTool):
             year_high (int, optional): 年份上限
             pages (int, optional): 爬取页数，默认1
             save_path (str, optional): 保存结果的相对路径（.md文件）
+            use_cache (bool, optional): 是否使用搜索结果缓存，默认True
         """
         try:
             if not CRAWL4AI_AVAILABLE:
@@ -138,6 +208,7 @@ class GoogleScholarSearchTool(BaseTool):
             year_high = parameters.get("year_high")
             pages = parameters.get("pages", 1)
             save_path = parameters.get("save_path")
+            use_cache = parameters.get("use_cache", True)
             
             if not query:
                 return {
@@ -146,8 +217,14 @@ class GoogleScholarSearchTool(BaseTool):
                     "error": "query is required"
                 }
             
-            # 爬取学术搜索结果
-            all_content = await self._crawl_scholar(query, year_low, year_high, pages)
+            # 爬取学术搜索结果（优先使用缓存）
+            all_content = await cached_search_async(
+                "google_scholar_search",
+                query,
+                {"year_low": year_low, "year_high": year_high, "pages": pages},
+                lambda: self._crawl_scholar(query, year_low, year_high, pages),
+                use_cache=use_cache
+            )
             
             # 保存到文件
             if save_path:
@@ -191,35 +268,29 @@ class GoogleScholarSearchTool(BaseTool):
         """爬取谷歌学术搜索结果"""
         base_url = "https://scholar.google.com/scholar"
         all_content = []
+        pool = get_browser_pool()
         
-        browser_conf = BrowserConfig(headless=True, verbose=False)
-        run_conf = CrawlerRunConfig(cache_mode=CacheMode.BYPASS)
-        
-        async with AsyncWebCrawler(config=browser_conf) as crawler:
-            for page in range(pages):
-                start = page * 10
-                
-                params = {
-                    "start": str(start),
-                    "q": query,
-                    "as_sdt": "0,5"
-                }
-                
-                if year_low:
-                    params["as_ylo"] = str(year_low)
-                if year_high:
-                    params["as_yhi"] = str(year_high)
-                
-                url = f"{base_url}?{urlencode(params)}"
-                
-                result = await crawler.arun(url, config=run_conf)
-                
-                markdown_attr = getattr(result, "markdown", None)
-                if markdown_attr:
-                    markdown_text = getattr(markdown_attr, "raw_markdown", None) or str(markdown_attr)
-                    # 移除图片
-                    markdown_text = re.sub(r"!\[[^\]]*\]\([^\)]+\)", "", markdown_text)
-                    all_content.append(f"--- Page {page + 1} ---\n{markdown_text}\n")
+        for page in range(pages):
+            start = page * 10
+            
+            params = {
+                "start": str(start),
+                "q": query,
+                "as_sdt": "0,5"
+            }
+            
+            if year_low:
+                params["as_ylo"] = str(year_low)
+            if year_high:
+                params["as_yhi"] = str(year_high)
+            
+            url = f"{base_url}?{urlencode(params)}"
+            
+            markdown_text = await pool.crawl_markdown(url)
+            if markdown_text:
+                # 移除图片
+                markdown_text = re.sub(r"!\[[^\]]*\]\([^\)]+\)", "", markdown_text)
+                all_content.append(f"--- Page {page + 1} ---\n{markdown_text}\n")
         
         return '\n'.join(all_content)
 
@@ -235,6 +306,7 @@ class WebSearchTool(BaseTool):
             query (str): 搜索关键词
             max_results (int, optional): 最大结果数，默认10
             save_path (str, optional): 保存结果的相对路径（.md文件）
+            use_cache (bool, optional): 是否使用搜索结果缓存，默认True
         """
         try:
             if not DDGS_AVAILABLE:
@@ -247,6 +319,7 @@ class WebSearchTool(BaseTool):
             query = parameters.get("query")
             max_results = parameters.get("max_results", 10)
             save_path = parameters.get("save_path")
+            use_cache = parameters.get("use_cache", True)
             
             if not query:
                 return {
@@ -255,8 +328,14 @@ class WebSearchTool(BaseTool):
                     "error": "query is required"
                 }
             
-            # 使用 DuckDuckGo 搜索
-            results = DDGS().text(query, max_results=max_results)
+            # 使用 DuckDuckGo 搜索（优先使用缓存）
+            results = cached_search(
+                "web_search",
+                query,
+                {"max_results": max_results},
+                lambda: self._search(query, max_results),
+                use_cache=use_cache
+            ) or []
             
             # 格式化为 Markdown
             results_md = []
@@ -308,40 +387,51 @@ class WebSearchTool(BaseTool):
                 "error": str(e)
             }
 
+    def _search(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        """调用 DuckDuckGo 搜索，返回原始结果列表"""
+        return list(DDGS().text(query, max_results=max_results) or [])
+
 
 class FileDownloadTool(BaseTool):
-    """文件下载工具"""
+    """文件下载工具（断点续传、并行分段、校验和、批量下载）"""
     
     def execute(self, task_id: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """
         从URL下载文件
         
         Parameters:
-            url (str): 文件URL
-            save_path (str): 保存的相对路径
+            url (str or list): 文件URL，传列表时批量下载
+            urls (list, optional): 同 url 的列表形式（批量模式）
+            save_path (str): 保存的相对路径；批量模式下为保存目录
+            connections (int, optional): 并行连接数，默认使用服务器配置
+            checksum (str or dict, optional): 校验和，如 "sha256:..."；批量模式下为 {url: 校验和}
+            max_concurrency (int, optional): 批量模式同时下载的文件数，默认4
+            use_cache (bool, optional): 是否先查共享论文库，默认True
         """
         try:
-            url = parameters.get("url")
+            url = parameters.get("url") or parameters.get("urls")
             save_path = parameters.get("save_path")
+            connections = parameters.get("connections")
+            checksum = parameters.get("checksum")
+            use_cache = parameters.get("use_cache", True)
             
-            abs_save_path = get_abs_path(task_id, save_path)
-            abs_save_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # 下载文件
-            response = requests.get(url, stream=True, timeout=60)
-            response.raise_for_status()
+            if not url or not save_path:
+                return {
+                    "status": "error",
+                    "output": "",
+                    "error": "url and save_path are required"
+                }
             
-            # 写入文件
-            with open(abs_save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            # 批量模式
+            if isinstance(url, list):
+                return self._download_batch(task_id, url, parameters)
             
-            file_size = abs_save_path.stat().st_size
-            size_mb = file_size / (1024 * 1024)
+            abs_save_path = get_abs_path(task_id, save_path)
+            result = self._download(url, abs_save_path, connections, checksum, use_cache)
             
             return {
                 "status": "success",
-                "output": f"Downloaded to {save_path} ({size_mb:.2f} MB)",
+                "output": f"Downloaded to {save_path} ({self._describe(result)})",
                 "error": ""
             }
             
@@ -351,4 +441,111 @@ class FileDownloadTool(BaseTool):
                 "output": "",
                 "error": str(e)
             }
+    
+    def _download_batch(self, task_id: str, urls: List[str], parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """并发下载多个URL到 save_path 目录，返回紧凑索引"""
+        save_dir = parameters.get("save_path")
+        connections = parameters.get("connections")
+        checksums = parameters.get("checksum") or {}
+        if not isinstance(checksums, dict):
+            checksums = {}
+        max_concurrency = max(1, int(parameters.get("max_concurrency", 4)))
+        use_cache = parameters.get("use_cache", True)
+        
+        abs_save_dir = get_abs_path(task_id, save_dir)
+        abs_save_dir.mkdir(parents=True, exist_ok=True)
+        
+        # 去重但保持顺序，同名文件追加URL哈希
+        unique_urls = list(dict.fromkeys(u for u in urls if u))
+        filenames = {}
+        used = set()
+        for file_url in unique_urls:
+            name = self._batch_filename(file_url)
+            if name in used:
+                digest = hashlib.sha1(file_url.encode('utf-8')).hexdigest()[:8]
+                stem, dot, ext = name.rpartition('.')
+                name = f"{stem}_{digest}.{ext}" if dot else f"{name}_{digest}"
+            used.add(name)
+            filenames[file_url] = name
+        
+        def download_one(file_url: str) -> Dict[str, Any]:
+            rel_path = str(Path(save_dir) / filenames[file_url])
+            try:
+                result = self._download(
+                    file_url,
+                    abs_save_dir / filenames[file_url],
+                    connections,
+                    checksums.get(file_url),
+                    use_cache
+                )
+                return {"url": file_url, "status": "success", "path": rel_path, "result": result}
+            except Exception as e:
+                return {"url": file_url, "status": "error", "error": str(e)}
+        
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            results = list(executor.map(download_one, unique_urls))
+        
+        succeeded = [r for r in results if r["status"] == "success"]
+        failed = [r for r in results if r["status"] != "success"]
+        
+        lines = [f"批量下载完成: 成功 {len(succeeded)}/{len(results)}，文件保存在 {save_dir}/"]
+        for r in succeeded:
+            lines.append(f"[OK] {r['url']} -> {r['path']} ({self._describe(r['result'])})")
+        for r in failed:
+            lines.append(f"[FAIL] {r['url']}: {r['error']}")
+        
+        return {
+            "status": "success" if succeeded else "error",
+            "output": "\n".join(lines),
+            "error": "\n".join(f"{r['url']}: {r['error']}" for r in failed)
+        }
+    
+    @staticmethod
+    def _download(url: str, dest: Path, connections, checksum, use_cache: bool) -> Dict[str, Any]:
+        """先查共享论文库（按 URL / arXiv ID / DOI），未命中再下载；下载到的 PDF 登记入库"""
+        store = get_paper_store()
+        ids = identifiers_from_url(url)
+        if store is not None and use_cache:
+            entry = store.lookup(arxiv_id=ids.get("arxiv"), doi=ids.get("doi"), url=ids.get("url"))
+            if entry and entry["has_pdf"]:
+                pdf = store.path(entry["id"], PDF_NAME)
+                verified = None
+                if checksum:
+                    algo, expected = parse_checksum(checksum)
+                    verified = f"{algo}:{expected}" if file_digest(pdf, algo) == expected else None
+                if verified or not checksum:
+                    method = store.materialize(entry["id"], PDF_NAME, dest)
+                    return {"path": dest, "size": dest.stat().st_size, "resumed_bytes": 0,
+                            "parallel": False, "checksum": verified, "paper_store": method}
+
+        result = download_file(url, dest, connections=connections, checksum=checksum)
+        if store is not None and is_pdf(dest):
+            try:
+                store.add_pdf(dest, ids)
+            except OSError as e:
+                # 入库失败（缓存目录不可写、磁盘满等）不影响已完成的下载
+                print(f"[WARN] 论文入库失败: {e}")
+        return result
 
+    @staticmethod
+    def _describe(result: Dict[str, Any]) -> str:
+        """生成大小/续传/校验说明"""
+        parts = [f"{result['size'] / (1024 * 1024):.2f} MB"]
+        if result.get("paper_store"):
+            parts.append(f"from shared paper store ({result['paper_store']})")
+        if result["resumed_bytes"]:
+            parts.append(f"resumed from {result['resumed_bytes'] / (1024 * 1024):.2f} MB")
+        if result["parallel"]:
+            parts.append("parallel")
+        if result["checksum"]:
+            parts.append(f"{result['checksum'].split(':')[0]} verified")
+        return ", ".join(parts)
+    
+    @staticmethod
+    def _batch_filename(url: str) -> str:
+        """取URL路径的最后一段作为文件名，没有时使用URL哈希"""
+        name = unquote(urlparse(url).path.rstrip('/').rsplit('/', 1)[-1])
+        name = re.sub(r'[^\w.-]+', '_', name).strip('._')[:100]
+        if not name:
+            name = f"download_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:8]}"
+        return name
@@ -0,0 +1,641 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+workspace 文本检索索引 - workspace_retrieve 使用
+- 段落：按空行和长度把文本文件切成带行号范围的段落
+- BM25 倒排索引：词表 + CSR 形式的倒排表（array 存储的段落号 / 词频），不依赖第三方库
+- 增量更新：按 (大小, mtime) 发现变化，再用内容哈希确认；变化的文件只重新切分这一个文件，
+  旧段落打删除标记，新段落的倒排项先放在增量区，保存时合并，删除标记过多时压缩重排
+- 索引保存在 cache_dir/retrieve/<workspace 哈希>/，首次查询时才加载，进程内保留最近使用的若干个
+- 可选的嵌入后端（CPU）：配置后与 BM25 结果按 RRF 融合
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter, OrderedDict, defaultdict
+from fnmatch import fnmatch
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .file_tools import SKIP_DIRS
+from .tool_config import load_tool_config, get_cache_root
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+# 默认配置（可在 tool_config.yaml 的 workspace_retrieve 段覆盖）
+DEFAULT_RETRIEVE_CONFIG = {
+    "suffixes": [".md", ".txt", ".tex", ".bib", ".rst", ".csv", ".json", ".py", ".html"],
+    "max_file_mb": 10,              # 超过该大小的文件不建索引
+    "passage_chars": 1000,          # 段落目标长度（字符）
+    "passage_max_lines": 40,        # 段落最多行数
+    "k1": 1.2,                      # BM25 参数
+    "b": 0.75,
+    "compact_ratio": 0.3,           # 已删除段落超过该比例时压缩重排
+    "memory_indexes": 8,            # 进程内保留的索引数
+    "embedding": None,              # 可选：{"backend": "sentence_transformers", "model": "...", "batch_size": 32}
+}
+
+INDEX_VERSION = 2  # 2: 行号只按 \n 计
+
+
+# 常见英文停用词（不进倒排表，减小体积）
+STOPWORDS = set(
+    "the of and to in is for on that with as by are be this an at from or it we our was were which "
+    "can has have not but their these its also than such into been they more other".split()
+)
+
+_TOKEN_RE = re.compile(r'[0-9a-z]+|[㐀-䶿一-鿿]+')
+
+# RRF 融合常数
+RRF_K = 60
+
+
+def get_retrieve_config() -> Dict[str, Any]:
+    config = dict(DEFAULT_RETRIEVE_CONFIG)
+    config.update(load_tool_config().get("workspace_retrieve") or {})
+    return config
+
+
+# ===== 切分与分词 =====
+
+def tokenize(text: str) -> List[str]:
+    """小写英文词（去停用词和单字母）+ 中文按字二元组"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        word = match.group()
+        if word[0] >= '㐀':
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        elif word.isdigit() or (len(word) > 1 and word not in STOPWORDS):
+            tokens.append(word)
+    return tokens
+
+
+def split_passages(text: str, passage_chars: int, max_lines: int) -> List[Tuple[int, int, str]]:
+    """
+    把文本切成段落：遇到空行且已够半个段落长时断开，超长或行数到上限时强制断开
+
+    Returns:
+        [(起始行号, 结束行号, 段落文本)]，行号从 1 开始且包含两端
+    """
+    passages = []
+    buffer: List[str] = []
+    size = 0
+    start = end = 0
+
+    def flush():
+        nonlocal buffer, size
+        if buffer:
+            passages.append((start, end, "\n".join(buffer)))
+        buffer, size = [], 0
+
+    # 只按 \n 切行（与 read_passage / file_read 的行号一致）：splitlines 还会在 \f、单独的 \r、\u2028 等处切分
+    for number, line in enumerate(text.split("\n"), 1):
+        line = line.rstrip("\r")
+        if not line.strip():
+            if size >= passage_chars // 2:
+                flush()
+            continue
+        if buffer and (size + len(line) > passage_chars or len(buffer) >= max_lines):
+            flush()
+        if not buffer:
+            start = number
+        buffer.append(line)
+        size += len(line) + 1
+        end = number
+    flush()
+    return passages
+
+
+# ===== 嵌入后端 =====
+
+class EmbeddingBackend:
+    """嵌入后端接口：name 用于区分索引中的向量，embed 返回与输入等长的向量列表"""
+
+    name = ""
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """sentence-transformers（CPU）"""
+
+    def __init__(self, model: str = "sentence-transformers/all-MiniLM-L6-v2", batch_size: int = 32, **_):
+        # 依赖 torch，导入较慢，只在配置了嵌入后端时才导入
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ValueError("sentence-transformers not installed. Run: pip install sentence-transformers")
+        self._model = SentenceTransformer(model, device="cpu")
+        self.batch_size = batch_size
+        self.name = f"sentence_transformers:{model}"
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self._model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True).tolist()
+
+
+EMBEDDING_BACKENDS: Dict[str, Callable[..., EmbeddingBackend]] = {
+    "sentence_transformers": SentenceTransformerBackend,
+}
+
+_backend_instances: Dict[str, EmbeddingBackend] = {}
+_backend_lock = threading.Lock()
+
+
+def register_embedding_backend(name: str, factory: Callable[..., EmbeddingBackend]):
+    """注册自定义嵌入后端（factory 接收 embedding 配置中除 backend 外的参数）"""
+    EMBEDDING_BACKENDS[name] = factory
+
+
+def get_embedding_backend(config: Optional[Dict[str, Any]]) -> Optional[EmbeddingBackend]:
+    """按 embedding 配置取得后端单例，未配置时返回 None"""
+    if not config or not config.get("backend"):
+        return None
+    options = {k: v for k, v in config.items() if k != "backend"}
+    key = json.dumps(config, sort_keys=True)
+    with _backend_lock:
+        if key not in _backend_instances:
+            factory = EMBEDDING_BACKENDS.get(config["backend"])
+            if factory is None:
+                raise ValueError(f"未知的嵌入后端: {config['backend']}，可选 {', '.join(EMBEDDING_BACKENDS)}")
+            _backend_instances[key] = factory(**options)
+    return _backend_instances[key]
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+# ===== 索引 =====
+
+# 持久化的数组：文件名 -> 类型码
+_ARRAYS = {
+    "passage_file": "I",   # 段落 -> 文件号
+    "starts": "I",         # 段落起始行
+    "ends": "I",           # 段落结束行
+    "lengths": "I",        # 段落词数
+    "offsets": "Q",        # 词号 -> 倒排表起点（CSR）
+    "pids": "I",           # 倒排表：段落号
+    "tfs": "H",            # 倒排表：词频
+    "vectors": "f",        # 段落向量（按段落号排列，可选）
+}
+
+
+class WorkspaceIndex:
+    """单个 workspace 的检索索引（线程安全）"""
+
+    def __init__(self, workspace: Path, index_dir: Path, config: Dict[str, Any],
+                 embedder: Optional[EmbeddingBackend] = None):
+        self.workspace = Path(workspace)
+        self.index_dir = Path(index_dir)
+        self.config = config
+        self.embedder = embedder
+        self.lock = threading.RLock()
+        # 影响索引内容的设置，变化时整体重建
+        self.settings = {
+            "version": INDEX_VERSION,
+            "passage_chars": config["passage_chars"],
+            "passage_max_lines": config["passage_max_lines"],
+            "embedding": embedder.name if embedder else None,
+        }
+        self._meta_loaded = False
+        self._arrays_loaded = False
+        self._reset()
+
+    def _reset(self):
+        self.files: Dict[str, Dict[str, Any]] = {}     # 相对路径 -> {size, mtime_ns, sha1, id, first, count}
+        self.file_names: List[str] = []                 # 文件号 -> 相对路径
+        self.terms: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        self.arrays = {name: array(code) for name, code in _ARRAYS.items()}
+        self.arrays["offsets"].append(0)
+        self.alive = bytearray()
+        self.overlay: Dict[int, Tuple[array, array]] = {}   # 词号 -> 尚未合并进 CSR 的 (段落号, 词频)
+        self.live_count = 0
+        self.live_length = 0
+        self.dim = 0
+
+    # ----- 加载与保存 -----
+
+    def _load_meta(self):
+        if self._meta_loaded:
+            return
+        self._meta_loaded = True
+        try:
+            meta = json.loads((self.index_dir / "meta.json").read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            self._arrays_loaded = True      # 没有索引：从空索引开始
+            return
+        if meta.get("settings") != self.settings:
+            self._arrays_loaded = True      # 设置变化：丢弃旧索引
+            return
+        self._meta = meta
+        self.files = meta["files"]
+        self.file_names = meta["file_names"]
+        self.live_count = meta["live_count"]
+        self.live_length = meta["live_length"]
+        self.dim = meta["dim"]
+
+    def _load_arrays(self):
+        """首次需要倒排表时才读入词表和数组；数组长度与 meta 不符时丢弃整个索引"""
+        self._load_meta()
+        if self._arrays_loaded:
+            return
+        self._arrays_loaded = True
+        try:
+            terms = (self.index_dir / "vocab.txt").read_text(encoding='utf-8').split("\n")
+            terms = terms if terms != [""] else []
+            arrays = {}
+            for name, code in _ARRAYS.items():
+                arr = array(code)
+                with open(self.index_dir / f"{name}.bin", 'rb') as f:
+                    arr.frombytes(f.read())
+                arrays[name] = arr
+            alive = bytearray((self.index_dir / "alive.bin").read_bytes())
+            if [len(terms), len(alive)] + [len(a) for a in arrays.values()] != self._meta["counts"]:
+                raise ValueError("index arrays out of sync")
+        except (OSError, ValueError):
+            self._reset()
+            return
+        self.terms = terms
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.arrays = arrays
+        self.alive = alive
+
+    def save(self):
+        """合并增量区后写盘（先写各数组，最后原子替换 meta.json）"""
+        self._merge(compact=False)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+
+        def write(name: str, data: bytes):
+            tmp = self.index_dir / f".{name}.{os.getpid()}.tmp"
+            tmp.write_bytes(data)
+            os.replace(tmp, self.index_dir / name)
+
+        write("vocab.txt", "\n".join(self.terms).encode('utf-8'))
+        for name, arr in self.arrays.items():
+            write(f"{name}.bin", arr.tobytes())
+        write("alive.bin", bytes(self.alive))
+        meta = {
+            "settings": self.settings,
+            "workspace": str(self.workspace),
+            "files": self.files,
+            "file_names": self.file_names,
+            "live_count": self.live_count,
+            "live_length": self.live_length,
+            "dim": self.dim,
+            "counts": [len(self.terms), len(self.alive)] + [len(a) for a in self.arrays.values()],
+        }
+        self._meta = meta
+        write("meta.json", json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+
+    # ----- 增量更新 -----
+
+    def _walk(self) -> Iterator[Tuple[str, Path, os.stat_result]]:
+        suffixes = {s.lower() for s in self.config["suffixes"]}
+        max_bytes = self.config["max_file_mb"] * 1024 * 1024
+        stack = [self.workspace]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        stack.append(Path(entry.path))
+                elif os.path.splitext(entry.name)[1].lower() in suffixes:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    if stat.st_size <= max_bytes:
+                        path = Path(entry.path)
+                        yield path.relative_to(self.workspace).as_posix(), path, stat
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        与磁盘同步：只重新切分新增或内容变化的文件
+
+        Returns:
+            {"added", "updated", "removed", "unchanged"}
+        """
+        with self.lock:
+            self._load_meta()
+            counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+            dirty = False
+            seen = set()
+            for rel, path, stat in self._walk():
+                seen.add(rel)
+                old = self.files.get(rel)
+                if old and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+                    counts["unchanged"] += 1
+                    continue
+                try:
+                    data = path.read_bytes()
+                except OSError:
+                    continue
+                sha1 = hashlib.sha1(data).hexdigest()
+                dirty = True
+                # save() 会重写全部数组，写盘前必须先加载（加载失败时索引被清空，需重新取 old）
+                self._load_arrays()
+                old = self.files.get(rel)
+                if old and old["sha1"] == sha1:
+                    # 只是 mtime 变了
+                    old.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                    counts["unchanged"] += 1
+                    continue
+                if old:
+                    self._drop(rel)
+                    counts["updated"] += 1
+                else:
+                    counts["added"] += 1
+                self._add(rel, _decode(data), stat, sha1)
+
+            for rel in [rel for rel in self.files if rel not in seen]:
+                self._load_arrays()
+                self._drop(rel)
+                counts["removed"] += 1
+                dirty = True
+
+            if dirty:
+                total = len(self.alive)
+                if total and (total - self.live_count) / total > self.config["compact_ratio"]:
+                    self._merge(compact=True)
+                self.save()
+            return counts
+
+    def _add(self, rel: str, text: str, stat: os.stat_result, sha1: str):
+        passages = split_passages(text, self.config["passage_chars"], self.config["passage_max_lines"])
+        arrays = self.arrays
+        first = len(self.alive)
+        file_id = len(self.file_names)
+        self.file_names.append(rel)
+        for start, end, passage in passages:
+            pid = len(self.alive)
+            tokens = tokenize(passage)
+            for term, tf in Counter(tokens).items():
+                term_id = self.vocab.get(term)
+                if term_id is None:
+                    term_id = self.vocab[term] = len(self.terms)
+                    self.terms.append(term)
+                postings = self.overlay.get(term_id)
+                if postings is None:
+                    postings = self.overlay[term_id] = (array("I"), array("H"))
+                postings[0].append(pid)
+                postings[1].append(min(tf, 65535))
+            arrays["passage_file"].append(file_id)
+            arrays["starts"].append(start)
+            arrays["ends"].append(end)
+            arrays["lengths"].append(len(tokens))
+            self.alive.append(1)
+            self.live_count += 1
+            self.live_length += len(tokens)
+
+        if self.embedder is not None and passages:
+            vectors = self.embedder.embed([passage for _, _, passage in passages])
+            self.dim = self.dim or len(vectors[0])
+            for vector in vectors:
+                arrays["vectors"].extend(_normalize(vector))
+
+        self.files[rel] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": sha1,
+                           "id": file_id, "first": first, "count": len(passages)}
+
+    def _drop(self, rel: str):
+        info = self.files.pop(rel)
+        lengths = self.arrays["lengths"]
+        for pid in range(info["first"], info["first"] + info["count"]):
+            if self.alive[pid]:
+                self.alive[pid] = 0
+                self.live_count -= 1
+                self.live_length -= lengths[pid]
+
+    def _merge(self, compact: bool):
+        """
+        把增量区合并进 CSR 倒排表；compact 时同时去掉已删除的段落并重排段落号、文件号和词号
+        """
+        if not self.overlay and not compact:
+            return
+        arrays = self.arrays
+        offsets, pids, tfs = arrays["offsets"], arrays["pids"], arrays["tfs"]
+        base_terms = len(offsets) - 1
+
+        if compact:
+            # 段落号重排：只保留未删除的段落，同一文件的段落保持连续
+            remap = array("i", [-1]) * len(self.alive)
+            kept = [pid for pid in range(len(self.alive)) if self.alive[pid]]
+            for new_pid, pid in enumerate(kept):
+                remap[pid] = new_pid
+            file_remap = {}
+            new_names = []
+            for rel, info in sorted(self.files.items(), key=lambda item: item[1]["first"]):
+                file_remap[info["id"]] = len(new_names)
+                new_names.append(rel)
+                info["first"] = remap[info["first"]] if info["count"] else 0
+                info["id"] = file_remap[info["id"]]
+            for name in ("starts", "ends", "lengths"):
+                arrays[name] = array(_ARRAYS[name], (arrays[name][pid] for pid in kept))
+            arrays["passage_file"] = array("I", (file_remap[arrays["passage_file"][pid]] for pid in kept))
+            if self.dim:
+                vectors = arrays["vectors"]
+                new_vectors = array("f")
+                for pid in kept:
+                    new_vectors.extend(vectors[pid * self.dim:(pid + 1) * self.dim])
+                arrays["vectors"] = new_vectors
+            self.file_names = new_names
+            self.alive = bytearray([1]) * len(kept)
+
+        new_offsets, new_pids, new_tfs = array("Q", [0]), array("I"), array("H")
+        new_terms = []
+        for term_id, term in enumerate(self.terms):
+            if term_id < base_terms:
+                start, end = offsets[term_id], offsets[term_id + 1]
+                term_pids, term_tfs = pids[start:end], tfs[start:end]
+            else:
+                term_pids, term_tfs = array("I"), array("H")
+            extra = self.overlay.get(term_id)
+            if extra:
+                term_pids.extend(extra[0])
+                term_tfs.extend(extra[1])
+            if compact:
+                pairs = [(remap[p], tf) for p, tf in zip(term_pids, term_tfs) if remap[p] >= 0]
+                if not pairs:
+                    continue    # 词已不再出现：从词表中去掉
+                term_pids = array("I", (p for p, _ in pairs))
+                term_tfs = array("H", (tf for _, tf in pairs))
+            new_terms.append(term)
+            new_pids.extend(term_pids)
+            new_tfs.extend(term_tfs)
+            new_offsets.append(len(new_pids))
+
+        arrays["offsets"], arrays["pids"], arrays["tfs"] = new_offsets, new_pids, new_tfs
+        self.terms = new_terms
+        self.vocab = {term: i for i, term in enumerate(new_terms)}
+        self.overlay = {}
+
+    # ----- 查询 -----
+
+    def _postings(self, term_id: int) -> Iterator[Tuple[int, int]]:
+        offsets = self.arrays["offsets"]
+        if term_id < len(offsets) - 1:
+            start, end = offsets[term_id], offsets[term_id + 1]
+            yield from zip(self.arrays["pids"][start:end], self.arrays["tfs"][start:end])
+        extra = self.overlay.get(term_id)
+        if extra:
+            yield from zip(extra[0], extra[1])
+
+    def _bm25(self, query: str, allowed: Optional[bytearray]) -> Dict[int, float]:
+        k1, b = self.config["k1"], self.config["b"]
+        total = self.live_count
+        avgdl = self.live_length / total if total else 1.0
+        lengths = self.arrays["lengths"]
+        alive = self.alive
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            postings = [(pid, tf) for pid, tf in self._postings(term_id) if alive[pid]]
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for pid, tf in postings:
+                if allowed is not None and not allowed[pid]:
+                    continue
+                norm = k1 * (1 - b + b * lengths[pid] / avgdl)
+                scores[pid] += idf * tf * (k1 + 1) / (tf + norm)
+        return scores
+
+    def _dense(self, query: str, allowed: bytearray, limit: int) -> List[int]:
+        """按余弦相似度取前 limit 个段落号"""
+        query_vector = _normalize(self.embedder.embed([query])[0])
+        vectors = self.arrays["vectors"]
+        if HAS_NUMPY:
+            matrix = np.frombuffer(vectors, dtype=np.float32).reshape(-1, self.dim)
+            sims = matrix @ np.asarray(query_vector, dtype=np.float32)
+            sims[np.frombuffer(bytes(allowed), dtype=np.uint8) == 0] = -np.inf
+            order = np.argsort(-sims)[:limit]
+            return [int(pid) for pid in order if np.isfinite(sims[pid])]
+        dim = self.dim
+        sims = ((sum(q * v for q, v in zip(query_vector, vectors[pid * dim:(pid + 1) * dim])), pid)
+                for pid in range(len(allowed)) if allowed[pid])
+        return [pid for _, pid in heapq.nlargest(limit, sims)]
+
+    def search(self, query: str, top_k: int = 5, path_pattern: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        检索段落
+
+        Args:
+            query: 查询
+            top_k: 返回条数
+            path_pattern: 只在匹配的文件中检索（目录前缀或 glob）
+
+        Returns:
+            [{"path", "start_line", "end_line", "score"}]，按相关度降序
+        """
+        with self.lock:
+            self._load_arrays()
+            allowed = None
+            if path_pattern:
+                allowed = bytearray(self.alive)
+                matching = {info["id"] for rel, info in self.files.items() if _path_matches(rel, path_pattern)}
+                passage_file = self.arrays["passage_file"]
+                for pid in range(len(allowed)):
+                    if allowed[pid] and passage_file[pid] not in matching:
+                        allowed[pid] = 0
+
+            scores = self._bm25(query, allowed)
+            ranked = heapq.nlargest(max(top_k, 100) if self.dim else top_k, scores.items(), key=lambda x: x[1])
+
+            if self.embedder is not None and self.dim:
+                # 与向量检索结果按 RRF 融合
+                dense = self._dense(query, allowed if allowed is not None else self.alive, max(top_k, 100))
+                fused: Dict[int, float] = defaultdict(float)
+                for rank, (pid, _) in enumerate(ranked):
+                    fused[pid] += 1 / (RRF_K + rank + 1)
+                for rank, pid in enumerate(dense):
+                    fused[pid] += 1 / (RRF_K + rank + 1)
+                ranked = heapq.nlargest(top_k, fused.items(), key=lambda x: x[1])
+            else:
+                ranked = ranked[:top_k]
+
+            arrays = self.arrays
+            return [{"path": self.file_names[arrays["passage_file"][pid]],
+                     "start_line": arrays["starts"][pid],
+                     "end_line": arrays["ends"][pid],
+                     "score": round(score, 4)} for pid, score in ranked]
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            self._load_meta()
+            return {"files": len(self.files), "passages": self.live_count,
+                    "terms": len(self.terms) if self._arrays_loaded else None,
+                    "arrays_loaded": self._arrays_loaded}
+
+
+def _decode(data: bytes) -> str:
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('gb18030', errors='replace')
+
+
+def _path_matches(rel: str, pattern: str) -> bool:
+    pattern = pattern.strip().lstrip('./').rstrip('/')
+    if not pattern:
+        return True
+    if any(c in pattern for c in "*?["):
+        return fnmatch(rel, pattern)
+    return rel == pattern or rel.startswith(pattern + "/")
+
+
+def read_passage(workspace: Path, hit: Dict[str, Any], max_chars: int) -> str:
+    """读取命中段落的原文（按行号范围）"""
+    with open(Path(workspace) / hit["path"], 'rb') as f:
+        lines = islice(f, hit["start_line"] - 1, hit["end_line"])
+        text = _decode(b"".join(lines)).replace("\r\n", "\n").rstrip("\n")
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars] + " …"
+    return text
+
+
+_indexes: "OrderedDict[str, WorkspaceIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_workspace_index(workspace: Path) -> WorkspaceIndex:
+    """取得 workspace 的索引（进程内按 LRU 保留最近使用的若干个）"""
+    config = get_retrieve_config()
+    embedder = get_embedding_backend(config.get("embedding"))
+    workspace = Path(workspace).resolve()
+    key = str(workspace)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None or index.embedder is not embedder or index.config != config:
+            digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+            index = WorkspaceIndex(workspace, get_cache_root() / "retrieve" / digest, config, embedder)
+            _indexes[key] = index
+        _indexes.move_to_end(key)
+        while len(_indexes) > max(1, int(config["memory_indexes"])):
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工具结果信封
+工具结果在整条链路中保持为结构化字典：
+    {"status": ..., "output": 原始输出文本, "error_information": ..., "metadata": {...}}
+output 不再被逐层 json.dumps，只在 ContextBuilder 构建上下文时渲染一次
+"""
+
+import json
+from typing import Any, Dict
+
+
+# 信封的固定字段，其余字段（包括压缩标记 _compressed 等）都视为元数据
+ENVELOPE_FIELDS = ("status", "output", "error_information", "metadata")
+
+
+def from_toolserver_data(data: Dict[str, Any], status: str = None, error: str = "") -> Dict[str, Any]:
+    """
+    把 toolServer 返回的工具结果（{"status", "output", "error", ...}）转换为信封
+
+    Args:
+        data: 工具的原始返回字典
+        status: 覆盖 data 中的状态
+        error: 覆盖 data 中的错误信息
+
+    Returns:
+        结果信封
+    """
+    data = data if isinstance(data, dict) else {"output": data}
+    metadata = {k: v for k, v in data.items() if k not in ("status", "output", "error")}
+    result = {
+        "status": status or data.get("status", "success"),
+        "output": data.get("output", ""),
+        "error_information": error or data.get("error") or "",
+    }
+    if metadata:
+        result["metadata"] = metadata
+    return result
+
+
+def unwrap_legacy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    兼容旧轨迹：旧版 ToolExecutor 把整个工具返回字典 json.dumps 后放进 output，
+    这里把它还原为信封（非旧格式时原样返回）
+    """
+    output = result.get("output")
+    if not isinstance(output, str) or not output.startswith("{"):
+        return result
+    try:
+        inner = json.loads(output)
+    except ValueError:
+        return result
+    if not isinstance(inner, dict) or "status" not in inner or "output" not in inner:
+        return result
+
+    unwrapped = from_toolserver_data(inner, status=result.get("status"), error=result.get("error_information", ""))
+    for key, value in result.items():
+        if key not in ENVELOPE_FIELDS:
+            unwrapped[key] = value
+    return unwrapped
+
+
+def render_tool_result(result: Dict[str, Any]) -> str:
+    """
+    把结果信封渲染为上下文文本（输出原样保留，不做 JSON 转义）
+
+    Returns:
+        形如 "status: success\\nmetadata: {...}\\noutput:\\n<原始输出>" 的文本
+    """
+    if not isinstance(result, dict):
+        return str(result)
+    result = unwrap_legacy_result(result)
+
+    lines = [f"status: {result.get('status', '')}"]
+
+    metadata = dict(result.get("metadata") or {})
+    metadata.update({k: v for k, v in result.items() if k not in ENVELOPE_FIELDS})
+    if metadata:
+        lines.append("metadata: " + json.dumps(metadata, ensure_ascii=False, default=str))
+
+    error = result.get("error_information")
+    if error:
+        lines.append(f"error: {error}")
+
+    output = result.get("output", "")
+    if output not in ("", None):
+        if not isinstance(output, str):
+            output = json.dumps(output, ensure_ascii=False, indent=2, default=str)
+        lines.append("output:")
+        lines.append(output)
+
+    return "\n".join(lines)
@@ -13,12 +13,15 @@ import os
 import sys
 import json
 import threading
+import time
+import hashlib
 import queue
 import subprocess
 import signal
 import fcntl  # For file locking (Unix systems)
 import yaml
 from pathlib import Path
+from collections import OrderedDict
 from datetime import datetime
 from flask import Flask, render_template, request, Response, jsonify, session
 from flask_cors import CORS
@@ -1077,71 +1080,173 @@ def list_tasks():
         return jsonify({"error": str(e)}), 500
 
 
+# Directory listing cache (per directory, invalidated by directory mtime)
+# 目录 mtime 只在增删/重命名条目时变化，文件大小的变化靠短 TTL 刷新
+FILE_LIST_CACHE_TTL = 2.0  # seconds
+FILE_LIST_CACHE_MAX = 256
+file_list_cache = OrderedDict()  # {dir_path: {"mtime_ns", "time", "entries", "signature"}}
+file_list_cache_lock = threading.Lock()
+
+FILE_LIST_SORT_KEYS = {
+    "name": lambda e: e["name"],
+    "size": lambda e: (e["size"], e["name"]),
+    "mtime": lambda e: (e["mtime"], e["name"]),
+    "type": lambda e: (not e["is_dir"], e["name"]),
+}
+
+
+def scan_directory(dir_path: str) -> dict:
+    """
+    List a directory with os.scandir (cached)
+
+    Returns:
+        {"entries": [{"name", "is_dir", "size", "mtime"}] sorted by name, "signature": listing hash, ...}
+    """
+    dir_mtime_ns = os.stat(dir_path).st_mtime_ns
+    now = time.monotonic()
+    with file_list_cache_lock:
+        cached = file_list_cache.get(dir_path)
+        if cached and cached["mtime_ns"] == dir_mtime_ns and now - cached["time"] < FILE_LIST_CACHE_TTL:
+            file_list_cache.move_to_end(dir_path)
+            return cached
+
+    entries = []
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            # Skip hidden files and special directories
+            if entry.name.startswith('.'):
+                continue
+            # is_dir()/is_file() 使用 scandir 返回的类型信息，只有文件才 stat 一次
+            try:
+                is_dir = entry.is_dir()
+                stat = entry.stat() if not is_dir else None
+            except OSError:
+                # 失效的符号链接等
+                is_dir, stat = False, None
+            entries.append({
+                "name": entry.name,
+                "is_dir": is_dir,
+                "size": stat.st_size if stat is not None and entry.is_file() else 0,
+                "mtime": stat.st_mtime if stat is not None else 0
+            })
+    entries.sort(key=lambda e: e["name"])
+
+    signature = hashlib.sha1(
+        json.dumps([[e["name"], e["is_dir"], e["size"], e["mtime"]] for e in entries]).encode('utf-8')
+    ).hexdigest()
+    result = {"mtime_ns": dir_mtime_ns, "time": now, "entries": entries, "signature": signature}
+    with file_list_cache_lock:
+        file_list_cache[dir_path] = result
+        file_list_cache.move_to_end(dir_path)
+        while len(file_list_cache) > FILE_LIST_CACHE_MAX:
+            file_list_cache.popitem(last=False)
+    return result
+
+
 @app.route('/api/files/list', methods=['GET'])
 @login_required
 def list_files():
-    """Get file list under specified path"""
+    """
+    Get file list under specified path
+
+    Query parameters:
+        path: directory path
+        task_id: task ID (optional)
+        sort: name / size / mtime / type (default name)
+        order: asc / desc (default asc)
+        page, page_size: pagination, page starts at 1 (omit page_size to return all entries)
+
+    Returns 304 when If-None-Match matches the listing's ETag.
+    """
     try:
         username = session.get('username')
         if not username:
             return jsonify({"error": "User not authenticated"}), 401
-        
+
         path = request.args.get('path', '')
         task_id = request.args.get('task_id', '')
         if not path:
             return jsonify({"error": "Missing path parameter"}), 400
-        
+
+        sort = request.args.get('sort', 'name')
+        order = request.args.get('order', 'asc')
+        if sort not in FILE_LIST_SORT_KEYS:
+            return jsonify({"error": f"Invalid sort: {sort} (name/size/mtime/type)"}), 400
+        if order not in ('asc', 'desc'):
+            return jsonify({"error": f"Invalid order: {order} (asc/desc)"}), 400
+        try:
+            page = max(1, int(request.args.get('page', 1)))
+            page_size = request.args.get('page_size')
+            page_size = max(1, int(page_size)) if page_size else None
+        except ValueError:
+            return jsonify({"error": "page and page_size must be integers"}), 400
+
         # Normalize path (limited to user workspace directory)
         try:
             path_obj = normalize_file_path(path, task_id=task_id if task_id else None, username=username)
         except ValueError as e:
             return jsonify({"error": str(e)}), 400
-        
+
         if not path_obj.exists():
             return jsonify({"error": "Path does not exist"}), 404
-        
+
         if not path_obj.is_dir():
             return jsonify({"error": "Path is not a directory"}), 400
-        
+
         # Get user workspace for relative path calculation
         user_workspace = get_user_workspace(username)
-        
+
         # Calculate relative path (for display)
         try:
             rel_path = path_obj.relative_to(user_workspace)
             display_path = str(rel_path) if rel_path != Path('.') else ''
         except ValueError:
             display_path = str(path_obj)
-        
+
+        listing = scan_directory(str(path_obj))
+
+        # ETag 覆盖目录内容和本次的排序/分页参数
+        etag = hashlib.sha1(
+            f"{listing['signature']}|{display_path}|{sort}|{order}|{page}|{page_size}".encode('utf-8')
+        ).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        entries = listing["entries"]
+        if sort != 'name' or order != 'asc':
+            entries = sorted(entries, key=FILE_LIST_SORT_KEYS[sort], reverse=(order == 'desc'))
+        total = len(entries)
+        if page_size:
+            entries = entries[(page - 1) * page_size:page * page_size]
+
+        # 条目路径 = 当前目录路径 + 名称，不再逐个计算 relative_to
         files = []
-        for item in sorted(path_obj.iterdir()):
-            # Skip hidden files and special directories
-            if item.name.startswith('.'):
-                continue
-            
-            # Skip chat_history.json and conversations folder (hidden from users)
-            # if item.name == 'chat_history.json' or item.name == 'conversations':
-            #     continue
-            
-            # Calculate file relative path (for display)
-            try:
-                item_rel = item.relative_to(user_workspace)
-                item_display_path = str(item_rel) if item_rel != Path('.') else ''
-            except ValueError:
-                item_display_path = str(item)
-            
+        for entry in entries:
             files.append({
-                "name": item.name,
-                "path": item_display_path,  # Return relative path (for frontend display)
-                "path_absolute": str(item),  # Absolute path for internal use
-                "type": "directory" if item.is_dir() else "file",
-                "size": item.stat().st_size if item.is_file() else 0
+                "name": entry["name"],
+                "path": os.path.join(display_path, entry["name"]),  # Return relative path (for frontend display)
+                "path_absolute": os.path.join(str(path_obj), entry["name"]),  # Absolute path for internal use
+                "type": "directory" if entry["is_dir"] else "file",
+                "size": entry["size"],
+                "mtime": entry["mtime"]
             })
-        
-        return jsonify({
+
+        result = {
             "files": files,
-            "path": display_path  # Current path (relative path)
-        })
+            "path": display_path,  # Current path (relative path)
+            "total": total
+        }
+        if page_size:
+            result["page"] = page
+            result["page_size"] = page_size
+
+        response = jsonify(result)
+        response.set_etag(etag)
+        # 浏览器每次带 If-None-Match 重新验证，目录未变化时得到 304
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1440,10 +1545,119 @@ def get_copy_progress_api():
         return jsonify({"error": str(e)}), 500
 
 
+# Streaming ZIP download
+ZIP_CHUNK_SIZE = 1024 * 1024
+# 已经压缩过的格式直接存储，不再 deflate
+ZIP_STORED_SUFFIXES = {
+    '.pdf', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z',
+    '.rar', '.zst', '.mp3', '.mp4', '.m4a', '.mov', '.avi', '.mkv', '.webm', '.docx', '.xlsx',
+    '.pptx', '.npz', '.parquet', '.whl', '.jar'
+}
+ZIP_ENV_DIRS = {'code_env', 'venv', '.venv', 'node_modules'}
+ZIP_CACHE_DIRS = {'__pycache__', '.pytest_cache', '.mypy_cache', '.ruff_cache', '.ipynb_checkpoints', '.cache'}
+ZIP_CACHE_SUFFIXES = {'.pyc', '.pyo'}
+
+
+class _ZipStreamBuffer:
+    """Write-only sink for ZipFile; bytes are drained by the response generator"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_task_zip(task_path: Path, exclude_env: bool = False, exclude_cache: bool = False):
+    """
+    Generate a ZIP archive of the task directory chunk by chunk
+
+    ZipFile 写入不可 seek 的流时使用 data descriptor，条目边遍历边写出，内存占用与目录大小无关
+    响应头发出后出错时记录日志并中止响应，客户端看到的是下载失败而不是一个截断的 ZIP
+
+    Args:
+        task_path: task directory
+        exclude_env: skip virtual environments (code_env, venv, any directory with pyvenv.cfg) and node_modules
+        exclude_cache: skip __pycache__ / .cache etc. and .pyc files
+    """
+    import zipfile
+
+    sink = _ZipStreamBuffer()
+    try:
+        with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for root, dirs, files in os.walk(task_path):
+                root_path = Path(root)
+                if exclude_env:
+                    dirs[:] = [d for d in dirs
+                               if d not in ZIP_ENV_DIRS and not (root_path / d / 'pyvenv.cfg').exists()]
+                if exclude_cache:
+                    dirs[:] = [d for d in dirs if d not in ZIP_CACHE_DIRS]
+                    files = [f for f in files if os.path.splitext(f)[1].lower() not in ZIP_CACHE_SUFFIXES]
+                dirs.sort()
+
+                # Skip chat_history.json file
+                valid_files = sorted(f for f in files if f != 'chat_history.json')
+                rel_root = root_path.relative_to(task_path)
+
+                if not valid_files and not dirs and rel_root != Path('.'):
+                    # Empty directory: add a path ending with /
+                    zip_file.writestr(rel_root.as_posix() + '/', b'')
+                    continue
+
+                for file in valid_files:
+                    file_path = root_path / file
+                    try:
+                        zinfo = zipfile.ZipInfo.from_file(file_path, (rel_root / file).as_posix(),
+                                                         strict_timestamps=False)
+                        src = open(file_path, 'rb')
+                    except (OSError, ValueError):
+                        # 遍历期间被删除、失效的符号链接等
+                        continue
+                    with src:
+                        if os.path.splitext(file)[1].lower() in ZIP_STORED_SUFFIXES:
+                            zinfo.compress_type = zipfile.ZIP_STORED
+                        else:
+                            zinfo.compress_type = zipfile.ZIP_DEFLATED
+                        with zip_file.open(zinfo, 'w') as dest:
+                            while True:
+                                chunk = src.read(ZIP_CHUNK_SIZE)
+                                if not chunk:
+                                    break
+                                dest.write(chunk)
+                                if sink.chunks:
+                                    yield sink.drain()
+                    if sink.chunks:
+                        yield sink.drain()
+        # Central directory
+        yield sink.drain()
+    except Exception:
+        import traceback
+        print(f"Task download error ({task_path}): {traceback.format_exc()}")
+        # 响应头已经发出，无法再返回错误状态：中止响应而不是正常结束，
+        # 否则客户端会把缺少中央目录的 ZIP 当作下载完成
+        raise
+
+
 @app.route('/api/task/download', methods=['GET'])
 @login_required
 def download_task():
-    """Download entire task directory as ZIP archive"""
+    """
+    Download entire task directory as ZIP archive (streamed while walking the directory)
+
+    Query parameters:
+        task_id: task ID
+        exclude_env: "true" to skip virtual environments (code_env, venvs) and node_modules
+        exclude_cache: "true" to skip cache directories (__pycache__, .cache, ...) and .pyc files
+    """
     try:
         username = session.get('username')
         if not username:
@@ -1452,6 +1666,8 @@ def download_task():
         task_id = request.args.get('task_id', '').strip()
         if not task_id:
             return jsonify({"error": "Missing task_id parameter"}), 400
+        exclude_env = request.args.get('exclude_env', '').lower() in ('1', 'true', 'yes')
+        exclude_cache = request.args.get('exclude_cache', '').lower() in ('1', 'true', 'yes')
         
         # Normalize task path
         try:
@@ -1465,83 +1681,19 @@ def download_task():
         if not task_path.is_dir():
             return jsonify({"error": "Path is not a directory"}), 400
         
-        # Create ZIP file in memory
-        import zipfile
-        import io
-        from flask import send_file
-        
-        # Create in-memory ZIP file
-        zip_buffer = io.BytesIO()
-        
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            # Collect empty directories and files to include
-            empty_directories = set()
-            files_to_add = []
-            directories_with_files = set()  # Track directories that contain files
-            
-            # Walk through all files in task directory
-            for root, dirs, files in os.walk(task_path):
-                # Calculate relative path for current directory
-                rel_root = Path(root).relative_to(task_path)
-                rel_root_str = str(rel_root)
-                
-                # # Skip conversations directory and all its subdirectories
-                # if 'conversations' in rel_root_str.split(os.sep):
-                #     # Remove conversations from dirs to prevent further traversal
-                #     if 'conversations' in dirs:
-                #         dirs.remove('conversations')
-                #     continue
-                
-                # # Remove conversations directory from dirs to skip it during walk
-                # if 'conversations' in dirs:
-                #     dirs.remove('conversations')
-                
-                # Check if directory has any valid files (excluding chat_history.json)
-                valid_files = [f for f in files if f != 'chat_history.json']
-                
-                if not valid_files:
-                    # Directory is empty (or only contains chat_history.json)
-                    if rel_root != Path('.'):
-                        empty_directories.add(rel_root_str)
-                else:
-                    # Directory has files, mark it and its parents
-                    directories_with_files.add(rel_root_str)
-                    for parent in rel_root.parents:
-                        if parent != Path('.'):
-                            directories_with_files.add(str(parent))
-                
-                # Process files
-                for file in files:
-                    # Skip chat_history.json file
-                    if file == 'chat_history.json':
-                        continue
-                    
-                    file_path = Path(root) / file
-                    # Calculate relative path from task directory
-                    arcname = file_path.relative_to(task_path)
-                    files_to_add.append((file_path, arcname))
-            
-            # Add empty directories (excluding those that will be created by files)
-            for dir_path in sorted(empty_directories):
-                if dir_path not in directories_with_files:
-                    # Create empty directory entry by adding a path ending with /
-                    zip_file.writestr(dir_path + '/', b'')
-            
-            # Add all files
-            for file_path, arcname in files_to_add:
-                zip_file.write(file_path, arcname)
-        
-        zip_buffer.seek(0)
-        
         # Generate filename (sanitize task_id for filename)
         safe_task_id = task_id.replace('/', '_').replace('\\', '_').replace('..', '_')
         zip_filename = f"{safe_task_id}.zip"
+        ascii_filename = zip_filename.encode('ascii', 'replace').decode('ascii').replace('?', '_').replace('"', '_')
         
-        return send_file(
-            zip_buffer,
+        from urllib.parse import quote
+        return Response(
+            iter_task_zip(task_path, exclude_env=exclude_env, exclude_cache=exclude_cache),
             mimetype='application/zip',
-            as_attachment=True,
-            download_name=zip_filename
+            headers={
+                "Content-Disposition": f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{quote(zip_filename)}",
+                "X-Accel-Buffering": "no"  # 反向代理不要缓冲整个响应
+            }
         )
     except Exception as e:
         import traceback